@@ -3,7 +3,7 @@ API Request Models
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class MerchantAttestationRequest(BaseModel):
@@ -22,12 +22,35 @@ class PurchaseRequest(BaseModel):
     user_address: str = Field(..., description="User's Algorand address")
     timestamp: Optional[int] = Field(None, description="Purchase timestamp")
 
+class BatchPurchaseRequest(BaseModel):
+    """Request model for batch purchase verification"""
+    purchases: List[PurchaseRequest] = Field(..., max_length=10000, description="Purchases to verify, in order")
+
+class CheckoutItem(BaseModel):
+    """One item of a cart"""
+    merchant_name: str = Field(..., description="Name of the merchant")
+    amount: int = Field(..., gt=0, description="Item amount in microAlgos")
+
+class CheckoutRequest(BaseModel):
+    """Request model for checking out a cart in one atomic group"""
+    user_address: str = Field(..., description="User's Algorand address")
+    # Two app calls plus one payment per item fill a 16-transaction group
+    items: List[CheckoutItem] = Field(..., min_length=1, max_length=14, description="Items in cart order")
+    timestamp: Optional[int] = Field(None, description="Purchase timestamp")
+
 class AllowanceRequest(BaseModel):
     """Request model for allowance operations"""
     teen_address: str = Field(..., description="Teen's Algorand address")
     weekly_amount: int = Field(..., description="Weekly allowance amount in microAlgos")
     parent_private_key: Optional[str] = Field(None, description="Parent's private key for signing")
 
+class FamilyRegistrationRequest(BaseModel):
+    """Request model for registering a teen with the shared allowance manager"""
+    teen_address: str = Field(..., description="Teen's Algorand address")
+    weekly_amount: int = Field(..., gt=0, description="Weekly allowance amount in microAlgos")
+    parent_private_key: str = Field(..., description="Parent's private key for signing")
+    family_id: Optional[str] = Field(None, description="Family whose rules the teen follows")
+
 class EmergencyAllowanceRequest(BaseModel):
     """Request model for emergency allowance"""
     teen_address: str = Field(..., description="Teen's Algorand address")
@@ -41,10 +64,29 @@ class SavingsRequest(BaseModel):
     unlock_time: int = Field(..., description="Unix timestamp when savings unlock")
     teen_private_key: Optional[str] = Field(None, description="Teen's private key for signing")
 
+class SpendWindowRequest(BaseModel):
+    """Request model for one rolling spend window"""
+    name: str = Field(..., description="Window name, e.g. 24h, 7d or 30d")
+    window_seconds: int = Field(..., gt=0, description="Window length in seconds")
+    num_buckets: int = Field(..., gt=0, le=1024, description="Number of time buckets in the window")
+    limit: Optional[int] = Field(None, description="Spend limit in microAlgos, null to track only")
+
+class SpendWindowsRequest(BaseModel):
+    """Request model for configuring a teen's rolling spend windows"""
+    windows: List[SpendWindowRequest] = Field(..., description="Rolling spend windows")
+
+class FamilyRulesRequest(BaseModel):
+    """Request model for setting a family's purchase rules"""
+    teen_addresses: List[str] = Field(default_factory=list, description="Teen addresses in the family")
+    restricted_categories: Optional[List[str]] = Field(None, description="Blocked categories, null for the defaults")
+    merchant_approvals: Dict[str, bool] = Field(default_factory=dict, description="Per-merchant parent approvals")
+    category_caps: Dict[str, int] = Field(default_factory=dict, description="Daily caps per category in microAlgos")
+
 class ParentApprovalRequest(BaseModel):
     """Request model for parent approval operations"""
     merchant_name: str = Field(..., description="Name of the merchant")
     approved: bool = Field(..., description="Whether to approve or disapprove")
+    family_id: Optional[str] = Field(None, description="Apply the approval to this family only")
     parent_private_key: Optional[str] = Field(None, description="Parent's private key for signing")
 
 class MerchantUpdateRequest(BaseModel):
@@ -36,6 +36,26 @@ class PurchaseResponse(BaseResponse):
     explorer_link: Optional[str] = Field(None, description="Algorand Explorer link")
     amount: Optional[int] = Field(None, description="Purchase amount in microAlgos")
     merchant_name: Optional[str] = Field(None, description="Merchant name")
+    status: Optional[str] = Field(None, description="Transaction status: pending, confirmed or failed")
+    confirmed_round: Optional[int] = Field(None, description="Round the transaction confirmed in")
+
+class BatchPurchaseResponse(BaseResponse):
+    """Response model for batch purchase verification"""
+    approved: List[bool] = Field(..., description="Approval result per purchase, in request order")
+    reasons: List[Optional[str]] = Field(..., description="Denial reason per purchase, null when approved")
+    approved_count: int = Field(..., description="Number of approved purchases")
+    total_approved_amount: int = Field(..., description="Sum of approved amounts in microAlgos")
+
+class CheckoutResponse(BaseResponse):
+    """Response model for cart checkout"""
+    approved: bool = Field(..., description="Whether the whole cart was approved and submitted")
+    reason: Optional[str] = Field(None, description="Why the cart was denied or not submitted")
+    reasons: List[Optional[str]] = Field(default_factory=list, description="Denial reason per item, null when approved")
+    transaction_id: Optional[str] = Field(None, description="Transaction ID of the group's first transaction")
+    explorer_link: Optional[str] = Field(None, description="Algorand Explorer link")
+    status: Optional[str] = Field(None, description="Transaction status: pending, confirmed or failed")
+    item_count: int = Field(..., description="Number of items in the cart")
+    total_amount: int = Field(..., description="Sum of item amounts in microAlgos")
 
 class AllowanceResponse(BaseResponse):
     """Response model for allowance operations"""
@@ -45,6 +65,38 @@ class AllowanceResponse(BaseResponse):
     last_allowance_time: int = Field(..., description="Last allowance timestamp")
     is_paused: bool = Field(..., description="Whether allowance is paused")
     can_issue: bool = Field(..., description="Whether allowance can be issued now")
+    round: Optional[int] = Field(None, description="Round the on-chain state is at least as fresh as")
+
+class FamilyRegistrationResponse(BaseResponse):
+    """Response model for registering a teen with the shared allowance manager"""
+    teen_address: str = Field(..., description="Teen's Algorand address")
+    parent_address: str = Field(..., description="Parent who controls the allowance")
+    weekly_amount: int = Field(..., description="Weekly allowance amount in microAlgos")
+    app_id: int = Field(..., description="Allowance manager app holding the teen's record")
+    transaction_id: str = Field(..., description="Registration transaction ID")
+    confirmed_round: Optional[int] = Field(None, description="Round the registration was confirmed in")
+
+class SpendWindowStatus(BaseModel):
+    """Status of one rolling spend window"""
+    name: str = Field(..., description="Window name")
+    window_seconds: int = Field(..., description="Window length in seconds")
+    num_buckets: int = Field(..., description="Number of time buckets in the window")
+    limit: Optional[int] = Field(None, description="Spend limit in microAlgos")
+    spent: int = Field(..., description="Amount spent within the window in microAlgos")
+    remaining: Optional[int] = Field(None, description="Remaining spend in microAlgos")
+
+class SpendWindowsResponse(BaseResponse):
+    """Response model for a teen's rolling spend windows"""
+    teen_address: str = Field(..., description="Teen's Algorand address")
+    windows: List[SpendWindowStatus] = Field(..., description="Rolling spend windows")
+
+class FamilyRulesResponse(BaseResponse):
+    """Response model for a family's purchase rules"""
+    family_id: str = Field(..., description="Family identifier")
+    teen_addresses: List[str] = Field(..., description="Teen addresses in the family")
+    restricted_categories: List[str] = Field(..., description="Blocked categories")
+    merchant_approvals: Dict[str, bool] = Field(..., description="Per-merchant parent approvals")
+    category_caps: Dict[str, int] = Field(..., description="Daily caps per category in microAlgos")
 
 class TransactionResponse(BaseModel):
     """Response model for individual transactions"""
@@ -64,6 +116,8 @@ class TransactionHistoryResponse(BaseResponse):
     transactions: List[TransactionResponse] = Field(..., description="List of transactions")
     total_count: int = Field(..., description="Total number of transactions")
     user_address: str = Field(..., description="User's Algorand address")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, if any")
+    synced_round: Optional[int] = Field(None, description="Round the local store is synced through, if served locally")
 
 class AccountInfoResponse(BaseResponse):
     """Response model for account information"""
@@ -85,6 +139,36 @@ class MerchantAnalyticsResponse(BaseResponse):
     parent_approved: bool = Field(..., description="Whether parent has approved this merchant")
     last_update: int = Field(..., description="Last update timestamp")
 
+class ChainAttestationResponse(BaseResponse):
+    """Response model for a merchant attestation as stored on chain"""
+    merchant_name: str = Field(..., description="Name of the merchant")
+    category: str = Field(..., description="Category of the merchant")
+    is_approved: bool = Field(..., description="Whether the merchant is approved")
+    daily_limit: int = Field(..., description="Daily spending limit in microAlgos")
+    total_spent_today: int = Field(..., description="Amount spent today in microAlgos, as counted on chain")
+    parent_approved: bool = Field(..., description="Whether parent has approved this merchant")
+    last_update: int = Field(..., description="Last update timestamp")
+    round: int = Field(..., description="Round the state is at least as fresh as")
+
+class MerchantWriteResponse(BaseResponse):
+    """Response model for merchant changes; the on-chain write follows in the background"""
+    merchant_name: str = Field(..., description="Name of the merchant")
+    write_id: Optional[int] = Field(None, description="Queued attestation oracle write, null when no oracle is deployed")
+
+class OracleWriteStatusResponse(BaseResponse):
+    """Response model for a queued attestation oracle write"""
+    write_id: int = Field(..., description="Write ID")
+    merchant_name: str = Field(..., description="Merchant the write updates")
+    method: str = Field(..., description="Attestation oracle method called")
+    status: str = Field(..., description="Write status: pending, confirmed or failed")
+    attempts: int = Field(..., description="Sends attempted so far")
+    next_attempt: Optional[float] = Field(None, description="When a pending write is next sent (unix seconds)")
+    last_error: Optional[str] = Field(None, description="Error from the last failed attempt")
+    transaction_id: Optional[str] = Field(None, description="Transaction ID once confirmed")
+    confirmed_round: Optional[int] = Field(None, description="Round the write confirmed in")
+    created_at: float = Field(..., description="When the write was queued (unix seconds)")
+    updated_at: float = Field(..., description="When the write last changed (unix seconds)")
+
 class HealthCheckResponse(BaseResponse):
     """Response model for health check"""
     status: str = Field(..., description="Service status")
@@ -100,6 +184,48 @@ class NetworkStatusResponse(BaseResponse):
     catchup_time: int = Field(..., description="Catchup time")
     network: str = Field(..., description="Network type (testnet/mainnet)")
 
+class ParamsCacheStatsResponse(BaseResponse):
+    """Response model for suggested params cache counters"""
+    hits: int = Field(..., description="Requests served from the cache")
+    misses: int = Field(..., description="Requests that fetched params from algod")
+    background_refreshes: int = Field(..., description="Per-round refreshes by the background follower")
+    algod_calls: int = Field(..., description="Total suggested params calls made to algod")
+    last_round: int = Field(..., description="Latest round seen by the cache")
+    valid_until_round: Optional[int] = Field(None, description="Last valid round of the cached params")
+    following_rounds: bool = Field(..., description="Whether the background follower is running")
+
+class SignerStatsResponse(BaseResponse):
+    """Response model for transaction signer counters"""
+    processes: int = Field(..., description="Signing worker processes (0 signs in the service process)")
+    cached_keys: int = Field(..., description="Private keys whose address and signing key are cached")
+    transactions_signed: int = Field(..., description="Transactions signed")
+    transactions_offloaded: int = Field(..., description="Transactions signed in worker processes")
+
+class PurchaseTemplateStatsResponse(BaseResponse):
+    """Response model for purchase group template counters"""
+    templates: int = Field(..., description="Cached (teen, merchant) purchase group templates")
+    hits: int = Field(..., description="Purchase groups rendered from a cached template")
+    misses: int = Field(..., description="Purchase groups that built a new template")
+    fallbacks: int = Field(..., description="Purchase groups built without a template, e.g. under per-byte fees")
+
+class IngestStatsResponse(BaseResponse):
+    """Response model for block ingestion progress"""
+    running: bool = Field(..., description="Whether the block ingestor is following the chain")
+    processed_round: int = Field(..., description="Last round fanned out to subscribers")
+    network_round: int = Field(..., description="Latest round reported by algod")
+    lag_rounds: int = Field(..., description="Rounds behind the network")
+    lag_seconds: Optional[int] = Field(None, description="Seconds since the last processed block was produced")
+    blocks_processed: int = Field(..., description="Blocks processed since start")
+    transactions_matched: int = Field(..., description="Transactions delivered to subscribers since start")
+    subscribed_addresses: int = Field(..., description="Addresses with at least one subscriber")
+    missed_rounds: int = Field(0, description="Rounds a subscriber kept failing on and must backfill")
+
+class EventHubStatsResponse(BaseResponse):
+    """Response model for event push counters"""
+    published: int = Field(..., description="Events published since start")
+    topics: int = Field(..., description="Addresses/families with retained events")
+    connections: int = Field(..., description="Open SSE and WebSocket subscriptions")
+
 class SavingsResponse(BaseResponse):
     """Response model for savings operations"""
     teen_address: str = Field(..., description="Teen's Algorand address")
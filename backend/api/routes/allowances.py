@@ -2,33 +2,99 @@
 Allowance Management API Routes
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 import logging
+import time
+from typing import Any, Dict
 
 from ..models.requests import (
     AllowanceRequest,
     EmergencyAllowanceRequest,
-    SavingsRequest
+    FamilyRegistrationRequest,
+    SavingsRequest,
+    SpendWindowsRequest
 )
 from ..models.responses import (
     AllowanceResponse,
+    FamilyRegistrationResponse,
     SavingsResponse,
+    SpendWindowsResponse,
     BaseResponse
 )
 from ...services.blockchain_service import BlockchainService
+from ...services.family_registry import FamilyAccount, decode_family_allowance, family_box_name
+from ...services.chain_cache import ChainStateCache
+from ...services import service_registry
+from ...services.oracle_service import OracleService
+from ...services.event_hub import EventHub, ALLOWANCE_ISSUED, SAVINGS_LOCKED, SAVINGS_UNLOCKED
+from ...services.rolling_limits import SpendWindowConfig
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/allowances", tags=["allowances"])
 
+# The allowance manager issues at most one weekly allowance per 7 days
+WEEK_SECONDS = 604800
+
 # Dependency injection
 def get_blockchain_service() -> BlockchainService:
-    return BlockchainService()
+    return service_registry.get_blockchain_service()
+
+def get_oracle_service() -> OracleService:
+    return service_registry.get_oracle_service()
+
+def get_event_hub() -> EventHub:
+    return service_registry.get_event_hub()
+
+def get_chain_cache() -> ChainStateCache:
+    return service_registry.get_chain_cache()
+
+def publish_teen_event(event_hub: EventHub, teen_address: str, event_type: str, data: Dict[str, Any]) -> None:
+    """Push an event to the teen's stream and their family's stream"""
+    family_id = get_oracle_service().policy_compiler.family_of(teen_address)
+    event_hub.publish([teen_address, family_id], event_type, {"teen_address": teen_address, **data})
+
+@router.post("/families", response_model=FamilyRegistrationResponse)
+async def register_family(
+    request: FamilyRegistrationRequest,
+    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+):
+    """Register a teen with the shared allowance manager, the signer as their parent"""
+    try:
+        result = await run_in_threadpool(
+            blockchain_service.register_family,
+            request.parent_private_key,
+            request.teen_address,
+            request.weekly_amount,
+            request.family_id
+        )
+        
+        if result.get("error"):
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return FamilyRegistrationResponse(
+            success=True,
+            teen_address=request.teen_address,
+            parent_address=result["parent_address"],
+            weekly_amount=request.weekly_amount,
+            app_id=blockchain_service.allowance_manager_app_id,
+            transaction_id=result["transaction_id"],
+            confirmed_round=result.get("confirmed_round"),
+            message="Family registered successfully"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to register family: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/issue", response_model=AllowanceResponse)
 async def issue_weekly_allowance(
     request: AllowanceRequest,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    blockchain_service: BlockchainService = Depends(get_blockchain_service),
+    event_hub: EventHub = Depends(get_event_hub)
 ):
     """Issue weekly allowance to teen"""
     try:
@@ -38,6 +104,9 @@ async def issue_weekly_allowance(
         if not blockchain_service.allowance_manager_app_id:
             raise HTTPException(status_code=400, detail="Allowance manager contract not deployed")
         
+        publish_teen_event(event_hub, request.teen_address, ALLOWANCE_ISSUED,
+                           {"amount": request.weekly_amount, "emergency": False})
+        
         # Mock response for demo
         return AllowanceResponse(
             success=True,
@@ -59,11 +128,14 @@ async def issue_weekly_allowance(
 @router.post("/emergency", response_model=AllowanceResponse)
 async def issue_emergency_allowance(
     request: EmergencyAllowanceRequest,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    blockchain_service: BlockchainService = Depends(get_blockchain_service),
+    event_hub: EventHub = Depends(get_event_hub)
 ):
     """Issue emergency allowance to teen"""
     try:
         # For demo purposes, we'll simulate the emergency allowance issuance
+        publish_teen_event(event_hub, request.teen_address, ALLOWANCE_ISSUED,
+                           {"amount": request.amount, "emergency": True})
         
         return AllowanceResponse(
             success=True,
@@ -83,24 +155,52 @@ async def issue_emergency_allowance(
 @router.get("/{teen_address}/status", response_model=AllowanceResponse)
 async def get_allowance_status(
     teen_address: str,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    min_round: int = Query(0, ge=0, description="Round of your own allowance transaction, to read at least that fresh"),
+    blockchain_service: BlockchainService = Depends(get_blockchain_service),
+    chain_cache: ChainStateCache = Depends(get_chain_cache)
 ):
     """Get current allowance status for a teen"""
     try:
-        # For demo purposes, we'll return mock status
-        # In production, this would query the smart contract
+        if not blockchain_service.allowance_manager_app_id:
+            # Demo status until the allowance manager is deployed
+            return AllowanceResponse(
+                success=True,
+                teen_address=teen_address,
+                weekly_amount=150000000,  # 150 ALGO in microAlgos
+                total_issued=600000000,   # 600 ALGO total issued
+                last_allowance_time=int(time.time()) - 86400,  # 1 day ago
+                is_paused=False,
+                can_issue=True,
+                message="Allowance status retrieved successfully"
+            )
+        
+        # The teen's box read through the chain cache: algod is asked again only after a call to the app
+        result = await chain_cache.get_box(
+            blockchain_service.allowance_manager_app_id, family_box_name(teen_address), min_round
+        )
+        if result.get("error"):
+            raise HTTPException(status_code=500, detail=result["error"])
+        if result["value"] is None:
+            raise HTTPException(status_code=404, detail="No allowance for this teen")
+        
+        status = decode_family_allowance(result["value"])
+        # Remember the parent so calls for this teen are checked before they are sent
+        blockchain_service.families.add(FamilyAccount(teen_address, status["parent_address"]))
         
         return AllowanceResponse(
             success=True,
             teen_address=teen_address,
-            weekly_amount=150000000,  # 150 ALGO in microAlgos
-            total_issued=600000000,   # 600 ALGO total issued
-            last_allowance_time=int(__import__('time').time()) - 86400,  # 1 day ago
-            is_paused=False,
-            can_issue=True,
+            weekly_amount=status["weekly_amount"],
+            total_issued=status["total_issued"],
+            last_allowance_time=status["last_allowance_time"],
+            is_paused=status["is_paused"],
+            can_issue=not status["is_paused"] and time.time() >= status["last_allowance_time"] + WEEK_SECONDS,
+            round=result["round"],
             message="Allowance status retrieved successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get allowance status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -143,15 +243,63 @@ async def resume_allowance(
         logger.error(f"Failed to resume allowance: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{teen_address}/spend-windows", response_model=SpendWindowsResponse)
+async def get_spend_windows(
+    teen_address: str,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Get rolling spend windows (e.g. 24h, 7d, 30d) and current spend for a teen"""
+    try:
+        return SpendWindowsResponse(
+            success=True,
+            teen_address=teen_address,
+            windows=await run_in_threadpool(oracle_service.get_spend_windows, teen_address),
+            message="Spend windows retrieved successfully"
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to get spend windows: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{teen_address}/spend-windows", response_model=SpendWindowsResponse)
+async def configure_spend_windows(
+    teen_address: str,
+    request: SpendWindowsRequest,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Configure rolling spend windows for a teen"""
+    try:
+        windows = [SpendWindowConfig(**window.model_dump()) for window in request.windows]
+        result = await run_in_threadpool(oracle_service.configure_spend_windows, teen_address, windows)
+        
+        if result.get("error"):
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return SpendWindowsResponse(
+            success=True,
+            teen_address=teen_address,
+            windows=await run_in_threadpool(oracle_service.get_spend_windows, teen_address),
+            message="Spend windows updated successfully"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to configure spend windows: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/savings/lock", response_model=SavingsResponse)
 async def lock_savings(
     request: SavingsRequest,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    blockchain_service: BlockchainService = Depends(get_blockchain_service),
+    event_hub: EventHub = Depends(get_event_hub)
 ):
     """Lock teen savings until specified time"""
     try:
         # For demo purposes, we'll simulate locking savings
         # In production, this would call the smart contract
+        publish_teen_event(event_hub, request.teen_address, SAVINGS_LOCKED,
+                           {"amount": request.amount, "unlock_time": request.unlock_time})
         
         return SavingsResponse(
             success=True,
@@ -169,12 +317,14 @@ async def lock_savings(
 @router.post("/savings/unlock", response_model=SavingsResponse)
 async def unlock_savings(
     teen_address: str,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    blockchain_service: BlockchainService = Depends(get_blockchain_service),
+    event_hub: EventHub = Depends(get_event_hub)
 ):
     """Unlock teen savings if time has passed"""
     try:
         # For demo purposes, we'll simulate unlocking savings
         # In production, this would call the smart contract
+        publish_teen_event(event_hub, teen_address, SAVINGS_UNLOCKED, {})
         
         return SavingsResponse(
             success=True,
@@ -0,0 +1,102 @@
+"""
+Event Stream API Routes
+Server-sent events and WebSocket push for teen and family addresses
+"""
+
+from fastapi import APIRouter, Depends, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
+import os
+import logging
+
+from ..models.responses import EventHubStatsResponse
+from ...services.event_hub import EventHub
+from ...services import service_registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1/events", tags=["events"])
+
+HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+# Dependency injection
+def get_event_hub() -> EventHub:
+    return service_registry.get_event_hub()
+
+@router.get("/{address}/stream")
+async def stream_events(
+    address: str,
+    request: Request,
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id"),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+    event_hub: EventHub = Depends(get_event_hub)
+):
+    """
+    Server-sent event stream of purchase, allowance, savings and
+    merchant-approval events for a teen address or family id.
+    Browsers resume automatically through the Last-Event-ID header.
+    """
+    subscription = event_hub.subscribe(
+        address,
+        last_event_id if last_event_id is not None else last_event_id_header
+    )
+    
+    async def frames() -> AsyncIterator[str]:
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            while True:
+                batch = await subscription.next_batch(HEARTBEAT_SECONDS)
+                if not batch:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(event.to_sse() for event in batch)
+        except ConnectionAbortedError:
+            logger.info(f"Dropped slow event stream for {address}")
+        finally:
+            event_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{address}/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    address: str,
+    last_event_id: Optional[int] = None
+):
+    """WebSocket stream of the same events as the SSE endpoint, one JSON message per event"""
+    event_hub = get_event_hub()
+    await websocket.accept()
+    subscription = event_hub.subscribe(address, last_event_id)
+    try:
+        while True:
+            batch = await subscription.next_batch(HEARTBEAT_SECONDS)
+            if not batch:
+                await websocket.send_json({"type": "keep-alive"})
+                continue
+            for event in batch:
+                await websocket.send_json(event.to_dict())
+    except ConnectionAbortedError:
+        logger.info(f"Dropped slow event socket for {address}")
+        await websocket.close(code=1013, reason="Subscriber too slow")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_hub.unsubscribe(subscription)
+
+@router.get("/stats", response_model=EventHubStatsResponse)
+async def get_event_stats(
+    event_hub: EventHub = Depends(get_event_hub)
+):
+    """Get event hub counters"""
+    return EventHubStatsResponse(
+        success=True,
+        message="Event stats retrieved successfully",
+        **event_hub.stats()
+    )
@@ -0,0 +1,77 @@
+"""
+Family Rules API Routes
+Purchase rules parents set for their family: teens, restricted categories,
+merchant approvals and category caps
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+import logging
+
+from ..models.requests import FamilyRulesRequest
+from ..models.responses import FamilyRulesResponse
+from ...services.oracle_service import OracleService
+from ...services.policy_compiler import DEFAULT_RESTRICTED_CATEGORIES, FamilyRules
+from ...services import service_registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1/families", tags=["families"])
+
+# Dependency injection
+def get_oracle_service() -> OracleService:
+    return service_registry.get_oracle_service()
+
+def _rules_response(rules: FamilyRules, message: str) -> FamilyRulesResponse:
+    return FamilyRulesResponse(success=True, message=message, **rules.model_dump())
+
+@router.get("/{family_id}/rules", response_model=FamilyRulesResponse)
+async def get_family_rules(
+    family_id: str,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Get a family's purchase rules"""
+    try:
+        rules = oracle_service.get_family_rules(family_id)
+        if rules is None:
+            raise HTTPException(status_code=404, detail="Family not found")
+
+        return _rules_response(rules, "Family rules retrieved successfully")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get family rules: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{family_id}/rules", response_model=FamilyRulesResponse)
+async def set_family_rules(
+    family_id: str,
+    request: FamilyRulesRequest,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Create or replace a family's purchase rules"""
+    try:
+        rules = FamilyRules(
+            family_id=family_id,
+            teen_addresses=request.teen_addresses,
+            restricted_categories=(
+                request.restricted_categories
+                if request.restricted_categories is not None
+                else list(DEFAULT_RESTRICTED_CATEGORIES)
+            ),
+            merchant_approvals=request.merchant_approvals,
+            category_caps=request.category_caps
+        )
+        result = await run_in_threadpool(oracle_service.set_family_rules, rules)
+
+        if result.get("error"):
+            raise HTTPException(status_code=400, detail=result["error"])
+
+        return _rules_response(rules, "Family rules updated successfully")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to set family rules: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
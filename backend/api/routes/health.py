@@ -9,9 +9,14 @@ import logging
 from ..models.responses import (
     HealthCheckResponse,
     NetworkStatusResponse,
+    ParamsCacheStatsResponse,
+    SignerStatsResponse,
+    PurchaseTemplateStatsResponse,
+    IngestStatsResponse,
     BaseResponse
 )
 from ...services.blockchain_service import BlockchainService
+from ...services import service_registry
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +27,7 @@ service_start_time = time.time()
 
 # Dependency injection
 def get_blockchain_service() -> BlockchainService:
-    return BlockchainService()
+    return service_registry.get_blockchain_service()
 
 @router.get("/", response_model=HealthCheckResponse)
 async def health_check(
@@ -31,12 +36,12 @@ async def health_check(
     """Health check endpoint"""
     try:
         # Test Algorand connection
-        is_connected = blockchain_service.connect_to_algorand()
+        is_connected = await blockchain_service.connect_to_algorand_async()
         
         if is_connected:
             status = "healthy"
             algorand_connection = "connected"
-            network_status = blockchain_service.get_network_status()
+            network_status = await blockchain_service.get_network_status_async()
             last_round = network_status.get("last_round", 0)
         else:
             status = "unhealthy"
@@ -73,7 +78,7 @@ async def get_network_status(
 ):
     """Get Algorand network status"""
     try:
-        network_status = blockchain_service.get_network_status()
+        network_status = await blockchain_service.get_network_status_async()
         
         if network_status.get("error"):
             raise HTTPException(status_code=500, detail=network_status["error"])
@@ -119,3 +124,72 @@ async def get_contract_status(
     except Exception as e:
         logger.error(f"Failed to get contract status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/params-cache", response_model=ParamsCacheStatsResponse)
+async def get_params_cache_stats(
+    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+):
+    """Get suggested params cache hit/miss counters"""
+    try:
+        return ParamsCacheStatsResponse(
+            success=True,
+            message="Params cache stats retrieved successfully",
+            **blockchain_service.get_params_cache_stats()
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to get params cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/signer", response_model=SignerStatsResponse)
+async def get_signer_stats(
+    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+):
+    """Get transaction signer counters"""
+    try:
+        return SignerStatsResponse(
+            success=True,
+            message="Signer stats retrieved successfully",
+            **blockchain_service.get_signer_stats()
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to get signer stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/purchase-templates", response_model=PurchaseTemplateStatsResponse)
+async def get_purchase_template_stats(
+    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+):
+    """Get purchase group template counters"""
+    try:
+        return PurchaseTemplateStatsResponse(
+            success=True,
+            message="Purchase template stats retrieved successfully",
+            **blockchain_service.get_purchase_template_stats()
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to get purchase template stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/ingest", response_model=IngestStatsResponse)
+async def get_ingest_stats():
+    """Get block ingestion progress and lag"""
+    try:
+        ingestor = service_registry.get_transaction_sync().ingestor
+        
+        if ingestor is None:
+            raise HTTPException(status_code=404, detail="Block ingestor is disabled")
+        
+        return IngestStatsResponse(
+            success=True,
+            message="Ingest stats retrieved successfully",
+            **ingestor.stats()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get ingest stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,7 +2,8 @@
 Merchant Management API Routes
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, List
 import logging
 
@@ -14,26 +15,22 @@ from ..models.requests import (
 from ..models.responses import (
     MerchantAttestationResponse,
     MerchantAnalyticsResponse,
+    ChainAttestationResponse,
+    MerchantWriteResponse,
+    OracleWriteStatusResponse,
     BaseResponse
 )
 from ...services.oracle_service import OracleService
 from ...services.blockchain_service import BlockchainService
+from ...services import service_registry
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/merchants", tags=["merchants"])
 
-# Global shared oracle service instance
-_shared_oracle_service = None
-
 def get_oracle_service() -> OracleService:
     """Get shared oracle service instance"""
-    global _shared_oracle_service
-    if _shared_oracle_service is None:
-        blockchain_service = BlockchainService()
-        _shared_oracle_service = OracleService(blockchain_service)
-        logger.info("Created shared OracleService instance")
-    return _shared_oracle_service
+    return service_registry.get_oracle_service()
 
 @router.get("/", response_model=Dict[str, List[MerchantAttestationResponse]])
 async def get_all_merchants(
@@ -41,7 +38,7 @@ async def get_all_merchants(
 ):
     """Get all merchant attestations"""
     try:
-        attestations = oracle_service.get_merchant_attestations()
+        attestations = await run_in_threadpool(oracle_service.get_merchant_attestations)
         
         merchants = []
         for name, attestation in attestations.items():
@@ -69,7 +66,7 @@ async def get_merchant(
 ):
     """Get specific merchant attestation"""
     try:
-        attestation = oracle_service.get_merchant_attestation(merchant_name)
+        attestation = await run_in_threadpool(oracle_service.get_merchant_attestation, merchant_name)
         
         if not attestation:
             raise HTTPException(status_code=404, detail="Merchant not found")
@@ -91,7 +88,7 @@ async def get_merchant(
         logger.error(f"Failed to get merchant {merchant_name}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/", response_model=BaseResponse)
+@router.post("/", response_model=MerchantWriteResponse)
 async def add_merchant(
     request: MerchantAttestationRequest,
     oracle_service: OracleService = Depends(get_oracle_service)
@@ -111,14 +108,17 @@ async def add_merchant(
             merchant_address=request.merchant_address
         )
         
-        result = oracle_service.add_merchant_attestation(attestation)
+        # Persisting the attestation and queueing its chain write block, keep them off the event loop
+        result = await run_in_threadpool(oracle_service.add_merchant_attestation, attestation)
         
         if result.get("error"):
             raise HTTPException(status_code=400, detail=result["error"])
         
-        return BaseResponse(
+        return MerchantWriteResponse(
             success=True,
-            message=f"Merchant {request.merchant_name} added successfully"
+            message=f"Merchant {request.merchant_name} added successfully",
+            merchant_name=request.merchant_name,
+            write_id=result.get("write_id")
         )
         
     except HTTPException:
@@ -127,7 +127,7 @@ async def add_merchant(
         logger.error(f"Failed to add merchant: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/{merchant_name}/limits", response_model=BaseResponse)
+@router.put("/{merchant_name}/limits", response_model=MerchantWriteResponse)
 async def update_merchant_limits(
     merchant_name: str,
     request: MerchantUpdateRequest,
@@ -135,7 +135,8 @@ async def update_merchant_limits(
 ):
     """Update merchant daily limits and approval status"""
     try:
-        result = oracle_service.update_merchant_limits(
+        result = await run_in_threadpool(
+            oracle_service.update_merchant_limits,
             merchant_name=merchant_name,
             new_daily_limit=request.new_daily_limit,
             is_approved=request.is_approved
@@ -144,9 +145,11 @@ async def update_merchant_limits(
         if result.get("error"):
             raise HTTPException(status_code=400, detail=result["error"])
         
-        return BaseResponse(
+        return MerchantWriteResponse(
             success=True,
-            message=f"Merchant {merchant_name} limits updated successfully"
+            message=f"Merchant {merchant_name} limits updated successfully",
+            merchant_name=merchant_name,
+            write_id=result.get("write_id")
         )
         
     except HTTPException:
@@ -155,7 +158,7 @@ async def update_merchant_limits(
         logger.error(f"Failed to update merchant limits: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{merchant_name}/parent-approval", response_model=BaseResponse)
+@router.post("/{merchant_name}/parent-approval", response_model=MerchantWriteResponse)
 async def update_parent_approval(
     merchant_name: str,
     request: ParentApprovalRequest,
@@ -163,17 +166,21 @@ async def update_parent_approval(
 ):
     """Update parent approval for a merchant"""
     try:
-        result = oracle_service.parent_approve_merchant(
+        result = await run_in_threadpool(
+            oracle_service.parent_approve_merchant,
             merchant_name=merchant_name,
-            approved=request.approved
+            approved=request.approved,
+            family_id=request.family_id
         )
         
         if result.get("error"):
             raise HTTPException(status_code=400, detail=result["error"])
         
-        return BaseResponse(
+        return MerchantWriteResponse(
             success=True,
-            message=f"Parent approval for {merchant_name} updated to {request.approved}"
+            message=f"Parent approval for {merchant_name} updated to {request.approved}",
+            merchant_name=merchant_name,
+            write_id=result.get("write_id")
         )
         
     except HTTPException:
@@ -182,6 +189,69 @@ async def update_parent_approval(
         logger.error(f"Failed to update parent approval: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/writes/{write_id}", response_model=OracleWriteStatusResponse)
+async def get_oracle_write(
+    write_id: int,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Get the status of a merchant change's on-chain write"""
+    try:
+        write = await run_in_threadpool(oracle_service.get_oracle_write, write_id)
+        
+        if write is None:
+            raise HTTPException(status_code=404, detail="Write not found")
+        
+        return OracleWriteStatusResponse(
+            success=True,
+            message=f"Write {write_id} is {write['status']}",
+            write_id=write["write_id"],
+            merchant_name=write["merchant"],
+            method=write["method"],
+            status=write["status"],
+            attempts=write["attempts"],
+            next_attempt=write["next_attempt"],
+            last_error=write["last_error"],
+            transaction_id=write["transaction_id"],
+            confirmed_round=write["confirmed_round"],
+            created_at=write["created_at"],
+            updated_at=write["updated_at"]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get oracle write: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{merchant_name}/on-chain", response_model=ChainAttestationResponse)
+async def get_chain_attestation(
+    merchant_name: str,
+    min_round: int = Query(0, ge=0, description="Round of your own write, to read at least that fresh"),
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Get a merchant's attestation from the attestation oracle's box"""
+    try:
+        result = await oracle_service.get_chain_attestation(merchant_name, min_round)
+        
+        if result.get("error") == "Merchant not found on chain":
+            raise HTTPException(status_code=404, detail=result["error"])
+        if result.get("error") == "Attestation oracle not deployed":
+            raise HTTPException(status_code=400, detail=result["error"])
+        if result.get("error"):
+            raise HTTPException(status_code=500, detail=result["error"])
+        
+        return ChainAttestationResponse(
+            success=True,
+            message=f"On-chain attestation for {merchant_name} as of round {result['round']}",
+            **result
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get chain attestation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{merchant_name}/analytics", response_model=MerchantAnalyticsResponse)
 async def get_merchant_analytics(
     merchant_name: str,
@@ -189,7 +259,7 @@ async def get_merchant_analytics(
 ):
     """Get analytics for a specific merchant"""
     try:
-        analytics = oracle_service.get_merchant_analytics(merchant_name)
+        analytics = await run_in_threadpool(oracle_service.get_merchant_analytics, merchant_name)
         
         if analytics.get("error"):
             raise HTTPException(status_code=404, detail=analytics["error"])
@@ -218,14 +288,14 @@ async def sync_merchants(
 ):
     """Sync merchant attestations with blockchain"""
     try:
-        result = oracle_service.sync_with_blockchain()
+        result = await oracle_service.sync_with_blockchain_async()
         
         if result.get("error"):
             raise HTTPException(status_code=500, detail=result["error"])
         
         return BaseResponse(
             success=True,
-            message=f"Synced {result['synced_merchants']} merchants with blockchain"
+            message=f"Synced {result['synced_merchants']} merchants with blockchain ({result['updated']} updated)"
         )
         
     except HTTPException:
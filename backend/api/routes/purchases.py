@@ -3,29 +3,28 @@ Purchase Management API Routes
 """
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 import logging
 
-from ..models.requests import PurchaseRequest
-from ..models.responses import PurchaseResponse
+from ..models.requests import PurchaseRequest, BatchPurchaseRequest, CheckoutRequest
+from ..models.responses import PurchaseResponse, BatchPurchaseResponse, CheckoutResponse
 from ...services.oracle_service import OracleService
 from ...services.blockchain_service import BlockchainService
+from ...services import service_registry
+from ...services.confirmation_tracker import (
+    STATUS_FAILED,
+    TransactionStatus,
+    status_from_pending_info
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/purchases", tags=["purchases"])
 
-# Global shared oracle service instance
-_shared_oracle_service = None
-
 def get_oracle_service() -> OracleService:
     """Get shared oracle service instance"""
-    global _shared_oracle_service
-    if _shared_oracle_service is None:
-        blockchain_service = BlockchainService()
-        _shared_oracle_service = OracleService(blockchain_service)
-        logger.info("Created shared OracleService instance")
-    return _shared_oracle_service
+    return service_registry.get_oracle_service()
 
 @router.post("/verify", response_model=PurchaseResponse)
 async def verify_purchase(
@@ -43,7 +42,7 @@ async def verify_purchase(
             timestamp=request.timestamp
         )
         
-        result = oracle_service.verify_purchase(oracle_request)
+        result = await run_in_threadpool(oracle_service.verify_purchase, oracle_request)
         
         return PurchaseResponse(
             success=True,
@@ -59,12 +58,45 @@ async def verify_purchase(
         logger.error(f"Failed to verify purchase: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/verify-batch", response_model=BatchPurchaseResponse)
+async def verify_purchase_batch(
+    request: BatchPurchaseRequest,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """Verify many purchases in one call, with the same outcome as verifying them in order"""
+    try:
+        merchant_names = [purchase.merchant_name for purchase in request.purchases]
+        amounts = [purchase.amount for purchase in request.purchases]
+        user_addresses = [purchase.user_address for purchase in request.purchases]
+        
+        # Up to 10,000 purchases under the counter locks: keep it off the event loop
+        approved, reasons = await run_in_threadpool(
+            oracle_service.verify_purchase_batch, merchant_names, amounts, user_addresses
+        )
+        
+        return BatchPurchaseResponse(
+            success=True,
+            approved=approved,
+            reasons=reasons,
+            approved_count=sum(approved),
+            total_approved_amount=sum(amount for amount, ok in zip(amounts, approved) if ok),
+            message=f"Verified {len(amounts)} purchases"
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to verify purchase batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/execute", response_model=PurchaseResponse)
 async def execute_purchase(
     request: PurchaseRequest,
     oracle_service: OracleService = Depends(get_oracle_service)
 ):
-    """Execute a purchase using atomic transactions"""
+    """
+    Execute a purchase using atomic transactions.
+    Returns as soon as the group is submitted; poll the status endpoint
+    for confirmation.
+    """
     try:
         from ...services.oracle_service import PurchaseRequest as OraclePurchaseRequest
         
@@ -79,10 +111,10 @@ async def execute_purchase(
             timestamp=request.timestamp
         )
         
-        result = oracle_service.execute_purchase_atomic(
-            teen_private_key=teen_private_key,
-            teen_address=request.user_address,
-            request=oracle_request
+        result = await oracle_service.submit_purchase_atomic_async(
+            teen_private_key,
+            request.user_address,
+            oracle_request
         )
         
         return PurchaseResponse(
@@ -92,13 +124,64 @@ async def execute_purchase(
             transaction_id=result.transaction_id,
             explorer_link=result.explorer_link,
             amount=request.amount,
-            merchant_name=request.merchant_name
+            merchant_name=request.merchant_name,
+            status=result.status
         )
         
     except Exception as e:
         logger.error(f"Failed to execute purchase: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/checkout", response_model=CheckoutResponse)
+async def checkout(
+    request: CheckoutRequest,
+    oracle_service: OracleService = Depends(get_oracle_service)
+):
+    """
+    Check out a cart of up to 14 items as one atomic group: one oracle
+    call verifies every item, one allowance call checks the total, then
+    one payment per item. The cart settles in a single round or not at
+    all; poll the status endpoint with the returned transaction id.
+    """
+    try:
+        from ...services.oracle_service import PurchaseRequest as OraclePurchaseRequest
+        
+        # For demo purposes, we'll use a mock private key
+        # In production, this would come from secure authentication
+        teen_private_key = "demo_private_key_for_testing_only"
+        
+        oracle_requests = [
+            OraclePurchaseRequest(
+                merchant_name=item.merchant_name,
+                amount=item.amount,
+                user_address=request.user_address,
+                timestamp=request.timestamp
+            )
+            for item in request.items
+        ]
+        
+        result = await oracle_service.submit_checkout_async(
+            teen_private_key,
+            request.user_address,
+            oracle_requests
+        )
+        
+        return CheckoutResponse(
+            success=True,
+            approved=result.approved,
+            reason=result.reason,
+            reasons=result.reasons,
+            transaction_id=result.transaction_id,
+            explorer_link=result.explorer_link,
+            status=result.status,
+            item_count=len(request.items),
+            total_amount=sum(item.amount for item in request.items)
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to check out cart: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{transaction_id}/status", response_model=PurchaseResponse)
 async def get_purchase_status(
     transaction_id: str,
@@ -106,17 +189,33 @@ async def get_purchase_status(
 ):
     """Get the status of a purchase transaction"""
     try:
-        # In production, this would query the blockchain for transaction status
-        # For demo, we'll return a mock status
+        status = oracle_service.confirmation_tracker.get(transaction_id)
+        
+        if status is None:
+            # Not submitted by this process, ask algod directly
+            info = await oracle_service.blockchain_service.get_pending_transaction_info_async(
+                transaction_id
+            )
+            if info.get("error"):
+                raise HTTPException(status_code=404, detail="Transaction not found")
+            status = status_from_pending_info(transaction_id, info) or TransactionStatus(
+                transaction_id=transaction_id,
+                submitted_at=0
+            )
         
         return PurchaseResponse(
             success=True,
-            approved=True,
+            approved=status.status != STATUS_FAILED,
+            reason=status.error,
             transaction_id=transaction_id,
             explorer_link=f"https://testnet.algoexplorer.io/tx/{transaction_id}",
-            message="Transaction confirmed"
+            status=status.status,
+            confirmed_round=status.confirmed_round,
+            message=f"Transaction {status.status}"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get purchase status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
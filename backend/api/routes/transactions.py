@@ -2,8 +2,10 @@
 Transaction Management API Routes
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional
+import json
 import logging
 
 from ..models.requests import TransactionHistoryRequest, AccountInfoRequest
@@ -12,7 +14,9 @@ from ..models.responses import (
     TransactionResponse,
     AccountInfoResponse
 )
-from ...services.blockchain_service import BlockchainService
+from ...services.blockchain_service import BlockchainService, TRANSACTION_PAGE_SIZE
+from ...services.transaction_store import TransactionSync
+from ...services import service_registry
 
 logger = logging.getLogger(__name__)
 
@@ -20,87 +24,125 @@ router = APIRouter(prefix="/api/v1/transactions", tags=["transactions"])
 
 # Dependency injection
 def get_blockchain_service() -> BlockchainService:
-    return BlockchainService()
+    return service_registry.get_blockchain_service()
+
+def get_transaction_sync() -> TransactionSync:
+    return service_registry.get_transaction_sync()
+
+def _transaction_response(tx: Dict) -> TransactionResponse:
+    return TransactionResponse(
+        id=tx.get("id", ""),
+        type=tx.get("type", ""),
+        round=tx.get("round") or 0,
+        timestamp=tx.get("timestamp") or 0,
+        sender=tx.get("sender", ""),
+        receiver=tx.get("receiver"),
+        amount=tx.get("amount", 0),
+        note=tx.get("note"),
+        confirmed=tx.get("confirmed", False),
+        explorer_link=f"https://testnet.algoexplorer.io/tx/{tx.get('id', '')}"
+    )
 
 @router.get("/{user_address}", response_model=TransactionHistoryResponse)
 async def get_transaction_history(
     user_address: str,
-    limit: int = 50,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    limit: int = Query(50, ge=1, le=TRANSACTION_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    blockchain_service: BlockchainService = Depends(get_blockchain_service),
+    transaction_sync: TransactionSync = Depends(get_transaction_sync)
 ):
-    """Get transaction history for a user"""
+    """
+    Get one newest-first page of transaction history for a user; follow
+    next_cursor for more. Served from the local store (synced through
+    synced_round) once the address has been synced, otherwise straight from
+    the indexer while the first sync runs. Both use the same order and
+    cursors, so paging continues across the switch.
+    """
     try:
-        # Get transaction history from blockchain
-        transactions = blockchain_service.get_transaction_history(user_address, limit)
+        synced_round = await transaction_sync.ensure_synced(user_address)
+        
+        try:
+            if synced_round is not None:
+                transaction_sync.ensure_running()
+                page = transaction_sync.store.history(user_address, limit, cursor)
+            else:
+                page = await blockchain_service.get_transaction_page_async(user_address, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Format transactions
-        formatted_transactions = []
-        for tx in transactions:
-            formatted_tx = TransactionResponse(
-                id=tx.get("id", ""),
-                type=tx.get("type", ""),
-                round=tx.get("round", 0),
-                timestamp=tx.get("timestamp", 0),
-                sender=tx.get("sender", ""),
-                receiver=tx.get("receiver"),
-                amount=tx.get("amount", 0),
-                note=tx.get("note"),
-                confirmed=tx.get("confirmed", False),
-                explorer_link=f"https://testnet.algoexplorer.io/tx/{tx.get('id', '')}"
-            )
-            formatted_transactions.append(formatted_tx)
+        if page.get("error"):
+            raise HTTPException(status_code=502, detail=page["error"])
+        
+        formatted_transactions = [_transaction_response(tx) for tx in page["transactions"]]
         
         return TransactionHistoryResponse(
             success=True,
             transactions=formatted_transactions,
             total_count=len(formatted_transactions),
             user_address=user_address,
+            next_cursor=page["next_cursor"],
+            synced_round=synced_round,
             message="Transaction history retrieved successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get transaction history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{user_address}/stream")
+async def stream_transaction_history(
+    user_address: str,
+    page_size: int = Query(TRANSACTION_PAGE_SIZE, ge=1, le=TRANSACTION_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Resume from a next_cursor"),
+    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+):
+    """
+    Stream a user's full transaction history as NDJSON, one transaction per
+    line, fetching indexer pages as the client reads.
+    """
+    async def lines() -> AsyncIterator[str]:
+        try:
+            async for tx in blockchain_service.iter_transaction_history_async(
+                user_address, page_size, cursor
+            ):
+                yield _transaction_response(tx).model_dump_json() + "\n"
+        except Exception as e:
+            # Headers are already sent, report the failure in-band
+            logger.error(f"Transaction stream for {user_address} failed: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/{user_address}/analytics", response_model=dict)
 async def get_transaction_analytics(
     user_address: str,
-    blockchain_service: BlockchainService = Depends(get_blockchain_service)
+    transaction_sync: TransactionSync = Depends(get_transaction_sync)
 ):
-    """Get transaction analytics for a user"""
+    """Get precomputed transaction analytics for a user (lifetime, windowed, per merchant/category)"""
     try:
-        # Get transaction history
-        transactions = blockchain_service.get_transaction_history(user_address, 100)
+        synced_round = await transaction_sync.ensure_synced(user_address)
         
-        # Calculate analytics
-        total_spent = sum(tx.get("amount", 0) for tx in transactions if tx.get("type") == "pay")
-        total_received = sum(tx.get("amount", 0) for tx in transactions if tx.get("receiver") == user_address)
-        transaction_count = len(transactions)
+        if synced_round is None:
+            raise HTTPException(status_code=503, detail="Transaction history is not synced yet")
         
-        # Group by merchant (from transaction notes)
-        merchant_spending = {}
-        for tx in transactions:
-            if tx.get("type") == "pay" and tx.get("note"):
-                note = tx.get("note", "").decode() if isinstance(tx.get("note"), bytes) else str(tx.get("note", ""))
-                if "ClearSpend purchase at" in note:
-                    merchant = note.replace("ClearSpend purchase at ", "").strip()
-                    if merchant not in merchant_spending:
-                        merchant_spending[merchant] = 0
-                    merchant_spending[merchant] += tx.get("amount", 0)
+        transaction_sync.ensure_running()
+        
+        analytics = transaction_sync.loaded_analytics(user_address)
+        if analytics is None:
+            raise HTTPException(status_code=503, detail="Transaction analytics are still loading")
         
         return {
             "success": True,
             "user_address": user_address,
-            "analytics": {
-                "total_spent": total_spent,
-                "total_received": total_received,
-                "transaction_count": transaction_count,
-                "merchant_spending": merchant_spending,
-                "net_balance": total_received - total_spent
-            },
+            "analytics": analytics,
+            "synced_round": synced_round,
             "message": "Analytics retrieved successfully"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get transaction analytics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -112,7 +154,7 @@ async def get_account_info(
 ):
     """Get account information"""
     try:
-        account_info = blockchain_service.get_account_balance(address)
+        account_info = await blockchain_service.get_account_balance_async(address)
         
         if account_info.get("error"):
             raise HTTPException(status_code=400, detail=account_info["error"])
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Async Algorand Client Benchmark
+Compares concurrent request throughput of a route that calls the blocking
+algod client against one that awaits the asyncio client, with a local HTTP
+server standing in for algod and answering after a simulated 200 ms latency
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_async_clients
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from fastapi import FastAPI
+
+ALGOD_LATENCY = 0.2
+CONCURRENCY = 50
+ROUNDS = 2
+
+
+class SlowAlgodHandler(BaseHTTPRequestHandler):
+    """Answers /v2/status like algod, after ALGOD_LATENCY seconds"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(ALGOD_LATENCY)
+        body = json.dumps({"last-round": 1000, "time-since-last-round": 0, "catchup-time": 0}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SlowAlgodServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+async def timed(label: str, client: httpx.AsyncClient, path: str) -> None:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        responses = await asyncio.gather(*[client.get(path) for _ in range(CONCURRENCY)])
+        assert all(response.status_code == 200 for response in responses)
+    elapsed = time.perf_counter() - start
+    total = CONCURRENCY * ROUNDS
+    print(f"{label:<36} {total / elapsed:>8,.1f} req/s {elapsed:>8.2f} s total")
+
+
+async def run(service) -> None:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking_status():
+        # What the routes did before: a blocking algod call inside async def
+        return service.get_network_status()
+
+    @app.get("/async")
+    async def async_status():
+        return await service.get_network_status_async()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{CONCURRENCY} concurrent status requests x {ROUNDS}, algod latency {ALGOD_LATENCY * 1000:.0f} ms")
+        await timed("blocking client in async route", client, "/blocking")
+        await timed("awaited async client", client, "/async")
+
+    service.close()
+    await service.aclose()
+
+
+def main():
+    server = SlowAlgodServer(("127.0.0.1", 0), SlowAlgodHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["ALGOD_ADDRESS"] = address
+    os.environ["INDEXER_ADDRESS"] = address
+    os.environ["ALGOD_POOL_SIZE"] = str(CONCURRENCY)
+    os.environ["PARAMS_CACHE_BACKGROUND"] = "false"
+
+    from backend.services.blockchain_service import BlockchainService
+
+    asyncio.run(run(BlockchainService()))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
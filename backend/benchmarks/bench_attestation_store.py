@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Attestation Store Benchmark
+Cold start (snapshot load, one spend counter per merchant, log tail replay)
+with a million merchants, and write-ahead log throughput at different fsync
+batch sizes
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_attestation_store
+"""
+
+import tempfile
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from backend.services.attestation_store import AttestationStore, encode_merchant_columns
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService, PurchaseRequest
+from backend.services.policy_compiler import FLAGS_ELIGIBLE, CategoryRegistry, MerchantColumns
+from backend.services.spend_counter import SECONDS_IN_DAY, ShardedSpendCounter
+
+MERCHANTS = 1_000_000
+TAIL_RECORDS = 20_000
+# One merchant in SPENDING_EVERY has spend on the snapshot's day
+SPENDING_EVERY = 20
+CATEGORIES = ["Food & Beverage", "Retail", "Education", "Shopping", "Entertainment"]
+WRITES = 5_000
+SYNC_BATCHES = [1, 8, 64, 0]
+PURCHASES = 4_000
+PURCHASE_THREADS = 8
+
+
+def write_large_snapshot(directory: str) -> None:
+    """Snapshot of MERCHANTS merchants built column-wise (building them one by one would dominate)"""
+    now = int(datetime.now().timestamp())
+    columns = MerchantColumns(CategoryRegistry())
+    for category in CATEGORIES:
+        columns.categories.intern(category)
+    columns.names = [f"Merchant {i}" for i in range(MERCHANTS)]
+    columns.limits = array("q", [10**12]) * MERCHANTS
+    columns.category_ids = array("H", range(len(CATEGORIES))) * (MERCHANTS // len(CATEGORIES))
+    columns.base_flags = array("B", [FLAGS_ELIGIBLE]) * MERCHANTS
+    columns.last_updates = array("q", [now]) * MERCHANTS
+    columns.addresses = [None] * MERCHANTS
+
+    state = encode_merchant_columns(columns)
+    state["families"] = []
+    # add_merchant_attestation seeds a counter per merchant; some have spend today
+    # and the rest were spent on earlier days or never
+    today = now // SECONDS_IN_DAY
+    counter = ShardedSpendCounter()
+    counter.restore_many(
+        (name, today, 1000, now) if i % SPENDING_EVERY == 0 else (name, today - i % 30, 0, now)
+        for i, name in enumerate(columns.names)
+    )
+    state["counters"] = [list(entry) for entry in counter.live_entries(now)]
+    print(f"Snapshot keeps {len(state['counters'])} of {len(counter)} spend counters")
+    store = AttestationStore(directory, sync_every=0, sync_interval=0, snapshot_every=0)
+    store.snapshot(state)
+    store.close()
+
+
+def main():
+    blockchain_service = BlockchainService()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        write_large_snapshot(directory)
+        print(f"Wrote snapshot of {MERCHANTS} merchants in {time.perf_counter() - start:.2f}s")
+
+        # Grow a log tail of limit changes and purchases on top of the snapshot
+        store = AttestationStore(directory, sync_every=0, sync_interval=0, snapshot_every=0)
+        oracle_service = OracleService(blockchain_service, attestation_store=store)
+        for i in range(TAIL_RECORDS // 2):
+            oracle_service.update_merchant_limits(f"Merchant {i}", 10**12 - i, True)
+            oracle_service.verify_purchase(PurchaseRequest(
+                merchant_name=f"Merchant {i}", amount=1000, user_address="DEMO_USER_ADDRESS"
+            ))
+        store.close()
+
+        start = time.perf_counter()
+        restarted = OracleService(blockchain_service, attestation_store=AttestationStore(directory))
+        elapsed = time.perf_counter() - start
+        print(f"Cold start: {len(restarted.merchant_attestations)} merchants + {TAIL_RECORDS} log records in {elapsed:.2f}s")
+        assert restarted.get_spent_today("Merchant 7") == 1000
+        restarted.attestation_store.close()
+
+    print(f"\nLog throughput: {WRITES} limit updates")
+    print(f"{'sync_every':>10} {'writes/s':>10} {'fsyncs':>8}")
+    for sync_every in SYNC_BATCHES:
+        with tempfile.TemporaryDirectory() as directory:
+            store = AttestationStore(directory, sync_every=sync_every, sync_interval=0, snapshot_every=0)
+            oracle_service = OracleService(blockchain_service, attestation_store=store)
+            start = time.perf_counter()
+            for i in range(WRITES):
+                oracle_service.update_merchant_limits("Starbucks", 50000000 + i, True)
+            elapsed = time.perf_counter() - start
+            store.close()
+            label = "off" if sync_every == 0 else str(sync_every)
+            print(f"{label:>10} {WRITES / elapsed:>10.0f} {store.syncs:>8}")
+
+    journaled_purchases(blockchain_service)
+
+
+def journaled_purchases(blockchain_service: BlockchainService) -> None:
+    """Purchases from several threads with every record fsynced; the journal only queues under the shard lock"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = AttestationStore(directory, sync_every=1, sync_interval=0, snapshot_every=0)
+        oracle_service = OracleService(blockchain_service, attestation_store=store)
+        request = PurchaseRequest(merchant_name="Bookstore", amount=1, user_address="DEMO_USER_ADDRESS")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(PURCHASE_THREADS) as threads:
+            results = list(threads.map(lambda _: oracle_service.verify_purchase(request), range(PURCHASES)))
+        elapsed = time.perf_counter() - start
+        store.close()
+        assert all(result.approved for result in results)
+        print(f"\n{PURCHASES} journaled purchases on {PURCHASE_THREADS} threads (sync_every=1): "
+              f"{PURCHASES / elapsed:.0f}/s, {store.records_written} records in {store.syncs} fsyncs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Oracle Sync Benchmark
+Reads thousands of AttestationOracle merchant boxes from a simulated algod
+with a fixed per-request latency, at several concurrency bounds, then
+re-syncs with one merchant changed
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_oracle_sync
+"""
+
+import time
+import asyncio
+from unittest.mock import Mock
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.attestation_layout import encode_merchant_attestation, merchant_box_name
+from backend.services.oracle_sync import OracleBoxSync
+
+BOXES = 5000
+# Stand-in for one algod round trip
+LATENCY = 0.02
+
+
+def simulated_chain() -> Mock:
+    boxes = {
+        merchant_box_name(f"Merchant {i}"): encode_merchant_attestation({
+            "merchant_name": f"Merchant {i}", "category": "Retail", "is_approved": True, "daily_limit": 10**9,
+            "total_spent_today": 0, "last_update": 1700000000, "parent_approved": True
+        })
+        for i in range(BOXES)
+    }
+
+    async def network_status():
+        await asyncio.sleep(LATENCY)
+        return {"last_round": 1000}
+
+    async def list_boxes(app_id):
+        await asyncio.sleep(LATENCY)
+        return list(boxes)
+
+    async def read_box(app_id, name):
+        await asyncio.sleep(LATENCY)
+        return boxes[name]
+
+    async def app_calls(app_id, min_round):
+        await asyncio.sleep(LATENCY)
+        return {"args": [[b"update_merchant_limits", b"Merchant 7"]], "current_round": 1000}
+
+    blockchain_service = Mock(spec=BlockchainService)
+    blockchain_service.attestation_oracle_app_id = 1234
+    blockchain_service.attestation_oracle_version = 1
+    blockchain_service.get_network_status_async = network_status
+    blockchain_service.get_application_boxes_async = list_boxes
+    blockchain_service.get_box_async = read_box
+    blockchain_service.get_application_call_args_async = app_calls
+    return blockchain_service
+
+
+async def sync(concurrency: int) -> None:
+    box_sync = OracleBoxSync(simulated_chain(), concurrency=concurrency)
+    start = time.perf_counter()
+    read = await box_sync.read()
+    first = time.perf_counter() - start
+    box_sync.commit(read, [(name, digest) for name, digest, _ in read["changed"]])
+
+    start = time.perf_counter()
+    again = await box_sync.read()
+    second = time.perf_counter() - start
+    print(f"{concurrency:>11} {first:>10.2f} {again['fetched']:>8} {second:>9.3f}")
+
+
+def main():
+    print(f"{BOXES} merchant boxes, {LATENCY * 1000:.0f} ms per algod request")
+    print(f"One box at a time: {BOXES * LATENCY:.0f}s\n")
+    print(f"{'concurrency':>11} {'full sync':>10} {'re-read':>8} {'re-sync':>9}")
+    for concurrency in [8, 32, 128]:
+        asyncio.run(sync(concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Purchase Group Template Benchmark
+Builds thousands of three-transaction purchase groups the way the purchase
+path did (algosdk transaction objects, group id, msgpack encoding) and by
+rendering PurchaseGroupTemplates, first unsigned and then signed, ready to
+send
+
+Amounts and validity windows change every purchase, so every rendered
+group is patched and re-hashed; only the skeletons are reused.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_purchase_templates
+"""
+
+import base64
+import time
+
+from algosdk import account, encoding
+from algosdk.transaction import SuggestedParams
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.purchase_templates import PurchaseGroupTemplates
+
+GROUPS = 5000
+TEENS = 50
+MERCHANTS = ["Starbucks", "Target", "Bookstore", "Chipotle"]
+
+GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+
+
+def purchases():
+    """(params, teen key, teen, merchant name, merchant, amount) with a new round every 10 purchases"""
+    teens = [account.generate_account() for _ in range(TEENS)]
+    merchants = [(name, account.generate_account()[1]) for name in MERCHANTS]
+    rows = []
+    for i in range(GROUPS):
+        first = 30000000 + i // 10
+        params = SuggestedParams(1000, first, first + 1000, GENESIS_HASH, "testnet-v1.0", flat_fee=True)
+        private_key, address = teens[i % TEENS]
+        name, merchant = merchants[i % len(merchants)]
+        rows.append((params, private_key, address, name, merchant, 1000 + i))
+    return rows
+
+
+def report(label: str, elapsed: float) -> None:
+    print(f"{label:<34} {elapsed:>8.2f} {GROUPS / elapsed:>10.0f}")
+
+
+def bench_builder(service: BlockchainService, rows) -> None:
+    start = time.perf_counter()
+    for params, _, teen, name, merchant, amount in rows:
+        [base64.b64decode(encoding.msgpack_encode(txn)) for txn in service._purchase_group(params, name, amount, teen, merchant)]
+    report("builder, unsigned", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for params, private_key, teen, name, merchant, amount in rows:
+        b"".join(
+            base64.b64decode(encoding.msgpack_encode(stxn))
+            for stxn in service._build_purchase_group(params, private_key, name, amount, teen, merchant)
+        )
+    report("builder, signed", time.perf_counter() - start)
+
+
+def bench_templates(service: BlockchainService, rows) -> None:
+    templates = PurchaseGroupTemplates(service._purchase_group)
+    # Build every (teen, merchant) skeleton before timing
+    for params, _, teen, name, merchant, amount in rows[:TEENS * len(MERCHANTS)]:
+        templates.render(params, name, amount, teen, merchant)
+
+    start = time.perf_counter()
+    for params, _, teen, name, merchant, amount in rows:
+        templates.render(params, name, amount, teen, merchant)
+    report("templates, unsigned", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for params, private_key, teen, name, merchant, amount in rows:
+        b"".join(service.signer.sign_encoded_group(templates.render(params, name, amount, teen, merchant), private_key, teen))
+    report("templates, signed", time.perf_counter() - start)
+    print(f"\n{templates.stats()}")
+
+
+def main():
+    service = BlockchainService()
+    service.attestation_oracle_app_id = 1234
+    service.allowance_manager_app_id = 5678
+    try:
+        rows = purchases()
+        # Warm the signer's key cache so both paths only pay for signatures
+        for _, private_key, _, _, _, _ in rows[:TEENS]:
+            service.signer.address(private_key)
+
+        print(f"{GROUPS} purchase groups of 3 transactions, {TEENS} teens, {len(MERCHANTS)} merchants\n")
+        print(f"{'group construction':<34} {'seconds':>8} {'groups/s':>10}")
+        bench_builder(service, rows)
+        bench_templates(service, rows)
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Redis Spend Counter Benchmark
+Compares one worker with in-memory counters against N worker processes
+sharing Redis counters, and shows that in-memory counters let N workers
+approve N times a merchant's daily limit
+
+Uses REDIS_URL when a Redis server answers there, otherwise a local
+fakeredis TCP server (pip install "fakeredis[lua]"). Run from the
+repository root:
+    python -m backend.benchmarks.bench_redis_spend
+"""
+
+import os
+import threading
+import time
+from multiprocessing import Pool
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService, PurchaseRequest
+from backend.services.redis_spend import create_redis_client
+
+VERIFICATIONS = 2000
+WORKER_COUNTS = [1, 2, 4]
+AMOUNT = 100000
+# Starbucks' demo limit is 50 ALGO: 500 purchases of 0.1 ALGO
+LIMIT_PURCHASES = 50000000 // AMOUNT
+BATCH_SIZE = 16
+
+
+def redis_url() -> str:
+    """REDIS_URL if a server answers, else a fakeredis server on a free port"""
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    try:
+        create_redis_client(url).ping()
+        return url
+    except Exception:
+        from fakeredis import TcpFakeServer
+
+        server = TcpFakeServer(("127.0.0.1", 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        print(f"No Redis at {url}; using fakeredis on port {port}")
+        return f"redis://{host}:{port}/0"
+
+
+def run_worker(args) -> tuple:
+    """One API worker: verify `count` purchases, in batches when batch_size > 1"""
+    url, count, batch_size = args
+    redis_client = create_redis_client(url, pool_size=4) if url else None
+    oracle_service = OracleService(BlockchainService(), redis_client=redis_client)
+    approved = 0
+    start = time.perf_counter()
+    if batch_size == 1:
+        for i in range(count):
+            response = oracle_service.verify_purchase(PurchaseRequest(
+                merchant_name="Starbucks", amount=AMOUNT, user_address=f"TEEN_{i % 64}"
+            ))
+            approved += response.approved
+    else:
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            results, _ = oracle_service.verify_purchase_batch(
+                ["Starbucks"] * size, [AMOUNT] * size, [f"TEEN_{i % 64}" for i in range(offset, offset + size)]
+            )
+            approved += sum(results)
+    return approved, time.perf_counter() - start
+
+
+def run(workers: int, url, batch_size: int = 1) -> tuple:
+    """Split VERIFICATIONS over worker processes; returns (approved, purchases/s)"""
+    if url:
+        create_redis_client(url).flushdb()
+    jobs = [(url, VERIFICATIONS // workers, batch_size)] * workers
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        results = pool.map(run_worker, jobs)
+    elapsed = time.perf_counter() - start
+    return sum(approved for approved, _ in results), VERIFICATIONS / elapsed
+
+
+def main():
+    url = redis_url()
+    print(f"{VERIFICATIONS} verifications of {AMOUNT} microAlgos at Starbucks, {os.cpu_count()} CPUs")
+    print(f"Daily limit allows {LIMIT_PURCHASES} purchases\n")
+
+    print(f"{'mode':<24} {'workers':>7} {'approved':>9} {'verif/s':>9}")
+    for workers in WORKER_COUNTS:
+        approved, rate = run(workers, None)
+        print(f"{'in-memory':<24} {workers:>7} {approved:>9} {rate:>9.0f}")
+    for workers in WORKER_COUNTS:
+        approved, rate = run(workers, url)
+        print(f"{'redis':<24} {workers:>7} {approved:>9} {rate:>9.0f}")
+    for workers in WORKER_COUNTS:
+        approved, rate = run(workers, url, BATCH_SIZE)
+        print(f"{f'redis, batches of {BATCH_SIZE}':<24} {workers:>7} {approved:>9} {rate:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Service Registry Benchmark
+Compares the per-request cost of building a fresh BlockchainService with
+urllib clients against the shared registry service with pooled keep-alive
+connections, using a local HTTP server standing in for algod
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_service_registry
+"""
+
+import os
+import asyncio
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from algosdk.v2client import algod, indexer
+
+REQUESTS = 500
+THREADS = 8
+
+
+class FakeAlgodHandler(BaseHTTPRequestHandler):
+    """Answers /v2/status like algod, with keep-alive"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({"last-round": 1000, "time-since-last-round": 0, "catchup-time": 0}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def timed(label: str, handler) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(lambda _: handler(), range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {REQUESTS / elapsed:>10,.0f} req/s {elapsed / REQUESTS * 1e6:>10,.0f} us/req")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAlgodHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["ALGOD_ADDRESS"] = address
+    os.environ["INDEXER_ADDRESS"] = address
+    os.environ["PARAMS_CACHE_BACKGROUND"] = "false"
+
+    from backend.services import service_registry
+    from backend.services.blockchain_service import BlockchainService
+
+    def legacy_request():
+        # What the routes did before: re-read env and build urllib clients per request
+        algod_client = algod.AlgodClient(os.getenv("ALGOD_TOKEN", ""), os.getenv("ALGOD_ADDRESS"))
+        indexer.IndexerClient("", os.getenv("INDEXER_ADDRESS"))
+        algod_client.status()
+
+    def fresh_pooled_request():
+        service = BlockchainService()
+        service.get_network_status()
+        service.close()
+
+    def registry_request():
+        service_registry.get_blockchain_service().get_network_status()
+
+    print(f"{REQUESTS} status requests on {THREADS} threads against {address}")
+    timed("fresh service + urllib (before)", legacy_request)
+    timed("fresh service + pooled client", fresh_pooled_request)
+    timed("shared registry service + pooled client", registry_request)
+
+    asyncio.run(service_registry.shutdown())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Shared State Table Benchmark
+Compares worker processes with per-process counters against worker
+processes sharing the memory-mapped merchant table, and times the
+change-ring refresh that carries attestation updates between workers
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_shared_state
+"""
+
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService, PurchaseRequest
+from backend.services.shared_state import open_table
+
+VERIFICATIONS = 20000
+WORKER_COUNTS = [1, 2, 4]
+AMOUNT = 10000
+# Starbucks' demo limit is 50 ALGO: 5000 purchases of 0.01 ALGO
+LIMIT_PURCHASES = 50000000 // AMOUNT
+UPDATES = 2000
+
+
+def run_worker(args) -> tuple:
+    """One API worker: verify `count` purchases"""
+    path, count = args
+    oracle_service = OracleService(BlockchainService(), shared_state=open_table(path) if path else None)
+    approved = 0
+    start = time.perf_counter()
+    for i in range(count):
+        response = oracle_service.verify_purchase(PurchaseRequest(
+            merchant_name="Starbucks", amount=AMOUNT, user_address=f"TEEN_{i % 64}"
+        ))
+        approved += response.approved
+    return approved, time.perf_counter() - start
+
+
+def run(workers: int, path) -> tuple:
+    """Split VERIFICATIONS over worker processes; returns (approved, purchases/s)"""
+    if path:
+        OracleService(BlockchainService(), shared_state=open_table(path)).spend_counter.remove("Starbucks")
+    jobs = [(path, VERIFICATIONS // workers)] * workers
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        results = pool.map(run_worker, jobs)
+    elapsed = time.perf_counter() - start
+    return sum(approved for approved, _ in results), VERIFICATIONS / elapsed
+
+
+def main():
+    print(f"{VERIFICATIONS} verifications of {AMOUNT} microAlgos at Starbucks, {os.cpu_count()} CPUs")
+    print(f"Daily limit allows {LIMIT_PURCHASES} purchases\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.mmap")
+        print(f"{'mode':<12} {'workers':>7} {'approved':>9} {'verif/s':>9}")
+        for workers in WORKER_COUNTS:
+            approved, rate = run(workers, None)
+            print(f"{'in-memory':<12} {workers:>7} {approved:>9} {rate:>9.0f}")
+        for workers in WORKER_COUNTS:
+            approved, rate = run(workers, path)
+            print(f"{'shared':<12} {workers:>7} {approved:>9} {rate:>9.0f}")
+
+        table = open_table(path)
+        writer = OracleService(BlockchainService(), shared_state=table)
+        reader = OracleService(BlockchainService(), shared_state=table)
+        start = time.perf_counter()
+        for i in range(UPDATES):
+            writer.update_merchant_limits("Target", 100000000 + i, True)
+            reader.get_merchant_category("Target")
+        elapsed = time.perf_counter() - start
+        assert reader.get_merchant_attestation("Target").daily_limit == 100000000 + UPDATES - 1
+        print(f"\nLimit update + refresh on another worker: {elapsed / UPDATES * 1e6:.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Transaction Signer Benchmark
+Signs thousands of three-transaction purchase groups with Transaction.sign
+(what the purchase path did), with the cached Signer in-process, and with
+the Signer's process pool at 1, 4 and 8 worker processes
+
+Pool throughput is bounded by the cores of the machine it runs on; the
+header prints how many there are.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_signer
+"""
+
+import os
+import time
+import asyncio
+import warnings
+
+from algosdk import account
+from algosdk.transaction import SuggestedParams
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.signer import Signer
+
+GROUPS = 3000
+TEENS = 50
+
+PARAMS = SuggestedParams(1000, 100, 1100, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", "testnet-v1.0", flat_fee=True)
+
+
+def purchase_groups(service: BlockchainService):
+    keys = [account.generate_account() for _ in range(TEENS)]
+    _, merchant = account.generate_account()
+    groups = []
+    for i in range(GROUPS):
+        private_key, address = keys[i % TEENS]
+        groups.append((service._purchase_group(PARAMS, "Starbucks", 1000 + i, address, merchant), private_key))
+    return groups
+
+
+def report(label: str, elapsed: float) -> None:
+    print(f"{label:<28} {elapsed:>8.2f} {GROUPS / elapsed:>10.0f} {3 * GROUPS / elapsed:>10.0f}")
+
+
+def bench_transaction_sign(groups) -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        start = time.perf_counter()
+        for txns, private_key in groups:
+            account.address_from_private_key(private_key)
+            [txn.sign(private_key) for txn in txns]
+        report("Transaction.sign", time.perf_counter() - start)
+
+
+def bench_inline(groups) -> None:
+    signer = Signer()
+    start = time.perf_counter()
+    for txns, private_key in groups:
+        signer.address(private_key)
+        signer.sign_group(txns, private_key)
+    report("Signer, in process", time.perf_counter() - start)
+
+
+async def bench_pool(groups, processes: int) -> None:
+    signer = Signer(processes=processes)
+    try:
+        # Spawn the workers and warm their key caches before timing
+        await signer.sign_groups_async(groups[:TEENS * processes])
+        start = time.perf_counter()
+        await signer.sign_groups_async(groups)
+        report(f"Signer, {processes} processes", time.perf_counter() - start)
+    finally:
+        signer.close()
+
+
+def main():
+    service = BlockchainService()
+    service.attestation_oracle_app_id = 1234
+    service.allowance_manager_app_id = 5678
+    try:
+        groups = purchase_groups(service)
+    finally:
+        service.close()
+
+    print(f"{GROUPS} purchase groups of 3 transactions, {TEENS} teens, {os.cpu_count()} cores available\n")
+    print(f"{'signing':<28} {'seconds':>8} {'groups/s':>10} {'txns/s':>10}")
+    bench_transaction_sign(groups)
+    bench_inline(groups)
+    for processes in [1, 4, 8]:
+        asyncio.run(bench_pool(groups, processes))
+
+
+if __name__ == "__main__":
+    main()
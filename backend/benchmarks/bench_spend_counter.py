@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Spend Counter Concurrency Benchmark
+Hammers OracleService.verify_purchase from many threads and checks that
+daily limits are never overshot
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_spend_counter
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService, MerchantAttestation, PurchaseRequest
+
+VERIFICATIONS = 20000
+THREAD_COUNTS = [1, 2, 4, 8, 16, 32]
+SPREAD_MERCHANTS = 256
+
+
+def build_oracle_service() -> OracleService:
+    """Oracle service with no deployed contracts and a set of extra merchants"""
+    oracle_service = OracleService(BlockchainService())
+    now = int(datetime.now().timestamp())
+    for i in range(SPREAD_MERCHANTS):
+        oracle_service.add_merchant_attestation(MerchantAttestation(
+            merchant_name=f"Merchant {i}",
+            category="Retail",
+            is_approved=True,
+            daily_limit=10**15,
+            total_spent_today=0,
+            last_update=now,
+            parent_approved=True
+        ))
+    return oracle_service
+
+
+def run(threads: int, requests) -> tuple:
+    """Run verifications on a thread pool, return (elapsed, approved_count, service)"""
+    oracle_service = build_oracle_service()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(oracle_service.verify_purchase, requests, chunksize=64))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(1 for r in results if r.approved), oracle_service
+
+
+def main():
+    hot_requests = [
+        PurchaseRequest(merchant_name="Starbucks", amount=5000, user_address="DEMO_USER_ADDRESS")
+        for _ in range(VERIFICATIONS)
+    ]
+    spread_requests = [
+        PurchaseRequest(merchant_name=f"Merchant {i % SPREAD_MERCHANTS}", amount=1000, user_address="DEMO_USER_ADDRESS")
+        for i in range(VERIFICATIONS)
+    ]
+
+    print(f"Hot merchant: {VERIFICATIONS} verifications against Starbucks (limit 50 ALGO, 5000 microAlgos each)")
+    print(f"{'threads':>8} {'verif/s':>12} {'approved':>10} {'spent':>12} {'overshoot':>10}")
+    for threads in THREAD_COUNTS:
+        elapsed, approved, service = run(threads, hot_requests)
+        limit = service.get_merchant_attestation("Starbucks").daily_limit
+        spent = service.get_spent_today("Starbucks")
+        overshoot = max(0, spent - limit)
+        print(f"{threads:>8} {VERIFICATIONS / elapsed:>12,.0f} {approved:>10} {spent:>12} {overshoot:>10}")
+        assert overshoot == 0 and spent == approved * 5000, "daily limit overshoot detected"
+
+    print()
+    print(f"Spread: {VERIFICATIONS} verifications across {SPREAD_MERCHANTS} merchants")
+    print(f"{'threads':>8} {'verif/s':>12} {'approved':>10}")
+    for threads in THREAD_COUNTS:
+        elapsed, approved, _ = run(threads, spread_requests)
+        print(f"{threads:>8} {VERIFICATIONS / elapsed:>12,.0f} {approved:>10}")
+
+
+if __name__ == "__main__":
+    main()
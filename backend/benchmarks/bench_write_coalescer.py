@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Oracle Write Coalescer Benchmark
+Onboards merchants through OracleService with a simulated confirmation
+delay per submitted group, one app call at a time versus coalesced groups.
+Callers are answered once the write is queued; "on chain" is when the
+write queue has drained
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_write_coalescer
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import MerchantAttestation, OracleService
+
+MERCHANTS = 500
+# Stand-in for wait_for_confirmation (a few seconds on testnet)
+CONFIRMATION_SECONDS = 0.5
+CALLERS = 64
+
+
+def simulated_chain() -> Mock:
+    blockchain_service = Mock(spec=BlockchainService)
+    blockchain_service.attestation_oracle_app_id = 1234
+    blockchain_service.attestation_oracle_version = 1
+
+    def call_group(calls):
+        time.sleep(CONFIRMATION_SECONDS)
+        return {
+            "success": True,
+            "transaction_ids": [f"TX_{i}" for i in range(len(calls))],
+            "confirmed_round": 1
+        }
+
+    blockchain_service.call_attestation_oracle_group.side_effect = call_group
+    return blockchain_service
+
+
+def onboard(group_size: int) -> float:
+    """Add MERCHANTS attestations from CALLERS concurrent request threads; returns seconds until all confirm"""
+    blockchain_service = simulated_chain()
+    oracle_service = OracleService(blockchain_service)
+    oracle_service.oracle_private_key = "ORACLE_KEY"
+    oracle_service.oracle_writes.group_size = group_size
+
+    attestations = [
+        MerchantAttestation(
+            merchant_name=f"Merchant {i}", category="Retail", is_approved=True, daily_limit=10**9,
+            total_spent_today=0, last_update=int(time.time()), parent_approved=True
+        )
+        for i in range(MERCHANTS)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CALLERS) as callers:
+        results = list(callers.map(oracle_service.add_merchant_attestation, attestations))
+    acknowledged = time.perf_counter() - start
+    assert oracle_service.write_queue.drain(MERCHANTS * CONFIRMATION_SECONDS)
+    elapsed = time.perf_counter() - start
+    assert all(result.get("success") for result in results)
+    assert oracle_service.write_queue.stats()["confirmed"] == MERCHANTS
+    groups = blockchain_service.call_attestation_oracle_group.call_count
+    print(f"{group_size:>10} {groups:>7} {acknowledged:>12.2f} {elapsed:>9.2f}")
+    oracle_service.write_queue.close()
+    oracle_service.oracle_writes.close()
+    return elapsed
+
+
+def main():
+    print(f"Onboarding {MERCHANTS} merchants, {CONFIRMATION_SECONDS}s per confirmation, {CALLERS} callers")
+    print(f"One call at a time, confirmed serially: {MERCHANTS * CONFIRMATION_SECONDS:.0f}s\n")
+    print(f"{'group size':>10} {'groups':>7} {'acknowledged':>12} {'on chain':>9}")
+    for group_size in [1, 4, 16]:
+        onboard(group_size)
+
+
+if __name__ == "__main__":
+    main()
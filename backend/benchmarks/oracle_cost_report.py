@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Attestation Oracle Cost Report
+Box bytes, minimum balance and box I/O per method for the v1 and v2
+merchant layouts, plus opcode budget per method when both apps are deployed
+
+The byte columns are computed from the two layouts. Opcode budgets come
+from simulating one group per app (add, update limits, parent approval,
+verify purchase) against a node; set ORACLE_V1_APP_ID, ORACLE_V2_APP_ID
+and ORACLE_ADDRESS (the oracle both apps were initialized with) to include
+them. Simulation signs nothing and commits nothing.
+
+Run from the repository root:
+    python -m backend.benchmarks.oracle_cost_report
+"""
+
+import os
+import time
+
+from algosdk import abi
+from algosdk.atomic_transaction_composer import AtomicTransactionComposer, EmptySigner
+from algosdk.v2client.models import SimulateRequest
+
+from backend.services.algorand_clients import PooledAlgodClient
+from backend.services.attestation_layout import (
+    MERCHANT_V2_COUNTER_SIZE,
+    MERCHANT_V2_RECORD,
+    encode_merchant_attestation,
+    merchant_box_name,
+    merchant_key_v2,
+    oracle_category_id
+)
+
+MERCHANTS = [
+    ("Target", "Retail"),
+    ("Starbucks", "Food & Beverage"),
+    ("Barnes & Noble College Bookstore", "Education")
+]
+
+# Box minimum balance: 2500 + 400 per key and value byte (microAlgos)
+BOX_FLAT_MBR = 2500
+BOX_BYTE_MBR = 400
+
+V1_METHODS = {
+    "add_merchant_attestation": "add_merchant_attestation(string,string,bool,uint64,bool)uint64",
+    "update_merchant_limits": "update_merchant_limits(string,uint64,bool)void",
+    "parent_approve_merchant": "parent_approve_merchant(string,bool)void",
+    "verify_purchase": "verify_purchase(string,uint64,address)bool"
+}
+V2_METHODS = {
+    **V1_METHODS,
+    "add_merchant_attestation": "add_merchant_attestation(string,uint8,bool,uint64,bool)uint64"
+}
+
+
+def box_io(value_size: int):
+    """(bytes read, bytes written) per method. v1 decodes and box_puts the whole struct every time."""
+    v2_size = MERCHANT_V2_RECORD.size
+    return {
+        "add_merchant_attestation": ((0, value_size), (0, v2_size)),
+        "update_merchant_limits": ((value_size, value_size), (1, 17)),
+        "parent_approve_merchant": ((value_size, value_size), (1, 9)),
+        "verify_purchase": ((value_size, value_size), (v2_size, MERCHANT_V2_COUNTER_SIZE))
+    }
+
+
+def layout_report():
+    print(f"{'merchant':<34} {'v1 key+value':>12} {'v2 key+value':>12} {'v1 MBR':>8} {'v2 MBR':>8}")
+    for name, category in MERCHANTS:
+        v1_key = len(merchant_box_name(name))
+        v1_value = len(encode_merchant_attestation({
+            "merchant_name": name, "category": category, "is_approved": True, "daily_limit": 0,
+            "total_spent_today": 0, "last_update": 0, "parent_approved": True
+        }))
+        v2_key = len(merchant_key_v2(name))
+        v2_value = MERCHANT_V2_RECORD.size
+        print(
+            f"{name:<34} {f'{v1_key}+{v1_value}':>12} {f'{v2_key}+{v2_value}':>12} "
+            f"{BOX_FLAT_MBR + BOX_BYTE_MBR * (v1_key + v1_value):>8} "
+            f"{BOX_FLAT_MBR + BOX_BYTE_MBR * (v2_key + v2_value):>8}"
+        )
+
+    name, category = MERCHANTS[-1]
+    value_size = len(encode_merchant_attestation({
+        "merchant_name": name, "category": category, "is_approved": True, "daily_limit": 0,
+        "total_spent_today": 0, "last_update": 0, "parent_approved": True
+    }))
+    print(f"\nBox bytes read / written per call ({name}):")
+    print(f"{'method':<26} {'v1':>9} {'v2':>9}")
+    for method, ((v1_read, v1_written), (v2_read, v2_written)) in box_io(value_size).items():
+        print(f"{method:<26} {f'{v1_read}/{v1_written}':>9} {f'{v2_read}/{v2_written}':>9}")
+
+
+def simulate_budgets(algod_client, app_id: int, methods, category, box_name: bytes, oracle_address: str, merchant: str):
+    """Opcode budget each method's app call consumed, simulated as one group"""
+    params = algod_client.suggested_params()
+    signer = EmptySigner()
+    calls = [
+        ("add_merchant_attestation", [merchant, category, True, 10**9, True]),
+        ("update_merchant_limits", [merchant, 2 * 10**9, True]),
+        ("parent_approve_merchant", [merchant, True]),
+        ("verify_purchase", [merchant, 1000, oracle_address])
+    ]
+    atc = AtomicTransactionComposer()
+    for method, args in calls:
+        atc.add_method_call(
+            app_id, abi.Method.from_signature(methods[method]), oracle_address, params, signer,
+            method_args=args, boxes=[(0, box_name)]
+        )
+    response = atc.simulate(algod_client, SimulateRequest(txn_groups=[], allow_empty_signatures=True))
+    group = response.simulate_response["txn-groups"][0]
+    if group.get("failure-message"):
+        raise RuntimeError(group["failure-message"])
+    return {
+        method: result.get("app-budget-consumed", 0)
+        for (method, _), result in zip(calls, group["txn-results"])
+    }
+
+
+def opcode_report():
+    v1_app_id = os.getenv("ORACLE_V1_APP_ID")
+    v2_app_id = os.getenv("ORACLE_V2_APP_ID")
+    oracle_address = os.getenv("ORACLE_ADDRESS")
+    if not (v1_app_id and v2_app_id and oracle_address):
+        print("\nOpcode budgets: set ORACLE_V1_APP_ID, ORACLE_V2_APP_ID and ORACLE_ADDRESS to simulate")
+        return
+
+    algod_client = PooledAlgodClient(
+        os.getenv("ALGOD_TOKEN", ""), os.getenv("ALGOD_ADDRESS", "https://testnet-api.algonode.cloud")
+    )
+    merchant = f"Cost Report {int(time.time())}"
+    v1 = simulate_budgets(
+        algod_client, int(v1_app_id), V1_METHODS, "Retail", merchant_box_name(merchant), oracle_address, merchant
+    )
+    v2 = simulate_budgets(
+        algod_client, int(v2_app_id), V2_METHODS, oracle_category_id("Retail"), merchant_key_v2(merchant),
+        oracle_address, merchant
+    )
+    print("\nOpcode budget consumed per call (simulated):")
+    print(f"{'method':<26} {'v1':>6} {'v2':>6} {'saved':>6}")
+    for method in V1_METHODS:
+        print(f"{method:<26} {v1[method]:>6} {v2[method]:>6} {v1[method] - v2[method]:>6}")
+
+
+def main():
+    layout_report()
+    opcode_report()
+
+
+if __name__ == "__main__":
+    main()
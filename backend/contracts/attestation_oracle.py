@@ -3,7 +3,7 @@ ClearSpend Attestation Oracle Smart Contract
 Manages merchant attestations and purchase verification using AlgoKit
 """
 
-from algopy import ARC4Contract, UInt64, Bytes, Global, Txn, op, subroutine, BoxRef, arc4
+from algopy import ARC4Contract, UInt64, Bytes, Global, Txn, op, subroutine, urange, BoxRef, arc4
 from algopy.arc4 import String, Bool, Struct, DynamicArray, Address
 
 class MerchantAttestation(Struct):
@@ -88,14 +88,42 @@ class AttestationOracle(ARC4Contract):
         Verify if purchase is allowed based on attestation
         Called as part of atomic transfer group
         """
+        return Bool(self._verify_item(merchant_name, amount, user_address))
+    
+    @arc4.abimethod
+    def verify_purchases(
+        self,
+        merchant_names: DynamicArray[String],
+        amounts: DynamicArray[arc4.UInt64],
+        user_address: arc4.Address
+    ) -> Bool:
+        """
+        Verify every item of a cart in one call, in order
+        Called first in a checkout group; any denied item fails the whole
+        group, so no item's spend is recorded unless every item is paid
+        """
+        assert merchant_names.length == amounts.length, "One amount per merchant"
+        assert merchant_names.length > UInt64(0), "Empty cart"
+        
+        for i in urange(merchant_names.length):
+            assert self._verify_item(merchant_names[i], amounts[i].native, user_address), "Purchase not allowed"
         
+        op.log(b"CART_VERIFIED")
+        op.log(user_address.bytes)
+        op.log(op.itob(merchant_names.length))
+        
+        return Bool(True)
+    
+    @subroutine
+    def _verify_item(self, merchant_name: String, amount: UInt64, user_address: arc4.Address) -> bool:
+        """Check one purchase against its merchant's attestation and record the spend"""
         # Get merchant attestation from box storage
         merchant_key = self._create_merchant_key(merchant_name)
         merchant_box = BoxRef(key=merchant_key)
         
         if not merchant_box.exists:
             op.log(b"MERCHANT_NOT_FOUND")
-            return Bool(False)
+            return False
         
         attestation_bytes = merchant_box.get()
         attestation = MerchantAttestation.from_bytes(attestation_bytes)
@@ -103,17 +131,17 @@ class AttestationOracle(ARC4Contract):
         # Check if merchant is approved
         if not attestation.is_approved:
             op.log(b"MERCHANT_NOT_APPROVED")
-            return Bool(False)
+            return False
         
         # Check parent approval
         if not attestation.parent_approved:
             op.log(b"PARENT_NOT_APPROVED")
-            return Bool(False)
+            return False
         
         # Check category restrictions
         if not self._check_category_restriction(attestation.category):
             op.log(b"CATEGORY_RESTRICTED")
-            return Bool(False)
+            return False
         
         # Check daily limit
         if self._is_new_day(attestation.last_update):
@@ -123,7 +151,7 @@ class AttestationOracle(ARC4Contract):
         new_total = attestation.total_spent_today + amount
         if new_total > attestation.daily_limit:
             op.log(b"DAILY_LIMIT_EXCEEDED")
-            return Bool(False)
+            return False
         
         # Update spending
         attestation.total_spent_today = new_total
@@ -140,7 +168,7 @@ class AttestationOracle(ARC4Contract):
         op.log(user_address.bytes)
         op.log(op.itob(self.total_verifications))
         
-        return Bool(True)
+        return True
     
     @arc4.abimethod
     def update_merchant_limits(
@@ -0,0 +1,285 @@
+"""
+ClearSpend Attestation Oracle v2 Smart Contract
+Fixed-width merchant records under hashed box keys, updated in place with box_replace
+"""
+
+from algopy import ARC4Contract, UInt64, Bytes, Global, Txn, op, subroutine, urange, arc4
+from algopy.arc4 import String, Bool, UInt8, DynamicArray
+
+# Record byte offsets (see services/attestation_layout.py for the off-chain codec)
+FLAGS_OFFSET = 1
+LAST_UPDATE_OFFSET = 10
+COUNTER_OFFSET = 18
+
+FLAG_APPROVED = 1
+FLAG_PARENT_APPROVED = 2
+
+SECONDS_PER_DAY = 86400
+
+# Gaming, Gambling, Adult Content, Tobacco, Alcohol (category ids 6-10)
+DEFAULT_RESTRICTED_MASK = 0b11111000000
+
+class MerchantRecord(arc4.Struct):
+    """
+    Fixed-width merchant record, 34 bytes. Static ARC-4 fields encode
+    back to back, so every field sits at a constant offset. The merchant
+    name is not stored; it is hashed into the box key.
+    """
+    category_id: UInt8
+    flags: UInt8
+    daily_limit: arc4.UInt64
+    last_update: arc4.UInt64
+    total_spent_today: arc4.UInt64
+    spend_day: arc4.UInt64
+
+class AttestationOracleV2(ARC4Contract):
+    """
+    ClearSpend Purchase Attestation Oracle, v2 layout
+    Same ABI method names as v1; merchant boxes are fixed-width records
+    keyed by b"m" + sha256(name)[:15], categories are ids checked against
+    a restricted bitmask, and updates rewrite only the bytes they change
+    """
+
+    @arc4.abimethod(create="require")
+    def initialize(self, oracle_address: arc4.Address) -> None:
+        """Initialize the contract with oracle address"""
+        self.oracle = oracle_address
+        self.admin = Txn.sender
+        self.total_merchants = UInt64(0)
+        self.total_verifications = UInt64(0)
+        self.restricted_mask = UInt64(DEFAULT_RESTRICTED_MASK)
+
+    @arc4.abimethod
+    def add_merchant_attestation(
+        self,
+        merchant_name: String,
+        category_id: UInt8,
+        is_approved: Bool,
+        daily_limit: UInt64,
+        parent_approved: Bool
+    ) -> UInt64:
+        """Add or replace a merchant attestation (oracle only)"""
+        assert Txn.sender == self.oracle.native, "Only oracle can add attestations"
+
+        flags = UInt64(0)
+        if is_approved.native:
+            flags |= UInt64(FLAG_APPROVED)
+        if parent_approved.native:
+            flags |= UInt64(FLAG_PARENT_APPROVED)
+
+        record = MerchantRecord(
+            category_id=category_id,
+            flags=UInt8(flags),
+            daily_limit=arc4.UInt64(daily_limit),
+            last_update=arc4.UInt64(Global.latest_timestamp),
+            total_spent_today=arc4.UInt64(0),
+            spend_day=arc4.UInt64(Global.latest_timestamp // UInt64(SECONDS_PER_DAY))
+        )
+        self._put_record(merchant_name, record.bytes)
+
+        op.log(b"MERCHANT_ADDED")
+        op.log(merchant_name.bytes)
+        op.log(op.itob(self.total_merchants))
+
+        return self.total_merchants
+
+    @arc4.abimethod
+    def import_merchant_attestation(self, merchant_name: String, record: MerchantRecord) -> UInt64:
+        """
+        Write a merchant record converted from a v1 box, counters included,
+        so today's spend carries over (oracle only; see deployment/migrate_oracle_v2.py)
+        """
+        assert Txn.sender == self.oracle.native, "Only oracle can import attestations"
+
+        self._put_record(merchant_name, record.bytes)
+
+        op.log(b"MERCHANT_IMPORTED")
+        op.log(merchant_name.bytes)
+
+        return self.total_merchants
+
+    @arc4.abimethod
+    def verify_purchase(
+        self,
+        merchant_name: String,
+        amount: UInt64,
+        user_address: arc4.Address
+    ) -> Bool:
+        """
+        Verify if purchase is allowed based on attestation
+        Called as part of atomic transfer group
+        """
+        return Bool(self._verify_item(merchant_name, amount, user_address))
+
+    @arc4.abimethod
+    def verify_purchases(
+        self,
+        merchant_names: DynamicArray[String],
+        amounts: DynamicArray[arc4.UInt64],
+        user_address: arc4.Address
+    ) -> Bool:
+        """
+        Verify every item of a cart in one call, in order
+        Called first in a checkout group; any denied item fails the whole
+        group, so no item's spend is recorded unless every item is paid
+        """
+        assert merchant_names.length == amounts.length, "One amount per merchant"
+        assert merchant_names.length > UInt64(0), "Empty cart"
+
+        for i in urange(merchant_names.length):
+            assert self._verify_item(merchant_names[i], amounts[i].native, user_address), "Purchase not allowed"
+
+        op.log(b"CART_VERIFIED")
+        op.log(user_address.bytes)
+        op.log(op.itob(merchant_names.length))
+
+        return Bool(True)
+
+    @arc4.abimethod
+    def update_merchant_limits(
+        self,
+        merchant_name: String,
+        new_daily_limit: UInt64,
+        is_approved: Bool
+    ) -> None:
+        """Update merchant daily limits and approval status (oracle only)"""
+        assert Txn.sender == self.oracle.native, "Only oracle can update limits"
+
+        merchant_key = self._create_merchant_key(merchant_name)
+        flags = self._read_flags(merchant_key) & ~UInt64(FLAG_APPROVED)
+        if is_approved.native:
+            flags |= UInt64(FLAG_APPROVED)
+
+        # flags, daily_limit and last_update are adjacent: one 17-byte write
+        op.Box.replace(
+            merchant_key,
+            UInt64(FLAGS_OFFSET),
+            op.extract(op.itob(flags), 7, 1) + op.itob(new_daily_limit) + op.itob(Global.latest_timestamp)
+        )
+
+        op.log(b"MERCHANT_UPDATED")
+        op.log(merchant_name.bytes)
+        op.log(op.itob(new_daily_limit))
+
+    @arc4.abimethod
+    def parent_approve_merchant(
+        self,
+        merchant_name: String,
+        approved: Bool
+    ) -> None:
+        """Allow parents to approve/disapprove specific merchants"""
+        # In production, this would verify parent signature
+        # For now, we'll allow any caller to simulate parent approval
+
+        merchant_key = self._create_merchant_key(merchant_name)
+        flags = self._read_flags(merchant_key) & ~UInt64(FLAG_PARENT_APPROVED)
+        if approved.native:
+            flags |= UInt64(FLAG_PARENT_APPROVED)
+
+        op.Box.replace(merchant_key, UInt64(FLAGS_OFFSET), op.extract(op.itob(flags), 7, 1))
+        op.Box.replace(merchant_key, UInt64(LAST_UPDATE_OFFSET), op.itob(Global.latest_timestamp))
+
+        op.log(b"PARENT_APPROVAL_UPDATED")
+        op.log(merchant_name.bytes)
+        op.log(approved.bytes)
+
+    @arc4.abimethod
+    def set_restricted_categories(self, restricted_mask: UInt64) -> None:
+        """Replace the restricted category bitmask: bit i restricts category id i (oracle only)"""
+        assert Txn.sender == self.oracle.native, "Only oracle can restrict categories"
+        self.restricted_mask = restricted_mask
+
+        op.log(b"RESTRICTED_CATEGORIES_UPDATED")
+        op.log(op.itob(restricted_mask))
+
+    @arc4.abimethod(readonly=True)
+    def get_merchant_info(self, merchant_name: String) -> MerchantRecord:
+        """Get merchant attestation record"""
+        record_bytes, exists = op.Box.get(self._create_merchant_key(merchant_name))
+        assert exists, "Merchant not found"
+        return MerchantRecord.from_bytes(record_bytes)
+
+    @arc4.abimethod(readonly=True)
+    def get_contract_stats(self) -> tuple[UInt64, UInt64]:
+        """Get contract statistics"""
+        return (self.total_merchants, self.total_verifications)
+
+    @arc4.abimethod
+    def update_oracle(self, new_oracle: arc4.Address) -> None:
+        """Update oracle address (admin only)"""
+        assert Txn.sender == self.admin, "Only admin can update oracle"
+        self.oracle = new_oracle
+
+        op.log(b"ORACLE_UPDATED")
+        op.log(new_oracle.bytes)
+
+    @subroutine
+    def _verify_item(self, merchant_name: String, amount: UInt64, user_address: arc4.Address) -> bool:
+        """Check one purchase against its merchant's record and count the spend"""
+        merchant_key = self._create_merchant_key(merchant_name)
+        record_bytes, exists = op.Box.get(merchant_key)
+
+        if not exists:
+            op.log(b"MERCHANT_NOT_FOUND")
+            return False
+
+        record = MerchantRecord.from_bytes(record_bytes)
+        flags = record.flags.native
+
+        if not flags & UInt64(FLAG_APPROVED):
+            op.log(b"MERCHANT_NOT_APPROVED")
+            return False
+
+        if not flags & UInt64(FLAG_PARENT_APPROVED):
+            op.log(b"PARENT_NOT_APPROVED")
+            return False
+
+        # One shift and mask instead of comparing category strings
+        if (self.restricted_mask >> record.category_id.native) & UInt64(1):
+            op.log(b"CATEGORY_RESTRICTED")
+            return False
+
+        # The counter belongs to spend_day; a new day starts from zero
+        today = Global.latest_timestamp // UInt64(SECONDS_PER_DAY)
+        spent = UInt64(0)
+        if record.spend_day.native == today:
+            spent = record.total_spent_today.native
+
+        new_total = spent + amount
+        if new_total > record.daily_limit.native:
+            op.log(b"DAILY_LIMIT_EXCEEDED")
+            return False
+
+        # Rewrite only total_spent_today and spend_day (16 bytes)
+        op.Box.replace(merchant_key, UInt64(COUNTER_OFFSET), op.itob(new_total) + op.itob(today))
+
+        self.total_verifications += UInt64(1)
+
+        op.log(b"PURCHASE_VERIFIED")
+        op.log(merchant_name.bytes)
+        op.log(op.itob(amount))
+        op.log(user_address.bytes)
+        op.log(op.itob(self.total_verifications))
+
+        return True
+
+    @subroutine
+    def _create_merchant_key(self, merchant_name: String) -> Bytes:
+        """Fixed 16-byte key, whatever the name's length"""
+        return Bytes(b"m") + op.extract(op.sha256(merchant_name.bytes), 0, 15)
+
+    @subroutine
+    def _read_flags(self, merchant_key: Bytes) -> UInt64:
+        """Read just the flags byte of an existing record"""
+        _length, exists = op.Box.length(merchant_key)
+        assert exists, "Merchant not found"
+        return op.btoi(op.Box.extract(merchant_key, UInt64(FLAGS_OFFSET), UInt64(1)))
+
+    @subroutine
+    def _put_record(self, merchant_name: String, record: Bytes) -> None:
+        """Store a full record, counting merchants the first time they are stored"""
+        merchant_key = self._create_merchant_key(merchant_name)
+        _length, exists = op.Box.length(merchant_key)
+        if not exists:
+            self.total_merchants += UInt64(1)
+        op.Box.put(merchant_key, record)
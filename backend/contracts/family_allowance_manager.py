@@ -0,0 +1,305 @@
+"""
+ClearSpend Family Allowance Manager Smart Contract
+One app for every family: each teen's allowance record lives in a box keyed by the teen's address
+"""
+
+from algopy import ARC4Contract, BoxMap, UInt64, Global, Txn, gtxn, op, subroutine, urange, arc4
+from algopy.arc4 import String, Bool, Address
+
+WEEK_SECONDS = 604800
+
+# Box minimum balance a family's registration pays for:
+# 2500 + 400 * (33-byte key + 81-byte record)
+FAMILY_BOX_MBR = 48100
+
+class FamilyAllowance(arc4.Struct):
+    """A teen's allowance record (the AllowanceRecord fields, keyed by the teen), 81 bytes"""
+    parent: Address
+    weekly_allowance: arc4.UInt64
+    last_allowance_time: arc4.UInt64
+    total_issued: arc4.UInt64
+    savings_locked: arc4.UInt64
+    savings_unlock_time: arc4.UInt64
+    created: arc4.UInt64
+    is_paused: Bool
+
+class FamilyAllowanceManager(ARC4Contract):
+    """
+    ClearSpend Allowance Management Contract for many families
+    Each teen's record lives in box b"t" + teen address, so onboarding a
+    family is one registration call instead of one app deployment. Parent
+    methods name the teen; teen methods use the sender.
+    """
+
+    def __init__(self) -> None:
+        self.families = BoxMap(Address, FamilyAllowance, key_prefix=b"t")
+
+    @arc4.abimethod(create="require")
+    def initialize(self, attestation_app_id: UInt64) -> None:
+        """Initialize the contract with the attestation oracle it pairs with"""
+        self.admin = Txn.sender
+        self.attestation_app_id = attestation_app_id
+        self.total_families = UInt64(0)
+        self.contract_created = Global.latest_timestamp
+
+    @arc4.abimethod
+    def register_family(
+        self,
+        mbr_payment: gtxn.PaymentTransaction,
+        teen_address: Address,
+        weekly_allowance: UInt64
+    ) -> UInt64:
+        """Register the sender as a teen's parent; the payment covers the record's box"""
+        assert teen_address not in self.families, "Teen already registered"
+        assert mbr_payment.receiver == Global.current_application_address, "Payment must go to the app"
+        assert mbr_payment.amount >= UInt64(FAMILY_BOX_MBR), "Payment must cover the box minimum balance"
+        assert weekly_allowance > UInt64(0), "Amount must be positive"
+
+        self.families[teen_address] = FamilyAllowance(
+            parent=Address(Txn.sender),
+            weekly_allowance=arc4.UInt64(weekly_allowance),
+            last_allowance_time=arc4.UInt64(Global.latest_timestamp),
+            total_issued=arc4.UInt64(0),
+            savings_locked=arc4.UInt64(0),
+            savings_unlock_time=arc4.UInt64(0),
+            created=arc4.UInt64(Global.latest_timestamp),
+            is_paused=Bool(False)
+        )
+        self.total_families += UInt64(1)
+
+        op.log(b"FAMILY_REGISTERED")
+        op.log(teen_address.bytes)
+        op.log(Txn.sender.bytes)
+
+        return self.total_families
+
+    @arc4.abimethod
+    def issue_weekly_allowance(self, teen_address: Address) -> UInt64:
+        """Issue weekly allowance (parent only)"""
+        record = self._parent_record(teen_address)
+        assert not record.is_paused.native, "Allowance is currently paused"
+
+        current_time = Global.latest_timestamp
+        assert current_time >= record.last_allowance_time.native + UInt64(WEEK_SECONDS), "Weekly allowance already issued"
+
+        record.last_allowance_time = arc4.UInt64(current_time)
+        record.total_issued = arc4.UInt64(record.total_issued.native + record.weekly_allowance.native)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"ALLOWANCE_ISSUED")
+        op.log(teen_address.bytes)
+        op.log(record.weekly_allowance.bytes)
+        op.log(record.total_issued.bytes)
+        op.log(op.itob(current_time))
+
+        return record.weekly_allowance.native
+
+    @arc4.abimethod
+    def issue_emergency_allowance(self, teen_address: Address, amount: UInt64) -> UInt64:
+        """Issue emergency allowance (parent only, bypasses weekly limit)"""
+        record = self._parent_record(teen_address)
+        assert not record.is_paused.native, "Allowance is currently paused"
+        assert amount > UInt64(0), "Amount must be positive"
+
+        record.total_issued = arc4.UInt64(record.total_issued.native + amount)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"EMERGENCY_ALLOWANCE_ISSUED")
+        op.log(teen_address.bytes)
+        op.log(op.itob(amount))
+        op.log(record.total_issued.bytes)
+
+        return amount
+
+    @arc4.abimethod
+    def pause_allowance(self, teen_address: Address) -> None:
+        """Pause allowance (parent only)"""
+        record = self._parent_record(teen_address)
+        record.is_paused = Bool(True)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"ALLOWANCE_PAUSED")
+        op.log(teen_address.bytes)
+        op.log(op.itob(Global.latest_timestamp))
+
+    @arc4.abimethod
+    def resume_allowance(self, teen_address: Address) -> None:
+        """Resume allowance (parent only)"""
+        record = self._parent_record(teen_address)
+        record.is_paused = Bool(False)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"ALLOWANCE_RESUMED")
+        op.log(teen_address.bytes)
+        op.log(op.itob(Global.latest_timestamp))
+
+    @arc4.abimethod
+    def update_weekly_amount(self, teen_address: Address, new_amount: UInt64) -> None:
+        """Update weekly allowance amount (parent only)"""
+        record = self._parent_record(teen_address)
+        assert new_amount > UInt64(0), "Amount must be positive"
+
+        old_amount = record.weekly_allowance
+        record.weekly_allowance = arc4.UInt64(new_amount)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"WEEKLY_AMOUNT_UPDATED")
+        op.log(teen_address.bytes)
+        op.log(old_amount.bytes)
+        op.log(op.itob(new_amount))
+
+    @arc4.abimethod
+    def transfer_allowance_control(self, teen_address: Address, new_parent: Address) -> None:
+        """Transfer allowance control to new parent (current parent only)"""
+        record = self._parent_record(teen_address)
+
+        old_parent = record.parent
+        record.parent = new_parent
+        self.families[teen_address] = record.copy()
+
+        op.log(b"CONTROL_TRANSFERRED")
+        op.log(teen_address.bytes)
+        op.log(old_parent.bytes)
+        op.log(new_parent.bytes)
+
+    @arc4.abimethod
+    def timelock_savings(self, amount: UInt64, unlock_time: UInt64) -> Bool:
+        """Lock funds until specified time (teen feature)"""
+        teen_address = Address(Txn.sender)
+        assert teen_address in self.families, "Teen not registered"
+        assert unlock_time > Global.latest_timestamp, "Unlock time must be in future"
+        assert amount > UInt64(0), "Amount must be positive"
+
+        record = self.families[teen_address].copy()
+        if record.savings_locked.native > UInt64(0):
+            # If unlock time has passed, release previous savings
+            if Global.latest_timestamp < record.savings_unlock_time.native:
+                # Cannot lock new savings while old ones are still locked
+                return Bool(False)
+
+        record.savings_locked = arc4.UInt64(amount)
+        record.savings_unlock_time = arc4.UInt64(unlock_time)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"SAVINGS_LOCKED")
+        op.log(teen_address.bytes)
+        op.log(op.itob(amount))
+        op.log(op.itob(unlock_time))
+
+        return Bool(True)
+
+    @arc4.abimethod
+    def unlock_savings(self) -> UInt64:
+        """Unlock savings if time has passed (teen feature)"""
+        teen_address = Address(Txn.sender)
+        assert teen_address in self.families, "Teen not registered"
+
+        record = self.families[teen_address].copy()
+        assert record.savings_locked.native > UInt64(0), "No locked savings"
+        assert Global.latest_timestamp >= record.savings_unlock_time.native, "Savings still locked"
+
+        unlocked_amount = record.savings_locked.native
+        record.savings_locked = arc4.UInt64(0)
+        record.savings_unlock_time = arc4.UInt64(0)
+        self.families[teen_address] = record.copy()
+
+        op.log(b"SAVINGS_UNLOCKED")
+        op.log(teen_address.bytes)
+        op.log(op.itob(unlocked_amount))
+
+        return unlocked_amount
+
+    @arc4.abimethod
+    def process_purchase_atomic(self, merchant_name: String, amount: UInt64) -> Bool:
+        """
+        Process purchase as part of atomic group
+        Group should contain:
+        1. App call to attestation oracle (verify purchase)
+        2. This app call (check allowance limits), sent by the teen
+        3. Payment (execute payment)
+        """
+        teen_address = Address(Txn.sender)
+        assert teen_address in self.families, "Teen not registered"
+
+        # Read only: the purchase does not change the record
+        record = self.families[teen_address].copy()
+        assert not record.is_paused.native, "Allowance is paused"
+
+        # Verify atomic group structure
+        assert Global.group_size == UInt64(3), "Invalid atomic group"
+        assert Txn.group_index == UInt64(1), "Invalid group position"
+
+        assert amount <= record.weekly_allowance.native, "Purchase exceeds weekly allowance"
+
+        op.log(b"PURCHASE_PROCESSED")
+        op.log(teen_address.bytes)
+        op.log(merchant_name.bytes)
+        op.log(op.itob(amount))
+        op.log(op.itob(Global.latest_timestamp))
+
+        return Bool(True)
+
+    @arc4.abimethod
+    def process_purchases_atomic(self, amounts: arc4.DynamicArray[arc4.UInt64]) -> UInt64:
+        """
+        Check a whole cart as part of one atomic checkout group
+        Group should contain:
+        1. App call to attestation oracle (verify_purchases, every item)
+        2. This app call (check allowance limits), sent by the teen
+        3+. One payment per item, in cart order
+        """
+        teen_address = Address(Txn.sender)
+        assert teen_address in self.families, "Teen not registered"
+
+        record = self.families[teen_address].copy()
+        assert not record.is_paused.native, "Allowance is paused"
+
+        # Verify atomic group structure
+        assert Global.group_size == amounts.length + UInt64(2), "Invalid atomic group"
+        assert Txn.group_index == UInt64(1), "Invalid group position"
+        assert gtxn.ApplicationCallTransaction(0).app_id.id == self.attestation_app_id, "Cart not verified by the oracle"
+
+        total = UInt64(0)
+        for i in urange(amounts.length):
+            payment = gtxn.PaymentTransaction(i + UInt64(2))
+            assert payment.sender == Txn.sender, "Payment not from the teen"
+            assert payment.amount == amounts[i].native, "Payment does not match the cart"
+            total += payment.amount
+
+        assert total <= record.weekly_allowance.native, "Cart exceeds weekly allowance"
+
+        op.log(b"CART_PROCESSED")
+        op.log(teen_address.bytes)
+        op.log(op.itob(amounts.length))
+        op.log(op.itob(total))
+        op.log(op.itob(Global.latest_timestamp))
+
+        return total
+
+    @arc4.abimethod(readonly=True)
+    def get_allowance_status(self, teen_address: Address) -> FamilyAllowance:
+        """Get a teen's allowance record"""
+        assert teen_address in self.families, "Teen not registered"
+        return self.families[teen_address]
+
+    @arc4.abimethod(readonly=True)
+    def can_issue_allowance(self, teen_address: Address) -> Bool:
+        """Check if weekly allowance can be issued"""
+        assert teen_address in self.families, "Teen not registered"
+        record = self.families[teen_address].copy()
+        if record.is_paused.native:
+            return Bool(False)
+        return Bool(Global.latest_timestamp >= record.last_allowance_time.native + UInt64(WEEK_SECONDS))
+
+    @arc4.abimethod(readonly=True)
+    def get_contract_info(self) -> tuple[UInt64, UInt64, UInt64]:
+        """Get contract information"""
+        return (self.attestation_app_id, self.total_families, self.contract_created)
+
+    @subroutine
+    def _parent_record(self, teen_address: Address) -> FamilyAllowance:
+        """A registered teen's record, asserting the sender is the teen's parent"""
+        assert teen_address in self.families, "Teen not registered"
+        record = self.families[teen_address].copy()
+        assert Txn.sender == record.parent.native, "Only parent can manage allowance"
+        return record
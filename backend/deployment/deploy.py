@@ -44,12 +44,8 @@ def deploy_contracts():
         
         # Deploy allowance manager
         logger.info("Deploying Allowance Manager contract...")
-        manager_app_id = blockchain_service.deploy_allowance_manager(
-            "demo_parent_key",
-            "DEMO_PARENT_ADDRESS",
-            "DEMO_TEEN_ADDRESS",
-            150000000  # 150 ALGO
-        )
+        # One app for every family; parents register teens with register_family
+        manager_app_id = blockchain_service.deploy_allowance_manager("demo_oracle_key")
         
         if manager_app_id:
             logger.info(f"Allowance Manager deployed with app ID: {manager_app_id}")
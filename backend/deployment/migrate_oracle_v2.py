@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+ClearSpend Attestation Oracle v2 Migration
+Copies every merchant box of a v1 AttestationOracle into a deployed v2 oracle
+
+Steps:
+  1. Deploy contracts/attestation_oracle_v2.py and fund its app account for
+     the boxes' minimum balance (see benchmarks/oracle_cost_report.py)
+  2. python deployment/migrate_oracle_v2.py --v1-app-id <id> --v2-app-id <id> --dry-run
+  3. Drain the oracle write queue, then run it again without --dry-run: v1
+     boxes are read, converted to fixed-width records (today's spend
+     included) and written with import_merchant_attestation, 16 per group
+  4. Set ATTESTATION_ORACLE_VERSION=2 and point the backend at the v2 app.
+     The v1 app keeps its boxes until it is deleted, so switching back is
+     only a config change while no purchases have gone through v2
+"""
+
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from algosdk import mnemonic
+
+from services.blockchain_service import BlockchainService
+from services.oracle_sync import OracleBoxSync
+from services.attestation_layout import encode_merchant_record_v2
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GROUP_SIZE = 16
+
+def read_v1_attestations(v1_app_id: int):
+    """Every merchant attestation in the v1 oracle's boxes"""
+    service = BlockchainService()
+    service.attestation_oracle_app_id = v1_app_id
+    service.attestation_oracle_version = 1
+    try:
+        read = asyncio.run(OracleBoxSync(service).read())
+    finally:
+        service.close()
+    if read.get("error"):
+        raise RuntimeError(read["error"])
+    return [attestation for _, _, attestation in read["changed"]]
+
+def migrate(v1_app_id: int, v2_app_id: int, oracle_private_key: str, dry_run: bool) -> bool:
+    attestations = read_v1_attestations(v1_app_id)
+    logger.info(f"Read {len(attestations)} merchant attestations from v1 app {v1_app_id}")
+
+    calls = []
+    for attestation in attestations:
+        try:
+            record = encode_merchant_record_v2(attestation)
+        except ValueError as e:
+            # Add the category to ORACLE_CATEGORIES (append only) and run again
+            logger.error(f"Cannot migrate {attestation['merchant_name']}: {e}")
+            continue
+        calls.append((oracle_private_key, "import_merchant_attestation", [attestation["merchant_name"].encode(), record]))
+
+    if dry_run:
+        logger.info(f"Dry run: {len(calls)} merchants would be imported into v2 app {v2_app_id}")
+        return len(calls) == len(attestations)
+
+    service = BlockchainService()
+    service.attestation_oracle_app_id = v2_app_id
+    service.attestation_oracle_version = 2
+    imported = 0
+    try:
+        for start in range(0, len(calls), GROUP_SIZE):
+            group = calls[start:start + GROUP_SIZE]
+            result = service.call_attestation_oracle_group(group)
+            if result.get("error"):
+                logger.error(f"Import of merchants {start}-{start + len(group) - 1} failed: {result['error']}")
+                continue
+            imported += len(group)
+            logger.info(f"Imported {imported}/{len(calls)} merchants (round {result['confirmed_round']})")
+    finally:
+        service.close()
+
+    # Importing is idempotent, so a partial run can simply be repeated
+    return imported == len(attestations)
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy v1 attestation oracle boxes into a v2 oracle")
+    parser.add_argument("--v1-app-id", type=int, required=True)
+    parser.add_argument("--v2-app-id", type=int, required=True)
+    parser.add_argument("--dry-run", action="store_true", help="Read and convert only")
+    args = parser.parse_args()
+
+    oracle_mnemonic = os.getenv("DEMO_ORACLE_MNEMONIC", "")
+    if not oracle_mnemonic and not args.dry_run:
+        logger.error("Set DEMO_ORACLE_MNEMONIC to the oracle account both apps were initialized with")
+        return False
+    oracle_private_key = mnemonic.to_private_key(oracle_mnemonic) if oracle_mnemonic else ""
+
+    return migrate(args.v1_app_id, args.v2_app_id, oracle_private_key, args.dry_run)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -10,9 +10,10 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from .api.routes import merchants, purchases, allowances, transactions, health
+from .api.routes import merchants, purchases, allowances, transactions, health, events, families
 from .services.blockchain_service import BlockchainService
 from .services.oracle_service import OracleService
+from .services import service_registry
 
 # Configure logging
 logging.basicConfig(
@@ -34,28 +35,35 @@ async def lifespan(app: FastAPI):
     logger.info("Starting ClearSpend Backend API...")
     
     try:
-        # Initialize blockchain service
-        blockchain_service = BlockchainService()
+        # Initialize the process-wide blockchain service shared with all routers
+        blockchain_service = service_registry.get_blockchain_service()
         
         # Test connection
-        if blockchain_service.connect_to_algorand():
+        if await blockchain_service.connect_to_algorand_async():
             logger.info("Successfully connected to Algorand network")
         else:
             logger.warning("Failed to connect to Algorand network")
         
-        # Initialize oracle service
-        oracle_service = OracleService(blockchain_service)
+        # Initialize the oracle service shared with all routers
+        oracle_service = service_registry.get_oracle_service()
         logger.info("Oracle service initialized")
         
+        # Poll submitted purchases (also those submitted from threadpool requests)
+        oracle_service.confirmation_tracker.ensure_running()
+        
+        # Transaction analytics bucket purchases by the routers' merchant categories
+        service_registry.get_transaction_sync().aggregator.category_of = oracle_service.get_merchant_category
+        
+        # Follow new blocks for watched addresses
+        service_registry.get_transaction_sync().ensure_running()
+        
         # Deploy contracts (in production, this would be done separately)
         logger.info("Deploying smart contracts...")
         blockchain_service.deploy_attestation_oracle("demo_oracle_key")
-        blockchain_service.deploy_allowance_manager(
-            "demo_parent_key",
-            "DEMO_PARENT_ADDRESS",
-            "DEMO_TEEN_ADDRESS",
-            150000000  # 150 ALGO
-        )
+        # One allowance manager serves every family; families register
+        # through POST /api/v1/allowances/families
+        if not blockchain_service.allowance_manager_app_id:
+            blockchain_service.deploy_allowance_manager("demo_oracle_key")
         
         logger.info("ClearSpend Backend API started successfully")
         
@@ -67,6 +75,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down ClearSpend Backend API...")
+    await service_registry.shutdown()
 
 # Create FastAPI application
 app = FastAPI(
@@ -91,6 +100,8 @@ app.include_router(merchants.router)
 app.include_router(purchases.router)
 app.include_router(allowances.router)
 app.include_router(transactions.router)
+app.include_router(events.router)
+app.include_router(families.router)
 
 @app.get("/")
 async def root():
@@ -106,6 +117,8 @@ async def root():
             "purchases": "/api/v1/purchases/",
             "allowances": "/api/v1/allowances/",
             "transactions": "/api/v1/transactions/",
+            "events": "/api/v1/events/",
+            "families": "/api/v1/families/",
             "docs": "/docs"
         }
     }
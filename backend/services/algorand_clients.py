@@ -0,0 +1,145 @@
+"""
+ClearSpend Pooled Algorand Clients
+algod and indexer clients that reuse keep-alive HTTP connections
+"""
+
+import os
+import json
+from typing import Dict, Optional
+from urllib import parse
+
+import httpx
+from algosdk import constants, error
+from algosdk.v2client import algod, indexer
+
+API_VERSION_PREFIX = "/v2"
+
+
+def _pool_limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+
+def _request_url(requrl: str, params: Optional[Dict]) -> str:
+    if requrl not in constants.unversioned_paths:
+        requrl = API_VERSION_PREFIX + requrl
+    if params:
+        requrl = requrl + "?" + parse.urlencode(params)
+    return requrl
+
+
+class PooledAlgodClient(algod.AlgodClient):
+    """AlgodClient that sends requests over a pooled httpx.Client"""
+
+    def __init__(
+        self,
+        algod_token: str,
+        algod_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(algod_token, algod_address, headers)
+        self.http = httpx.Client(
+            base_url=algod_address,
+            limits=_pool_limits(pool_size or int(os.getenv("ALGOD_POOL_SIZE", "20"))),
+            timeout=timeout or float(os.getenv("ALGOD_TIMEOUT", "30"))
+        )
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        timeout=None
+    ):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        kwargs = {"timeout": timeout} if timeout else {}
+        resp = self.http.request(
+            method,
+            _request_url(requrl, params),
+            headers=header,
+            content=data,
+            **kwargs
+        )
+
+        if resp.status_code >= 400:
+            message = resp.text
+            body = {}
+            try:
+                body = resp.json()
+                message = body["message"]
+            except Exception:
+                pass
+            raise error.AlgodHTTPError(message, resp.status_code, body.get("data"))
+
+        if response_format != "json":
+            return resp.content
+        if not resp.content:
+            return {}
+        try:
+            return resp.json()
+        except Exception as e:
+            raise error.AlgodResponseError("Failed to parse JSON response from algod") from e
+
+    def close(self) -> None:
+        self.http.close()
+
+
+class PooledIndexerClient(indexer.IndexerClient):
+    """IndexerClient that sends requests over a pooled httpx.Client"""
+
+    def __init__(
+        self,
+        indexer_token: str,
+        indexer_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(indexer_token, indexer_address, headers)
+        self.http = httpx.Client(
+            base_url=indexer_address,
+            limits=_pool_limits(pool_size or int(os.getenv("INDEXER_POOL_SIZE", "20"))),
+            timeout=timeout or float(os.getenv("INDEXER_TIMEOUT", "30"))
+        )
+
+    def indexer_request(self, method, requrl, params=None, data=None, headers=None, timeout=None):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth and self.indexer_token:
+            header.update({constants.indexer_auth_header: self.indexer_token})
+
+        kwargs = {"timeout": timeout} if timeout else {}
+        resp = self.http.request(
+            method,
+            _request_url(requrl, params),
+            headers=header,
+            content=data,
+            **kwargs
+        )
+
+        if resp.status_code >= 400:
+            message = resp.text
+            try:
+                message = json.loads(message)["message"]
+            except Exception:
+                pass
+            raise error.IndexerHTTPError(message)
+
+        return resp.json()
+
+    def close(self) -> None:
+        self.http.close()
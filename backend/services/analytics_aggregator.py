@@ -0,0 +1,119 @@
+"""
+ClearSpend Analytics Aggregator
+Per-address spending aggregates updated incrementally as transactions are ingested
+"""
+
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .rolling_limits import DEFAULT_SPEND_WINDOWS, SpendWindow, SpendWindowConfig
+
+UNCATEGORIZED = "uncategorized"
+
+
+class AddressAggregate:
+    """Running totals for one address; every update is O(1)"""
+
+    def __init__(self, windows: List[SpendWindowConfig]):
+        self.total_spent = 0
+        self.total_received = 0
+        self.transaction_count = 0
+        self.purchase_count = 0
+        self.last_round = 0
+        self.merchant_spending: Dict[str, int] = defaultdict(int)
+        self.merchant_counts: Dict[str, int] = defaultdict(int)
+        self.category_spending: Dict[str, int] = defaultdict(int)
+        self.spent_windows = [SpendWindow(config) for config in windows]
+        self.purchase_windows = [SpendWindow(config) for config in windows]
+
+
+class AnalyticsAggregator:
+    """
+    Maintains an AddressAggregate per address from ingested transaction
+    rows (the dicts TransactionStore.add_transactions returns), so the
+    analytics endpoint reads precomputed totals instead of rescanning
+    history. Purchase categories are resolved once, at ingest, through
+    category_of(merchant_name).
+    """
+
+    def __init__(
+        self,
+        category_of: Optional[Callable[[str], Optional[str]]] = None,
+        windows: Optional[List[SpendWindowConfig]] = None
+    ):
+        self.category_of = category_of
+        self.windows = list(windows or DEFAULT_SPEND_WINDOWS)
+        self._aggregates: Dict[str, AddressAggregate] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, address: str) -> bool:
+        return address in self._aggregates
+
+    def load(self, address: str, rows: Iterable[Dict]) -> None:
+        """Build an address's aggregate from its full stored history"""
+        aggregate = AddressAggregate(self.windows)
+        for row in rows:
+            self._apply(aggregate, address, row)
+        with self._lock:
+            self._aggregates[address] = aggregate
+
+    def apply(self, address: str, rows: Iterable[Dict]) -> None:
+        """Fold newly ingested rows into a loaded aggregate (unloaded addresses are skipped)"""
+        with self._lock:
+            aggregate = self._aggregates.get(address)
+            if aggregate is None:
+                return
+            for row in rows:
+                self._apply(aggregate, address, row)
+
+    def _apply(self, aggregate: AddressAggregate, address: str, row: Dict) -> None:
+        amount = row.get("amount") or 0
+        timestamp = row.get("timestamp") or 0
+        aggregate.transaction_count += 1
+        aggregate.last_round = max(aggregate.last_round, row.get("round") or 0)
+
+        if row.get("receiver") == address:
+            aggregate.total_received += amount
+        if row.get("type") != "pay" or row.get("sender") != address:
+            return
+
+        aggregate.total_spent += amount
+        for window in aggregate.spent_windows:
+            window.record(amount, timestamp)
+
+        merchant = row.get("merchant")
+        if merchant is None:
+            return
+        aggregate.purchase_count += 1
+        aggregate.merchant_spending[merchant] += amount
+        aggregate.merchant_counts[merchant] += 1
+        category = (self.category_of(merchant) if self.category_of else None) or UNCATEGORIZED
+        aggregate.category_spending[category] += amount
+        for window in aggregate.purchase_windows:
+            window.record(1, timestamp)
+
+    def snapshot(self, address: str, timestamp: int) -> Optional[Dict]:
+        """Current analytics for a loaded address, windows evaluated at timestamp"""
+        with self._lock:
+            aggregate = self._aggregates.get(address)
+            if aggregate is None:
+                return None
+            return {
+                "total_spent": aggregate.total_spent,
+                "total_received": aggregate.total_received,
+                "transaction_count": aggregate.transaction_count,
+                "purchase_count": aggregate.purchase_count,
+                "merchant_spending": dict(aggregate.merchant_spending),
+                "merchant_counts": dict(aggregate.merchant_counts),
+                "category_spending": dict(aggregate.category_spending),
+                "windows": {
+                    spent.config.name: {
+                        "spent": spent.spent(timestamp),
+                        "purchase_count": purchases.spent(timestamp)
+                    }
+                    for spent, purchases in zip(aggregate.spent_windows, aggregate.purchase_windows)
+                },
+                "net_balance": aggregate.total_received - aggregate.total_spent,
+                "last_round": aggregate.last_round
+            }
@@ -0,0 +1,230 @@
+"""
+ClearSpend Async Algorand Clients
+Native asyncio algod and indexer clients on a pooled httpx.AsyncClient
+"""
+
+import os
+import base64
+from typing import Dict, List, Optional, Union
+
+import httpx
+from algosdk import constants, encoding, error
+from algosdk.transaction import GenericSignedTransaction, SuggestedParams
+
+from .algorand_clients import _pool_limits, _request_url
+
+
+class AsyncAlgodClient:
+    """
+    The subset of the algod v2 API ClearSpend uses, awaitable so a slow
+    node only suspends the calling request instead of the whole worker.
+    Responses are the same JSON dicts the algosdk AlgodClient returns.
+    """
+
+    def __init__(
+        self,
+        algod_token: str,
+        algod_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.algod_token = algod_token
+        self.algod_address = algod_address
+        self.headers = headers
+        self.http = httpx.AsyncClient(
+            base_url=algod_address,
+            limits=_pool_limits(pool_size or int(os.getenv("ALGOD_POOL_SIZE", "20"))),
+            timeout=timeout or float(os.getenv("ALGOD_TIMEOUT", "30")),
+            transport=transport
+        )
+
+    async def algod_request(
+        self,
+        method: str,
+        requrl: str,
+        params: Optional[Dict] = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        response_format: str = "json",
+        timeout: Optional[float] = None
+    ):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        kwargs = {"timeout": timeout} if timeout else {}
+        resp = await self.http.request(
+            method,
+            _request_url(requrl, params),
+            headers=header,
+            content=data,
+            **kwargs
+        )
+
+        if resp.status_code >= 400:
+            message = resp.text
+            body = {}
+            try:
+                body = resp.json()
+                message = body["message"]
+            except Exception:
+                pass
+            raise error.AlgodHTTPError(message, resp.status_code, body.get("data"))
+
+        if response_format != "json":
+            return resp.content
+        if not resp.content:
+            return {}
+        try:
+            return resp.json()
+        except Exception as e:
+            raise error.AlgodResponseError("Failed to parse JSON response from algod") from e
+
+    async def status(self) -> Dict:
+        return await self.algod_request("GET", "/status")
+
+    async def status_after_block(self, block_num: int, **kwargs) -> Dict:
+        return await self.algod_request("GET", f"/status/wait-for-block-after/{block_num}", **kwargs)
+
+    async def account_info(self, address: str) -> Dict:
+        return await self.algod_request("GET", "/accounts/" + address)
+
+    async def suggested_params(self) -> SuggestedParams:
+        res = await self.algod_request("GET", "/transactions/params")
+        return SuggestedParams(
+            res["fee"],
+            res["last-round"],
+            res["last-round"] + 1000,
+            res["genesis-hash"],
+            res["genesis-id"],
+            False,
+            res["consensus-version"],
+            res["min-fee"]
+        )
+
+    async def send_raw_transactions(self, txn_bytes: bytes) -> str:
+        """Submit already msgpack-encoded signed transactions"""
+        res = await self.algod_request(
+            "POST",
+            "/transactions",
+            data=txn_bytes,
+            headers={"Content-Type": "application/x-binary"}
+        )
+        return res["txId"]
+
+    async def send_transactions(self, txns: List[GenericSignedTransaction]) -> str:
+        serialized = b"".join(base64.b64decode(encoding.msgpack_encode(txn)) for txn in txns)
+        return await self.send_raw_transactions(serialized)
+
+    async def send_transaction(self, txn: GenericSignedTransaction) -> str:
+        return await self.send_transactions([txn])
+
+    async def pending_transaction_info(self, transaction_id: str) -> Dict:
+        return await self.algod_request(
+            "GET", "/transactions/pending/" + transaction_id, params={"format": "json"}
+        )
+
+    async def block_raw(self, round_number: int) -> bytes:
+        """Block for a round as the raw msgpack bytes algod returns"""
+        return await self.algod_request(
+            "GET", f"/blocks/{round_number}", params={"format": "msgpack"}, response_format="msgpack"
+        )
+
+    async def application_info(self, application_id: int) -> Dict:
+        return await self.algod_request("GET", f"/applications/{application_id}")
+
+    async def application_boxes(self, application_id: int, limit: int = 0) -> Dict:
+        params = {"max": limit} if limit else None
+        return await self.algod_request("GET", f"/applications/{application_id}/boxes", params=params)
+
+    async def application_box_by_name(self, application_id: int, box_name: bytes) -> Dict:
+        params = {"name": "b64:" + base64.b64encode(box_name).decode()}
+        return await self.algod_request("GET", f"/applications/{application_id}/box", params=params)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+class AsyncIndexerClient:
+    """Awaitable indexer reads (transaction search) on a pooled httpx.AsyncClient"""
+
+    def __init__(
+        self,
+        indexer_token: str,
+        indexer_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.indexer_token = indexer_token
+        self.indexer_address = indexer_address
+        self.headers = headers
+        self.http = httpx.AsyncClient(
+            base_url=indexer_address,
+            limits=_pool_limits(pool_size or int(os.getenv("INDEXER_POOL_SIZE", "20"))),
+            timeout=timeout or float(os.getenv("INDEXER_TIMEOUT", "30")),
+            transport=transport
+        )
+
+    async def indexer_request(self, method: str, requrl: str, params: Optional[Dict] = None) -> Dict:
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if requrl not in constants.no_auth and self.indexer_token:
+            header.update({constants.indexer_auth_header: self.indexer_token})
+
+        resp = await self.http.request(method, _request_url(requrl, params), headers=header)
+
+        if resp.status_code >= 400:
+            message = resp.text
+            try:
+                message = resp.json()["message"]
+            except Exception:
+                pass
+            raise error.IndexerHTTPError(message)
+
+        return resp.json()
+
+    async def search_transactions(
+        self,
+        address: Optional[str] = None,
+        limit: Optional[int] = None,
+        next_page: Optional[str] = None,
+        min_round: Optional[int] = None,
+        max_round: Optional[int] = None,
+        txn_type: Optional[str] = None,
+        application_id: Optional[int] = None,
+        note_prefix: Optional[bytes] = None,
+        txid: Optional[str] = None
+    ) -> Dict:
+        """Same query parameters as IndexerClient.search_transactions"""
+        query: Dict[str, Union[str, int]] = {}
+        if address:
+            query["address"] = address
+        if limit:
+            query["limit"] = limit
+        if next_page:
+            query["next"] = next_page
+        if min_round:
+            query["min-round"] = min_round
+        if max_round:
+            query["max-round"] = max_round
+        if txn_type:
+            query["tx-type"] = txn_type
+        if application_id:
+            query["application-id"] = application_id
+        if note_prefix:
+            query["note-prefix"] = base64.b64encode(note_prefix).decode()
+        if txid:
+            query["txid"] = txid
+        return await self.indexer_request("GET", "/transactions", query)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
@@ -0,0 +1,239 @@
+"""
+ClearSpend Attestation Box Layouts
+Box keys and record encodings of the AttestationOracle v1 and v2 contracts
+"""
+
+import struct
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+
+# v1 box key: b"merchant_" + the ARC-4 encoded merchant name (2-byte length, then UTF-8)
+MERCHANT_BOX_PREFIX = b"merchant_"
+
+# ARC-4 MerchantAttestation head: two string offsets, bool, three uint64s, bool
+_ATTESTATION_HEAD = struct.Struct(">HHBQQQB")
+_ARC4_TRUE = 0x80
+
+# v2 box key: b"m" + the first 15 bytes of sha256(ARC-4 encoded name), 16 bytes whatever the name
+MERCHANT_V2_BOX_PREFIX = b"m"
+MERCHANT_V2_KEY_SIZE = 16
+
+# v2 record: category id, flags, daily limit, last update, then the two
+# counter fields verify_purchase rewrites in one box_replace
+MERCHANT_V2_RECORD = struct.Struct(">BBQQQQ")
+MERCHANT_V2_COUNTER_OFFSET = 18
+MERCHANT_V2_COUNTER_SIZE = 16
+V2_FLAG_APPROVED = 1
+V2_FLAG_PARENT_APPROVED = 2
+
+# Category ids the v2 contract's restricted bitmask is indexed by. Ids are
+# on chain, so this list is append-only.
+ORACLE_CATEGORIES = [
+    "Retail",
+    "Food & Beverage",
+    "Education",
+    "Entertainment",
+    "Shopping",
+    "Transportation",
+    "Gaming",
+    "Gambling",
+    "Adult Content",
+    "Tobacco",
+    "Alcohol"
+]
+_ORACLE_CATEGORY_IDS = {category: category_id for category_id, category in enumerate(ORACLE_CATEGORIES)}
+
+SECONDS_PER_DAY = 86400
+
+
+def _encode_arc4_string(text: str) -> bytes:
+    data = text.encode()
+    return struct.pack(">H", len(data)) + data
+
+
+def encode_arc4_string_array(texts: List[str]) -> bytes:
+    """ARC-4 string[]: element count, one offset per element, then the encoded strings"""
+    elements = [_encode_arc4_string(text) for text in texts]
+    head = bytearray(struct.pack(">H", len(elements)))
+    offset = 2 * len(elements)
+    for element in elements:
+        head += struct.pack(">H", offset)
+        offset += len(element)
+    return bytes(head) + b"".join(elements)
+
+
+def encode_arc4_uint64_array(values: List[int]) -> bytes:
+    """ARC-4 uint64[]: element count, then the values"""
+    return struct.pack(f">H{len(values)}Q", len(values), *values)
+
+
+def _arc4_string_array_elements(arg: bytes) -> List[bytes]:
+    """The ARC-4 encoded strings of a string[] app arg, or [] if arg is not one"""
+    if len(arg) < 2:
+        return []
+    (count,) = struct.unpack_from(">H", arg)
+    body = arg[2:]
+    if count == 0 or len(body) < 2 * count:
+        return []
+    offsets = struct.unpack_from(f">{count}H", body)
+    if offsets[0] != 2 * count:
+        return []
+    elements = []
+    for start, end in zip(offsets, offsets[1:] + (len(body),)):
+        element = body[start:end]
+        if len(element) < 2 or struct.unpack_from(">H", element)[0] != len(element) - 2:
+            return []
+        elements.append(element)
+    return elements
+
+
+def _decode_arc4_string(value: bytes, offset: int) -> str:
+    if offset + 2 > len(value):
+        raise ValueError("String offset past the end of the box")
+    (length,) = struct.unpack_from(">H", value, offset)
+    end = offset + 2 + length
+    if end > len(value):
+        raise ValueError("String runs past the end of the box")
+    return value[offset + 2:end].decode()
+
+
+def merchant_box_name(merchant_name: str) -> bytes:
+    """v1 box key the contract stores a merchant's attestation under"""
+    return MERCHANT_BOX_PREFIX + _encode_arc4_string(merchant_name)
+
+
+def encode_merchant_attestation(attestation: Dict) -> bytes:
+    """ARC-4 encode a MerchantAttestation struct as contracts/attestation_oracle.py stores it"""
+    name = _encode_arc4_string(attestation["merchant_name"])
+    category = _encode_arc4_string(attestation["category"])
+    head = _ATTESTATION_HEAD.pack(
+        _ATTESTATION_HEAD.size,
+        _ATTESTATION_HEAD.size + len(name),
+        _ARC4_TRUE if attestation["is_approved"] else 0,
+        attestation["daily_limit"],
+        attestation["total_spent_today"],
+        attestation["last_update"],
+        _ARC4_TRUE if attestation["parent_approved"] else 0
+    )
+    return head + name + category
+
+
+def decode_merchant_attestation(value: bytes) -> Dict:
+    """Decode an ARC-4 MerchantAttestation box value; raises ValueError if it is malformed"""
+    try:
+        (name_offset, category_offset, is_approved, daily_limit,
+         total_spent_today, last_update, parent_approved) = _ATTESTATION_HEAD.unpack_from(value)
+        return {
+            "merchant_name": _decode_arc4_string(value, name_offset),
+            "category": _decode_arc4_string(value, category_offset),
+            "is_approved": bool(is_approved & _ARC4_TRUE),
+            "daily_limit": daily_limit,
+            "total_spent_today": total_spent_today,
+            "last_update": last_update,
+            "parent_approved": bool(parent_approved & _ARC4_TRUE)
+        }
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed MerchantAttestation box: {e}") from e
+
+
+def oracle_category_id(category: str) -> int:
+    """The v2 contract's id for a category; raises ValueError for one it has no id for"""
+    category_id = _ORACLE_CATEGORY_IDS.get(category)
+    if category_id is None:
+        raise ValueError(f"Category '{category}' has no attestation oracle v2 id")
+    return category_id
+
+
+def restricted_category_mask(categories: Iterable[str]) -> int:
+    """v2 restricted bitmask: bit i set for category id i"""
+    mask = 0
+    for category in categories:
+        mask |= 1 << oracle_category_id(category)
+    return mask
+
+
+def merchant_key_v2(merchant_name: str) -> bytes:
+    """v2 box key; fixed length, so every box reference and MBR costs the same"""
+    return MERCHANT_V2_BOX_PREFIX + hashlib.sha256(_encode_arc4_string(merchant_name)).digest()[:MERCHANT_V2_KEY_SIZE - 1]
+
+
+def encode_merchant_record_v2(attestation: Dict) -> bytes:
+    """Fixed-width v2 record of an attestation dict (as decode_merchant_attestation returns)"""
+    flags = (V2_FLAG_APPROVED if attestation["is_approved"] else 0) | (
+        V2_FLAG_PARENT_APPROVED if attestation["parent_approved"] else 0
+    )
+    return MERCHANT_V2_RECORD.pack(
+        oracle_category_id(attestation["category"]),
+        flags,
+        attestation["daily_limit"],
+        attestation["last_update"],
+        attestation["total_spent_today"],
+        # v1 resets the counter when last_update falls on an earlier day
+        attestation["last_update"] // SECONDS_PER_DAY
+    )
+
+
+def decode_merchant_record_v2(value: bytes, merchant_name: str, now: Optional[int] = None) -> Dict:
+    """
+    Decode a v2 record into the attestation dict v1 boxes decode to. The
+    record does not hold the name; the caller knows which key it read.
+    With now, a counter from an earlier day reads as 0, as the contract
+    sees it. Raises ValueError if the record is malformed.
+    """
+    if len(value) != MERCHANT_V2_RECORD.size:
+        raise ValueError(f"Malformed v2 merchant record: {len(value)} bytes")
+    category_id, flags, daily_limit, last_update, total_spent_today, spend_day = MERCHANT_V2_RECORD.unpack(value)
+    if category_id >= len(ORACLE_CATEGORIES):
+        raise ValueError(f"Malformed v2 merchant record: unknown category id {category_id}")
+    if now is not None and spend_day < now // SECONDS_PER_DAY:
+        total_spent_today = 0
+    return {
+        "merchant_name": merchant_name,
+        "category": ORACLE_CATEGORIES[category_id],
+        "is_approved": bool(flags & V2_FLAG_APPROVED),
+        "daily_limit": daily_limit,
+        "total_spent_today": total_spent_today,
+        "last_update": last_update,
+        "parent_approved": bool(flags & V2_FLAG_PARENT_APPROVED)
+    }
+
+
+def touched_box_names(calls: Iterable[List[bytes]]) -> Set[bytes]:
+    """
+    v1 merchant boxes an application call may have written: every app
+    arg, read both as an ARC-4 string (ABI callers) and as raw UTF-8 (the
+    service's own calls pass the bare name after the method name), and
+    every element of an arg that is an ARC-4 string[]
+    """
+    names = set()
+    for args in calls:
+        for arg in args:
+            names.add(MERCHANT_BOX_PREFIX + arg)
+            if len(arg) < 1 << 16:
+                names.add(MERCHANT_BOX_PREFIX + struct.pack(">H", len(arg)) + arg)
+            # verify_purchases passes a cart's merchants as one string[]
+            for element in _arc4_string_array_elements(arg):
+                names.add(MERCHANT_BOX_PREFIX + element)
+    return names
+
+
+def touched_merchant_names(calls: Iterable[List[bytes]]) -> Dict[bytes, str]:
+    """
+    v2 box keys an application call may have written, mapped to the
+    merchant name they hash from; app args are read as ARC-4 strings,
+    as raw UTF-8 and as ARC-4 string[]
+    """
+    keys = {}
+    for args in calls:
+        for arg in args:
+            candidates = [arg]
+            if len(arg) >= 2 and struct.unpack_from(">H", arg)[0] == len(arg) - 2:
+                candidates.append(arg[2:])
+            candidates += [element[2:] for element in _arc4_string_array_elements(arg)]
+            for candidate in candidates:
+                try:
+                    name = candidate.decode()
+                except UnicodeDecodeError:
+                    continue
+                keys[merchant_key_v2(name)] = name
+    return keys
@@ -0,0 +1,410 @@
+"""
+ClearSpend Attestation Store
+Write-ahead log plus periodic compact snapshots for merchant attestations,
+family rules and daily spend counters
+"""
+
+import os
+import sys
+import glob
+import zlib
+import fcntl
+import struct
+import threading
+import logging
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = "snapshot.msgpack"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+LOCK_FILE = "LOCK"
+
+# Every log record is framed as <payload length, crc32> + msgpack payload
+FRAME_HEADER = struct.Struct("<II")
+
+# Log record types. Records carry absolute values (never deltas), so
+# replaying one that a snapshot already contains is harmless.
+MERCHANT_RECORD = "m"  # ["m", name, category, is_approved, daily_limit, last_update, parent_approved, address]
+FAMILY_RECORD = "f"    # ["f", FamilyRules dict]
+SPEND_RECORD = "s"     # ["s", key, day, spent, last_update], or ["s", key] when removed
+
+
+def merchant_record(attestation) -> list:
+    return [
+        MERCHANT_RECORD,
+        attestation.merchant_name,
+        attestation.category,
+        attestation.is_approved,
+        attestation.daily_limit,
+        attestation.last_update,
+        attestation.parent_approved,
+        attestation.merchant_address
+    ]
+
+
+def encode_merchant_columns(columns) -> Dict:
+    """Snapshot form of a MerchantColumns table: one list or packed array per column"""
+    # Rows appended while copying are also in the log tail, so trimming
+    # every column to the shortest copy is enough
+    names = list(columns.names)
+    count = min(len(names), len(columns.limits), len(columns.category_ids), len(columns.base_flags),
+                len(columns.last_updates), len(columns.addresses))
+    return {
+        "byteorder": sys.byteorder,
+        "categories": list(columns.categories.names),
+        "names": names[:count],
+        "category_ids": columns.category_ids[:count].tobytes(),
+        "limits": columns.limits[:count].tobytes(),
+        "base_flags": columns.base_flags[:count].tobytes(),
+        "last_updates": columns.last_updates[:count].tobytes(),
+        "addresses": list(columns.addresses[:count])
+    }
+
+
+def decode_merchant_columns(snapshot: Dict) -> Tuple:
+    """Arguments for MerchantColumns.load from a snapshot"""
+    packed = []
+    for typecode, field in (("H", "category_ids"), ("q", "limits"), ("B", "base_flags"), ("q", "last_updates")):
+        column = array(typecode)
+        column.frombytes(snapshot[field])
+        if snapshot["byteorder"] != sys.byteorder:
+            column.byteswap()
+        packed.append(column)
+    category_ids, limits, base_flags, last_updates = packed
+    return (
+        snapshot["names"],
+        snapshot["categories"],
+        category_ids,
+        limits,
+        base_flags,
+        last_updates,
+        snapshot["addresses"]
+    )
+
+
+class AttestationStore:
+    """
+    Append-only log of attestation mutations in numbered segment files plus
+    a snapshot of the full state. Callers apply a mutation in memory first
+    and then append it, so a snapshot taken after rotating to a new segment
+    contains everything in the older segments, which are then deleted.
+
+    Appends are group-committed: append() queues the framed record and a
+    writer thread writes everything queued in one write, so callers never
+    do file I/O themselves. append() then waits until its record is written
+    (or durable, with sync_every=1) unless called with wait=False, which
+    the spend counter journal uses under its shard lock.
+
+    fsync is batched: every sync_every records (1 = every write, 0 = never
+    on write) and every sync_interval seconds from a background thread.
+    Records that were written but not yet synced survive a process crash but
+    not a power loss; records still queued survive neither.
+
+    One process owns a directory: the constructor takes an exclusive flock
+    on its LOCK file and raises RuntimeError if another process holds it.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        sync_every: Optional[int] = None,
+        sync_interval: Optional[float] = None,
+        snapshot_every: Optional[int] = None
+    ):
+        self.directory = directory or os.getenv("ATTESTATION_STORE_DIR", "clearspend_attestations")
+        self.sync_every = int(os.getenv("ATTESTATION_WAL_SYNC_EVERY", "64")) if sync_every is None else sync_every
+        self.sync_interval = (
+            float(os.getenv("ATTESTATION_WAL_SYNC_INTERVAL", "0.2")) if sync_interval is None else sync_interval
+        )
+        self.snapshot_every = (
+            int(os.getenv("ATTESTATION_SNAPSHOT_EVERY", "100000")) if snapshot_every is None else snapshot_every
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        # Two processes appending segments and compacting the same directory
+        # would delete each other's log, so the lock fails fast instead of waiting
+        self._lock_fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"Attestation store {self.directory} is in use by another process")
+
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        # Never append to a segment left by a previous run: its tail may be torn
+        segments = self._segments()
+        self._segment = segments[-1][0] + 1 if segments else 1
+        self._unsynced = 0
+        self._since_snapshot = 0
+        self._snapshotting = False
+        self._state_provider: Optional[Callable[[], Dict]] = None
+        self._stop = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+
+        # Group commit queue; sequence numbers count records ever queued
+        self._queue: List[bytes] = []
+        self._queued = threading.Condition()
+        self._enqueued_seq = 0
+        self._written_seq = 0
+        self._durable_seq = 0
+        self._failed_seq = 0
+        self._writer: Optional[threading.Thread] = None
+
+        self.records_written = 0
+        self.syncs = 0
+        self.snapshots = 0
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:010d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")):
+            name = os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            if name.isdigit():
+                segments.append((int(name), path))
+        return sorted(segments)
+
+    def recover(self) -> Tuple[Optional[Dict], List[list]]:
+        """Return the latest snapshot (or None) and the log records written after it, in order"""
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = msgpack.unpackb(f.read(), raw=False)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported attestation snapshot version: {snapshot.get('version')}")
+
+        first_segment = snapshot["wal_segment"] if snapshot else 0
+        self._segment = max(self._segment, first_segment)
+        records = []
+        for segment, path in self._segments():
+            if first_segment <= segment < self._segment:
+                records.extend(self._read_segment(path))
+        logger.info(f"Recovered attestation store: snapshot={'yes' if snapshot else 'no'}, {len(records)} log records")
+        return snapshot, records
+
+    def _read_segment(self, path: str) -> List[list]:
+        with open(path, "rb") as f:
+            data = f.read()
+        records = []
+        offset = 0
+        while offset + FRAME_HEADER.size <= len(data):
+            length, checksum = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            records.append(msgpack.unpackb(payload, raw=False))
+            offset = start + length
+        if offset < len(data):
+            # A crash mid-append leaves a torn record; everything before it is intact
+            logger.warning(f"Ignoring {len(data) - offset} torn bytes at the end of {path}")
+        return records
+
+    def attach(self, state_provider: Callable[[], Dict]) -> None:
+        """
+        Register the function that returns the full state for snapshots and
+        start the background fsync thread
+        """
+        self._state_provider = state_provider
+        if self.sync_interval > 0 and self.sync_every != 1 and self._syncer is None:
+            self._syncer = threading.Thread(target=self._sync_loop, name="attestation-wal-sync", daemon=True)
+            self._syncer.start()
+
+    def append(self, record: list, wait: bool = True) -> None:
+        """
+        Queue one mutation record for the log. With wait, return once it is
+        written (durable when sync_every=1); raises OSError if writing failed.
+        """
+        payload = msgpack.packb(record, use_bin_type=True)
+        frame = FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._queued:
+            self._queue.append(frame)
+            self._enqueued_seq += 1
+            seq = self._enqueued_seq
+            if self._writer is None and not self._stop.is_set():
+                self._writer = threading.Thread(target=self._write_loop, name="attestation-wal-writer", daemon=True)
+                self._writer.start()
+            self._queued.notify_all()
+        if self._writer is None:
+            # Closed: write inline
+            self._drain()
+        if not wait:
+            return
+        with self._queued:
+            target = "_durable_seq" if self.sync_every == 1 else "_written_seq"
+            while getattr(self, target) < seq and self._failed_seq < seq:
+                self._queued.wait()
+            if getattr(self, target) < seq:
+                raise OSError("Attestation log write failed")
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._queued:
+                while not self._queue and not self._stop.is_set():
+                    self._queued.wait()
+                if not self._queue:
+                    return
+            try:
+                self._drain()
+            except Exception as e:
+                logger.error(f"Attestation log write failed: {e}")
+
+    def _drain(self) -> None:
+        """Write every queued record in one write; the file lock keeps batches in queue order"""
+        snapshot_due = False
+        with self._lock:
+            with self._queued:
+                batch, self._queue = self._queue, []
+                last = self._enqueued_seq
+            if not batch:
+                return
+            try:
+                if self._fd is None:
+                    self._open_segment()
+                os.write(self._fd, b"".join(batch))
+                self.records_written += len(batch)
+                self._unsynced += len(batch)
+                with self._queued:
+                    self._written_seq = last
+                    self._queued.notify_all()
+                if self.sync_every and self._unsynced >= self.sync_every:
+                    self._sync_locked()
+            except Exception:
+                with self._queued:
+                    self._failed_seq = last
+                    self._queued.notify_all()
+                raise
+
+            self._since_snapshot += len(batch)
+            snapshot_due = (
+                self.snapshot_every > 0
+                and self._since_snapshot >= self.snapshot_every
+                and self._state_provider is not None
+                and not self._snapshotting
+            )
+            if snapshot_due:
+                self._snapshotting = True
+        if snapshot_due:
+            threading.Thread(target=self._snapshot_in_background, name="attestation-snapshot", daemon=True).start()
+
+    def _open_segment(self) -> None:
+        self._fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _sync_locked(self) -> None:
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = 0
+            self.syncs += 1
+        with self._queued:
+            self._durable_seq = self._written_seq
+            self._queued.notify_all()
+
+    def _sync_loop(self) -> None:
+        while not self._stop.wait(self.sync_interval):
+            try:
+                with self._lock:
+                    self._sync_locked()
+            except OSError as e:
+                logger.error(f"Attestation log fsync failed: {e}")
+
+    def flush(self) -> None:
+        """Write any queued records and fsync everything written since the last sync"""
+        self._drain()
+        with self._lock:
+            self._sync_locked()
+
+    def snapshot(self, state: Optional[Dict] = None) -> None:
+        """Write a snapshot of the current state and delete the log segments it covers"""
+        with self._snapshot_lock:
+            with self._lock:
+                # Appends from here on go to a fresh segment; every record
+                # in the older ones is already applied to the in-memory state
+                self._sync_locked()
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._segment += 1
+                covered = self._segment
+                # Create the new segment now so a restart numbers its own
+                # segments after it
+                self._open_segment()
+                self._since_snapshot = 0
+
+            state = dict(state if state is not None else self._state_provider())
+            state["version"] = SNAPSHOT_VERSION
+            state["wal_segment"] = covered
+
+            temp_path = self.snapshot_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(msgpack.packb(state, use_bin_type=True))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            self._sync_directory()
+
+            for segment, path in self._segments():
+                if segment < covered:
+                    os.remove(path)
+            self.snapshots += 1
+            logger.info(f"Wrote attestation snapshot covering log segments before {covered}")
+
+    def _snapshot_in_background(self) -> None:
+        try:
+            self.snapshot()
+        except Exception as e:
+            logger.error(f"Attestation snapshot failed: {e}")
+        finally:
+            self._snapshotting = False
+
+    def _sync_directory(self) -> None:
+        """Make the snapshot rename durable (POSIX only)"""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def stats(self) -> Dict:
+        return {
+            "segment": self._segment,
+            "records_written": self.records_written,
+            "records_queued": len(self._queue),
+            "records_since_snapshot": self._since_snapshot,
+            "syncs": self.syncs,
+            "snapshots": self.snapshots
+        }
+
+    def close(self) -> None:
+        """Stop the writer and fsync threads, sync and close the open segment and release the directory"""
+        self._stop.set()
+        with self._queued:
+            writer, self._writer = self._writer, None
+            self._queued.notify_all()
+        if writer is not None:
+            writer.join()
+        if self._syncer is not None:
+            self._syncer.join()
+            self._syncer = None
+        self._drain()
+        with self._lock:
+            self._sync_locked()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
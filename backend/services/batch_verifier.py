@@ -0,0 +1,179 @@
+"""
+ClearSpend Batch Purchase Verifier
+Evaluates purchases against compiled family policies and spend counters
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .policy_compiler import (
+    FLAG_APPROVED,
+    FLAG_PARENT_APPROVED,
+    FLAGS_ELIGIBLE,
+    DecisionRecord,
+    PolicyCompiler,
+    category_cap_key
+)
+from .redis_spend import RedisSpendCounter
+from .rolling_limits import RollingSpendLimits
+from .spend_counter import HeldCounters, ShardedSpendCounter
+
+
+class Reservation(NamedTuple):
+    """One eligible purchase waiting to be charged against the spend counters"""
+    record: DecisionRecord
+    merchant_name: str
+    family_id: str
+    category: str
+    amount: int
+    user_address: str
+
+    @property
+    def cap_key(self) -> Optional[str]:
+        if self.record.category_cap is None:
+            return None
+        return category_cap_key(self.family_id, self.record.category_id)
+
+
+def rejection_reason(merchant_name: str, category: str, flags: int) -> str:
+    """Reason for a flag-based rejection"""
+    if not flags & FLAG_APPROVED:
+        return f"Merchant '{merchant_name}' is not approved for purchases"
+    if not flags & FLAG_PARENT_APPROVED:
+        return f"Merchant '{merchant_name}' is not approved by parent"
+    return f"Category '{category}' is restricted"
+
+
+def reserve_purchase(
+    counters: Union[ShardedSpendCounter, HeldCounters],
+    record: DecisionRecord,
+    merchant_name: str,
+    family_id: str,
+    category: str,
+    amount: int,
+    timestamp: int,
+    user_address: str,
+    rolling_limits: Optional[RollingSpendLimits] = None
+) -> Optional[str]:
+    """
+    Reserve a purchase against the merchant daily limit, the family's
+    category cap when there is one, and the teen's rolling windows.
+    Returns a denial reason or None; a denied purchase holds nothing.
+    """
+    approved, _ = counters.try_reserve(merchant_name, amount, record.daily_limit, timestamp)
+    if not approved:
+        return f"Purchase would exceed daily limit of {record.daily_limit} microAlgos"
+
+    if record.category_cap is not None:
+        cap_key = category_cap_key(family_id, record.category_id)
+        approved, _ = counters.try_reserve(cap_key, amount, record.category_cap, timestamp)
+        if not approved:
+            counters.release(merchant_name, amount, timestamp)
+            return f"Purchase would exceed daily {category} cap of {record.category_cap} microAlgos"
+
+    if rolling_limits is not None:
+        reason = rolling_limits.try_reserve(user_address, amount, timestamp)
+        if reason is not None:
+            counters.release(merchant_name, amount, timestamp)
+            if record.category_cap is not None:
+                counters.release(category_cap_key(family_id, record.category_id), amount, timestamp)
+            return reason
+
+    return None
+
+
+def reserve_in_order(
+    counter: Union[ShardedSpendCounter, RedisSpendCounter],
+    reservations: Sequence[Reservation],
+    timestamp: int,
+    rolling_limits: Optional[RollingSpendLimits] = None
+) -> List[Optional[str]]:
+    """
+    Apply reservations in order, atomically with respect to concurrent
+    verifications. Returns a denial reason or None per reservation.
+    """
+    if isinstance(counter, RedisSpendCounter):
+        return counter.reserve_purchases(reservations, timestamp, rolling_limits)
+
+    keys = set()
+    for reservation in reservations:
+        keys.add(reservation.merchant_name)
+        if reservation.cap_key is not None:
+            keys.add(reservation.cap_key)
+    with counter.hold(keys) as held:
+        return [
+            reserve_purchase(
+                held,
+                reservation.record,
+                reservation.merchant_name,
+                reservation.family_id,
+                reservation.category,
+                reservation.amount,
+                timestamp,
+                reservation.user_address,
+                rolling_limits
+            )
+            for reservation in reservations
+        ]
+
+
+def evaluate_batch(
+    compiler: PolicyCompiler,
+    counter: Union[ShardedSpendCounter, RedisSpendCounter],
+    merchant_names: Sequence[str],
+    amounts: Sequence[int],
+    user_addresses: Sequence[str],
+    timestamp: int,
+    rolling_limits: Optional[RollingSpendLimits] = None
+) -> Tuple[List[bool], List[Optional[str]]]:
+    """
+    Verify a batch of purchases with the same outcome as verifying them
+    one by one in order.
+
+    The first pass resolves each purchase to its compiled decision record
+    and rejects on flags. The second pass applies reservations in order,
+    holding every counter shard the batch touches (or in one Redis
+    transaction), so the batch is atomic with respect to concurrent
+    single verifications.
+    """
+    count = len(merchant_names)
+    approved = [False] * count
+    reasons: List[Optional[str]] = [None] * count
+    positions: List[int] = []
+    reservations: List[Reservation] = []
+
+    index = compiler.columns.index
+    category_names = compiler.categories.names
+    family_cache: Dict[str, Tuple[str, list]] = {}
+
+    for pos in range(count):
+        name = merchant_names[pos]
+        idx = index.get(name)
+        if idx is None:
+            reasons[pos] = "Merchant not found in attestation system"
+            continue
+
+        user_address = user_addresses[pos]
+        family = family_cache.get(user_address)
+        if family is None:
+            family_id = compiler.family_of(user_address)
+            family = (family_id, compiler.policy(family_id).records)
+            family_cache[user_address] = family
+        family_id, records = family
+
+        record = records[idx]
+        if record.flags != FLAGS_ELIGIBLE:
+            reasons[pos] = rejection_reason(name, category_names[record.category_id], record.flags)
+            continue
+
+        positions.append(pos)
+        reservations.append(Reservation(
+            record, name, family_id, category_names[record.category_id], amounts[pos], user_address
+        ))
+
+    for pos, reason in zip(positions, reserve_in_order(counter, reservations, timestamp, rolling_limits)):
+        if reason is None:
+            approved[pos] = True
+        else:
+            reasons[pos] = reason
+
+    return approved, reasons
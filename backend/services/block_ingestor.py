@@ -0,0 +1,362 @@
+"""
+ClearSpend Block Ingestor
+Follows the chain block by block and fans matching transactions out to
+per-address subscribers
+"""
+
+import os
+import time
+import base64
+import asyncio
+import inspect
+import itertools
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+import msgpack
+from algosdk import encoding
+
+from .blockchain_service import BlockchainService
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "block_ingestor"
+
+# Transaction fields holding an account that the transaction touches
+ADDRESS_FIELDS = ("snd", "rcv", "close", "arcv", "asnd", "aclose")
+
+# algod holds status/wait-for-block-after open for up to a minute
+WAIT_FOR_BLOCK_TIMEOUT = 70.0
+
+# Deliveries of a round to a failing subscriber before the round is recorded
+# as missed for it and ingestion moves on
+MAX_ROUND_ATTEMPTS = 5
+
+Subscriber = Callable[[int, List[Dict]], Union[None, Awaitable[None]]]
+
+
+class SubscriberError(Exception):
+    """Subscribers failed on a round; it is delivered to them again before the checkpoint moves"""
+
+
+def _txid(txn: Dict) -> str:
+    """Transaction ID: hash of the canonical (sorted-key) msgpack encoding"""
+    packed = msgpack.packb(dict(sorted(txn.items())), use_bin_type=True)
+    return base64.b32encode(encoding.checksum(b"TX" + packed)).decode().strip("=")
+
+
+def indexer_shape(stxn: Dict, block: Dict, intra_round: int) -> Dict:
+    """Render a block transaction like the indexer does, for downstream consumers"""
+    txn = stxn["txn"]
+    # Blocks strip the genesis hash (and the genesis ID when hgi is set),
+    # put them back before hashing
+    full = dict(txn)
+    full["gh"] = block.get("gh")
+    if stxn.get("hgi"):
+        full["gen"] = block.get("gen")
+
+    tx = {
+        "id": _txid(full),
+        "tx-type": txn.get("type"),
+        "confirmed-round": block.get("rnd", 0),
+        "round-time": block.get("ts", 0),
+        "intra-round-offset": intra_round,
+        "sender": encoding.encode_address(txn["snd"])
+    }
+    if txn.get("note"):
+        tx["note"] = base64.b64encode(txn["note"]).decode()
+    if txn.get("grp"):
+        tx["group"] = base64.b64encode(txn["grp"]).decode()
+    if txn.get("type") == "pay":
+        tx["payment-transaction"] = {
+            "amount": txn.get("amt", 0),
+            "receiver": encoding.encode_address(txn["rcv"]) if txn.get("rcv") else None
+        }
+    elif txn.get("type") == "axfer":
+        tx["asset-transfer-transaction"] = {
+            "asset-id": txn.get("xaid", 0),
+            "amount": txn.get("aamt", 0),
+            "receiver": encoding.encode_address(txn["arcv"]) if txn.get("arcv") else None
+        }
+    elif txn.get("type") == "appl":
+        tx["application-transaction"] = application_call(txn)
+    return tx
+
+
+def application_call(txn: Dict) -> Dict:
+    """An app call's application-transaction fields as the indexer renders them"""
+    foreign_apps = txn.get("apfa", [])
+    return {
+        "application-id": txn.get("apid", 0),
+        "application-args": [base64.b64encode(arg).decode() for arg in txn.get("apaa", [])],
+        # Box reference index 0 is the called app, i is foreign app i-1
+        "box-references": [
+            {
+                "app": foreign_apps[ref["i"] - 1] if ref.get("i") else 0,
+                "name": base64.b64encode(ref.get("n", b"")).decode()
+            }
+            for ref in txn.get("apbx", [])
+        ]
+    }
+
+
+def _application_calls(stxn: Dict) -> List[Dict]:
+    """The app calls in a block transaction, inner calls included"""
+    calls = []
+    pending = [stxn]
+    while pending:
+        current = pending.pop()
+        txn = current.get("txn", {})
+        if txn.get("type") == "appl" and txn.get("apid"):
+            calls.append(application_call(txn))
+        pending += current.get("dt", {}).get("itx", [])
+    return calls
+
+
+class BlockIngestor:
+    """
+    One worker for the whole process: waits for each new round with
+    status/wait-for-block-after, fetches and decodes the block once, and
+    hands each subscriber the transactions touching its address. The
+    processed round is checkpointed after every block so a restart resumes
+    where it stopped. Only top-level transactions are matched to
+    addresses; application subscribers also see inner calls.
+
+    A subscriber that raises holds the round back: it is delivered again,
+    to the failed subscribers only, up to max_round_attempts times. After
+    that it is recorded in missed_rounds for those subscribers to backfill,
+    so one broken subscriber cannot stall the rest.
+    """
+
+    def __init__(
+        self,
+        blockchain_service: BlockchainService,
+        checkpoint_store: Optional[Any] = None,
+        retry_delay: float = 2.0,
+        max_round_attempts: int = MAX_ROUND_ATTEMPTS
+    ):
+        self.blockchain_service = blockchain_service
+        # Anything with get_checkpoint(name) / set_checkpoint(name, round), e.g. TransactionStore
+        self.checkpoint_store = checkpoint_store
+        self.retry_delay = retry_delay
+        self.max_round_attempts = max_round_attempts
+
+        self._subscribers: Dict[bytes, Dict[int, Subscriber]] = defaultdict(dict)
+        self._tokens: Dict[int, bytes] = {}
+        self._app_subscribers: Dict[int, Dict[int, Subscriber]] = defaultdict(dict)
+        self._app_tokens: Dict[int, int] = {}
+        self._next_token = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+        # (round, subscriber tokens still owed it, attempts so far)
+        self._retry: Optional[Tuple[int, Set[int], int]] = None
+        # Rounds each subscriber never received, for it to backfill
+        self.missed_rounds: Dict[int, List[int]] = defaultdict(list)
+
+        self.started_round: Optional[int] = None
+        self.processed_round: Optional[int] = None
+        self.network_round = 0
+        self.last_block_time = 0
+        self.blocks_processed = 0
+        self.transactions_matched = 0
+
+    def subscribe(self, address: str, callback: Subscriber) -> int:
+        """
+        Call callback(round, transactions) for every block with
+        transactions touching address. Returns a token for unsubscribe.
+        """
+        token = next(self._next_token)
+        public_key = encoding.decode_address(address)
+        self._subscribers[public_key][token] = callback
+        self._tokens[token] = public_key
+        return token
+
+    def subscribe_application(self, app_id: int, callback: Subscriber) -> int:
+        """
+        Call callback(round, calls) for every block with calls to app_id,
+        each call rendered like the indexer's application-transaction.
+        Box references are shared across an atomic group, so every call
+        carries its whole group's references to the app. Returns a token
+        for unsubscribe.
+        """
+        token = next(self._next_token)
+        self._app_subscribers[app_id][token] = callback
+        self._app_tokens[token] = app_id
+        return token
+
+    def unsubscribe(self, token: int) -> None:
+        self.missed_rounds.pop(token, None)
+        app_id = self._app_tokens.pop(token, None)
+        if app_id is not None:
+            subscribers = self._app_subscribers.get(app_id)
+            if subscribers is not None:
+                subscribers.pop(token, None)
+                if not subscribers:
+                    del self._app_subscribers[app_id]
+            return
+        public_key = self._tokens.pop(token, None)
+        if public_key is None:
+            return
+        subscribers = self._subscribers.get(public_key)
+        if subscribers is not None:
+            subscribers.pop(token, None)
+            if not subscribers:
+                del self._subscribers[public_key]
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Resume from the checkpointed round (or the current round) and follow the chain"""
+        if self.is_running:
+            return
+        if self.processed_round is None:
+            checkpoint = self.checkpoint_store.get_checkpoint(CHECKPOINT_NAME) if self.checkpoint_store else None
+            if checkpoint is None:
+                start_round = os.getenv("INGEST_START_ROUND")
+                if start_round:
+                    checkpoint = int(start_round) - 1
+                else:
+                    status = await self.blockchain_service.async_algod.status()
+                    checkpoint = status.get("last-round", 0)
+            self.processed_round = checkpoint
+            self.started_round = checkpoint + 1
+            logger.info(f"Block ingestor starting at round {self.started_round}")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        algod = self.blockchain_service.async_algod
+        while True:
+            try:
+                status = await algod.status_after_block(self.processed_round, timeout=WAIT_FOR_BLOCK_TIMEOUT)
+                self.network_round = status.get("last-round", self.network_round)
+                while self.processed_round < self.network_round:
+                    await self.process_round(self.processed_round + 1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Block ingestion failed after round {self.processed_round}: {e}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def process_round(self, round_number: int) -> int:
+        """Fetch, decode and fan out one block; returns the number of matched transactions"""
+        raw = await self.blockchain_service.async_algod.block_raw(round_number)
+        block = msgpack.unpackb(raw, raw=False, strict_map_key=False)["block"]
+
+        deliveries: Dict[int, List[Dict]] = defaultdict(list)
+        callbacks: Dict[int, Subscriber] = {}
+        matched = 0
+        if self._subscribers:
+            for intra_round, stxn in enumerate(block.get("txns", [])):
+                txn = stxn.get("txn", {})
+                touched = {txn[field] for field in ADDRESS_FIELDS if field in txn}
+                hits = [self._subscribers[key] for key in touched if key in self._subscribers]
+                if not hits:
+                    continue
+                tx = indexer_shape(stxn, block, intra_round)
+                matched += 1
+                for subscribers in hits:
+                    for token, callback in subscribers.items():
+                        deliveries[token].append(tx)
+                        callbacks[token] = callback
+
+        if self._app_subscribers:
+            self._match_application_calls(block, deliveries, callbacks)
+
+        retry = self._retry if self._retry is not None and self._retry[0] == round_number else None
+        failed = set()
+        for token, txs in deliveries.items():
+            if retry is not None and token not in retry[1]:
+                continue
+            try:
+                result = callbacks[token](round_number, txs)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Block subscriber {token} failed at round {round_number}: {e}")
+                failed.add(token)
+
+        self._retry = None
+        if failed:
+            attempts = retry[2] + 1 if retry is not None else 1
+            if attempts < self.max_round_attempts:
+                self._retry = (round_number, failed, attempts)
+                raise SubscriberError(f"{len(failed)} subscribers failed at round {round_number}")
+            for token in failed:
+                self.missed_rounds[token].append(round_number)
+            logger.error(f"Round {round_number} recorded as missed for subscribers {sorted(failed)}")
+
+        self.processed_round = round_number
+        self.network_round = max(self.network_round, round_number)
+        self.last_block_time = block.get("ts", 0)
+        self.blocks_processed += 1
+        self.transactions_matched += matched
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.set_checkpoint(CHECKPOINT_NAME, round_number)
+        return matched
+
+    def _match_application_calls(
+        self,
+        block: Dict,
+        deliveries: Dict[int, List[Dict]],
+        callbacks: Dict[int, Subscriber]
+    ) -> None:
+        """Queue each call to a subscribed app, carrying its group's box references to that app"""
+        batches: List[List[Dict]] = []
+        groups: Dict[bytes, List[Dict]] = {}
+        for stxn in block.get("txns", []):
+            calls = _application_calls(stxn)
+            if not calls:
+                continue
+            group = stxn.get("txn", {}).get("grp")
+            if group is None:
+                batches.append(calls)
+            elif group in groups:
+                groups[group] += calls
+            else:
+                # The same list is extended in place by later members
+                groups[group] = calls
+                batches.append(calls)
+
+        for batch in batches:
+            for call in batch:
+                app_id = call["application-id"]
+                subscribers = self._app_subscribers.get(app_id)
+                if not subscribers:
+                    continue
+                refs = [
+                    {"app": 0, "name": ref["name"]}
+                    for member in batch
+                    for ref in member["box-references"]
+                    if (ref["app"] or member["application-id"]) == app_id
+                ]
+                call = {**call, "box-references": refs}
+                for token, callback in subscribers.items():
+                    deliveries[token].append(call)
+                    callbacks[token] = callback
+
+    def stats(self) -> Dict:
+        """Ingestion progress and lag for monitoring"""
+        processed_round = self.processed_round or 0
+        return {
+            "running": self.is_running,
+            "processed_round": processed_round,
+            "network_round": self.network_round,
+            "lag_rounds": max(0, self.network_round - processed_round),
+            "lag_seconds": max(0, int(time.time()) - self.last_block_time) if self.last_block_time else None,
+            "blocks_processed": self.blocks_processed,
+            "transactions_matched": self.transactions_matched,
+            "subscribed_addresses": len(self._subscribers),
+            "missed_rounds": sum(len(rounds) for rounds in self.missed_rounds.values()),
+            "subscribed_applications": len(self._app_subscribers)
+        }
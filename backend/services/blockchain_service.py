@@ -5,9 +5,9 @@ Handles all Algorand blockchain interactions using AlgoKit
 
 import os
 import json
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from algosdk import account, mnemonic, transaction
+from algosdk import account, encoding, error, logic, mnemonic, transaction
 from algosdk.v2client import algod, indexer
 from algosdk.transaction import (
     ApplicationCallTxn, 
@@ -25,8 +25,49 @@ from algosdk.abi import Contract
 import base64
 import logging
 
+from .params_cache import SuggestedParamsCache
+from .algorand_clients import PooledAlgodClient, PooledIndexerClient
+from .async_algorand import AsyncAlgodClient, AsyncIndexerClient
+from .attestation_layout import (
+    encode_arc4_string_array,
+    encode_arc4_uint64_array,
+    merchant_box_name,
+    merchant_key_v2
+)
+from .family_registry import FAMILY_BOX_MBR, TEEN_METHODS, FamilyAccount, FamilyRegistry, family_box_name
+from .purchase_templates import PurchaseGroupTemplates
+from .signer import Signer
+
 logger = logging.getLogger(__name__)
 
+# Largest page the public indexers return for search_transactions
+TRANSACTION_PAGE_SIZE = 1000
+
+# An atomic group holds at most 16 transactions; a checkout's two app
+# calls leave room for 14 payments
+MAX_GROUP_SIZE = 16
+CHECKOUT_MAX_ITEMS = MAX_GROUP_SIZE - 2
+
+# Apps, accounts, assets and boxes one app call may reference
+MAX_APP_REFERENCES = 8
+
+
+def encode_history_cursor(round_number: int, intra_round: int) -> str:
+    """Opaque history cursor: the (round, intra-round offset) of the last transaction returned"""
+    return base64.urlsafe_b64encode(json.dumps([round_number, intra_round]).encode()).decode()
+
+
+def decode_history_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        round_number, intra_round = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(round_number), int(intra_round)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _history_position(tx: Dict) -> Tuple[int, int]:
+    return tx.get('confirmed-round') or 0, tx.get('intra-round-offset') or 0
+
 class BlockchainService:
     """Service for handling Algorand blockchain operations"""
     
@@ -35,13 +76,32 @@ class BlockchainService:
         self.algod_address = os.getenv("ALGOD_ADDRESS", "https://testnet-api.algonode.cloud")
         self.indexer_address = os.getenv("INDEXER_ADDRESS", "https://testnet-idx.algonode.cloud")
         
-        # Initialize clients
-        self.algod_client = algod.AlgodClient(self.algod_token, self.algod_address)
-        self.indexer_client = indexer.IndexerClient("", self.indexer_address)
+        # Initialize clients (keep-alive connection pools, see ALGOD_POOL_SIZE / INDEXER_POOL_SIZE)
+        self.algod_client = PooledAlgodClient(self.algod_token, self.algod_address)
+        self.indexer_client = PooledIndexerClient("", self.indexer_address)
+        
+        # Awaitable clients for async route handlers (same pool size / timeout settings)
+        self.async_algod = AsyncAlgodClient(self.algod_token, self.algod_address)
+        self.async_indexer = AsyncIndexerClient("", self.indexer_address)
+        
+        # Suggested params shared across transactions in the same round
+        self.params_cache = SuggestedParamsCache(self.algod_client)
+        
+        # Cached signing keys; SIGNER_PROCESSES > 0 signs async paths in worker processes
+        self.signer = Signer(int(os.getenv("SIGNER_PROCESSES", "0")))
+        
+        # Pre-encoded purchase groups per (teen, merchant); 0 builds every group
+        self.purchase_templates = PurchaseGroupTemplates(
+            self._purchase_group, int(os.getenv("PURCHASE_TEMPLATE_CACHE_SIZE", "10000"))
+        )
         
         # Contract addresses (will be set after deployment)
         self.attestation_oracle_app_id = None
-        self.allowance_manager_app_id = None
+        # One FamilyAllowanceManager app serves every family (set to reuse a deployed one)
+        self.allowance_manager_app_id = int(os.getenv("ALLOWANCE_MANAGER_APP_ID", "0")) or None
+        self.families = FamilyRegistry()
+        # 1: contracts/attestation_oracle.py, 2: the fixed-width layout of attestation_oracle_v2.py
+        self.attestation_oracle_version = int(os.getenv("ATTESTATION_ORACLE_VERSION", "1"))
         
         # Demo accounts for testing
         self.demo_parent_mnemonic = os.getenv("DEMO_PARENT_MNEMONIC", "")
@@ -58,24 +118,45 @@ class BlockchainService:
             logger.error(f"Failed to connect to Algorand: {e}")
             return False
     
+    async def connect_to_algorand_async(self) -> bool:
+        """Test connection to Algorand network without blocking the event loop"""
+        try:
+            status = await self.async_algod.status()
+            logger.info(f"Connected to Algorand. Last round: {status.get('last-round', 0)}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to connect to Algorand: {e}")
+            return False
+    
     def get_account_balance(self, address: str) -> Dict:
         """Get account balance and information"""
         try:
             account_info = self.algod_client.account_info(address)
-            balance = account_info.get('amount', 0)
-            
-            return {
-                "address": address,
-                "balance": balance,
-                "balance_algo": balance / 1_000_000,  # Convert microAlgos to ALGO
-                "assets": account_info.get('assets', []),
-                "created_apps": account_info.get('created-apps', []),
-                "created_assets": account_info.get('created-assets', [])
-            }
+            return self._format_account(address, account_info)
         except Exception as e:
             logger.error(f"Failed to get account balance for {address}: {e}")
             return {"error": str(e)}
     
+    async def get_account_balance_async(self, address: str) -> Dict:
+        """Get account balance and information without blocking the event loop"""
+        try:
+            account_info = await self.async_algod.account_info(address)
+            return self._format_account(address, account_info)
+        except Exception as e:
+            logger.error(f"Failed to get account balance for {address}: {e}")
+            return {"error": str(e)}
+    
+    def _format_account(self, address: str, account_info: Dict) -> Dict:
+        balance = account_info.get('amount', 0)
+        return {
+            "address": address,
+            "balance": balance,
+            "balance_algo": balance / 1_000_000,  # Convert microAlgos to ALGO
+            "assets": account_info.get('assets', []),
+            "created_apps": account_info.get('created-apps', []),
+            "created_assets": account_info.get('created-assets', [])
+        }
+    
     def get_transaction_history(self, address: str, limit: int = 50) -> List[Dict]:
         """Get transaction history for an address"""
         try:
@@ -83,27 +164,90 @@ class BlockchainService:
                 address=address,
                 limit=limit
             )
-            
-            formatted_transactions = []
-            for tx in transactions.get('transactions', []):
-                formatted_tx = {
-                    "id": tx.get('id'),
-                    "type": tx.get('tx-type'),
-                    "round": tx.get('confirmed-round'),
-                    "timestamp": tx.get('round-time'),
-                    "sender": tx.get('sender'),
-                    "amount": tx.get('payment-transaction', {}).get('amount', 0),
-                    "note": tx.get('note'),
-                    "confirmed": tx.get('confirmed-round') is not None
-                }
-                formatted_transactions.append(formatted_tx)
-            
-            return formatted_transactions
+            return self._format_transactions(transactions)
         except Exception as e:
             logger.error(f"Failed to get transaction history for {address}: {e}")
             return []
     
-    def create_atomic_purchase_group(
+    async def get_transaction_page_async(
+        self,
+        address: str,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Get one newest-first page of transaction history, in the same order
+        and with the same cursor format as TransactionStore.history, so a
+        client can keep paging when the local store takes over.
+        Raises ValueError for a cursor this service did not issue.
+        """
+        before = decode_history_cursor(cursor) if cursor else None
+        try:
+            found: List[Dict] = []
+            next_page = None
+            # Keep reading until there is one transaction past the page, proving there is another
+            while len(found) <= limit:
+                transactions = await self.async_indexer.search_transactions(
+                    address=address,
+                    limit=min(limit + 1, TRANSACTION_PAGE_SIZE),
+                    next_page=next_page,
+                    max_round=before[0] if before else None
+                )
+                batch = transactions.get('transactions', [])
+                found += [tx for tx in batch if before is None or _history_position(tx) < before]
+                next_page = transactions.get('next-token')
+                if not batch or not next_page:
+                    break
+            
+            found.sort(key=_history_position, reverse=True)
+            page = found[:limit]
+            next_cursor = None
+            if len(found) > limit:
+                next_cursor = encode_history_cursor(*_history_position(page[-1]))
+            return {"transactions": self._format_transactions({"transactions": page}), "next_cursor": next_cursor}
+        except Exception as e:
+            logger.error(f"Failed to get transaction page for {address}: {e}")
+            return {"error": str(e)}
+    
+    async def iter_transaction_history_async(
+        self,
+        address: str,
+        page_size: int = TRANSACTION_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield an address's full transaction history one indexer page at a
+        time, so only a single page is held in memory. Errors end the
+        iteration by raising.
+        """
+        while True:
+            page = await self.get_transaction_page_async(address, page_size, cursor)
+            if page.get("error"):
+                raise RuntimeError(page["error"])
+            for tx in page["transactions"]:
+                yield tx
+            cursor = page["next_cursor"]
+            if not cursor:
+                return
+    
+    def _format_transactions(self, transactions: Dict) -> List[Dict]:
+        formatted_transactions = []
+        for tx in transactions.get('transactions', []):
+            formatted_tx = {
+                "id": tx.get('id'),
+                "type": tx.get('tx-type'),
+                "round": tx.get('confirmed-round'),
+                "timestamp": tx.get('round-time'),
+                "sender": tx.get('sender'),
+                "receiver": tx.get('payment-transaction', {}).get('receiver'),
+                "amount": tx.get('payment-transaction', {}).get('amount', 0),
+                "note": tx.get('note'),
+                "confirmed": tx.get('confirmed-round') is not None
+            }
+            formatted_transactions.append(formatted_tx)
+        return formatted_transactions
+    
+    def submit_atomic_purchase_group(
         self,
         teen_private_key: str,
         merchant_name: str,
@@ -112,7 +256,8 @@ class BlockchainService:
         merchant_address: str
     ) -> Dict:
         """
-        Create atomic transaction group for purchase verification and execution
+        Build, sign and submit the atomic purchase group without waiting
+        for confirmation.
         Group structure:
         1. App call to attestation oracle (verify purchase)
         2. App call to allowance manager (check limits)
@@ -123,53 +268,278 @@ class BlockchainService:
                 return {"error": "Smart contracts not deployed"}
             
             # Get suggested parameters
-            params = self.algod_client.suggested_params()
+            params = self.params_cache.get()
             
-            # Transaction 1: Verify purchase with attestation oracle
-            attestation_txn = ApplicationCallTxn(
-                sender=teen_address,
-                sp=params,
-                index=self.attestation_oracle_app_id,
-                app_args=[
-                    b"verify_purchase",
-                    merchant_name.encode(),
-                    amount.to_bytes(8, 'big'),
-                    teen_address.encode()
-                ],
-                accounts=[merchant_address]
-            )
+            encoded_group = self._render_purchase_group(params, merchant_name, amount, teen_address, merchant_address)
+            if encoded_group is None:
+                signed_group = self._build_purchase_group(
+                    params, teen_private_key, merchant_name, amount, teen_address, merchant_address
+                )
+                
+                # Submit atomic group
+                txid = self.algod_client.send_transactions(signed_group)
+            else:
+                signed_group = self.signer.sign_encoded_group(encoded_group, teen_private_key, teen_address)
+                txid = self.algod_client.send_raw_transaction(base64.b64encode(b"".join(signed_group)))
             
-            # Transaction 2: Check allowance limits
-            allowance_txn = ApplicationCallTxn(
-                sender=teen_address,
-                sp=params,
-                index=self.allowance_manager_app_id,
-                app_args=[
-                    b"process_purchase_atomic",
-                    merchant_name.encode(),
-                    amount.to_bytes(8, 'big')
-                ]
+            return {
+                "success": True,
+                "transaction_id": txid,
+                "last_valid_round": params.last,
+                "explorer_link": f"https://testnet.algoexplorer.io/tx/{txid}"
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to submit atomic purchase group: {e}")
+            return {"error": str(e)}
+    
+    async def submit_atomic_purchase_group_async(
+        self,
+        teen_private_key: str,
+        merchant_name: str,
+        amount: int,
+        teen_address: str,
+        merchant_address: str
+    ) -> Dict:
+        """Async variant of submit_atomic_purchase_group"""
+        try:
+            if not self.attestation_oracle_app_id or not self.allowance_manager_app_id:
+                return {"error": "Smart contracts not deployed"}
+            
+            params = self.params_cache.peek()
+            if params is None:
+                params = await self.async_algod.suggested_params()
+                self.params_cache.put(params)
+            
+            encoded_group = self._render_purchase_group(params, merchant_name, amount, teen_address, merchant_address)
+            if encoded_group is None:
+                signed_group = await self.signer.sign_group_async(
+                    self._purchase_group(params, merchant_name, amount, teen_address, merchant_address),
+                    teen_private_key
+                )
+                txid = await self.async_algod.send_transactions(signed_group)
+            else:
+                signed_group = await self.signer.sign_encoded_group_async(encoded_group, teen_private_key, teen_address)
+                txid = await self.async_algod.send_raw_transactions(b"".join(signed_group))
+            
+            return {
+                "success": True,
+                "transaction_id": txid,
+                "last_valid_round": params.last,
+                "explorer_link": f"https://testnet.algoexplorer.io/tx/{txid}"
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to submit atomic purchase group: {e}")
+            return {"error": str(e)}
+    
+    def _build_purchase_group(
+        self,
+        params,
+        teen_private_key: str,
+        merchant_name: str,
+        amount: int,
+        teen_address: str,
+        merchant_address: str
+    ) -> List:
+        """Build and sign the three purchase transactions as one atomic group"""
+        return self.signer.sign_group(
+            self._purchase_group(params, merchant_name, amount, teen_address, merchant_address),
+            teen_private_key
+        )
+    
+    def _render_purchase_group(
+        self,
+        params,
+        merchant_name: str,
+        amount: int,
+        teen_address: str,
+        merchant_address: str
+    ) -> Optional[List[bytes]]:
+        """The encoded purchase group from its template, or None if it has to be built"""
+        chain = (self.attestation_oracle_app_id, self.allowance_manager_app_id, self.attestation_oracle_version)
+        return self.purchase_templates.render(params, merchant_name, amount, teen_address, merchant_address, chain)
+    
+    def _purchase_group(
+        self,
+        params,
+        merchant_name: str,
+        amount: int,
+        teen_address: str,
+        merchant_address: str
+    ) -> List:
+        """The three purchase transactions, unsigned, with their group id assigned"""
+        # Transaction 1: Verify purchase with attestation oracle
+        attestation_txn = ApplicationCallTxn(
+            sender=teen_address,
+            sp=params,
+            index=self.attestation_oracle_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[
+                b"verify_purchase",
+                merchant_name.encode(),
+                amount.to_bytes(8, 'big'),
+                teen_address.encode()
+            ],
+            accounts=[merchant_address],
+            boxes=[(0, self.attestation_box_name(merchant_name))]
+        )
+        
+        # Transaction 2: Check allowance limits
+        allowance_txn = ApplicationCallTxn(
+            sender=teen_address,
+            sp=params,
+            index=self.allowance_manager_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[
+                b"process_purchase_atomic",
+                merchant_name.encode(),
+                amount.to_bytes(8, 'big')
+            ],
+            boxes=[(0, family_box_name(teen_address))]
+        )
+        
+        # Transaction 3: Payment to merchant
+        payment_txn = PaymentTxn(
+            sender=teen_address,
+            sp=params,
+            receiver=merchant_address,
+            amt=amount,
+            note=f"ClearSpend purchase at {merchant_name}".encode()
+        )
+        
+        # Assign group ID to make them atomic
+        return assign_group_id([attestation_txn, allowance_txn, payment_txn])
+    
+    async def submit_checkout_group_async(
+        self,
+        teen_private_key: str,
+        teen_address: str,
+        items: List[Tuple[str, str, int]]
+    ) -> Dict:
+        """
+        Build, sign and submit a whole cart as one atomic group without
+        waiting for confirmation. items are (merchant_name,
+        merchant_address, amount) in cart order.
+        Group structure:
+        1. App call to attestation oracle (verify_purchases, every item)
+        2. App call to allowance manager (process_purchases_atomic)
+        3+. One payment per item
+        The transaction id returned is the first transaction's; the group
+        confirms in one round or not at all.
+        """
+        try:
+            if not self.attestation_oracle_app_id or not self.allowance_manager_app_id:
+                return {"error": "Smart contracts not deployed"}
+            if not 1 <= len(items) <= CHECKOUT_MAX_ITEMS:
+                return {"error": f"A checkout holds 1 to {CHECKOUT_MAX_ITEMS} items"}
+            
+            params = self.params_cache.peek()
+            if params is None:
+                params = await self.async_algod.suggested_params()
+                self.params_cache.put(params)
+            
+            signed_group = await self.signer.sign_group_async(
+                self._checkout_group(params, teen_address, items), teen_private_key
             )
             
-            # Transaction 3: Payment to merchant
-            payment_txn = PaymentTxn(
+            txid = await self.async_algod.send_transactions(signed_group)
+            
+            return {
+                "success": True,
+                "transaction_id": txid,
+                "last_valid_round": params.last,
+                "explorer_link": f"https://testnet.algoexplorer.io/tx/{txid}"
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to submit checkout group: {e}")
+            return {"error": str(e)}
+    
+    def _checkout_group(
+        self,
+        params,
+        teen_address: str,
+        items: List[Tuple[str, str, int]]
+    ) -> List:
+        """A cart's verification, allowance check and payments, unsigned, as one atomic group"""
+        merchant_names = [merchant_name for merchant_name, _, _ in items]
+        amounts = [amount for _, _, amount in items]
+        
+        # Box references are shared across the group: the oracle call holds
+        # the first merchants' boxes, the allowance call the rest
+        merchant_boxes = list(dict.fromkeys(self.attestation_box_name(name) for name in merchant_names))
+        oracle_boxes = merchant_boxes[:MAX_APP_REFERENCES]
+        carried_boxes = merchant_boxes[MAX_APP_REFERENCES:]
+        
+        # Transaction 1: Verify every item with attestation oracle
+        attestation_txn = ApplicationCallTxn(
+            sender=teen_address,
+            sp=params,
+            index=self.attestation_oracle_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[
+                b"verify_purchases",
+                encode_arc4_string_array(merchant_names),
+                encode_arc4_uint64_array(amounts),
+                encoding.decode_address(teen_address)
+            ],
+            boxes=[(0, name) for name in oracle_boxes]
+        )
+        
+        # Transaction 2: Check the cart against the allowance
+        allowance_txn = ApplicationCallTxn(
+            sender=teen_address,
+            sp=params,
+            index=self.allowance_manager_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[
+                b"process_purchases_atomic",
+                encode_arc4_uint64_array(amounts)
+            ],
+            foreign_apps=[self.attestation_oracle_app_id] if carried_boxes else None,
+            boxes=[(0, family_box_name(teen_address))]
+                + [(self.attestation_oracle_app_id, name) for name in carried_boxes]
+        )
+        
+        # Transactions 3+: One payment per item
+        payment_txns = [
+            PaymentTxn(
                 sender=teen_address,
                 sp=params,
                 receiver=merchant_address,
                 amt=amount,
                 note=f"ClearSpend purchase at {merchant_name}".encode()
             )
+            for merchant_name, merchant_address, amount in items
+        ]
+        
+        return assign_group_id([attestation_txn, allowance_txn] + payment_txns)
+    
+    def create_atomic_purchase_group(
+        self,
+        teen_private_key: str,
+        merchant_name: str,
+        amount: int,
+        teen_address: str,
+        merchant_address: str
+    ) -> Dict:
+        """
+        Create atomic transaction group for purchase verification and execution
+        and wait for it to confirm (see submit_atomic_purchase_group)
+        """
+        try:
+            result = self.submit_atomic_purchase_group(
+                teen_private_key=teen_private_key,
+                merchant_name=merchant_name,
+                amount=amount,
+                teen_address=teen_address,
+                merchant_address=merchant_address
+            )
+            if not result.get("success"):
+                return result
             
-            # Assign group ID to make them atomic
-            group_id = assign_group_id([attestation_txn, allowance_txn, payment_txn])
-            
-            # Sign transactions
-            signed_attestation = attestation_txn.sign(teen_private_key)
-            signed_allowance = allowance_txn.sign(teen_private_key)
-            signed_payment = payment_txn.sign(teen_private_key)
-            
-            # Submit atomic group
-            txid = self.algod_client.send_transactions([signed_attestation, signed_allowance, signed_payment])
+            txid = result["transaction_id"]
             
             # Wait for confirmation
             confirmed_txn = wait_for_confirmation(self.algod_client, txid, 4)
@@ -178,13 +548,118 @@ class BlockchainService:
                 "success": True,
                 "transaction_id": txid,
                 "confirmed_round": confirmed_txn.get('confirmed-round'),
-                "explorer_link": f"https://testnet.algoexplorer.io/tx/{txid}"
+                "explorer_link": result["explorer_link"]
             }
             
         except Exception as e:
             logger.error(f"Failed to create atomic purchase group: {e}")
             return {"error": str(e)}
     
+    async def get_pending_transaction_info_async(self, txid: str) -> Dict:
+        """Get pool/confirmation info for a submitted transaction without blocking"""
+        try:
+            return await self.async_algod.pending_transaction_info(txid)
+        except Exception as e:
+            logger.debug(f"Failed to get pending transaction info for {txid}: {e}")
+            return {"error": str(e)}
+    
+    async def find_confirmed_transaction_async(self, txid: str) -> Dict:
+        """
+        Look a transaction up in the indexer, for transactions that have left
+        algod's pending pool. Returns its confirmed_round (None if the
+        indexer does not have it) and the indexer's current round.
+        """
+        try:
+            response = await self.async_indexer.search_transactions(txid=txid)
+            transactions = response.get("transactions", [])
+            return {
+                "confirmed_round": transactions[0].get("confirmed-round") if transactions else None,
+                "indexer_round": response.get("current-round")
+            }
+        except Exception as e:
+            logger.debug(f"Failed to look up transaction {txid} in the indexer: {e}")
+            return {"error": str(e)}
+    
+    async def get_application_boxes_async(self, app_id: int) -> List[bytes]:
+        """List the box names of an application"""
+        try:
+            response = await self.async_algod.application_boxes(app_id)
+            return [base64.b64decode(box["name"]) for box in response.get("boxes", [])]
+        except Exception as e:
+            logger.error(f"Failed to list boxes for app {app_id}: {e}")
+            return []
+    
+    async def get_application_global_state_async(self, app_id: int) -> Dict:
+        """An application's global state as {key: int or bytes}, or {"error"}"""
+        try:
+            info = await self.async_algod.application_info(app_id)
+            state = {}
+            for entry in info.get("params", {}).get("global-state", []):
+                key = base64.b64decode(entry["key"]).decode(errors="replace")
+                value = entry["value"]
+                # type 1 is bytes, type 2 is uint
+                state[key] = base64.b64decode(value.get("bytes", "")) if value.get("type") == 1 else value.get("uint", 0)
+            return {"state": state}
+        except Exception as e:
+            logger.error(f"Failed to read global state of app {app_id}: {e}")
+            return {"error": str(e)}
+    
+    async def get_application_call_args_async(self, app_id: int, min_round: int) -> Dict:
+        """
+        App args of every call to an application (inner calls included)
+        confirmed from min_round on: {"args": [[bytes, ...], ...],
+        "current_round": the indexer's round}
+        """
+        try:
+            calls: List[List[bytes]] = []
+            current_round = None
+            next_page = None
+            while True:
+                response = await self.async_indexer.search_transactions(
+                    application_id=app_id,
+                    min_round=min_round,
+                    limit=TRANSACTION_PAGE_SIZE,
+                    next_page=next_page
+                )
+                current_round = current_round or response.get("current-round")
+                pending = list(response.get("transactions", []))
+                while pending:
+                    tx = pending.pop()
+                    pending += tx.get("inner-txns", [])
+                    application = tx.get("application-transaction", {})
+                    if application.get("application-id") == app_id:
+                        calls.append([base64.b64decode(arg) for arg in application.get("application-args", [])])
+                next_page = response.get("next-token")
+                if not response.get("transactions") or not next_page:
+                    break
+            return {"args": calls, "current_round": current_round}
+        except Exception as e:
+            logger.error(f"Failed to search calls to app {app_id}: {e}")
+            return {"error": str(e)}
+    
+    async def get_box_async(self, app_id: int, box_name: bytes) -> Optional[bytes]:
+        """Read one box value, or None if it does not exist"""
+        try:
+            response = await self.async_algod.application_box_by_name(app_id, box_name)
+            return base64.b64decode(response.get("value", ""))
+        except Exception as e:
+            logger.debug(f"Failed to read box {box_name!r} of app {app_id}: {e}")
+            return None
+    
+    async def read_box_async(self, app_id: int, box_name: bytes) -> Dict:
+        """Read one box: {"value": bytes, or None if there is no such box}, or {"error"}"""
+        try:
+            response = await self.async_algod.application_box_by_name(app_id, box_name)
+            return {"value": base64.b64decode(response.get("value", ""))}
+        except error.AlgodHTTPError as e:
+            if e.code == 404:
+                return {"value": None}
+            logger.error(f"Failed to read box {box_name!r} of app {app_id}: {e}")
+            return {"error": str(e)}
+        except Exception as e:
+            logger.error(f"Failed to read box {box_name!r} of app {app_id}: {e}")
+            return {"error": str(e)}
+    
     def deploy_attestation_oracle(self, deployer_private_key: str) -> Optional[int]:
         """Deploy the attestation oracle smart contract"""
         try:
@@ -201,14 +676,8 @@ class BlockchainService:
             logger.error(f"Failed to deploy attestation oracle: {e}")
             return None
     
-    def deploy_allowance_manager(
-        self, 
-        deployer_private_key: str,
-        parent_address: str,
-        teen_address: str,
-        weekly_allowance: int
-    ) -> Optional[int]:
-        """Deploy the allowance manager smart contract"""
+    def deploy_allowance_manager(self, deployer_private_key: str) -> Optional[int]:
+        """Deploy the family allowance manager smart contract, once for every family"""
         try:
             logger.info("Deploying Allowance Manager contract...")
             
@@ -233,17 +702,18 @@ class BlockchainService:
             if not self.attestation_oracle_app_id:
                 return {"error": "Attestation oracle not deployed"}
             
-            params = self.algod_client.suggested_params()
-            caller_address = account.address_from_private_key(caller_private_key)
+            params = self.params_cache.get()
+            caller_address = self.signer.address(caller_private_key)
             
             txn = ApplicationCallTxn(
                 sender=caller_address,
                 sp=params,
                 index=self.attestation_oracle_app_id,
+                on_complete=transaction.OnComplete.NoOpOC,
                 app_args=[method.encode()] + args
             )
             
-            signed_txn = txn.sign(caller_private_key)
+            signed_txn = self.signer.sign(txn, caller_private_key)
             txid = self.algod_client.send_transaction(signed_txn)
             
             confirmed_txn = wait_for_confirmation(self.algod_client, txid, 4)
@@ -258,28 +728,148 @@ class BlockchainService:
             logger.error(f"Failed to call attestation oracle: {e}")
             return {"error": str(e)}
     
+    def attestation_box_name(self, merchant_name: str) -> bytes:
+        """Box key the deployed attestation oracle keeps a merchant under"""
+        if self.attestation_oracle_version == 2:
+            return merchant_key_v2(merchant_name)
+        return merchant_box_name(merchant_name)
+    
+    def call_attestation_oracle_group(
+        self,
+        calls: List[Tuple[str, str, List[bytes]]]
+    ) -> Dict:
+        """
+        Call the attestation oracle with up to 16 (private key, method, args)
+        calls as one atomic group sharing one set of suggested params, and
+        wait for the group to confirm
+        """
+        try:
+            if not self.attestation_oracle_app_id:
+                return {"error": "Attestation oracle not deployed"}
+        
+            params = self.params_cache.get()
+            txns = [
+                ApplicationCallTxn(
+                    sender=self.signer.address(caller_private_key),
+                    sp=params,
+                    index=self.attestation_oracle_app_id,
+                    on_complete=transaction.OnComplete.NoOpOC,
+                    app_args=[method.encode()] + args,
+                    boxes=[(0, self.attestation_box_name(args[0].decode()))]
+                )
+                for caller_private_key, method, args in calls
+            ]
+            if len(txns) > 1:
+                assign_group_id(txns)
+        
+            signed_group = self.signer.sign_group(txns, [caller_private_key for caller_private_key, _, _ in calls])
+            txid = self.algod_client.send_transactions(signed_group)
+        
+            confirmed_txn = wait_for_confirmation(self.algod_client, txid, 4)
+        
+            return {
+                "success": True,
+                "transaction_ids": [txn.get_txid() for txn in txns],
+                "confirmed_round": confirmed_txn.get('confirmed-round')
+            }
+        
+        except Exception as e:
+            logger.error(f"Failed to call attestation oracle group: {e}")
+            return {"error": str(e)}
+    
+    def register_family(
+        self,
+        parent_private_key: str,
+        teen_address: str,
+        weekly_allowance: int,
+        family_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Register a teen with the shared allowance manager, the signer as
+        the parent. The group pays the app the minimum balance of the
+        teen's record box.
+        """
+        try:
+            if not self.allowance_manager_app_id:
+                return {"error": "Allowance manager not deployed"}
+            
+            params = self.params_cache.get()
+            parent_address = self.signer.address(parent_private_key)
+            
+            mbr_payment = PaymentTxn(
+                sender=parent_address,
+                sp=params,
+                receiver=logic.get_application_address(self.allowance_manager_app_id),
+                amt=FAMILY_BOX_MBR
+            )
+            register_txn = ApplicationCallTxn(
+                sender=parent_address,
+                sp=params,
+                index=self.allowance_manager_app_id,
+                on_complete=transaction.OnComplete.NoOpOC,
+                app_args=[
+                    b"register_family",
+                    encoding.decode_address(teen_address),
+                    weekly_allowance.to_bytes(8, 'big')
+                ],
+                boxes=[(0, family_box_name(teen_address))]
+            )
+            assign_group_id([mbr_payment, register_txn])
+            
+            txid = self.algod_client.send_transactions(
+                self.signer.sign_group([mbr_payment, register_txn], parent_private_key)
+            )
+            confirmed_txn = wait_for_confirmation(self.algod_client, txid, 4)
+            
+            self.families.add(FamilyAccount(teen_address, parent_address, family_id))
+            return {
+                "success": True,
+                "transaction_id": register_txn.get_txid(),
+                "parent_address": parent_address,
+                "confirmed_round": confirmed_txn.get('confirmed-round')
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to register family for {teen_address}: {e}")
+            return {"error": str(e)}
+    
     def call_allowance_manager(
         self,
         caller_private_key: str,
+        teen_address: str,
         method: str,
         args: List[bytes]
     ) -> Dict:
-        """Call methods on the allowance manager contract"""
+        """
+        Call a method on the allowance manager for one teen's record.
+        Parent methods get the teen's address as their first argument;
+        teen methods are keyed by the sender.
+        """
         try:
             if not self.allowance_manager_app_id:
                 return {"error": "Allowance manager not deployed"}
             
-            params = self.algod_client.suggested_params()
-            caller_address = account.address_from_private_key(caller_private_key)
-            
+            caller_address = self.signer.address(caller_private_key)
+            family = self.families.get(teen_address)
+            if method in TEEN_METHODS:
+                if caller_address != teen_address:
+                    return {"error": f"Only the teen can call {method}"}
+            else:
+                if family is not None and caller_address != family.parent_address:
+                    return {"error": "Only the teen's parent can manage this allowance"}
+                args = [encoding.decode_address(teen_address)] + args
+            
+            params = self.params_cache.get()
             txn = ApplicationCallTxn(
                 sender=caller_address,
                 sp=params,
                 index=self.allowance_manager_app_id,
-                app_args=[method.encode()] + args
+                on_complete=transaction.OnComplete.NoOpOC,
+                app_args=[method.encode()] + args,
+                boxes=[(0, family_box_name(teen_address))]
             )
             
-            signed_txn = txn.sign(caller_private_key)
+            signed_txn = self.signer.sign(txn, caller_private_key)
             txid = self.algod_client.send_transaction(signed_txn)
             
             confirmed_txn = wait_for_confirmation(self.algod_client, txid, 4)
@@ -294,43 +884,52 @@ class BlockchainService:
             logger.error(f"Failed to call allowance manager: {e}")
             return {"error": str(e)}
     
-    def monitor_transactions(self, address: str, callback) -> None:
-        """Monitor transactions for an address (for real-time updates)"""
-        try:
-            last_round = 0
-            
-            while True:
-                # Get latest round
-                status = self.algod_client.status()
-                current_round = status.get('last-round', 0)
-                
-                if current_round > last_round:
-                    # Check for new transactions
-                    transactions = self.get_transaction_history(address, limit=10)
-                    
-                    for tx in transactions:
-                        if tx.get('round', 0) > last_round:
-                            callback(tx)
-                    
-                    last_round = current_round
-                
-                # Wait before next check
-                import time
-                time.sleep(5)
-                
-        except Exception as e:
-            logger.error(f"Failed to monitor transactions: {e}")
+    def close(self) -> None:
+        """Stop background refresh and close pooled connections"""
+        self.params_cache.stop()
+        self.signer.close()
+        self.algod_client.close()
+        self.indexer_client.close()
+    
+    async def aclose(self) -> None:
+        """Close the async connection pools"""
+        await self.async_algod.aclose()
+        await self.async_indexer.aclose()
+    
+    def get_params_cache_stats(self) -> Dict:
+        """Get suggested params cache hit/miss counters"""
+        return self.params_cache.stats()
+    
+    def get_signer_stats(self) -> Dict:
+        """Get cached signing keys and signed transaction counters"""
+        return self.signer.stats()
+    
+    def get_purchase_template_stats(self) -> Dict:
+        """Get purchase group template hit/miss counters"""
+        return self.purchase_templates.stats()
     
     def get_network_status(self) -> Dict:
         """Get current network status"""
         try:
             status = self.algod_client.status()
-            return {
-                "last_round": status.get('last-round', 0),
-                "time_since_last_round": status.get('time-since-last-round', 0),
-                "catchup_time": status.get('catchup-time', 0),
-                "network": "testnet" if "testnet" in self.algod_address else "mainnet"
-            }
+            return self._format_status(status)
+        except Exception as e:
+            logger.error(f"Failed to get network status: {e}")
+            return {"error": str(e)}
+    
+    async def get_network_status_async(self) -> Dict:
+        """Get current network status without blocking the event loop"""
+        try:
+            status = await self.async_algod.status()
+            return self._format_status(status)
         except Exception as e:
             logger.error(f"Failed to get network status: {e}")
             return {"error": str(e)}
+    
+    def _format_status(self, status: Dict) -> Dict:
+        return {
+            "last_round": status.get('last-round', 0),
+            "time_since_last_round": status.get('time-since-last-round', 0),
+            "catchup_time": status.get('catchup-time', 0),
+            "network": "testnet" if "testnet" in self.algod_address else "mainnet"
+        }
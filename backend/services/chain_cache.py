@@ -0,0 +1,182 @@
+"""
+ClearSpend Chain State Cache
+Round-tagged cache of application box and global state reads, invalidated
+when the block ingestor sees a call to the application
+"""
+
+import os
+import base64
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .blockchain_service import BlockchainService
+from .block_ingestor import BlockIngestor
+
+logger = logging.getLogger(__name__)
+
+# Cache key of an application's global state (box names are never empty)
+GLOBAL_STATE = b""
+
+CacheKey = Tuple[int, bytes]
+
+
+class CachedRead(NamedTuple):
+    """A value and a round the chain had reached before it was read"""
+    value: object
+    round: int
+
+
+class ChainStateCache:
+    """
+    Each entry is tagged with a round the chain had reached before the
+    value was read, so the value is at least that fresh. The block
+    ingestor reports every call to a watched application: a call in round
+    R marks the app's global state, and each box the call's group
+    references, as changed in R, and entries tagged before R are reloaded
+    on their next read. Nothing expires on a timer, so a hot merchant box
+    or family's allowance state is read from algod once per change.
+
+    A caller that just confirmed its own transaction passes that round as
+    min_round; an older entry is reloaded, waiting for algod to reach the
+    round if needed. Without a running ingestor nothing could invalidate
+    entries, so every read goes to algod. Concurrent misses for one key
+    share a single algod read.
+    """
+
+    def __init__(
+        self,
+        blockchain_service: BlockchainService,
+        ingestor: Optional[BlockIngestor] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.blockchain_service = blockchain_service
+        self.ingestor = ingestor
+        self.max_entries = int(os.getenv("CHAIN_CACHE_SIZE", "10000")) if max_entries is None else max_entries
+
+        self._entries: "OrderedDict[CacheKey, CachedRead]" = OrderedDict()
+        # Last round a call may have changed each cached or loading key
+        self._changed: Dict[CacheKey, int] = {}
+        self._loading: Dict[CacheKey, Tuple[int, asyncio.Future]] = {}
+        self._subscriptions: Dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def tracking(self) -> bool:
+        """Whether invalidations are flowing, so cached entries can be served"""
+        return self.ingestor is not None and self.ingestor.is_running
+
+    async def get_box(self, app_id: int, box_name: bytes, min_round: int = 0) -> Dict:
+        """{"value": box bytes or None, "round"}, or {"error"}"""
+        async def load() -> Dict:
+            return await self.blockchain_service.read_box_async(app_id, box_name)
+        return await self._get((app_id, box_name), load, min_round)
+
+    async def get_global_state(self, app_id: int, min_round: int = 0) -> Dict:
+        """{"value": {key: int or bytes}, "round"}, or {"error"}"""
+        async def load() -> Dict:
+            result = await self.blockchain_service.get_application_global_state_async(app_id)
+            return result if result.get("error") else {"value": result["state"]}
+        return await self._get((app_id, GLOBAL_STATE), load, min_round)
+
+    async def _get(self, key: CacheKey, load: Callable[[], Awaitable[Dict]], min_round: int) -> Dict:
+        self._watch(key[0])
+        if self.tracking:
+            entry = self._entries.get(key)
+            if entry is not None and entry.round >= max(min_round, self._changed.get(key, 0)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return {"value": entry.value, "round": entry.round}
+            loading = self._loading.get(key)
+            if loading is not None and loading[0] >= min_round:
+                # Like shield, waiting never cancels the shared read
+                await asyncio.wait([loading[1]])
+                if not loading[1].cancelled():
+                    return loading[1].result()
+                # The caller doing the read was cancelled; read for ourselves
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            read_round = await self._read_round(min_round)
+            self._loading[key] = (read_round, future)
+            result = await load()
+            if not result.get("error"):
+                result = {"value": result["value"], "round": read_round}
+                if self.tracking:
+                    self._store(key, CachedRead(result["value"], read_round))
+        except Exception as e:
+            logger.error(f"Failed to read {key!r}: {e}")
+            result = {"error": str(e)}
+        finally:
+            if self._loading.get(key, (None, None))[1] is future:
+                del self._loading[key]
+                if key not in self._entries:
+                    self._changed.pop(key, None)
+            # No result means this caller was cancelled mid-read; waiters must not hang on it
+            if result is None:
+                future.cancel()
+            else:
+                future.set_result(result)
+        return result
+
+    async def _read_round(self, min_round: int) -> int:
+        """A round algod has reached, at least min_round (waiting for it if needed)"""
+        known = self.ingestor.network_round if self.ingestor is not None else 0
+        if known >= min_round and known:
+            return known
+        algod = self.blockchain_service.async_algod
+        status = await algod.status()
+        last_round = status.get("last-round", 0)
+        if last_round < min_round:
+            status = await algod.status_after_block(min_round - 1)
+            last_round = status.get("last-round", min_round)
+        return last_round
+
+    def _store(self, key: CacheKey, entry: CachedRead) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            if evicted not in self._loading:
+                self._changed.pop(evicted, None)
+
+    def _watch(self, app_id: int) -> None:
+        if self.ingestor is not None and app_id not in self._subscriptions:
+            self._subscriptions[app_id] = self.ingestor.subscribe_application(
+                app_id, lambda round_number, calls: self.on_calls(app_id, round_number, calls)
+            )
+
+    def on_calls(self, app_id: int, round_number: int, calls: List[Dict]) -> None:
+        """Mark what the calls to app_id in round_number may have changed"""
+        changed = {GLOBAL_STATE}
+        for call in calls:
+            for ref in call.get("box-references", []):
+                if not ref.get("app"):
+                    changed.add(base64.b64decode(ref["name"]))
+        for name in changed:
+            key = (app_id, name)
+            if key in self._entries or key in self._loading:
+                self._changed[key] = max(self._changed.get(key, 0), round_number)
+                self.invalidations += 1
+
+    def stats(self) -> Dict:
+        return {
+            "tracking": self.tracking,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "watched_applications": len(self._subscriptions)
+        }
+
+    def close(self) -> None:
+        if self.ingestor is not None:
+            for token in self._subscriptions.values():
+                self.ingestor.unsubscribe(token)
+        self._subscriptions = {}
@@ -0,0 +1,222 @@
+"""
+ClearSpend Confirmation Tracker
+Tracks submitted transactions in the background until they confirm or fail
+"""
+
+import os
+import asyncio
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from pydantic import BaseModel
+
+from .blockchain_service import BlockchainService
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_CONFIRMED = "confirmed"
+STATUS_FAILED = "failed"
+
+
+class TransactionStatus(BaseModel):
+    """Confirmation state of a submitted transaction"""
+    transaction_id: str
+    status: str = STATUS_PENDING
+    submitted_at: int
+    last_valid_round: Optional[int] = None
+    confirmed_round: Optional[int] = None
+    error: Optional[str] = None
+
+
+def status_from_pending_info(txid: str, info: Dict, current_round: Optional[int] = None,
+                             last_valid_round: Optional[int] = None) -> Optional[TransactionStatus]:
+    """
+    Interpret an algod pending_transaction_info response.
+    Returns None while the transaction is still pending.
+    """
+    now = int(datetime.now().timestamp())
+    if info.get("confirmed-round"):
+        return TransactionStatus(
+            transaction_id=txid,
+            status=STATUS_CONFIRMED,
+            submitted_at=now,
+            confirmed_round=info["confirmed-round"]
+        )
+    if info.get("pool-error"):
+        return TransactionStatus(
+            transaction_id=txid,
+            status=STATUS_FAILED,
+            submitted_at=now,
+            error=info["pool-error"]
+        )
+    if last_valid_round is not None and current_round is not None and current_round > last_valid_round:
+        return TransactionStatus(
+            transaction_id=txid,
+            status=STATUS_FAILED,
+            submitted_at=now,
+            error=f"Transaction expired at round {last_valid_round}"
+        )
+    return None
+
+
+class ConfirmationTracker:
+    """
+    Polls algod for every pending transaction once per interval from a
+    single background task, so request handlers never wait on confirmation.
+    At most `concurrency` transactions are looked up at once. Finished
+    entries are kept (up to max_finished) for status lookups.
+    """
+
+    def __init__(
+        self,
+        blockchain_service: BlockchainService,
+        poll_interval: Optional[float] = None,
+        max_finished: int = 10000,
+        concurrency: Optional[int] = None
+    ):
+        self.blockchain_service = blockchain_service
+        self.poll_interval = poll_interval if poll_interval is not None else float(
+            os.getenv("CONFIRMATION_POLL_INTERVAL", "2.0")
+        )
+        self.concurrency = int(os.getenv("CONFIRMATION_POLL_CONCURRENCY", "32")) if concurrency is None else concurrency
+        self.max_finished = max_finished
+        self._pending: Dict[str, TransactionStatus] = {}
+        self._callbacks: Dict[str, Dict[str, Optional[Callable]]] = {}
+        self._finished: "OrderedDict[str, TransactionStatus]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def track(
+        self,
+        txid: str,
+        last_valid_round: Optional[int] = None,
+        on_confirmed: Optional[Callable[[TransactionStatus], None]] = None,
+        on_failed: Optional[Callable[[TransactionStatus], None]] = None
+    ) -> TransactionStatus:
+        """Start tracking a submitted transaction (safe to call from any thread)"""
+        status = TransactionStatus(
+            transaction_id=txid,
+            submitted_at=int(datetime.now().timestamp()),
+            last_valid_round=last_valid_round
+        )
+        with self._lock:
+            self._pending[txid] = status
+            self._callbacks[txid] = {"confirmed": on_confirmed, "failed": on_failed}
+        return status
+
+    def get(self, txid: str) -> Optional[TransactionStatus]:
+        with self._lock:
+            return self._pending.get(txid) or self._finished.get(txid)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def ensure_running(self) -> None:
+        """
+        Start the background poller if needed. Called off the event loop
+        (e.g. from a threadpool request) it starts on the loop it last ran on.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                logger.warning("Confirmation tracker has no event loop to poll on yet")
+            elif self._task is None or self._task.done():
+                loop.call_soon_threadsafe(self.ensure_running)
+            return
+        self._loop = loop
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background poller"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Confirmation poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll_once(self) -> None:
+        """Check every pending transaction once"""
+        with self._lock:
+            pending = list(self._pending.values())
+        if not pending:
+            return
+
+        network = await self.blockchain_service.get_network_status_async()
+        current_round = network.get("last_round")
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def pending_info(txid: str) -> Dict:
+            async with semaphore:
+                return await self.blockchain_service.get_pending_transaction_info_async(txid)
+
+        infos = await asyncio.gather(*(pending_info(status.transaction_id) for status in pending))
+
+        for status, info in zip(pending, infos):
+            result = status_from_pending_info(
+                status.transaction_id, info, current_round, status.last_valid_round
+            )
+            if result is not None and result.status == STATUS_FAILED and info.get("error"):
+                # algod no longer knows the transaction: it may have confirmed
+                # and left the pending cache, so only the indexer can say
+                result = await self._settle_expired(status, result)
+            if result is not None:
+                # Callbacks release spend (Redis round trips, file locks), so keep them off the loop
+                await asyncio.to_thread(self._finish, status, result)
+
+    async def _settle_expired(self, status: TransactionStatus, expired: TransactionStatus) -> Optional[TransactionStatus]:
+        """Confirmed, failed, or None (still unknown) for an expired transaction algod has forgotten"""
+        found = await self.blockchain_service.find_confirmed_transaction_async(status.transaction_id)
+        if found.get("confirmed_round"):
+            return TransactionStatus(
+                transaction_id=status.transaction_id,
+                status=STATUS_CONFIRMED,
+                submitted_at=status.submitted_at,
+                confirmed_round=found["confirmed_round"]
+            )
+        indexer_round = found.get("indexer_round")
+        if indexer_round is not None and indexer_round > status.last_valid_round:
+            # The indexer has seen every round it could have confirmed in
+            return expired
+        return None
+
+    def _finish(self, status: TransactionStatus, result: TransactionStatus) -> None:
+        status.status = result.status
+        status.confirmed_round = result.confirmed_round
+        status.error = result.error
+
+        with self._lock:
+            self._pending.pop(status.transaction_id, None)
+            callbacks = self._callbacks.pop(status.transaction_id, {})
+            self._finished[status.transaction_id] = status
+            while len(self._finished) > self.max_finished:
+                self._finished.popitem(last=False)
+
+        callback = callbacks.get(status.status)
+        if callback is not None:
+            try:
+                callback(status)
+            except Exception as e:
+                logger.error(f"Confirmation callback failed for {status.transaction_id}: {e}")
+
+        if status.status == STATUS_FAILED:
+            logger.warning(f"Transaction {status.transaction_id} failed: {status.error}")
+        else:
+            logger.info(f"Transaction {status.transaction_id} confirmed in round {status.confirmed_round}")
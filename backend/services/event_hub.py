@@ -0,0 +1,237 @@
+"""
+ClearSpend Event Hub
+In-process pub/sub for purchase, allowance, savings and merchant-approval
+events pushed to teen and family streams (SSE / WebSocket)
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PURCHASE_VERIFIED = "purchase.verified"
+PURCHASE_CONFIRMED = "purchase.confirmed"
+PURCHASE_FAILED = "purchase.failed"
+ALLOWANCE_ISSUED = "allowance.issued"
+SAVINGS_LOCKED = "savings.locked"
+SAVINGS_UNLOCKED = "savings.unlocked"
+MERCHANT_APPROVAL_CHANGED = "merchant.approval_changed"
+
+# Sent instead of the missed events when a client cannot be caught up
+STREAM_RESET = "stream.reset"
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+
+class Event:
+    """
+    One published event. Ids are global and increasing within a hub;
+    stream.reset events carry no id so they never move a client's cursor.
+    """
+    __slots__ = ("id", "type", "topic", "data", "timestamp")
+
+    def __init__(self, event_id: Optional[int], event_type: str, topic: str, data: Dict[str, Any], timestamp: int):
+        self.id = event_id
+        self.type = event_type
+        self.topic = topic
+        self.data = data
+        self.timestamp = timestamp
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "topic": self.topic,
+            "timestamp": self.timestamp,
+            "data": self.data
+        }
+
+    def to_sse(self) -> str:
+        event_id = f"id: {self.id}\n" if self.id is not None else ""
+        return f"{event_id}event: {self.type}\ndata: {json.dumps(self.to_dict())}\n\n"
+
+
+class Subscription:
+    """
+    One connection's bounded buffer. It holds no task of its own (just a
+    deque and an asyncio.Event), so idle connections cost a few hundred
+    bytes each.
+    """
+    __slots__ = ("topic", "buffer", "drop_policy", "dropped", "closed", "after", "_ready", "_overflowed")
+
+    def __init__(self, topic: str, buffer_size: int, drop_policy: str, after: int = 0):
+        self.topic = topic
+        self.buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.closed = False
+        # Events up to this id were published before the subscription opened
+        self.after = after
+        self._ready = asyncio.Event()
+        self._overflowed = False
+
+    def replay(self, events: List[Event]) -> None:
+        """Preload missed events on subscribe; not subject to the drop policy"""
+        self.buffer.extend(events)
+        if self.buffer:
+            self._ready.set()
+
+    def push(self, event: Event) -> None:
+        """Buffer an event (on the event loop thread)"""
+        if self.closed or (event.id is not None and event.id <= self.after):
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            if self.drop_policy == DISCONNECT:
+                self.close()
+                return
+            # deque(maxlen) discards the oldest event on append
+            self.dropped += 1
+            self._overflowed = True
+        self.buffer.append(event)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> List[Event]:
+        """
+        Wait for buffered events. Returns [] on timeout (send a heartbeat)
+        and raises ConnectionAbortedError once the subscription is closed.
+        """
+        if not self.buffer and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        if self.closed:
+            raise ConnectionAbortedError("Subscriber too slow, disconnected")
+
+        batch = list(self.buffer)
+        self.buffer.clear()
+        if self._overflowed:
+            # Tell the client it missed events so it can resync over REST
+            batch.insert(0, Event(None, STREAM_RESET, self.topic,
+                                  {"reason": "buffer_overflow", "dropped": self.dropped}, int(time.time())))
+            self._overflowed = False
+        return batch
+
+
+class EventHub:
+    """
+    Topic (teen address or family id) based fan-out. Each topic keeps the
+    last history_size events so a reconnecting client can resume from its
+    Last-Event-ID; gaps that are no longer retained, or that would not fit
+    in a subscription's buffer, get a stream.reset event instead. publish()
+    may be called from any thread.
+    """
+
+    def __init__(
+        self,
+        history_size: Optional[int] = None,
+        buffer_size: Optional[int] = None,
+        drop_policy: Optional[str] = None
+    ):
+        self.history_size = history_size or int(os.getenv("EVENT_HISTORY_SIZE", "256"))
+        self.buffer_size = buffer_size or int(os.getenv("EVENT_BUFFER_SIZE", "64"))
+        self.drop_policy = drop_policy or os.getenv("EVENT_DROP_POLICY", DROP_OLDEST)
+        if self.drop_policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"Unknown event drop policy: {self.drop_policy}")
+
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history: Dict[str, Deque[Event]] = {}
+        # Id of the newest event each topic has evicted from its history
+        self._evicted: Dict[str, int] = {}
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.published = 0
+
+    def publish(self, topics: Iterable[Optional[str]], event_type: str, data: Dict[str, Any]) -> None:
+        """Publish one event to each (non-empty, de-duplicated) topic"""
+        events = []
+        with self._lock:
+            for topic in dict.fromkeys(topic for topic in topics if topic):
+                event = Event(self._next_id, event_type, topic, data, int(time.time()))
+                self._next_id += 1
+                history = self._history.get(topic)
+                if history is None:
+                    history = self._history[topic] = deque(maxlen=self.history_size)
+                if len(history) == self.history_size:
+                    self._evicted[topic] = history[0].id
+                history.append(event)
+                events.append(event)
+            self.published += len(events)
+            loop = self._loop
+            # Checked under the lock subscribe() registers under, so a new
+            # subscriber either sees these events in its history or gets them here
+            subscribed = any(event.topic in self._subscriptions for event in events)
+
+        if loop is None or not subscribed:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(events)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, events)
+
+    def _deliver(self, events: List[Event]) -> None:
+        for event in events:
+            for subscription in list(self._subscriptions.get(event.topic, ())):
+                subscription.push(event)
+
+    def subscribe(self, topic: str, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Open a subscription on the running loop, replaying retained events
+        after last_event_id. A stream.reset comes first if some were not
+        retained, and replaces the replay if it would not fit in the buffer.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._loop = loop
+            subscription = Subscription(topic, self.buffer_size, self.drop_policy, after=self._next_id - 1)
+            missed = [] if last_event_id is None else [
+                event for event in self._history.get(topic, ()) if event.id > last_event_id
+            ]
+            expired = last_event_id is not None and last_event_id < self._evicted.get(topic, 0)
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+
+        # Leave room for live events so the drop policy never fires on a resume
+        too_large = len(missed) + expired >= self.buffer_size
+        replay = [] if too_large else missed
+        if expired or too_large:
+            replay.insert(0, Event(None, STREAM_RESET, topic, {
+                "reason": "history_expired" if expired else "gap_too_large",
+                "missed": len(missed)
+            }, int(time.time())))
+        subscription.replay(replay)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.topic]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "published": self.published,
+                "topics": len(self._history),
+                "connections": sum(len(subscribers) for subscribers in self._subscriptions.values())
+            }
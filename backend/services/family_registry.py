@@ -0,0 +1,102 @@
+"""
+ClearSpend Family Registry
+Teens registered in the multi-family allowance manager, and the box layout of their records
+"""
+
+import struct
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from algosdk import encoding
+
+# Box key: b"t" + the teen's 32-byte public key (contracts/family_allowance_manager.py)
+FAMILY_BOX_PREFIX = b"t"
+
+# ARC-4 FamilyAllowance: parent address, six uint64s, is_paused bool
+_FAMILY_RECORD = struct.Struct(">32sQQQQQQB")
+_ARC4_TRUE = 0x80
+
+# Minimum balance the registration payment covers: 2500 + 400 per key and value byte
+FAMILY_BOX_MBR = 2500 + 400 * (len(FAMILY_BOX_PREFIX) + 32 + _FAMILY_RECORD.size)
+
+# Methods the teen signs; the contract keys them by the sender. Parent
+# methods take the teen's address as their first argument.
+TEEN_METHODS = frozenset({"timelock_savings", "unlock_savings", "process_purchase_atomic", "process_purchases_atomic"})
+
+
+def family_box_name(teen_address: str) -> bytes:
+    """Box key of a teen's allowance record"""
+    return FAMILY_BOX_PREFIX + encoding.decode_address(teen_address)
+
+
+def encode_family_allowance(record: Dict) -> bytes:
+    """ARC-4 encode a FamilyAllowance struct as the contract stores it"""
+    return _FAMILY_RECORD.pack(
+        encoding.decode_address(record["parent_address"]),
+        record["weekly_amount"],
+        record["last_allowance_time"],
+        record["total_issued"],
+        record["savings_locked"],
+        record["savings_unlock_time"],
+        record["created"],
+        _ARC4_TRUE if record["is_paused"] else 0
+    )
+
+
+def decode_family_allowance(value: bytes) -> Dict:
+    """Decode a teen's FamilyAllowance box; raises ValueError if it is malformed"""
+    if len(value) != _FAMILY_RECORD.size:
+        raise ValueError(f"Malformed FamilyAllowance box: {len(value)} bytes")
+    (parent, weekly_amount, last_allowance_time, total_issued,
+     savings_locked, savings_unlock_time, created, is_paused) = _FAMILY_RECORD.unpack(value)
+    return {
+        "parent_address": encoding.encode_address(parent),
+        "weekly_amount": weekly_amount,
+        "last_allowance_time": last_allowance_time,
+        "total_issued": total_issued,
+        "savings_locked": savings_locked,
+        "savings_unlock_time": savings_unlock_time,
+        "created": created,
+        "is_paused": bool(is_paused & _ARC4_TRUE)
+    }
+
+
+class FamilyAccount(NamedTuple):
+    """A registered teen, the parent who controls the allowance and the family's rules id"""
+    teen_address: str
+    parent_address: str
+    family_id: Optional[str] = None
+
+
+class FamilyRegistry:
+    """
+    Every family shares one allowance manager app, so routing a call only
+    needs the teen: this registry remembers which parent controls each
+    teen registered through this process (or seen in a box read), so a
+    call signed by anyone else is refused before it costs a fee. The
+    boxes stay the source of truth; a teen missing here is sent to the
+    app and the contract decides.
+    """
+
+    def __init__(self):
+        self._accounts: Dict[str, FamilyAccount] = {}
+        self._lock = threading.Lock()
+
+    def add(self, account: FamilyAccount) -> None:
+        with self._lock:
+            self._accounts[account.teen_address] = account
+
+    def get(self, teen_address: str) -> Optional[FamilyAccount]:
+        return self._accounts.get(teen_address)
+
+    def remove(self, teen_address: str) -> None:
+        with self._lock:
+            self._accounts.pop(teen_address, None)
+
+    def teens_of(self, parent_address: str) -> List[str]:
+        """Teens whose allowance the parent controls"""
+        with self._lock:
+            return [account.teen_address for account in self._accounts.values() if account.parent_address == parent_address]
+
+    def __len__(self) -> int:
+        return len(self._accounts)
@@ -5,14 +5,59 @@ Manages merchant attestations and purchase verification
 
 import os
 import json
-from typing import Dict, List, Optional
+import asyncio
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import logging
+import msgpack
 from .blockchain_service import BlockchainService
+from .spend_counter import ShardedSpendCounter
+from .redis_spend import RedisRollingLimits, RedisSpendCounter
+from .shared_state import (
+    FAMILY_DOCUMENT,
+    ROW_APPROVED,
+    ROW_PARENT_APPROVED,
+    SharedRollingLimits,
+    SharedSpendCounter,
+    SharedStateTable
+)
+from .policy_compiler import (
+    DEFAULT_RESTRICTED_CATEGORIES,
+    FLAGS_ELIGIBLE,
+    FamilyRules,
+    PolicyCompiler,
+    category_cap_key
+)
+from .attestation_store import (
+    AttestationStore,
+    FAMILY_RECORD,
+    MERCHANT_RECORD,
+    SPEND_RECORD,
+    decode_merchant_columns,
+    encode_merchant_columns,
+    merchant_record
+)
+from .rolling_limits import RollingSpendLimits, SpendWindowConfig
+from .batch_verifier import Reservation, evaluate_batch, rejection_reason, reserve_in_order
+from .write_coalescer import OracleWriteCoalescer
+from .write_queue import OracleWriteQueue
+from .oracle_sync import OracleBoxSync
+from .attestation_layout import decode_merchant_attestation, decode_merchant_record_v2, oracle_category_id
+from .chain_cache import ChainStateCache
+from .confirmation_tracker import ConfirmationTracker, STATUS_PENDING, TransactionStatus
+from .event_hub import (
+    EventHub,
+    MERCHANT_APPROVAL_CHANGED,
+    PURCHASE_CONFIRMED,
+    PURCHASE_FAILED,
+    PURCHASE_VERIFIED
+)
 
 logger = logging.getLogger(__name__)
 
+RESTRICTED_CATEGORIES = DEFAULT_RESTRICTED_CATEGORIES
+
 class MerchantAttestation(BaseModel):
     """Merchant attestation data model"""
     merchant_name: str
@@ -37,15 +82,243 @@ class PurchaseResponse(BaseModel):
     reason: Optional[str] = None
     transaction_id: Optional[str] = None
     explorer_link: Optional[str] = None
+    status: Optional[str] = None
+
+class CheckoutResponse(BaseModel):
+    """Checkout response data model"""
+    approved: bool
+    reason: Optional[str] = None
+    reasons: List[Optional[str]] = []
+    transaction_id: Optional[str] = None
+    explorer_link: Optional[str] = None
+    status: Optional[str] = None
+
+class AttestationTable(Mapping):
+    """
+    Merchant attestations read from the policy compiler's merchant columns,
+    which hold the only copy. Attestations are built on access (with
+    total_spent_today left at 0: live spend is in the spend counter), and
+    assigning one writes it back through the compiler.
+    """
+    
+    def __init__(self, policy_compiler: PolicyCompiler):
+        self.policy_compiler = policy_compiler
+    
+    def __getitem__(self, merchant_name: str) -> MerchantAttestation:
+        return MerchantAttestation(total_spent_today=0, **self.policy_compiler.columns.row(merchant_name)._asdict())
+    
+    def __setitem__(self, merchant_name: str, attestation: MerchantAttestation) -> None:
+        self.policy_compiler.update_merchant(attestation)
+    
+    def __contains__(self, merchant_name: object) -> bool:
+        return merchant_name in self.policy_compiler.columns.index
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.policy_compiler.columns.names))
+    
+    def __len__(self) -> int:
+        return len(self.policy_compiler.columns)
 
 class OracleService:
     """Service for managing merchant attestations and purchase verification"""
     
-    def __init__(self, blockchain_service: BlockchainService):
+    def __init__(
+        self,
+        blockchain_service: BlockchainService,
+        event_hub: Optional[EventHub] = None,
+        attestation_store: Optional[AttestationStore] = None,
+        redis_client=None,
+        shared_state: Optional[SharedStateTable] = None,
+        write_queue_path: str = ":memory:",
+        chain_cache: Optional[ChainStateCache] = None
+    ):
         self.blockchain_service = blockchain_service
-        self.merchant_attestations: Dict[str, MerchantAttestation] = {}
+        self.event_hub = event_hub or EventHub()
+        if redis_client is not None:
+            # Spend state shared by every worker process
+            self.spend_counter = RedisSpendCounter(redis_client)
+            self.rolling_limits = RedisRollingLimits(redis_client)
+        elif shared_state is not None:
+            # Spend state shared by the worker processes on this host
+            self.spend_counter = SharedSpendCounter(shared_state)
+            self.rolling_limits = SharedRollingLimits(shared_state.documents)
+        else:
+            self.spend_counter = ShardedSpendCounter(int(os.getenv("SPEND_COUNTER_SHARDS", "64")))
+            self.rolling_limits = RollingSpendLimits()
+        self.policy_compiler = PolicyCompiler(RESTRICTED_CATEGORIES)
+        self.merchant_attestations = AttestationTable(self.policy_compiler)
+        self.confirmation_tracker = ConfirmationTracker(blockchain_service)
+        # Attestation oracle app calls, batched into atomic groups
+        self.oracle_writes = OracleWriteCoalescer(blockchain_service)
         self.oracle_private_key = os.getenv("ORACLE_PRIVATE_KEY", "")
-        self._initialize_demo_merchants()
+        # Chain writes happen behind the local change, retried until they confirm
+        self.write_queue = OracleWriteQueue(
+            self.oracle_writes, lambda: self.oracle_private_key, write_queue_path
+        )
+        self.box_sync = OracleBoxSync(blockchain_service)
+        # Without an ingestor to invalidate it, this cache reads through to algod
+        self.chain_cache = chain_cache or ChainStateCache(blockchain_service)
+        self.attestation_store = attestation_store
+        self.shared_state = shared_state
+        
+        if shared_state is not None:
+            # The table file holds the attestations; the first worker seeds it
+            self._shared_seq = shared_state.change_seq
+            if not self._load_shared_merchants(range(shared_state.row_count)):
+                self._initialize_demo_merchants()
+                for name in self.merchant_attestations:
+                    self._persist_merchant(name)
+            # Family rules live in the table's documents, shared the same way
+            self._family_documents: Dict[str, bytes] = {}
+            self._document_seq = shared_state.document_seq
+            self._load_shared_families()
+            return
+        
+        if attestation_store is None:
+            self._initialize_demo_merchants()
+            return
+        
+        if not self._recover():
+            # First start: seed the demo merchants and persist them
+            self._initialize_demo_merchants()
+            attestation_store.snapshot(self._persisted_state())
+        if not self.spend_counter.persistent:
+            self.spend_counter.journal = self._journal_spend
+        attestation_store.attach(self._persisted_state)
+    
+    def _recover(self) -> bool:
+        """Load the latest snapshot and replay the log after it; False if nothing was persisted"""
+        snapshot, records = self.attestation_store.recover()
+        if snapshot is None and not records:
+            return False
+        
+        if snapshot is not None:
+            self.policy_compiler.load_merchants(*decode_merchant_columns(snapshot))
+            for rules in snapshot["families"]:
+                self.policy_compiler.set_family_rules(FamilyRules(**rules))
+            if not self.spend_counter.persistent:
+                self.spend_counter.restore_many(snapshot["counters"])
+        
+        for record in records:
+            if record[0] == MERCHANT_RECORD:
+                _, name, category, is_approved, daily_limit, last_update, parent_approved, address = record
+                self.policy_compiler.update_merchant(MerchantAttestation(
+                    merchant_name=name,
+                    category=category,
+                    is_approved=is_approved,
+                    daily_limit=daily_limit,
+                    total_spent_today=0,
+                    last_update=last_update,
+                    parent_approved=parent_approved,
+                    merchant_address=address
+                ))
+            elif record[0] == FAMILY_RECORD:
+                self.policy_compiler.set_family_rules(FamilyRules(**record[1]))
+            elif record[0] == SPEND_RECORD and not self.spend_counter.persistent:
+                if len(record) == 2:
+                    self.spend_counter.remove(record[1])
+                else:
+                    self.spend_counter.restore(*record[1:])
+        
+        logger.info(f"Recovered {len(self.merchant_attestations)} merchant attestations")
+        return True
+    
+    def _persisted_state(self) -> Dict:
+        """Full state for an attestation snapshot"""
+        state = encode_merchant_columns(self.policy_compiler.columns)
+        state["families"] = [rules.model_dump() for rules in list(self.policy_compiler.family_rules.values())]
+        # Only counters with spend today; the rest read as zero after a restart anyway
+        state["counters"] = (
+            [] if self.spend_counter.persistent
+            else [list(entry) for entry in self.spend_counter.live_entries(int(datetime.now().timestamp()))]
+        )
+        return state
+    
+    def _persist_merchant(self, merchant_name: str) -> None:
+        if self.attestation_store is not None:
+            self.attestation_store.append(merchant_record(self.merchant_attestations[merchant_name]))
+        if self.shared_state is not None:
+            attestation = self.merchant_attestations[merchant_name]
+            self.shared_state.write_attestation(
+                merchant_name,
+                attestation.category,
+                attestation.merchant_address,
+                attestation.is_approved,
+                attestation.parent_approved,
+                attestation.daily_limit,
+                attestation.last_update
+            )
+    
+    def _load_shared_merchants(self, rows) -> int:
+        """Compile the attestations in the given shared table rows; returns how many rows had one"""
+        loaded = 0
+        for row in rows:
+            attestation = self.shared_state.read_attestation(row)
+            if attestation is None:
+                continue
+            category, address, flags, daily_limit, last_update = attestation
+            self.policy_compiler.update_merchant(MerchantAttestation(
+                merchant_name=self.shared_state.key(row),
+                category=category,
+                is_approved=bool(flags & ROW_APPROVED),
+                daily_limit=daily_limit,
+                total_spent_today=0,
+                last_update=last_update,
+                parent_approved=bool(flags & ROW_PARENT_APPROVED),
+                merchant_address=address
+            ))
+            loaded += 1
+        return loaded
+    
+    def _load_shared_families(self) -> None:
+        """Compile the shared family rules that changed since they were last loaded"""
+        for key, value in self.shared_state.documents.items(FAMILY_DOCUMENT).items():
+            if self._family_documents.get(key) != value:
+                self.policy_compiler.set_family_rules(FamilyRules(**msgpack.unpackb(value, raw=False)))
+                self._family_documents[key] = value
+    
+    def _refresh_shared_state(self) -> None:
+        """Pick up attestations and family rules other worker processes changed since the last refresh"""
+        if self.shared_state is None:
+            return
+        seq, rows = self.shared_state.changes_since(self._shared_seq)
+        if seq != self._shared_seq:
+            self._shared_seq = seq
+            self._load_shared_merchants(range(self.shared_state.row_count) if rows is None else rows)
+        document_seq = self.shared_state.document_seq
+        if document_seq != self._document_seq:
+            # Read the sequence first: a write after it triggers another reload
+            self._document_seq = document_seq
+            self._load_shared_families()
+    
+    def _persist_family(self, family_id: str) -> None:
+        rules = self.policy_compiler.family_rules[family_id]
+        if self.attestation_store is not None:
+            self.attestation_store.append([FAMILY_RECORD, rules.model_dump()])
+        if self.shared_state is not None:
+            value = msgpack.packb(rules.model_dump(), use_bin_type=True)
+            self.shared_state.documents.put(FAMILY_DOCUMENT + family_id, value)
+            self._family_documents[FAMILY_DOCUMENT + family_id] = value
+    
+    def _set_family_approval(self, family_id: str, merchant_name: str, approved: bool) -> None:
+        """Change one family-level approval; in shared mode, against the latest rules of every worker"""
+        if self.shared_state is None:
+            self.policy_compiler.set_merchant_approval(family_id, merchant_name, approved)
+            self._persist_family(family_id)
+            return
+        key = FAMILY_DOCUMENT + family_id
+        with self.shared_state.documents.update(key, notify=True) as document:
+            if document["value"] is not None and document["value"] != self._family_documents.get(key):
+                self.policy_compiler.set_family_rules(FamilyRules(**msgpack.unpackb(document["value"], raw=False)))
+            self.policy_compiler.set_merchant_approval(family_id, merchant_name, approved)
+            document["value"] = msgpack.packb(
+                self.policy_compiler.family_rules[family_id].model_dump(), use_bin_type=True
+            )
+            self._family_documents[key] = document["value"]
+    
+    def _journal_spend(self, key: str, entry: Optional[List[int]]) -> None:
+        """Spend counter journal hook; runs under the counter's shard lock, so it only queues the record"""
+        self.attestation_store.append([SPEND_RECORD, key] + (list(entry) if entry is not None else []), wait=False)
     
     def _initialize_demo_merchants(self):
         """Initialize demo merchants for testing"""
@@ -123,34 +396,48 @@ class OracleService:
         }
         
         for name, data in demo_merchants.items():
-            self.merchant_attestations[name] = MerchantAttestation(**data)
+            attestation = MerchantAttestation(**data)
+            self.merchant_attestations[name] = attestation
+            if not self.spend_counter.persistent:
+                # Shared counters must not be reset by every worker that starts
+                self.spend_counter.set_spent(name, attestation.total_spent_today, attestation.last_update)
     
     def add_merchant_attestation(self, attestation: MerchantAttestation) -> Dict:
         """Add or update merchant attestation"""
         try:
+            if self.shared_state is not None:
+                # Reject names and fields that do not fit a table row before changing anything
+                self.shared_state.check_attestation(
+                    attestation.merchant_name, attestation.category, attestation.merchant_address
+                )
+            category_arg = attestation.category.encode()
+            if self.blockchain_service.attestation_oracle_app_id and self.blockchain_service.attestation_oracle_version == 2:
+                # The v2 oracle stores a category id, and only knows a fixed set of categories
+                category_arg = oracle_category_id(attestation.category).to_bytes(1, 'big')
+            
             # Store locally
             self.merchant_attestations[attestation.merchant_name] = attestation
+            self.spend_counter.set_spent(
+                attestation.merchant_name,
+                attestation.total_spent_today,
+                attestation.last_update
+            )
+            self._persist_merchant(attestation.merchant_name)
             
-            # In production, this would also update the blockchain
-            if self.blockchain_service.attestation_oracle_app_id and self.oracle_private_key:
-                result = self.blockchain_service.call_attestation_oracle(
-                    self.oracle_private_key,
-                    "add_merchant_attestation",
-                    [
-                        attestation.merchant_name.encode(),
-                        attestation.category.encode(),
-                        str(attestation.is_approved).encode(),
-                        attestation.daily_limit.to_bytes(8, 'big'),
-                        str(attestation.parent_approved).encode()
-                    ]
-                )
-                
-                if not result.get("success"):
-                    logger.error(f"Failed to update blockchain: {result.get('error')}")
-                    return {"error": "Failed to update blockchain"}
+            write_id = self._queue_oracle_write(
+                attestation.merchant_name,
+                "add_merchant_attestation",
+                [
+                    attestation.merchant_name.encode(),
+                    category_arg,
+                    str(attestation.is_approved).encode(),
+                    attestation.daily_limit.to_bytes(8, 'big'),
+                    str(attestation.parent_approved).encode()
+                ]
+            )
             
             logger.info(f"Added merchant attestation for {attestation.merchant_name}")
-            return {"success": True, "merchant": attestation.merchant_name}
+            return {"success": True, "merchant": attestation.merchant_name, "write_id": write_id}
             
         except Exception as e:
             logger.error(f"Failed to add merchant attestation: {e}")
@@ -164,123 +451,161 @@ class OracleService:
     ) -> Dict:
         """Update merchant daily limits and approval status"""
         try:
+            self._refresh_shared_state()
             if merchant_name not in self.merchant_attestations:
                 return {"error": "Merchant not found"}
             
-            merchant = self.merchant_attestations[merchant_name]
-            merchant.daily_limit = new_daily_limit
-            merchant.is_approved = is_approved
-            merchant.last_update = int(datetime.now().timestamp())
+            # Read-modify-write under the compiler's lock, so a concurrent parent approval is kept
+            previous = self.policy_compiler.update_merchant_fields(
+                merchant_name,
+                daily_limit=new_daily_limit,
+                is_approved=is_approved,
+                last_update=int(datetime.now().timestamp())
+            )
+            approval_changed = previous.is_approved != is_approved
+            self._persist_merchant(merchant_name)
             
             # Update blockchain
-            if self.blockchain_service.attestation_oracle_app_id and self.oracle_private_key:
-                result = self.blockchain_service.call_attestation_oracle(
-                    self.oracle_private_key,
-                    "update_merchant_limits",
-                    [
-                        merchant_name.encode(),
-                        new_daily_limit.to_bytes(8, 'big'),
-                        str(is_approved).encode()
-                    ]
-                )
-                
-                if not result.get("success"):
-                    logger.error(f"Failed to update blockchain: {result.get('error')}")
-                    return {"error": "Failed to update blockchain"}
+            write_id = self._queue_oracle_write(
+                merchant_name,
+                "update_merchant_limits",
+                [
+                    merchant_name.encode(),
+                    new_daily_limit.to_bytes(8, 'big'),
+                    str(is_approved).encode()
+                ]
+            )
+            
+            if approval_changed:
+                self._publish_approval(merchant_name, is_approved, None)
             
             logger.info(f"Updated limits for {merchant_name}: {new_daily_limit} microAlgos, approved: {is_approved}")
-            return {"success": True, "merchant": merchant_name}
+            return {"success": True, "merchant": merchant_name, "write_id": write_id}
             
         except Exception as e:
             logger.error(f"Failed to update merchant limits: {e}")
             return {"error": str(e)}
     
-    def parent_approve_merchant(self, merchant_name: str, approved: bool) -> Dict:
-        """Allow parents to approve/disapprove specific merchants"""
+    def parent_approve_merchant(
+        self,
+        merchant_name: str,
+        approved: bool,
+        family_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Allow parents to approve/disapprove specific merchants.
+        With a family_id the approval only applies to that family's policy.
+        """
         try:
+            self._refresh_shared_state()
             if merchant_name not in self.merchant_attestations:
                 return {"error": "Merchant not found"}
             
-            merchant = self.merchant_attestations[merchant_name]
-            merchant.parent_approved = approved
-            merchant.last_update = int(datetime.now().timestamp())
+            if family_id is not None:
+                if family_id not in self.policy_compiler.family_rules:
+                    return {"error": "Family not found"}
+                self._set_family_approval(family_id, merchant_name, approved)
+                self._publish_approval(merchant_name, approved, family_id)
+                logger.info(f"Parent approval for family {family_id} updated for {merchant_name}: {approved}")
+                return {"success": True, "merchant": merchant_name, "approved": approved}
             
-            # Update blockchain
-            if self.blockchain_service.attestation_oracle_app_id:
-                # In production, this would use parent's private key
-                result = self.blockchain_service.call_attestation_oracle(
-                    self.oracle_private_key,  # Using oracle key for demo
-                    "parent_approve_merchant",
-                    [
-                        merchant_name.encode(),
-                        str(approved).encode()
-                    ]
-                )
-                
-                if not result.get("success"):
-                    logger.error(f"Failed to update blockchain: {result.get('error')}")
-                    return {"error": "Failed to update blockchain"}
+            self.policy_compiler.update_merchant_fields(
+                merchant_name, parent_approved=approved, last_update=int(datetime.now().timestamp())
+            )
+            self._persist_merchant(merchant_name)
             
+            # Update blockchain (in production this would be signed with the parent's key)
+            write_id = self._queue_oracle_write(
+                merchant_name,
+                "parent_approve_merchant",
+                [
+                    merchant_name.encode(),
+                    str(approved).encode()
+                ]
+            )
+            
+            self._publish_approval(merchant_name, approved, None)
             logger.info(f"Parent approval updated for {merchant_name}: {approved}")
-            return {"success": True, "merchant": merchant_name, "approved": approved}
+            return {"success": True, "merchant": merchant_name, "approved": approved, "write_id": write_id}
             
         except Exception as e:
             logger.error(f"Failed to update parent approval: {e}")
             return {"error": str(e)}
     
-    def verify_purchase(self, request: PurchaseRequest) -> PurchaseResponse:
-        """Verify if a purchase is allowed"""
+    def _queue_oracle_write(self, merchant_name: str, method: str, args: List[bytes]) -> Optional[int]:
+        """Queue an attestation oracle app call when the oracle is deployed; returns its write id"""
+        if not (self.blockchain_service.attestation_oracle_app_id and self.oracle_private_key):
+            return None
+        return self.write_queue.enqueue(merchant_name, method, args)
+    
+    def get_oracle_write(self, write_id: int) -> Optional[Dict]:
+        """Status of a queued attestation oracle write"""
+        return self.write_queue.status(write_id)
+    
+    def set_family_rules(self, rules: FamilyRules) -> Dict:
+        """Set a family's purchase rules (restricted categories, approvals, caps)"""
         try:
-            # Check if merchant exists
-            if request.merchant_name not in self.merchant_attestations:
-                return PurchaseResponse(
-                    approved=False,
-                    reason="Merchant not found in attestation system"
-                )
+            if self.shared_state is not None:
+                # The family's category cap counters must fit a table row
+                self.shared_state.check_key(category_cap_key(rules.family_id, 65535))
+            self.policy_compiler.set_family_rules(rules)
+            self._persist_family(rules.family_id)
+            logger.info(f"Updated purchase rules for family {rules.family_id}")
+            return {"success": True, "family_id": rules.family_id}
             
-            merchant = self.merchant_attestations[request.merchant_name]
-            
-            # Check if merchant is approved
-            if not merchant.is_approved:
-                return PurchaseResponse(
-                    approved=False,
-                    reason=f"Merchant '{request.merchant_name}' is not approved for purchases"
-                )
-            
-            # Check parent approval
-            if not merchant.parent_approved:
-                return PurchaseResponse(
-                    approved=False,
-                    reason=f"Merchant '{request.merchant_name}' is not approved by parent"
-                )
+        except Exception as e:
+            logger.error(f"Failed to set family rules: {e}")
+            return {"error": str(e)}
+    
+    def get_family_rules(self, family_id: str) -> Optional[FamilyRules]:
+        """Get a family's purchase rules, if the family exists"""
+        self._refresh_shared_state()
+        return self.policy_compiler.family_rules.get(family_id)
+    
+    def configure_spend_windows(self, teen_address: str, windows: List[SpendWindowConfig]) -> Dict:
+        """Set a teen's rolling spend windows (e.g. 24h, 7d, 30d limits)"""
+        try:
+            self.rolling_limits.configure(teen_address, windows)
+            logger.info(f"Updated spend windows for {teen_address}: {[w.name for w in windows]}")
+            return {"success": True, "teen_address": teen_address}
             
-            # Check category restrictions
-            restricted_categories = ["Gaming", "Gambling", "Adult Content", "Tobacco", "Alcohol"]
-            if merchant.category in restricted_categories:
+        except Exception as e:
+            logger.error(f"Failed to configure spend windows: {e}")
+            return {"error": str(e)}
+    
+    def get_spend_windows(self, teen_address: str) -> List[Dict]:
+        """Get a teen's rolling spend windows with current spend"""
+        return self.rolling_limits.status(teen_address, int(datetime.now().timestamp()))
+    
+    def verify_purchase(self, request: PurchaseRequest, timestamp: Optional[int] = None) -> PurchaseResponse:
+        """Verify if a purchase is allowed, reserving it at timestamp (default now)"""
+        try:
+            self._refresh_shared_state()
+            # Look up the compiled decision record for this family and merchant
+            family_id = self.policy_compiler.family_of(request.user_address)
+            record = self.policy_compiler.decide(request.user_address, request.merchant_name)
+            if record is None:
                 return PurchaseResponse(
                     approved=False,
-                    reason=f"Category '{merchant.category}' is restricted"
+                    reason="Merchant not found in attestation system"
                 )
             
-            # Check daily limit
-            current_time = int(datetime.now().timestamp())
-            
-            # Reset daily spending if it's a new day
-            if self._is_new_day(merchant.last_update, current_time):
-                merchant.total_spent_today = 0
-                merchant.last_update = current_time
-            
-            # Check if purchase would exceed daily limit
-            new_total = merchant.total_spent_today + request.amount
-            if new_total > merchant.daily_limit:
+            # Check approval, parent approval and category restrictions
+            category = self.policy_compiler.categories.names[record.category_id]
+            if record.flags != FLAGS_ELIGIBLE:
                 return PurchaseResponse(
                     approved=False,
-                    reason=f"Purchase would exceed daily limit of {merchant.daily_limit} microAlgos"
+                    reason=rejection_reason(request.merchant_name, category, record.flags)
                 )
             
-            # Update spending
-            merchant.total_spent_today = new_total
-            merchant.last_update = current_time
+            # Atomically check and reserve against the daily limit, category cap and spend windows
+            current_time = timestamp or int(datetime.now().timestamp())
+            reservation = Reservation(
+                record, request.merchant_name, family_id, category, request.amount, request.user_address
+            )
+            reason = reserve_in_order(self.spend_counter, [reservation], current_time, self.rolling_limits)[0]
+            if reason is not None:
+                return PurchaseResponse(approved=False, reason=reason)
             
             # In production, this would create an actual atomic transaction
             mock_transaction_id = f"mock_tx_{int(datetime.now().timestamp())}"
@@ -298,25 +623,53 @@ class OracleService:
                 reason=f"Verification error: {str(e)}"
             )
     
-    def execute_purchase_atomic(
+    def verify_purchase_batch(
+        self,
+        merchant_names: List[str],
+        amounts: List[int],
+        user_addresses: List[str],
+        timestamp: Optional[int] = None
+    ) -> Tuple[List[bool], List[Optional[str]]]:
+        """
+        Verify many purchases in one pass, reserving them at timestamp
+        (default now). Outcomes match calling verify_purchase for each
+        purchase in order.
+        """
+        if not len(merchant_names) == len(amounts) == len(user_addresses):
+            raise ValueError("merchant_names, amounts and user_addresses must have the same length")
+        
+        self._refresh_shared_state()
+        return evaluate_batch(
+            self.policy_compiler,
+            self.spend_counter,
+            merchant_names,
+            amounts,
+            user_addresses,
+            timestamp or int(datetime.now().timestamp()),
+            self.rolling_limits
+        )
+    
+    def submit_purchase_atomic(
         self,
         teen_private_key: str,
         teen_address: str,
         request: PurchaseRequest
     ) -> PurchaseResponse:
-        """Execute purchase using atomic transactions"""
+        """
+        Verify and submit a purchase without waiting for confirmation.
+        The confirmation tracker follows the transaction and releases the
+        reserved spend if it fails on chain.
+        """
         try:
-            # First verify the purchase
-            verification = self.verify_purchase(request)
+            reserved_at = int(datetime.now().timestamp())
+            verification = self.verify_purchase(request, reserved_at)
             if not verification.approved:
                 return verification
             
-            # Get merchant address
             merchant = self.merchant_attestations[request.merchant_name]
             merchant_address = merchant.merchant_address or "DEMO_MERCHANT_ADDRESS"
             
-            # Execute atomic transaction group
-            result = self.blockchain_service.create_atomic_purchase_group(
+            result = self.blockchain_service.submit_atomic_purchase_group(
                 teen_private_key=teen_private_key,
                 merchant_name=request.merchant_name,
                 amount=request.amount,
@@ -324,40 +677,267 @@ class OracleService:
                 merchant_address=merchant_address
             )
             
-            if result.get("success"):
+            if not result.get("success"):
+                self._release_purchase(request, reserved_at)
                 return PurchaseResponse(
-                    approved=True,
-                    transaction_id=result.get("transaction_id"),
-                    explorer_link=result.get("explorer_link")
+                    approved=False,
+                    reason=f"Transaction failed: {result.get('error')}"
                 )
-            else:
+            
+            self._track_purchases([request], result, reserved_at)
+            self.confirmation_tracker.ensure_running()
+            
+            return PurchaseResponse(
+                approved=True,
+                transaction_id=result["transaction_id"],
+                explorer_link=result.get("explorer_link"),
+                status=STATUS_PENDING
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to submit atomic purchase: {e}")
+            return PurchaseResponse(
+                approved=False,
+                reason=f"Execution error: {str(e)}"
+            )
+    
+    async def submit_purchase_atomic_async(
+        self,
+        teen_private_key: str,
+        teen_address: str,
+        request: PurchaseRequest
+    ) -> PurchaseResponse:
+        """
+        Async variant of submit_purchase_atomic for event-loop callers.
+        Verification and releases touch the spend counters (Redis or file
+        locks), so they run in a worker thread.
+        """
+        try:
+            reserved_at = int(datetime.now().timestamp())
+            verification = await asyncio.to_thread(self.verify_purchase, request, reserved_at)
+            if not verification.approved:
+                return verification
+            
+            merchant = self.merchant_attestations[request.merchant_name]
+            merchant_address = merchant.merchant_address or "DEMO_MERCHANT_ADDRESS"
+            
+            result = await self.blockchain_service.submit_atomic_purchase_group_async(
+                teen_private_key=teen_private_key,
+                merchant_name=request.merchant_name,
+                amount=request.amount,
+                teen_address=teen_address,
+                merchant_address=merchant_address
+            )
+            
+            if not result.get("success"):
+                await asyncio.to_thread(self._release_purchase, request, reserved_at)
                 return PurchaseResponse(
                     approved=False,
                     reason=f"Transaction failed: {result.get('error')}"
                 )
-                
+            
+            self._track_purchases([request], result, reserved_at)
+            self.confirmation_tracker.ensure_running()
+            
+            return PurchaseResponse(
+                approved=True,
+                transaction_id=result["transaction_id"],
+                explorer_link=result.get("explorer_link"),
+                status=STATUS_PENDING
+            )
+            
         except Exception as e:
-            logger.error(f"Failed to execute atomic purchase: {e}")
+            logger.error(f"Failed to submit atomic purchase: {e}")
             return PurchaseResponse(
                 approved=False,
                 reason=f"Execution error: {str(e)}"
             )
     
+    async def submit_checkout_async(
+        self,
+        teen_private_key: str,
+        teen_address: str,
+        requests: List[PurchaseRequest]
+    ) -> CheckoutResponse:
+        """
+        Verify a cart and submit it as one atomic group without waiting for
+        confirmation. Items are reserved together; if any is denied, or the
+        group cannot be sent, every item's reservation is given back.
+        """
+        try:
+            reserved_at = int(datetime.now().timestamp())
+            approved, reasons = await asyncio.to_thread(
+                self.verify_purchase_batch,
+                [request.merchant_name for request in requests],
+                [request.amount for request in requests],
+                [request.user_address for request in requests],
+                reserved_at
+            )
+            if not all(approved):
+                await asyncio.to_thread(
+                    self._release_purchases, [request for request, ok in zip(requests, approved) if ok], reserved_at
+                )
+                position = approved.index(False)
+                return CheckoutResponse(
+                    approved=False,
+                    reason=f"Item {position + 1} ({requests[position].merchant_name}): {reasons[position]}",
+                    reasons=reasons
+                )
+            
+            items = []
+            for request in requests:
+                merchant = self.merchant_attestations[request.merchant_name]
+                items.append((request.merchant_name, merchant.merchant_address or "DEMO_MERCHANT_ADDRESS", request.amount))
+            
+            result = await self.blockchain_service.submit_checkout_group_async(
+                teen_private_key=teen_private_key,
+                teen_address=teen_address,
+                items=items
+            )
+            
+            if not result.get("success"):
+                await asyncio.to_thread(self._release_purchases, requests, reserved_at)
+                return CheckoutResponse(
+                    approved=False,
+                    reason=f"Transaction failed: {result.get('error')}",
+                    reasons=reasons
+                )
+            
+            self._track_purchases(requests, result, reserved_at)
+            self.confirmation_tracker.ensure_running()
+            
+            return CheckoutResponse(
+                approved=True,
+                reasons=reasons,
+                transaction_id=result["transaction_id"],
+                explorer_link=result.get("explorer_link"),
+                status=STATUS_PENDING
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to submit checkout: {e}")
+            return CheckoutResponse(
+                approved=False,
+                reason=f"Execution error: {str(e)}"
+            )
+    
+    def _track_purchases(self, requests: List[PurchaseRequest], result: Dict, reserved_at: int) -> None:
+        """Follow a submitted purchase group to confirmation and notify the teen's streams per item"""
+        def on_confirmed(status: TransactionStatus) -> None:
+            for request in requests:
+                self._publish_purchase(PURCHASE_CONFIRMED, request, status.transaction_id,
+                                       confirmed_round=status.confirmed_round)
+        
+        def on_failed(status: TransactionStatus) -> None:
+            for request in requests:
+                self._release_purchase(request, reserved_at)
+                self._publish_purchase(PURCHASE_FAILED, request, status.transaction_id, error=status.error)
+        
+        self.confirmation_tracker.track(
+            result["transaction_id"],
+            last_valid_round=result.get("last_valid_round"),
+            on_confirmed=on_confirmed,
+            on_failed=on_failed
+        )
+        for request in requests:
+            self._publish_purchase(PURCHASE_VERIFIED, request, result["transaction_id"])
+    
+    def _publish_purchase(self, event_type: str, request: PurchaseRequest, transaction_id: str, **extra) -> None:
+        self.event_hub.publish(
+            [request.user_address, self.policy_compiler.family_of(request.user_address)],
+            event_type,
+            {
+                "transaction_id": transaction_id,
+                "merchant_name": request.merchant_name,
+                "amount": request.amount,
+                "user_address": request.user_address,
+                **extra
+            }
+        )
+    
+    def _publish_approval(self, merchant_name: str, approved: bool, family_id: Optional[str]) -> None:
+        """Family approvals go to that family; global changes go to every family"""
+        topics = [family_id] if family_id is not None else list(self.policy_compiler.family_rules)
+        self.event_hub.publish(
+            topics,
+            MERCHANT_APPROVAL_CHANGED,
+            {"merchant_name": merchant_name, "approved": approved, "family_id": family_id}
+        )
+    
+    def _release_purchase(self, request: PurchaseRequest, reserved_at: Optional[int] = None) -> None:
+        """
+        Give back the counter reservations taken for a verified purchase.
+        reserved_at (default now) finds the spend-window buckets it was charged to.
+        """
+        current_time = int(datetime.now().timestamp())
+        self.spend_counter.release(request.merchant_name, request.amount, current_time)
+        self.rolling_limits.release(request.user_address, request.amount, current_time, reserved_at)
+        
+        record = self.policy_compiler.decide(request.user_address, request.merchant_name)
+        if record is not None and record.category_cap is not None:
+            family_id = self.policy_compiler.family_of(request.user_address)
+            self.spend_counter.release(
+                category_cap_key(family_id, record.category_id),
+                request.amount,
+                current_time
+            )
+    
+    def _release_purchases(self, requests: List[PurchaseRequest], reserved_at: Optional[int] = None) -> None:
+        for request in requests:
+            self._release_purchase(request, reserved_at)
+    
     def get_merchant_attestations(self) -> Dict[str, MerchantAttestation]:
         """Get all merchant attestations"""
-        return self.merchant_attestations
+        self._refresh_shared_state()
+        attestations = [self.merchant_attestations[name] for name in self.merchant_attestations]
+        spent = self.spend_counter.get_spent_many(
+            [attestation.merchant_name for attestation in attestations],
+            int(datetime.now().timestamp())
+        )
+        return {
+            attestation.merchant_name: self._with_spend(attestation, spent_today, last_spend)
+            for attestation, (spent_today, last_spend) in zip(attestations, spent)
+        }
     
     def get_merchant_attestation(self, merchant_name: str) -> Optional[MerchantAttestation]:
         """Get specific merchant attestation"""
-        return self.merchant_attestations.get(merchant_name)
+        self._refresh_shared_state()
+        attestation = self.merchant_attestations.get(merchant_name)
+        return self._snapshot(attestation) if attestation else None
+    
+    def get_merchant_category(self, merchant_name: str) -> Optional[str]:
+        """Get a merchant's category, if the merchant is attested"""
+        self._refresh_shared_state()
+        attestation = self.merchant_attestations.get(merchant_name)
+        return attestation.category if attestation else None
+    
+    def get_spent_today(self, merchant_name: str) -> int:
+        """Get today's spend for a merchant from the counter engine"""
+        spent, _ = self.spend_counter.get_spent(merchant_name, int(datetime.now().timestamp()))
+        return spent
+    
+    def _snapshot(self, attestation: MerchantAttestation) -> MerchantAttestation:
+        """Copy of an attestation with live spend counter values"""
+        spent, last_spend = self.spend_counter.get_spent(
+            attestation.merchant_name,
+            int(datetime.now().timestamp())
+        )
+        return self._with_spend(attestation, spent, last_spend)
+    
+    def _with_spend(self, attestation: MerchantAttestation, spent: int, last_spend: int) -> MerchantAttestation:
+        return attestation.model_copy(update={
+            "total_spent_today": spent,
+            "last_update": max(attestation.last_update, last_spend)
+        })
     
     def get_merchant_analytics(self, merchant_name: str) -> Dict:
         """Get analytics for a specific merchant"""
         try:
+            self._refresh_shared_state()
             if merchant_name not in self.merchant_attestations:
                 return {"error": "Merchant not found"}
             
-            merchant = self.merchant_attestations[merchant_name]
+            merchant = self._snapshot(self.merchant_attestations[merchant_name])
             
             # Calculate daily spending percentage
             daily_usage_percent = (merchant.total_spent_today / merchant.daily_limit * 100) if merchant.daily_limit > 0 else 0
@@ -377,20 +957,116 @@ class OracleService:
             logger.error(f"Failed to get merchant analytics: {e}")
             return {"error": str(e)}
     
-    def sync_with_blockchain(self) -> Dict:
-        """Sync local attestations with blockchain state"""
+    async def sync_with_blockchain_async(self) -> Dict:
+        """
+        Reconcile local attestations with the oracle's merchant boxes,
+        applying only the ones that changed. Merchants with a chain write
+        still queued keep their local state.
+        """
         try:
-            # In production, this would read from the blockchain
-            # and update local state accordingly
             logger.info("Syncing with blockchain...")
+            read = await self.box_sync.read(list(self.merchant_attestations))
+            if read.get("error"):
+                return {"error": read["error"]}
             
-            # For demo, just return success
-            return {"success": True, "synced_merchants": len(self.merchant_attestations)}
+            pending = await asyncio.to_thread(self.write_queue.pending_merchants)
+            applied, updated, skipped = await asyncio.to_thread(self._apply_chain_attestations, read["changed"], pending)
+            self.box_sync.commit(read, applied)
+            
+            logger.info(
+                f"Synced {read['boxes']} merchant boxes: fetched {read['fetched']}, "
+                f"updated {updated}, {skipped} waiting on queued writes"
+            )
+            return {
+                "success": True,
+                "synced_merchants": read["boxes"],
+                "fetched": read["fetched"],
+                "updated": updated,
+                "skipped": skipped,
+                "synced_round": read["round"]
+            }
             
         except Exception as e:
             logger.error(f"Failed to sync with blockchain: {e}")
             return {"error": str(e)}
     
+    async def get_chain_attestation(self, merchant_name: str, min_round: int = 0) -> Dict:
+        """
+        A merchant's attestation as stored in the oracle's box, read
+        through the chain cache; pass the round of your own write as
+        min_round to be sure to see it
+        """
+        try:
+            app_id = self.blockchain_service.attestation_oracle_app_id
+            if not app_id:
+                return {"error": "Attestation oracle not deployed"}
+            
+            box_name = self.blockchain_service.attestation_box_name(merchant_name)
+            result = await self.chain_cache.get_box(app_id, box_name, min_round)
+            if result.get("error"):
+                return {"error": result["error"]}
+            if result["value"] is None:
+                return {"error": "Merchant not found on chain"}
+            if self.blockchain_service.attestation_oracle_version == 2:
+                attestation = decode_merchant_record_v2(result["value"], merchant_name, int(datetime.now().timestamp()))
+            else:
+                attestation = decode_merchant_attestation(result["value"])
+            return {**attestation, "round": result["round"]}
+            
+        except Exception as e:
+            logger.error(f"Failed to read chain attestation for {merchant_name}: {e}")
+            return {"error": str(e)}
+    
+    def _apply_chain_attestations(
+        self,
+        changed: List[Tuple[bytes, bytes, Dict]],
+        pending: set
+    ) -> Tuple[List[Tuple[bytes, bytes]], int, int]:
+        """Apply decoded merchant boxes that differ from local state; returns (applied boxes, updated, skipped)"""
+        self._refresh_shared_state()
+        applied = []
+        updated = skipped = 0
+        for box_name, digest, chain in changed:
+            name = chain["merchant_name"]
+            if name in pending:
+                skipped += 1
+                continue
+            try:
+                local = self.merchant_attestations.get(name)
+                if local is not None and all(
+                    getattr(local, field) == chain[field]
+                    for field in ("category", "is_approved", "daily_limit", "parent_approved")
+                ):
+                    applied.append((box_name, digest))
+                    continue
+                
+                attestation = MerchantAttestation(
+                    merchant_name=name,
+                    category=chain["category"],
+                    is_approved=chain["is_approved"],
+                    daily_limit=chain["daily_limit"],
+                    total_spent_today=chain["total_spent_today"],
+                    last_update=chain["last_update"],
+                    parent_approved=chain["parent_approved"],
+                    merchant_address=local.merchant_address if local is not None else None
+                )
+                if self.shared_state is not None:
+                    self.shared_state.check_attestation(name, attestation.category, attestation.merchant_address)
+                self.merchant_attestations[name] = attestation
+                if local is None:
+                    self.spend_counter.set_spent(name, attestation.total_spent_today, attestation.last_update)
+                self._persist_merchant(name)
+                
+                if local is not None and (local.is_approved, local.parent_approved) != (
+                    attestation.is_approved, attestation.parent_approved
+                ):
+                    self._publish_approval(name, attestation.is_approved and attestation.parent_approved, None)
+                applied.append((box_name, digest))
+                updated += 1
+            except Exception as e:
+                logger.error(f"Failed to apply chain attestation for {name}: {e}")
+        return applied, updated, skipped
+    
     def _is_new_day(self, last_timestamp: int, current_timestamp: int) -> bool:
         """Check if it's a new day since last update"""
         seconds_in_day = 86400
@@ -0,0 +1,146 @@
+"""
+ClearSpend Oracle Sync
+Reads the AttestationOracle's merchant boxes and reports which ones changed
+since the last sync
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .blockchain_service import BlockchainService
+from .attestation_layout import (
+    MERCHANT_BOX_PREFIX,
+    MERCHANT_V2_BOX_PREFIX,
+    MERCHANT_V2_KEY_SIZE,
+    decode_merchant_attestation,
+    decode_merchant_record_v2,
+    merchant_key_v2,
+    touched_box_names,
+    touched_merchant_names
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OracleBoxSync:
+    """
+    Remembers a digest of every merchant box it has read and the round it
+    last synced through. The first read fetches every box; later reads
+    list the boxes and fetch only new ones and those named by an app call
+    to the oracle since that round (found through the indexer), so an
+    unchanged oracle costs two requests. Box values are fetched
+    concurrently, at most `concurrency` at a time.
+
+    read() leaves the digests alone; the caller commit()s the boxes it
+    applied, so a box it had to skip is fetched again next time.
+    """
+
+    def __init__(self, blockchain_service: BlockchainService, concurrency: Optional[int] = None):
+        self.blockchain_service = blockchain_service
+        self.concurrency = int(os.getenv("ORACLE_SYNC_CONCURRENCY", "32")) if concurrency is None else concurrency
+        self._digests: Dict[bytes, bytes] = {}
+        # v2 box key -> merchant name, for the names this sync has seen
+        self._names: Dict[bytes, str] = {}
+        self.synced_round: Optional[int] = None
+
+    async def read(self, known_names: Iterable[str] = ()) -> Dict:
+        """
+        Fetch the merchant boxes that may have changed. Returns
+        {"success", "boxes", "fetched", "changed": [(box name, digest,
+        attestation dict)], "missing": [box names gone from the chain],
+        "unmapped", "round"}, or {"error"}.
+
+        v2 records do not hold the merchant name, so a v2 box is read only
+        once its key is matched to one of known_names or to a name passed
+        to an oracle call; the rest are counted as unmapped.
+        """
+        app_id = self.blockchain_service.attestation_oracle_app_id
+        if not app_id:
+            return {"error": "Attestation oracle not deployed"}
+        v2 = self.blockchain_service.attestation_oracle_version == 2
+
+        status = await self.blockchain_service.get_network_status_async()
+        if status.get("error"):
+            return {"error": status["error"]}
+        sync_round = status["last_round"]
+
+        touched: Optional[Set[bytes]] = None
+        if self.synced_round is not None:
+            calls = await self.blockchain_service.get_application_call_args_async(app_id, self.synced_round)
+            if calls.get("error"):
+                logger.warning(f"Falling back to reading every merchant box: {calls['error']}")
+            else:
+                if v2:
+                    called = touched_merchant_names(calls["args"])
+                    self._names.update(called)
+                    touched = set(called)
+                else:
+                    touched = touched_box_names(calls["args"])
+                if calls.get("current_round"):
+                    # Calls the indexer has not caught up with are looked for again next time
+                    sync_round = min(sync_round, calls["current_round"] + 1)
+
+        if v2:
+            mapped = set(self._names.values())
+            for merchant_name in known_names:
+                if merchant_name not in mapped:
+                    self._names[merchant_key_v2(merchant_name)] = merchant_name
+        names = [
+            name for name in await self.blockchain_service.get_application_boxes_async(app_id)
+            if (len(name) == MERCHANT_V2_KEY_SIZE and name.startswith(MERCHANT_V2_BOX_PREFIX) if v2
+                else name.startswith(MERCHANT_BOX_PREFIX))
+        ]
+        readable = [name for name in names if name in self._names] if v2 else names
+        fetch = [name for name in readable if touched is None or name in touched or name not in self._digests]
+
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def fetch_box(name: bytes) -> Tuple[bytes, Optional[bytes]]:
+            async with semaphore:
+                return name, await self.blockchain_service.get_box_async(app_id, name)
+
+        now = int(time.time())
+        changed = []
+        for name, value in await asyncio.gather(*(fetch_box(name) for name in fetch)):
+            if value is None:
+                # Read again next time
+                self._digests.pop(name, None)
+                continue
+            digest = hashlib.sha256(value).digest()
+            if self._digests.get(name) == digest:
+                continue
+            try:
+                attestation = (
+                    decode_merchant_record_v2(value, self._names[name], now) if v2
+                    else decode_merchant_attestation(value)
+                )
+                changed.append((name, digest, attestation))
+            except ValueError as e:
+                logger.warning(f"Skipping merchant box {name!r}: {e}")
+
+        listed = set(names)
+        return {
+            "success": True,
+            "boxes": len(names),
+            "fetched": len(fetch),
+            "changed": changed,
+            "missing": [name for name in self._digests if name not in listed],
+            "unmapped": len(names) - len(readable),
+            "round": sync_round
+        }
+
+    def commit(self, read: Dict, applied: List[Tuple[bytes, bytes]]) -> None:
+        """
+        Record the (box name, digest) pairs applied from a read() and the
+        round it synced through; changed boxes left out are fetched again
+        """
+        for name in read["missing"]:
+            self._digests.pop(name, None)
+        for name, _, _ in read["changed"]:
+            self._digests.pop(name, None)
+        self._digests.update(applied)
+        self.synced_round = read["round"]
@@ -0,0 +1,163 @@
+"""
+ClearSpend Suggested Params Cache
+Round-aware, thread-safe cache of algod suggested transaction parameters
+"""
+
+import os
+import copy
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+from algosdk.transaction import SuggestedParams
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestedParamsCache:
+    """
+    Shares one SuggestedParams fetch across every transaction built in a round.
+
+    A background thread follows the chain with status_after_block and
+    refreshes the params once each time the last round advances. Callers
+    get a copy of the cached params; they only hit algod themselves when
+    nothing is cached, when the validity window is within refresh_margin
+    rounds of ending, or (without the background thread) when the params
+    are older than one round.
+    """
+
+    def __init__(
+        self,
+        algod_client,
+        refresh_margin: Optional[int] = None,
+        round_time: Optional[float] = None,
+        background: Optional[bool] = None
+    ):
+        self.algod_client = algod_client
+        self.refresh_margin = refresh_margin if refresh_margin is not None else int(
+            os.getenv("PARAMS_CACHE_REFRESH_MARGIN", "10")
+        )
+        self.round_time = round_time if round_time is not None else float(
+            os.getenv("PARAMS_CACHE_ROUND_TIME", "2.8")
+        )
+        self.background = background if background is not None else (
+            os.getenv("PARAMS_CACHE_BACKGROUND", "true").lower() == "true"
+        )
+
+        self._lock = threading.Lock()
+        self._params: Optional[SuggestedParams] = None
+        self._fetched_at = 0.0
+        self._last_round = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _estimated_round(self, now: float) -> int:
+        """Latest known round, extrapolated when no follower is running"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._last_round
+        return self._last_round + int((now - self._fetched_at) / self.round_time)
+
+    def _is_stale(self, now: float) -> bool:
+        if self._params is None:
+            return True
+        if self._estimated_round(now) >= self._params.last - self.refresh_margin:
+            return True
+        following = self._thread is not None and self._thread.is_alive()
+        return not following and now - self._fetched_at > self.round_time
+
+    def _store(self, params: SuggestedParams) -> None:
+        """Store freshly fetched params (caller holds the lock)"""
+        self._params = params
+        self._fetched_at = time.monotonic()
+        self._last_round = max(self._last_round, params.first)
+
+    def get(self) -> SuggestedParams:
+        """Return suggested params, fetching from algod only when stale"""
+        if self.background:
+            self.start()
+
+        with self._lock:
+            if self._is_stale(time.monotonic()):
+                self.misses += 1
+                # Fetch under the lock so concurrent misses share one call
+                self._store(self.algod_client.suggested_params())
+            else:
+                self.hits += 1
+            return copy.copy(self._params)
+
+    def peek(self) -> Optional[SuggestedParams]:
+        """
+        Return cached params if still fresh, or None on a miss.
+        Used by async callers, which fetch themselves and then put() the result.
+        """
+        with self._lock:
+            if self._is_stale(time.monotonic()):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.copy(self._params)
+
+    def put(self, params: SuggestedParams) -> None:
+        """Store params fetched outside the cache"""
+        with self._lock:
+            self._store(params)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._params = None
+
+    def start(self) -> None:
+        """Start the round-following refresh thread if it is not running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._follow_rounds,
+                name="suggested-params-refresh",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _follow_rounds(self) -> None:
+        """Refresh params once per new round"""
+        while not self._stop.is_set():
+            try:
+                status = self.algod_client.status_after_block(self._last_round)
+                last_round = status.get("last-round", 0)
+                if last_round > self._last_round or self._params is None:
+                    params = self.algod_client.suggested_params()
+                    with self._lock:
+                        self._store(params)
+                        self._last_round = max(self._last_round, last_round)
+                        self.background_refreshes += 1
+            except Exception as e:
+                logger.warning(f"Suggested params refresh failed: {e}")
+                self._stop.wait(self.round_time)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "background_refreshes": self.background_refreshes,
+                "algod_calls": self.misses + self.background_refreshes,
+                "last_round": self._last_round,
+                "valid_until_round": self._params.last if self._params else None,
+                "following_rounds": self._thread is not None and self._thread.is_alive()
+            }
@@ -0,0 +1,299 @@
+"""
+ClearSpend Purchase Policy Compiler
+Compiles merchant attestations and family rules into constant-time purchase decisions
+"""
+
+import threading
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from pydantic import BaseModel, Field
+
+# Decision flag bits
+FLAG_APPROVED = 1
+FLAG_PARENT_APPROVED = 2
+FLAG_RESTRICTED = 4
+FLAGS_ELIGIBLE = FLAG_APPROVED | FLAG_PARENT_APPROVED
+
+DEFAULT_FAMILY = "default"
+DEFAULT_RESTRICTED_CATEGORIES = ["Gaming", "Gambling", "Adult Content", "Tobacco", "Alcohol"]
+
+
+class FamilyRules(BaseModel):
+    """Purchase rules a family's parents have set"""
+    family_id: str
+    teen_addresses: List[str] = Field(default_factory=list)
+    restricted_categories: List[str] = Field(default_factory=lambda: list(DEFAULT_RESTRICTED_CATEGORIES))
+    merchant_approvals: Dict[str, bool] = Field(default_factory=dict)
+    category_caps: Dict[str, int] = Field(default_factory=dict)  # daily caps in microAlgos
+
+
+class DecisionRecord(NamedTuple):
+    """Precomputed verification inputs for one merchant under one family policy"""
+    flags: int
+    category_id: int
+    daily_limit: int
+    category_cap: Optional[int]
+
+
+class MerchantRow(NamedTuple):
+    """One merchant's columns, with the attribute names MerchantColumns.upsert reads"""
+    merchant_name: str
+    category: str
+    is_approved: bool
+    daily_limit: int
+    last_update: int
+    parent_approved: bool
+    merchant_address: Optional[str]
+
+
+class CategoryRegistry:
+    """Interns category names to small integer ids used as bit positions"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, category: str) -> int:
+        category_id = self._ids.get(category)
+        if category_id is None:
+            category_id = len(self.names)
+            self._ids[category] = category_id
+            self.names.append(category)
+        return category_id
+
+    def mask(self, categories: Iterable[str]) -> int:
+        mask = 0
+        for category in categories:
+            mask |= 1 << self.intern(category)
+        return mask
+
+
+class MerchantColumns:
+    """
+    Array-backed merchant table shared by all family policies.
+    Merchant i is described by names[i], limits[i], category_ids[i],
+    base_flags[i] (global approval and default parent approval),
+    last_updates[i] and addresses[i].
+    """
+
+    def __init__(self, categories: CategoryRegistry):
+        self.categories = categories
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.limits = array("q")
+        self.category_ids = array("H")
+        self.base_flags = array("B")
+        self.last_updates = array("q")
+        self.addresses: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def row(self, merchant_name: str) -> MerchantRow:
+        """A merchant's columns; raises KeyError for an unknown merchant"""
+        idx = self.index[merchant_name]
+        flags = self.base_flags[idx]
+        return MerchantRow(
+            merchant_name,
+            self.categories.names[self.category_ids[idx]],
+            bool(flags & FLAG_APPROVED),
+            self.limits[idx],
+            self.last_updates[idx],
+            bool(flags & FLAG_PARENT_APPROVED),
+            self.addresses[idx]
+        )
+
+    def upsert(self, attestation, publish: bool = True) -> int:
+        """
+        Insert or update one merchant in place, returning its row index.
+        A new row is added to index last, so lock-free readers that find a
+        name always find its columns; with publish=False the caller adds it
+        (see publish) once dependent state is ready too.
+        """
+        flags = 0
+        if attestation.is_approved:
+            flags |= FLAG_APPROVED
+        if attestation.parent_approved:
+            flags |= FLAG_PARENT_APPROVED
+        category_id = self.categories.intern(attestation.category)
+
+        idx = self.index.get(attestation.merchant_name)
+        if idx is None:
+            idx = len(self.names)
+            self.limits.append(attestation.daily_limit)
+            self.category_ids.append(category_id)
+            self.base_flags.append(flags)
+            self.last_updates.append(attestation.last_update)
+            self.addresses.append(attestation.merchant_address)
+            self.names.append(attestation.merchant_name)
+            if publish:
+                self.publish(attestation.merchant_name, idx)
+        else:
+            self.limits[idx] = attestation.daily_limit
+            self.category_ids[idx] = category_id
+            self.base_flags[idx] = flags
+            self.last_updates[idx] = attestation.last_update
+            self.addresses[idx] = attestation.merchant_address
+        return idx
+
+    def publish(self, merchant_name: str, idx: int) -> None:
+        """Make a row appended by upsert(..., publish=False) visible to lookups"""
+        self.index[merchant_name] = idx
+
+    def load(
+        self,
+        names: List[str],
+        category_names: List[str],
+        category_ids: array,
+        limits: array,
+        base_flags: array,
+        last_updates: array,
+        addresses: List[Optional[str]]
+    ) -> None:
+        """Replace the table with whole columns (e.g. from a snapshot) without per-row work"""
+        ids = [self.categories.intern(category) for category in category_names]
+        if ids != list(range(len(ids))):
+            category_ids = array("H", (ids[category_id] for category_id in category_ids))
+        self.names = names
+        self.index = dict(zip(names, range(len(names))))
+        self.limits = limits
+        self.category_ids = category_ids
+        self.base_flags = base_flags
+        self.last_updates = last_updates
+        self.addresses = addresses
+
+
+class CompiledPolicy:
+    """A family's rules compiled into one DecisionRecord per merchant row"""
+
+    def __init__(self, rules: FamilyRules, columns: MerchantColumns):
+        self.rules = rules
+        self.columns = columns
+        self.restricted_mask = columns.categories.mask(rules.restricted_categories)
+        self.category_caps: Dict[int, int] = {
+            columns.categories.intern(category): cap
+            for category, cap in rules.category_caps.items()
+        }
+        self.records: List[DecisionRecord] = [self._compile_row(idx) for idx in range(len(columns))]
+
+    def _compile_row(self, idx: int) -> DecisionRecord:
+        columns = self.columns
+        flags = columns.base_flags[idx]
+        approval = self.rules.merchant_approvals.get(columns.names[idx])
+        if approval is not None:
+            flags = (flags | FLAG_PARENT_APPROVED) if approval else (flags & ~FLAG_PARENT_APPROVED)
+        category_id = columns.category_ids[idx]
+        if self.restricted_mask >> category_id & 1:
+            flags |= FLAG_RESTRICTED
+        return DecisionRecord(flags, category_id, columns.limits[idx], self.category_caps.get(category_id))
+
+    def recompile_row(self, idx: int) -> None:
+        """Refresh (or append) the record for one merchant row"""
+        if idx == len(self.records):
+            self.records.append(self._compile_row(idx))
+        else:
+            self.records[idx] = self._compile_row(idx)
+
+
+class PolicyCompiler:
+    """
+    Keeps one CompiledPolicy per family, compiled lazily on first use and
+    recompiled incrementally when a single merchant or family rule changes.
+
+    Mutations (which run in the threadpool) are serialized by a lock;
+    decide() stays lock-free because a merchant only enters the index once
+    every compiled policy has its record.
+    """
+
+    def __init__(self, default_restricted_categories: Optional[List[str]] = None):
+        self.categories = CategoryRegistry()
+        self.columns = MerchantColumns(self.categories)
+        self.family_rules: Dict[str, FamilyRules] = {
+            DEFAULT_FAMILY: FamilyRules(
+                family_id=DEFAULT_FAMILY,
+                restricted_categories=list(default_restricted_categories or DEFAULT_RESTRICTED_CATEGORIES)
+            )
+        }
+        self.teen_families: Dict[str, str] = {}
+        self._policies: Dict[str, CompiledPolicy] = {}
+        self._lock = threading.RLock()
+
+    def update_merchant(self, attestation) -> None:
+        """Apply a merchant attestation change to every compiled policy"""
+        with self._lock:
+            idx = self.columns.upsert(attestation, publish=False)
+            for policy in list(self._policies.values()):
+                policy.recompile_row(idx)
+            self.columns.publish(attestation.merchant_name, idx)
+
+    def update_merchant_fields(self, merchant_name: str, **changes) -> MerchantRow:
+        """
+        Change some of a merchant's fields (MerchantRow names), reading and
+        writing the row under the lock so concurrent updates to other
+        fields of the same merchant are kept. Returns the row as it was
+        before the change.
+        """
+        with self._lock:
+            previous = self.columns.row(merchant_name)
+            self.update_merchant(previous._replace(**changes))
+            return previous
+
+    def load_merchants(self, *columns) -> None:
+        """Bulk-load the merchant table (see MerchantColumns.load) and drop compiled policies"""
+        with self._lock:
+            self.columns.load(*columns)
+            self._policies.clear()
+
+    def set_family_rules(self, rules: FamilyRules) -> None:
+        """Replace a family's rules and recompile its policy"""
+        with self._lock:
+            previous = self.family_rules.get(rules.family_id)
+            if previous is not None:
+                for teen_address in previous.teen_addresses:
+                    self.teen_families.pop(teen_address, None)
+            self.family_rules[rules.family_id] = rules
+            for teen_address in rules.teen_addresses:
+                self.teen_families[teen_address] = rules.family_id
+            self._policies.pop(rules.family_id, None)
+
+    def set_merchant_approval(self, family_id: str, merchant_name: str, approved: bool) -> None:
+        """Record a family-level parent approval, recompiling only that merchant"""
+        with self._lock:
+            rules = self.family_rules.get(family_id)
+            if rules is None:
+                raise KeyError(f"Unknown family {family_id}")
+            rules.merchant_approvals[merchant_name] = approved
+
+            policy = self._policies.get(family_id)
+            idx = self.columns.index.get(merchant_name)
+            if policy is not None and idx is not None:
+                policy.recompile_row(idx)
+
+    def family_of(self, user_address: str) -> str:
+        return self.teen_families.get(user_address, DEFAULT_FAMILY)
+
+    def policy(self, family_id: str) -> CompiledPolicy:
+        policy = self._policies.get(family_id)
+        if policy is None:
+            with self._lock:
+                policy = self._policies.get(family_id)
+                if policy is None:
+                    rules = self.family_rules.get(family_id) or self.family_rules[DEFAULT_FAMILY]
+                    policy = CompiledPolicy(rules, self.columns)
+                    self._policies[family_id] = policy
+        return policy
+
+    def policy_for(self, user_address: str) -> CompiledPolicy:
+        return self.policy(self.family_of(user_address))
+
+    def decide(self, user_address: str, merchant_name: str) -> Optional[DecisionRecord]:
+        """Constant-time lookup of the decision record for a purchase"""
+        idx = self.columns.index.get(merchant_name)
+        if idx is None:
+            return None
+        return self.policy_for(user_address).records[idx]
+
+
+def category_cap_key(family_id: str, category_id: int) -> str:
+    """Spend counter key for a family's per-category daily cap"""
+    return f"category:{family_id}:{category_id}"
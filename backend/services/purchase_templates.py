@@ -0,0 +1,170 @@
+"""
+ClearSpend Purchase Group Templates
+Pre-encoded purchase groups per (teen, merchant), patched with each purchase's amount and validity window
+"""
+
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Union
+
+import msgpack
+from algosdk import constants, encoding
+from algosdk.transaction import SuggestedParams
+
+# Placeholder values the skeleton is encoded with, then cut out. uint64s
+# above 2**56 always encode as 0xcf + 8 bytes, so each marks its own slot.
+_FEE = 0xC1EA55E4D0000001
+_FIRST_VALID = 0xC1EA55E4D0000002
+_LAST_VALID = 0xC1EA55E4D0000003
+_AMOUNT = 0xC1EA55E4D0000004
+_GROUP = b"\xc1\xea\x55\xe4\xd0" * 6 + b"\x00\x05"
+
+_SLOTS = {
+    b"\xcf" + struct.pack(">Q", _FEE): "fee",
+    b"\xcf" + struct.pack(">Q", _FIRST_VALID): "fv",
+    b"\xcf" + struct.pack(">Q", _LAST_VALID): "lv",
+    b"\xcf" + struct.pack(">Q", _AMOUNT): "amt",
+    # The amount app arg: an 8-byte bin
+    b"\xc4\x08" + struct.pack(">Q", _AMOUNT): "amount_arg",
+    b"\xc4\x20" + _GROUP: "grp"
+}
+
+Parts = List[Union[bytes, str]]
+GroupBuilder = Callable[[SuggestedParams, str, int, str, str], List]
+
+
+def _split(encoded: bytes) -> Parts:
+    """Cut an encoded skeleton into constant bytes and slot names"""
+    parts: Parts = []
+    position = 0
+    while True:
+        found = [(encoded.find(pattern, position), pattern) for pattern in _SLOTS]
+        found = [(index, pattern) for index, pattern in found if index >= 0]
+        if not found:
+            parts.append(encoded[position:])
+            return parts
+        index, pattern = min(found)
+        parts.append(encoded[position:index])
+        parts.append(_SLOTS[pattern])
+        position = index + len(pattern)
+
+
+def _render(parts: Parts, values: Dict[str, bytes]) -> bytes:
+    return b"".join(part if isinstance(part, bytes) else values[part] for part in parts)
+
+
+class PurchaseTemplate(NamedTuple):
+    """A purchase group's transactions, encoded without and with their group id"""
+    ungrouped: List[Parts]
+    grouped: List[Parts]
+
+
+class PurchaseGroupTemplates:
+    """
+    A purchase group differs from the last one for the same teen and
+    merchant only in the amount, fee and validity window. This cache
+    encodes each (teen, merchant) group once, with placeholders in those
+    fields, and renders later purchases by splicing in the new values,
+    hashing the transaction ids and splicing in the group id; no algosdk
+    transaction objects are built. Rendered bytes are identical to
+    encoding the groups the builder makes.
+
+    Suggested params with a per-byte fee (a congested network) make the
+    fee depend on the transaction size, so render returns None and the
+    caller builds the group as before.
+    """
+
+    def __init__(self, build_group: GroupBuilder, max_templates: int = 10000):
+        self.build_group = build_group
+        self.max_templates = max_templates
+        self._templates: "OrderedDict[Hashable, PurchaseTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def render(
+        self,
+        params: SuggestedParams,
+        merchant_name: str,
+        amount: int,
+        teen_address: str,
+        merchant_address: str,
+        chain: Hashable = None
+    ) -> Optional[List[bytes]]:
+        """
+        The purchase group's encoded unsigned transactions, group id set,
+        or None if it must be built. chain identifies the deployed apps the
+        builder targets, so a redeploy builds new templates.
+        """
+        fee = self._fee(params)
+        if not self.max_templates or not fee or not params.first or not params.last or amount <= 0:
+            self.fallbacks += 1
+            return None
+
+        key = (teen_address, merchant_name, merchant_address, params.gh, params.gen, chain)
+        template = self._templates.get(key)
+        if template is None:
+            self.misses += 1
+            template = self._build(params, merchant_name, teen_address, merchant_address)
+            with self._lock:
+                self._templates[key] = template
+                while len(self._templates) > self.max_templates:
+                    self._templates.popitem(last=False)
+        else:
+            self.hits += 1
+            with self._lock:
+                if key in self._templates:
+                    self._templates.move_to_end(key)
+
+        values = {
+            "fee": msgpack.packb(fee),
+            "fv": msgpack.packb(params.first),
+            "lv": msgpack.packb(params.last),
+            "amt": msgpack.packb(amount),
+            "amount_arg": b"\xc4\x08" + struct.pack(">Q", amount)
+        }
+        txids = [encoding.checksum(constants.txid_prefix + _render(parts, values)) for parts in template.ungrouped]
+        group_id = encoding.checksum(constants.tgid_prefix + msgpack.packb({"txlist": txids}, use_bin_type=True))
+        values["grp"] = b"\xc4\x20" + group_id
+        return [_render(parts, values) for parts in template.grouped]
+
+    def _fee(self, params: SuggestedParams) -> Optional[int]:
+        if params.flat_fee:
+            return params.fee
+        if params.fee:
+            return None
+        return constants.min_txn_fee if params.min_fee is None else params.min_fee
+
+    def _build(self, params: SuggestedParams, merchant_name: str, teen_address: str, merchant_address: str) -> PurchaseTemplate:
+        skeleton_params = SuggestedParams(
+            _FEE, _FIRST_VALID, _LAST_VALID, params.gh, params.gen, flat_fee=True
+        )
+        txns = self.build_group(skeleton_params, merchant_name, _AMOUNT, teen_address, merchant_address)
+        ungrouped, grouped = [], []
+        for txn in txns:
+            txn.group = None
+            ungrouped.append(_split(_encode(txn)))
+            txn.group = _GROUP
+            grouped.append(_split(_encode(txn)))
+        return PurchaseTemplate(ungrouped, grouped)
+
+    def stats(self) -> Dict:
+        return {
+            "templates": len(self._templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks
+        }
+
+
+def _encode(txn) -> bytes:
+    return msgpack.packb(encoding._sort_dict(txn.dictify()), use_bin_type=True)
+
+
+def encode_signed(encoded_txn: bytes, signature: bytes, authorizing_public_key: Optional[bytes] = None) -> bytes:
+    """Canonical msgpack of a SignedTransaction around an already encoded transaction"""
+    if authorizing_public_key is None:
+        return b"\x82\xa3sig\xc4\x40" + signature + b"\xa3txn" + encoded_txn
+    return b"\x83\xa4sgnr\xc4\x20" + authorizing_public_key + b"\xa3sig\xc4\x40" + signature + b"\xa3txn" + encoded_txn
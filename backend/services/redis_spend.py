@@ -0,0 +1,346 @@
+"""
+ClearSpend Redis Spend Counters
+Authoritative merchant, category-cap and teen rolling-window spend state in
+Redis, shared by every API worker
+"""
+
+import os
+import json
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .rolling_limits import DEFAULT_SPEND_WINDOWS, SpendWindowConfig
+from .spend_counter import SECONDS_IN_DAY
+
+logger = logging.getLogger(__name__)
+
+# Counters outlive their day by one day so get_spent can still report the
+# last update
+COUNTER_TTL_SECONDS = 2 * SECONDS_IN_DAY
+
+# Shared by both scripts.
+# KEYS: n daily counter keys, then optionally the teen's window config key.
+# ARGV: n, amount, day, timestamp, counter ttl, n limits, window key prefix,
+# default window configs (JSON); the release script also takes the
+# reservation's timestamp.
+# Window bucket keys are derived from the config, so these scripts are not
+# Redis Cluster safe; use a single primary.
+_SCRIPT_PRELUDE = """
+local n = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+local day = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+
+local function windows()
+    if #KEYS == n then
+        return {}
+    end
+    local configs = cjson.decode(redis.call('GET', KEYS[n + 1]) or ARGV[n + 7])
+    for _, window in ipairs(configs) do
+        window.bucket_seconds = math.max(1, math.floor(window.window_seconds / window.num_buckets))
+        window.epoch = math.floor(now / window.bucket_seconds)
+        window.key = ARGV[n + 6] .. window.name .. ':' .. window.window_seconds .. ':' .. window.num_buckets
+    end
+    return configs
+end
+"""
+
+# Check every counter limit and window limit, then charge all or nothing.
+# Returns {1, spent on the first counter}, {0, i, spent} when counter i is
+# over its limit, or {0, 0, window name, window limit}.
+RESERVE_SCRIPT = _SCRIPT_PRELUDE + """
+local totals = {}
+local days = {}
+for i = 1, n do
+    local state = redis.call('HMGET', KEYS[i], 'd', 's')
+    local stored_day = tonumber(state[1])
+    local spent = 0
+    days[i] = day
+    -- An older day resets the counter
+    if stored_day and stored_day >= day then
+        spent = tonumber(state[2])
+        days[i] = stored_day
+    end
+    if spent + amount > tonumber(ARGV[5 + i]) then
+        return {0, i, spent}
+    end
+    totals[i] = spent + amount
+end
+
+local configs = windows()
+for _, window in ipairs(configs) do
+    if window.limit ~= nil and window.limit ~= cjson.null then
+        local spent = 0
+        local buckets = redis.call('HGETALL', window.key)
+        for j = 1, #buckets, 2 do
+            if tonumber(buckets[j]) > window.epoch - window.num_buckets then
+                spent = spent + tonumber(buckets[j + 1])
+            else
+                redis.call('HDEL', window.key, buckets[j])
+            end
+        end
+        if spent + amount > window.limit then
+            return {0, 0, window.name, window.limit}
+        end
+    end
+end
+
+for i = 1, n do
+    redis.call('HSET', KEYS[i], 'd', days[i], 's', totals[i], 't', now)
+    redis.call('EXPIRE', KEYS[i], ttl)
+end
+for _, window in ipairs(configs) do
+    redis.call('HINCRBY', window.key, window.epoch, amount)
+    redis.call('EXPIRE', window.key, window.window_seconds + window.bucket_seconds)
+end
+return {1, totals[1] or 0}
+"""
+
+# Give back a reservation: today's counters and the window buckets the
+# reservation was charged to (skipping buckets that left the window), never
+# below zero. Returns the first counter's remaining spend.
+RELEASE_SCRIPT = _SCRIPT_PRELUDE + """
+local remaining = 0
+for i = n, 1, -1 do
+    local state = redis.call('HMGET', KEYS[i], 'd', 's')
+    if state[1] and tonumber(state[1]) >= day then
+        remaining = math.max(0, tonumber(state[2]) - amount)
+        redis.call('HSET', KEYS[i], 's', remaining)
+    else
+        remaining = 0
+    end
+end
+local reserved_at = tonumber(ARGV[n + 8] or now)
+for _, window in ipairs(windows()) do
+    local epoch = math.min(math.floor(reserved_at / window.bucket_seconds), window.epoch)
+    if epoch > window.epoch - window.num_buckets then
+        local current = tonumber(redis.call('HGET', window.key, epoch) or '0')
+        if current > 0 then
+            redis.call('HINCRBY', window.key, epoch, -math.min(amount, current))
+        end
+    end
+end
+return remaining
+"""
+
+
+def create_redis_client(url: Optional[str] = None, pool_size: Optional[int] = None):
+    """Redis client on a bounded connection pool (REDIS_URL, REDIS_POOL_SIZE)"""
+    # Optional dependency: only needed with SPEND_BACKEND=redis
+    import redis
+
+    pool = redis.ConnectionPool.from_url(
+        url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        max_connections=pool_size or int(os.getenv("REDIS_POOL_SIZE", "50"))
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def _int(value) -> int:
+    return int(value) if value is not None else 0
+
+
+class RedisRollingLimits:
+    """
+    RollingSpendLimits backed by Redis. Each window is a hash of bucket
+    epoch -> amount keyed by the window's name and shape, so reconfiguring
+    a window's limit keeps its history and changing its shape starts fresh.
+    """
+
+    def __init__(
+        self,
+        client,
+        prefix: Optional[str] = None,
+        default_windows: Optional[List[SpendWindowConfig]] = None
+    ):
+        self.client = client
+        self.prefix = prefix or os.getenv("REDIS_KEY_PREFIX", "clearspend:")
+        self.default_windows = list(default_windows or DEFAULT_SPEND_WINDOWS)
+        self.default_json = json.dumps([config.model_dump() for config in self.default_windows])
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def config_key(self, teen_address: str) -> str:
+        return f"{self.prefix}windows:{teen_address}"
+
+    def window_prefix(self, teen_address: str) -> str:
+        return f"{self.prefix}window:{teen_address}:"
+
+    def script_args(self, teen_address: str) -> Tuple[List[str], List]:
+        """Extra KEYS and ARGV that make the spend scripts charge a teen's windows"""
+        return [self.config_key(teen_address)], [self.window_prefix(teen_address), self.default_json]
+
+    def try_reserve(self, teen_address: str, amount: int, timestamp: int) -> Optional[str]:
+        """Atomically check every window and record the spend; returns a denial reason or None"""
+        keys, args = self.script_args(teen_address)
+        result = self._reserve(keys=keys, args=[0, amount, timestamp // SECONDS_IN_DAY, timestamp, 0] + args)
+        if result[0] == 1:
+            return None
+        return f"Purchase would exceed {result[2].decode()} spend limit of {result[3]} microAlgos"
+
+    def release(self, teen_address: str, amount: int, timestamp: int, reserved_at: Optional[int] = None) -> None:
+        """Give back a spend that try_reserve recorded at reserved_at (default timestamp)"""
+        keys, args = self.script_args(teen_address)
+        reserved_at = timestamp if reserved_at is None else reserved_at
+        self._release(keys=keys, args=[0, amount, timestamp // SECONDS_IN_DAY, timestamp, 0] + args + [reserved_at])
+
+    def configure(self, teen_address: str, configs: List[SpendWindowConfig]) -> None:
+        self.client.set(self.config_key(teen_address), json.dumps([config.model_dump() for config in configs]))
+
+    def _configs(self, teen_address: str) -> List[SpendWindowConfig]:
+        stored = self.client.get(self.config_key(teen_address))
+        if stored is None:
+            return self.default_windows
+        return [SpendWindowConfig(**config) for config in json.loads(stored)]
+
+    def status(self, teen_address: str, timestamp: int) -> List[Dict]:
+        """Current spend per window for a teen"""
+        configs = self._configs(teen_address)
+        pipe = self.client.pipeline(transaction=False)
+        for config in configs:
+            pipe.hgetall(f"{self.window_prefix(teen_address)}{config.name}:{config.window_seconds}:{config.num_buckets}")
+        result = []
+        for config, buckets in zip(configs, pipe.execute()):
+            oldest = timestamp // config.bucket_seconds - config.num_buckets
+            spent = sum(int(amount) for epoch, amount in buckets.items() if int(epoch) > oldest)
+            result.append({
+                "name": config.name,
+                "window_seconds": config.window_seconds,
+                "num_buckets": config.num_buckets,
+                "limit": config.limit,
+                "spent": spent,
+                "remaining": None if config.limit is None else max(0, config.limit - spent)
+            })
+        return result
+
+
+class RedisSpendCounter:
+    """
+    ShardedSpendCounter backed by Redis hashes ({prefix}spend:{key} with
+    day, spent and last update). Every reservation is a server-side script,
+    so limits hold across any number of workers; batches are pipelined
+    in one MULTI/EXEC round trip.
+    """
+
+    # Redis persists the counters, so the attestation store must not
+    journal = None
+    persistent = True
+
+    def __init__(self, client, prefix: Optional[str] = None):
+        self.client = client
+        self.prefix = prefix or os.getenv("REDIS_KEY_PREFIX", "clearspend:")
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}spend:{key}"
+
+    def try_reserve(self, key: str, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        result = self._reserve(
+            keys=[self._key(key)],
+            args=[1, amount, timestamp // SECONDS_IN_DAY, timestamp, COUNTER_TTL_SECONDS, limit]
+        )
+        return result[0] == 1, result[-1]
+
+    def release(self, key: str, amount: int, timestamp: int) -> int:
+        return self._release(
+            keys=[self._key(key)],
+            args=[1, amount, timestamp // SECONDS_IN_DAY, timestamp, COUNTER_TTL_SECONDS, 0]
+        )
+
+    @contextmanager
+    def hold(self, keys) -> Iterator["RedisSpendCounter"]:
+        """Each operation is already atomic on the server; nothing to lock locally"""
+        yield self
+
+    def reserve_purchases(
+        self,
+        reservations: Sequence,
+        timestamp: int,
+        rolling_limits: Optional[RedisRollingLimits] = None
+    ) -> List[Optional[str]]:
+        """
+        Reserve batch_verifier.Reservation entries in order: merchant limit,
+        category cap and teen windows in one script each, all scripts in
+        one transaction. Returns a denial reason or None per reservation.
+        """
+        day = timestamp // SECONDS_IN_DAY
+        pipe = self.client.pipeline(transaction=True)
+        for reservation in reservations:
+            record = reservation.record
+            keys = [self._key(reservation.merchant_name)]
+            limits = [record.daily_limit]
+            if reservation.cap_key is not None:
+                keys.append(self._key(reservation.cap_key))
+                limits.append(record.category_cap)
+            window_keys, window_args = [], []
+            if rolling_limits is not None:
+                window_keys, window_args = rolling_limits.script_args(reservation.user_address)
+            self._reserve(
+                keys=keys + window_keys,
+                args=[len(keys), reservation.amount, day, timestamp, COUNTER_TTL_SECONDS] + limits + window_args,
+                client=pipe
+            )
+
+        reasons: List[Optional[str]] = []
+        for reservation, result in zip(reservations, pipe.execute()):
+            if result[0] == 1:
+                reasons.append(None)
+            elif result[1] == 1:
+                reasons.append(f"Purchase would exceed daily limit of {reservation.record.daily_limit} microAlgos")
+            elif result[1] == 2:
+                reasons.append(
+                    f"Purchase would exceed daily {reservation.category} cap of "
+                    f"{reservation.record.category_cap} microAlgos"
+                )
+            else:
+                reasons.append(f"Purchase would exceed {result[2].decode()} spend limit of {result[3]} microAlgos")
+        return reasons
+
+    def set_spent(self, key: str, spent: int, timestamp: int) -> None:
+        self.restore(key, timestamp // SECONDS_IN_DAY, spent, timestamp)
+
+    def restore(self, key: str, day: int, spent: int, last_update: int) -> None:
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._key(key), mapping={"d": day, "s": spent, "t": last_update})
+        pipe.expire(self._key(key), COUNTER_TTL_SECONDS)
+        pipe.execute()
+
+    def get_spent(self, key: str, timestamp: int) -> Tuple[int, int]:
+        return self.get_spent_many([key], timestamp)[0]
+
+    def get_spent_many(self, keys: Sequence[str], timestamp: int) -> List[Tuple[int, int]]:
+        """(spent_today, last_update) for many keys in one pipelined round trip"""
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(self._key(key), "d", "s", "t")
+        day = timestamp // SECONDS_IN_DAY
+        result = []
+        for stored_day, spent, last_update in pipe.execute():
+            if stored_day is None:
+                result.append((0, 0))
+            elif int(stored_day) < day:
+                result.append((0, _int(last_update)))
+            else:
+                result.append((_int(spent), _int(last_update)))
+        return result
+
+    def entries(self) -> List[Tuple[str, int, int, int]]:
+        prefix = self._key("")
+        keys = list(self.client.scan_iter(match=f"{prefix}*", count=1000))
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, "d", "s", "t")
+        return [
+            (key.decode()[len(prefix):], _int(day), _int(spent), _int(last_update))
+            for key, (day, spent, last_update) in zip(keys, pipe.execute())
+            if day is not None
+        ]
+
+    def remove(self, key: str) -> None:
+        self.client.delete(self._key(key))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self._key('')}*", count=1000))
@@ -0,0 +1,198 @@
+"""
+ClearSpend Rolling Spend Limits
+Per-teen sliding-window spend limits backed by time-bucketed ring buffers
+"""
+
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+
+
+class SpendWindowConfig(BaseModel):
+    """Shape and limit of one rolling spend window"""
+    name: str
+    window_seconds: int = Field(..., gt=0)
+    num_buckets: int = Field(..., gt=0, le=1024)
+    limit: Optional[int] = None  # in microAlgos, None tracks without limiting
+
+    @property
+    def bucket_seconds(self) -> int:
+        return max(1, self.window_seconds // self.num_buckets)
+
+
+DEFAULT_SPEND_WINDOWS = [
+    SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24),
+    SpendWindowConfig(name="7d", window_seconds=7 * 86400, num_buckets=28),
+    SpendWindowConfig(name="30d", window_seconds=30 * 86400, num_buckets=30),
+]
+
+
+class SpendWindow:
+    """
+    Fixed-size ring of time buckets holding spend for one window.
+
+    Bucket i covers epoch e where e % num_buckets == i and
+    e = timestamp // bucket_seconds. Advancing the head clears only the
+    buckets that fell out of the window, so checks stay O(1) amortized and
+    never rescan history.
+    """
+
+    def __init__(self, config: SpendWindowConfig):
+        self.config = config
+        self.bucket_seconds = config.bucket_seconds
+        self.num_buckets = config.num_buckets
+        self.amounts = array("q", [0] * self.num_buckets)
+        self.head_epoch = 0
+        self.total = 0
+
+    def _advance(self, timestamp: int) -> int:
+        """Roll expired buckets forward to timestamp, returning its epoch"""
+        epoch = timestamp // self.bucket_seconds
+        if epoch <= self.head_epoch:
+            return epoch
+        if epoch - self.head_epoch >= self.num_buckets:
+            for i in range(self.num_buckets):
+                self.amounts[i] = 0
+            self.total = 0
+        else:
+            for expired in range(self.head_epoch + 1, epoch + 1):
+                slot = expired % self.num_buckets
+                self.total -= self.amounts[slot]
+                self.amounts[slot] = 0
+        self.head_epoch = epoch
+        return epoch
+
+    def spent(self, timestamp: int) -> int:
+        self._advance(timestamp)
+        return self.total
+
+    def fits(self, amount: int, timestamp: int) -> bool:
+        self._advance(timestamp)
+        return self.config.limit is None or self.total + amount <= self.config.limit
+
+    def _slot(self, epoch: int) -> int:
+        """Bucket for an epoch at or behind the head; too-late epochs get the current bucket"""
+        if epoch <= self.head_epoch - self.num_buckets:
+            epoch = self.head_epoch
+        return min(epoch, self.head_epoch) % self.num_buckets
+
+    def add(self, amount: int, timestamp: int) -> None:
+        # Charged to the timestamp's own bucket, so a release can find it
+        self.amounts[self._slot(self._advance(timestamp))] += amount
+        self.total += amount
+
+    def record(self, amount: int, timestamp: int) -> None:
+        """
+        Add an amount to the bucket of its own timestamp, which may be in
+        the past (e.g. history replayed out of order). Amounts older than
+        the window are ignored.
+        """
+        epoch = timestamp // self.bucket_seconds
+        if epoch > self.head_epoch:
+            self._advance(timestamp)
+        elif epoch <= self.head_epoch - self.num_buckets:
+            return
+        self.amounts[epoch % self.num_buckets] += amount
+        self.total += amount
+
+    def remove(self, amount: int, timestamp: int, reserved_at: Optional[int] = None) -> None:
+        """
+        Take a released reservation back out of the bucket it was charged
+        to at reserved_at (default timestamp). Nothing is taken once that
+        bucket has left the window.
+        """
+        self._advance(timestamp)
+        epoch = (timestamp if reserved_at is None else reserved_at) // self.bucket_seconds
+        if epoch <= self.head_epoch - self.num_buckets:
+            return
+        slot = self._slot(epoch)
+        taken = min(amount, self.amounts[slot])
+        self.amounts[slot] -= taken
+        self.total -= taken
+
+
+class RollingSpendLimits:
+    """Rolling spend windows for every teen, each teen guarded by its own lock"""
+
+    def __init__(self, default_windows: Optional[List[SpendWindowConfig]] = None):
+        self.default_windows = list(default_windows or DEFAULT_SPEND_WINDOWS)
+        self._windows: Dict[str, List[SpendWindow]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def _lock(self, teen_address: str) -> threading.Lock:
+        """Return a teen's lock, creating the teen's windows on first use"""
+        lock = self._locks.get(teen_address)
+        if lock is None:
+            with self._registry_lock:
+                lock = self._locks.get(teen_address)
+                if lock is None:
+                    self._windows[teen_address] = [SpendWindow(config) for config in self.default_windows]
+                    lock = threading.Lock()
+                    self._locks[teen_address] = lock
+        return lock
+
+    @contextmanager
+    def _held(self, teen_address: str) -> Iterator[List[SpendWindow]]:
+        """A teen's windows under its lock; changes to the list and its windows are kept"""
+        with self._lock(teen_address):
+            yield self._windows[teen_address]
+
+    def try_reserve(self, teen_address: str, amount: int, timestamp: int) -> Optional[str]:
+        """
+        Atomically check every window and record the spend.
+        Returns a denial reason, or None when the spend was recorded.
+        """
+        with self._held(teen_address) as windows:
+            for window in windows:
+                if not window.fits(amount, timestamp):
+                    return f"Purchase would exceed {window.config.name} spend limit of {window.config.limit} microAlgos"
+            for window in windows:
+                window.add(amount, timestamp)
+        return None
+
+    def release(self, teen_address: str, amount: int, timestamp: int, reserved_at: Optional[int] = None) -> None:
+        """Give back a spend that try_reserve recorded at reserved_at (default timestamp)"""
+        with self._held(teen_address) as windows:
+            for window in windows:
+                window.remove(amount, timestamp, reserved_at)
+
+    def configure(self, teen_address: str, configs: List[SpendWindowConfig]) -> None:
+        """
+        Replace a teen's windows. Windows whose name and bucket shape are
+        unchanged keep their history; only their limit is updated.
+        """
+        with self._held(teen_address) as windows:
+            existing = {window.config.name: window for window in windows}
+            updated = []
+            for config in configs:
+                window = existing.get(config.name)
+                if (
+                    window is not None
+                    and window.config.window_seconds == config.window_seconds
+                    and window.config.num_buckets == config.num_buckets
+                ):
+                    window.config = config
+                else:
+                    window = SpendWindow(config)
+                updated.append(window)
+            windows[:] = updated
+
+    def status(self, teen_address: str, timestamp: int) -> List[Dict]:
+        """Current spend per window for a teen"""
+        with self._held(teen_address) as windows:
+            result = []
+            for window in windows:
+                spent = window.spent(timestamp)
+                limit = window.config.limit
+                result.append({
+                    "name": window.config.name,
+                    "window_seconds": window.config.window_seconds,
+                    "num_buckets": window.config.num_buckets,
+                    "limit": limit,
+                    "spent": spent,
+                    "remaining": None if limit is None else max(0, limit - spent)
+                })
+            return result
@@ -0,0 +1,194 @@
+"""
+ClearSpend Service Registry
+Process-wide BlockchainService (and services built on it, including the one
+OracleService) shared by the app lifespan and every router
+"""
+
+import os
+import asyncio
+import threading
+import logging
+from typing import Optional
+
+from .blockchain_service import BlockchainService
+from .transaction_store import TransactionStore, TransactionSync
+from .block_ingestor import BlockIngestor
+from .event_hub import EventHub
+from .attestation_store import AttestationStore
+from .redis_spend import create_redis_client
+from .shared_state import SharedStateTable, close_table, open_table
+from .chain_cache import ChainStateCache
+from .oracle_service import OracleService
+
+logger = logging.getLogger(__name__)
+
+_blockchain_service: Optional[BlockchainService] = None
+_transaction_sync: Optional[TransactionSync] = None
+_event_hub: Optional[EventHub] = None
+_attestation_store: Optional[AttestationStore] = None
+_attestation_store_unavailable = False
+_redis_client = None
+_shared_state: Optional[SharedStateTable] = None
+_oracle_service: Optional[OracleService] = None
+_chain_cache: Optional[ChainStateCache] = None
+_lock = threading.Lock()
+
+
+def get_blockchain_service() -> BlockchainService:
+    """Get the process-wide blockchain service, creating it on first use"""
+    global _blockchain_service
+    if _blockchain_service is None:
+        with _lock:
+            if _blockchain_service is None:
+                _blockchain_service = BlockchainService()
+                logger.info("Created shared BlockchainService instance")
+    return _blockchain_service
+
+
+def get_transaction_sync() -> TransactionSync:
+    """Get the process-wide local transaction store, its indexer sync and block ingestor"""
+    global _transaction_sync
+    if _transaction_sync is None:
+        blockchain_service = get_blockchain_service()
+        with _lock:
+            if _transaction_sync is None:
+                store = TransactionStore()
+                ingestor = None
+                if os.getenv("BLOCK_INGESTOR_ENABLED", "true").lower() == "true":
+                    ingestor = BlockIngestor(blockchain_service, checkpoint_store=store)
+                _transaction_sync = TransactionSync(blockchain_service, store, ingestor=ingestor)
+                logger.info(f"Opened transaction store at {_transaction_sync.store.path}")
+    return _transaction_sync
+
+
+def get_event_hub() -> EventHub:
+    """Get the process-wide event hub behind the SSE / WebSocket streams"""
+    global _event_hub
+    if _event_hub is None:
+        with _lock:
+            if _event_hub is None:
+                _event_hub = EventHub()
+    return _event_hub
+
+
+def get_attestation_store() -> Optional[AttestationStore]:
+    """
+    Get the process-wide attestation store (snapshot + write-ahead log),
+    or None when ATTESTATION_STORE_ENABLED=false keeps attestations in memory.
+    Only one process can own the store directory; any other worker logs an
+    error and runs without persistence (use SPEND_BACKEND=shared or redis
+    to run several workers).
+    """
+    global _attestation_store, _attestation_store_unavailable
+    if (
+        _attestation_store is None
+        and not _attestation_store_unavailable
+        and os.getenv("ATTESTATION_STORE_ENABLED", "true").lower() == "true"
+    ):
+        with _lock:
+            if _attestation_store is None and not _attestation_store_unavailable:
+                try:
+                    _attestation_store = AttestationStore()
+                    logger.info(f"Opened attestation store at {_attestation_store.directory}")
+                except RuntimeError as e:
+                    logger.error(f"{e}; attestations in this process will not be persisted")
+                    _attestation_store_unavailable = True
+    return _attestation_store
+
+
+def get_redis_client():
+    """
+    Get the process-wide pooled Redis client when SPEND_BACKEND=redis puts
+    spend counters in Redis, otherwise None (per-process counters)
+    """
+    global _redis_client
+    if _redis_client is None and os.getenv("SPEND_BACKEND", "memory").lower() == "redis":
+        with _lock:
+            if _redis_client is None:
+                _redis_client = create_redis_client()
+                logger.info("Using Redis spend counters")
+    return _redis_client
+
+
+def get_shared_state() -> Optional[SharedStateTable]:
+    """
+    Get the memory-mapped merchant table shared by the worker processes on
+    this host when SPEND_BACKEND=shared, otherwise None
+    """
+    global _shared_state
+    if _shared_state is None and os.getenv("SPEND_BACKEND", "memory").lower() == "shared":
+        with _lock:
+            if _shared_state is None:
+                _shared_state = open_table()
+                logger.info(f"Opened shared state table at {_shared_state.path}")
+    return _shared_state
+
+
+def get_chain_cache() -> ChainStateCache:
+    """
+    Get the process-wide cache of on-chain box and global state reads,
+    invalidated by the transaction sync's block ingestor
+    """
+    global _chain_cache
+    if _chain_cache is None:
+        blockchain_service = get_blockchain_service()
+        ingestor = get_transaction_sync().ingestor
+        with _lock:
+            if _chain_cache is None:
+                _chain_cache = ChainStateCache(blockchain_service, ingestor)
+    return _chain_cache
+
+
+def get_oracle_service() -> OracleService:
+    """Get the process-wide oracle service used by every router"""
+    global _oracle_service
+    if _oracle_service is None:
+        blockchain_service = get_blockchain_service()
+        event_hub = get_event_hub()
+        redis_client = get_redis_client()
+        shared_state = get_shared_state()
+        # The shared table file is the attestations' durable copy
+        attestation_store = get_attestation_store() if shared_state is None else None
+        chain_cache = get_chain_cache()
+        with _lock:
+            if _oracle_service is None:
+                _oracle_service = OracleService(
+                    blockchain_service, event_hub, attestation_store, redis_client, shared_state,
+                    write_queue_path=os.getenv("ORACLE_WRITE_QUEUE_PATH", "clearspend_oracle_writes.db"),
+                    chain_cache=chain_cache
+                )
+                logger.info("Created shared OracleService instance")
+    return _oracle_service
+
+
+async def shutdown() -> None:
+    """Stop background sync, close the attestation log and pooled connections held by the shared services"""
+    global _blockchain_service, _transaction_sync, _attestation_store, _redis_client, _shared_state, _oracle_service
+    global _chain_cache
+    with _lock:
+        oracle_service, _oracle_service = _oracle_service, None
+        chain_cache, _chain_cache = _chain_cache, None
+        shared_state, _shared_state = _shared_state, None
+        service, _blockchain_service = _blockchain_service, None
+        sync, _transaction_sync = _transaction_sync, None
+        attestation_store, _attestation_store = _attestation_store, None
+        redis_client, _redis_client = _redis_client, None
+    if oracle_service is not None:
+        await oracle_service.confirmation_tracker.stop()
+        # Drain queued chain writes while the coalescer can still send them
+        await asyncio.to_thread(oracle_service.write_queue.close)
+        oracle_service.oracle_writes.close()
+    if redis_client is not None:
+        redis_client.close()
+    if attestation_store is not None:
+        attestation_store.close()
+    if shared_state is not None:
+        close_table(shared_state)
+    if chain_cache is not None:
+        chain_cache.close()
+    if sync is not None:
+        await sync.stop()
+        sync.store.close()
+    if service is not None:
+        service.close()
+        await service.aclose()
@@ -0,0 +1,561 @@
+"""
+ClearSpend Shared State Table
+Memory-mapped, fixed-layout merchant attestation and spend counter table
+shared by every worker process on one host, plus the family rules and
+teen spend windows kept beside it
+"""
+
+import os
+import mmap
+import zlib
+import fcntl
+import struct
+import sqlite3
+import threading
+import logging
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import msgpack
+
+from .spend_counter import SECONDS_IN_DAY
+from .rolling_limits import RollingSpendLimits, SpendWindow, SpendWindowConfig
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CSST"
+VERSION = 1
+
+# magic, version, capacity, row count, change sequence
+HEADER = struct.Struct("<4sIIIQ")
+# Bumped on every shared document write (zero in files that predate it)
+DOCUMENT_SEQ = struct.Struct("<Q")
+DOCUMENT_SEQ_OFFSET = 24
+CHANGE_RING_OFFSET = 64
+CHANGE_RING_SIZE = 1024
+CHANGE_ENTRY = struct.Struct("<I")
+HEADER_SIZE = 8192
+
+# Open-addressing index of row number + 1 (0 = empty), two slots per row
+SLOT = struct.Struct("<I")
+
+# Rows: key, then the attestation (category, address, flags, daily limit,
+# last update), then the daily counter (day, spent, last spend)
+ROW_SIZE = 256
+KEY = struct.Struct("<64s")
+ATTESTATION = struct.Struct("<32s64sB7xqq")
+ATTESTATION_OFFSET = 64
+COUNTER = struct.Struct("<qqq")
+COUNTER_OFFSET = 184
+
+ROW_ATTESTED = 1
+ROW_APPROVED = 2
+ROW_PARENT_APPROVED = 4
+
+LOCK_STRIPES = 64
+
+FAMILY_DOCUMENT = "family:"
+WINDOWS_DOCUMENT = "windows:"
+
+
+def _encode(value: Optional[str], size: int, field: str) -> bytes:
+    encoded = (value or "").encode()
+    if len(encoded) > size:
+        raise ValueError(f"{field} is longer than {size} bytes: {value!r}")
+    return encoded
+
+
+def _decode(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode()
+
+
+def _rows_offset(capacity: int) -> int:
+    """Start of the rows: after the header and the index, rounded up to a whole row"""
+    index_size = 2 * capacity * SLOT.size
+    return HEADER_SIZE + -(-index_size // ROW_SIZE) * ROW_SIZE
+
+
+class SharedStateTable:
+    """
+    Fixed-capacity table in a MAP_SHARED file mapping. Rows are allocated
+    once and never move, so a key's row number can be cached per process.
+    A row is locked by a byte-range fcntl lock on its first byte (across
+    processes) plus a striped threading lock (across threads, which fcntl
+    does not separate). Attestation writes append the row to a change ring
+    in the header so each process can refresh only the rows that changed.
+
+    Open one instance per path per process (see open_table): closing any
+    descriptor of the file drops all of the process's fcntl locks on it.
+    """
+
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._table_lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+
+        # The first process to get the header lock lays the file out
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, _rows_offset(capacity) + capacity * ROW_SIZE)
+                header = HEADER.pack(MAGIC, VERSION, capacity, 0, 0)
+                os.pwrite(self._fd, header, 0)
+                logger.info(f"Created shared state table {path} for {capacity} rows")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+
+        self._map = mmap.mmap(self._fd, 0, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        magic, version, self.capacity, _, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} shared state table")
+        self._index_offset = HEADER_SIZE
+        self._rows_offset = _rows_offset(self.capacity)
+        self.documents = SharedDocuments(self)
+
+    @property
+    def row_count(self) -> int:
+        return HEADER.unpack_from(self._map, 0)[3]
+
+    @property
+    def change_seq(self) -> int:
+        return HEADER.unpack_from(self._map, 0)[4]
+
+    @property
+    def document_seq(self) -> int:
+        return DOCUMENT_SEQ.unpack_from(self._map, DOCUMENT_SEQ_OFFSET)[0]
+
+    def bump_document_seq(self) -> None:
+        with self._locked_header():
+            DOCUMENT_SEQ.pack_into(self._map, DOCUMENT_SEQ_OFFSET, self.document_seq + 1)
+
+    def check_key(self, key: str) -> None:
+        """Raise ValueError if key does not fit a row"""
+        _encode(key, KEY.size, "Key")
+
+    def _row_offset(self, row: int) -> int:
+        return self._rows_offset + row * ROW_SIZE
+
+    def _slots(self, key: bytes) -> Iterator[int]:
+        """Slot offsets to probe for key, in order"""
+        slot_count = 2 * self.capacity
+        start = zlib.crc32(key) % slot_count
+        for probe in range(slot_count):
+            yield self._index_offset + ((start + probe) % slot_count) * SLOT.size
+
+    def find(self, key: str) -> Optional[int]:
+        """Row number of key, or None"""
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        encoded = _encode(key, KEY.size, "Key")
+        padded = KEY.pack(encoded)
+        for slot in self._slots(encoded):
+            entry = SLOT.unpack_from(self._map, slot)[0]
+            if entry == 0:
+                return None
+            if self._map[self._row_offset(entry - 1):self._row_offset(entry - 1) + KEY.size] == padded:
+                self._rows[key] = entry - 1
+                return entry - 1
+        return None
+
+    def row(self, key: str) -> int:
+        """Row number of key, allocating a zeroed row on first use"""
+        row = self.find(key)
+        if row is not None:
+            return row
+        encoded = _encode(key, KEY.size, "Key")
+        with self._locked_header():
+            row = self.find(key)
+            if row is not None:
+                return row
+            count = self.row_count
+            if count >= self.capacity:
+                raise RuntimeError(f"Shared state table {self.path} is full ({self.capacity} rows)")
+            KEY.pack_into(self._map, self._row_offset(count), encoded)
+            for slot in self._slots(encoded):
+                if SLOT.unpack_from(self._map, slot)[0] == 0:
+                    # Publish the slot only after the row's key is written
+                    SLOT.pack_into(self._map, slot, count + 1)
+                    break
+            struct.pack_into("<I", self._map, 12, count + 1)
+        self._rows[key] = count
+        return count
+
+    @contextmanager
+    def _locked_header(self) -> Iterator[None]:
+        with self._table_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+
+    @contextmanager
+    def locked(self, rows: Iterable[int]) -> Iterator[None]:
+        """
+        Lock rows against every thread and process. Stripes, then row
+        ranges, are taken in ascending order so lockers never deadlock.
+        """
+        rows = sorted(set(rows))
+        stripes = sorted({row % LOCK_STRIPES for row in rows})
+        for stripe in stripes:
+            self._stripes[stripe].acquire()
+        locked = []
+        try:
+            for row in rows:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._row_offset(row))
+                locked.append(row)
+            yield
+        finally:
+            for row in reversed(locked):
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._row_offset(row))
+            for stripe in reversed(stripes):
+                self._stripes[stripe].release()
+
+    def key(self, row: int) -> str:
+        offset = self._row_offset(row)
+        return _decode(self._map[offset:offset + KEY.size])
+
+    def read_attestation(self, row: int) -> Optional[Tuple]:
+        """(category, address, flags, daily_limit, last_update), or None if row has no attestation"""
+        with self.locked([row]):
+            category, address, flags, daily_limit, last_update = ATTESTATION.unpack_from(
+                self._map, self._row_offset(row) + ATTESTATION_OFFSET
+            )
+        if not flags & ROW_ATTESTED:
+            return None
+        return _decode(category), _decode(address) or None, flags, daily_limit, last_update
+
+    def write_attestation(
+        self,
+        key: str,
+        category: str,
+        address: Optional[str],
+        approved: bool,
+        parent_approved: bool,
+        daily_limit: int,
+        last_update: int
+    ) -> int:
+        """Store a merchant attestation and announce the change to other processes"""
+        flags = ROW_ATTESTED | (ROW_APPROVED if approved else 0) | (ROW_PARENT_APPROVED if parent_approved else 0)
+        packed = self._pack_attestation(key, category, address, flags, daily_limit, last_update)
+        row = self.row(key)
+        with self.locked([row]):
+            self._map[self._row_offset(row) + ATTESTATION_OFFSET:
+                      self._row_offset(row) + ATTESTATION_OFFSET + ATTESTATION.size] = packed
+        with self._locked_header():
+            seq = self.change_seq
+            CHANGE_ENTRY.pack_into(self._map, CHANGE_RING_OFFSET + (seq % CHANGE_RING_SIZE) * CHANGE_ENTRY.size, row)
+            struct.pack_into("<Q", self._map, 16, seq + 1)
+        return row
+
+    def _pack_attestation(
+        self, key: str, category: str, address: Optional[str], flags: int, daily_limit: int, last_update: int
+    ) -> bytes:
+        self.check_key(key)
+        return ATTESTATION.pack(
+            _encode(category, 32, "Category"), _encode(address, 64, "Merchant address"),
+            flags, daily_limit, last_update
+        )
+
+    def check_attestation(self, key: str, category: str, address: Optional[str]) -> None:
+        """Raise ValueError if an attestation's fields do not fit a row, before anything is changed"""
+        self._pack_attestation(key, category, address, 0, 0, 0)
+
+    def changes_since(self, seq: int) -> Tuple[int, Optional[List[int]]]:
+        """
+        (current sequence, rows changed since seq). Rows is None when more
+        changes happened than the ring holds; rescan every row then.
+        """
+        current = self.change_seq
+        if current - seq > CHANGE_RING_SIZE:
+            return current, None
+        rows = [
+            CHANGE_ENTRY.unpack_from(self._map, CHANGE_RING_OFFSET + (s % CHANGE_RING_SIZE) * CHANGE_ENTRY.size)[0]
+            for s in range(seq, current)
+        ]
+        # The ring may have wrapped over entries while they were read
+        if self.change_seq - seq > CHANGE_RING_SIZE:
+            return self.change_seq, None
+        return current, rows
+
+    def read_counter(self, row: int) -> Tuple[int, int, int]:
+        """(day, spent, last_update); the caller holds the row lock"""
+        return COUNTER.unpack_from(self._map, self._row_offset(row) + COUNTER_OFFSET)
+
+    def write_counter(self, row: int, day: int, spent: int, last_update: int) -> None:
+        """The caller holds the row lock"""
+        COUNTER.pack_into(self._map, self._row_offset(row) + COUNTER_OFFSET, day, spent, last_update)
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        self.documents.close()
+        self._map.flush()
+        self._map.close()
+        os.close(self._fd)
+
+
+class SharedDocuments:
+    """
+    Variable-size records that do not fit a fixed row (family rules, teen
+    spend windows), in a SQLite file next to the table. SQLite's write
+    lock serializes writers across processes; writes that other processes
+    cache bump the table's document sequence so they know to reload.
+
+    The connection is opened on first use, so a table inherited across
+    fork() never shares one.
+    """
+
+    def __init__(self, table: SharedStateTable, path: Optional[str] = None):
+        self.table = table
+        self.path = path or table.path + ".db"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """The caller holds self._lock"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        return self._conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM documents WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def items(self, prefix: str) -> Dict[str, bytes]:
+        """Every document whose key starts with prefix"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM documents WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+        return dict(rows)
+
+    def put(self, key: str, value: bytes) -> None:
+        with self.update(key, notify=True) as document:
+            document["value"] = value
+
+    @contextmanager
+    def update(self, key: str, notify: bool = False) -> Iterator[Dict[str, Optional[bytes]]]:
+        """
+        Read-modify-write one document under a write transaction held
+        across processes. Yields {"value": current bytes or None}; a new
+        value set there is written on exit (and with notify, announced).
+
+        Updates are serialized across every key, not per key: the process
+        lock guards its one connection, and BEGIN IMMEDIATE takes SQLite's
+        database-wide write lock, so per-key locks would still queue on
+        the database. Keep the work done inside the block to decoding and
+        re-encoding the document.
+        """
+        changed = False
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM documents WHERE key = ?", (key,)).fetchone()
+                current = row[0] if row else None
+                document = {"value": current}
+                yield document
+                if document["value"] != current:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents (key, value) VALUES (?, ?)", (key, document["value"])
+                    )
+                    changed = True
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if changed and notify:
+            self.table.bump_document_seq()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_tables: Dict[str, SharedStateTable] = {}
+_tables_lock = threading.Lock()
+
+
+def open_table(path: Optional[str] = None, capacity: Optional[int] = None) -> SharedStateTable:
+    """The process's table for path (SHARED_STATE_PATH), created with capacity rows if new"""
+    path = os.path.abspath(path or os.getenv("SHARED_STATE_PATH", "clearspend_state.mmap"))
+    with _tables_lock:
+        table = _tables.get(path)
+        if table is None:
+            table = SharedStateTable(path, capacity or int(os.getenv("SHARED_STATE_CAPACITY", "65536")))
+            _tables[path] = table
+        return table
+
+
+def close_table(table: SharedStateTable) -> None:
+    with _tables_lock:
+        _tables.pop(os.path.abspath(table.path), None)
+    table.close()
+
+
+class SharedSpendCounter:
+    """
+    ShardedSpendCounter over a SharedStateTable: each key's daily counter
+    is a row, so every worker on the host reserves against the same
+    numbers under the row lock.
+    """
+
+    # The table file persists the counters, so the attestation store must not
+    journal = None
+    persistent = True
+
+    def __init__(self, table: SharedStateTable):
+        self.table = table
+
+    def _reserve_locked(self, row: int, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        day = timestamp // SECONDS_IN_DAY
+        stored_day, spent, last_update = self.table.read_counter(row)
+        if stored_day < day:
+            # Reset daily spending if it's a new day
+            stored_day, spent = day, 0
+        new_total = spent + amount
+        if new_total > limit:
+            return False, spent
+        self.table.write_counter(row, stored_day, new_total, timestamp)
+        return True, new_total
+
+    def _release_locked(self, row: int, amount: int, timestamp: int) -> int:
+        stored_day, spent, last_update = self.table.read_counter(row)
+        if stored_day < timestamp // SECONDS_IN_DAY:
+            return 0
+        spent = max(0, spent - amount)
+        self.table.write_counter(row, stored_day, spent, last_update)
+        return spent
+
+    def try_reserve(self, key: str, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        row = self.table.row(key)
+        with self.table.locked([row]):
+            return self._reserve_locked(row, amount, limit, timestamp)
+
+    def release(self, key: str, amount: int, timestamp: int) -> int:
+        row = self.table.row(key)
+        with self.table.locked([row]):
+            return self._release_locked(row, amount, timestamp)
+
+    @contextmanager
+    def hold(self, keys: Iterable[str]) -> Iterator["HeldSharedCounters"]:
+        """Lock every row touched by keys and yield a view for reserving against them"""
+        rows = {key: self.table.row(key) for key in keys}
+        with self.table.locked(rows.values()):
+            yield HeldSharedCounters(self, rows)
+
+    def set_spent(self, key: str, spent: int, timestamp: int) -> None:
+        self.restore(key, timestamp // SECONDS_IN_DAY, spent, timestamp)
+
+    def restore(self, key: str, day: int, spent: int, last_update: int) -> None:
+        row = self.table.row(key)
+        with self.table.locked([row]):
+            self.table.write_counter(row, day, spent, last_update)
+
+    def get_spent(self, key: str, timestamp: int) -> Tuple[int, int]:
+        row = self.table.find(key)
+        if row is None:
+            return 0, 0
+        with self.table.locked([row]):
+            day, spent, last_update = self.table.read_counter(row)
+        if last_update == 0:
+            return 0, 0
+        if day < timestamp // SECONDS_IN_DAY:
+            return 0, last_update
+        return spent, last_update
+
+    def get_spent_many(self, keys: Sequence[str], timestamp: int) -> List[Tuple[int, int]]:
+        return [self.get_spent(key, timestamp) for key in keys]
+
+    def entries(self) -> List[Tuple[str, int, int, int]]:
+        entries = []
+        for row in range(self.table.row_count):
+            with self.table.locked([row]):
+                day, spent, last_update = self.table.read_counter(row)
+            if last_update:
+                entries.append((self.table.key(row), day, spent, last_update))
+        return entries
+
+    def remove(self, key: str) -> None:
+        """Rows are never freed; the counter is zeroed"""
+        row = self.table.find(key)
+        if row is not None:
+            self.restore(key, 0, 0, 0)
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+
+class HeldSharedCounters:
+    """Reservation view over rows locked by SharedSpendCounter.hold"""
+
+    def __init__(self, counter: SharedSpendCounter, rows: Dict[str, int]):
+        self._counter = counter
+        self._rows = rows
+
+    def try_reserve(self, key: str, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        return self._counter._reserve_locked(self._rows[key], amount, limit, timestamp)
+
+    def release(self, key: str, amount: int, timestamp: int) -> int:
+        return self._counter._release_locked(self._rows[key], amount, timestamp)
+
+
+def _encode_windows(windows: List[SpendWindow]) -> bytes:
+    return msgpack.packb(
+        [[window.config.model_dump(), window.head_epoch, window.total, window.amounts.tobytes()] for window in windows],
+        use_bin_type=True
+    )
+
+
+def _decode_windows(value: bytes) -> List[SpendWindow]:
+    windows = []
+    for config, head_epoch, total, amounts in msgpack.unpackb(value, raw=False):
+        window = SpendWindow(SpendWindowConfig(**config))
+        window.head_epoch = head_epoch
+        window.total = total
+        window.amounts = array("q")
+        window.amounts.frombytes(amounts)
+        windows.append(window)
+    return windows
+
+
+class SharedRollingLimits(RollingSpendLimits):
+    """
+    RollingSpendLimits whose per-teen windows live in the table's shared
+    documents: every check and update reads, changes and writes the
+    teen's windows in one cross-process transaction, so a teen's 24h / 7d
+    / 30d limits hold across every worker on the host.
+    """
+
+    def __init__(self, documents: SharedDocuments, default_windows: Optional[List[SpendWindowConfig]] = None):
+        super().__init__(default_windows)
+        self.documents = documents
+
+    @contextmanager
+    def _held(self, teen_address: str) -> Iterator[List[SpendWindow]]:
+        with self.documents.update(WINDOWS_DOCUMENT + teen_address) as document:
+            if document["value"] is None:
+                windows = [SpendWindow(config) for config in self.default_windows]
+            else:
+                windows = _decode_windows(document["value"])
+            yield windows
+            # Teens that were only looked at keep no document
+            untouched = (
+                document["value"] is None
+                and not any(window.total for window in windows)
+                and [window.config for window in windows] == self.default_windows
+            )
+            if not untouched:
+                document["value"] = _encode_windows(windows)
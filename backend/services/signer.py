@@ -0,0 +1,215 @@
+"""
+ClearSpend Transaction Signer
+Cached signing keys and addresses, group signing and optional process-pool ed25519 signing
+"""
+
+import base64
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from nacl.signing import SigningKey
+from algosdk import constants, encoding
+from algosdk.transaction import SignedTransaction, Transaction
+
+from .purchase_templates import encode_signed
+
+logger = logging.getLogger(__name__)
+
+# Signing keys each pool worker keeps, keyed by seed
+WORKER_KEY_CACHE_SIZE = 1024
+
+_worker_keys: Dict[bytes, SigningKey] = {}
+
+Keys = Union[str, Sequence[str]]
+
+
+def sign_payloads(jobs: Sequence[Tuple[bytes, bytes]]) -> List[bytes]:
+    """Ed25519 signatures of (seed, message) pairs; what a pool worker runs"""
+    signatures = []
+    for seed, message in jobs:
+        signing_key = _worker_keys.get(seed)
+        if signing_key is None:
+            if len(_worker_keys) >= WORKER_KEY_CACHE_SIZE:
+                _worker_keys.clear()
+            signing_key = _worker_keys[seed] = SigningKey(seed)
+        signatures.append(signing_key.sign(message).signature)
+    return signatures
+
+
+class SigningAccount(NamedTuple):
+    """What signing needs from a private key, derived once"""
+    address: str
+    seed: bytes
+    signing_key: SigningKey
+
+
+class Signer:
+    """
+    Signs transactions with keys derived once per private key: the
+    address and ed25519 signing key of each key are cached, so a group
+    costs one signature per transaction and nothing else.
+
+    With processes > 0 the async methods send the signatures to a pool of
+    worker processes (spawned on first use), keeping the event loop free
+    while thousands of transactions a minute are signed. Transactions are
+    encoded in the caller's process; workers only see seeds and bytes.
+    """
+
+    def __init__(self, processes: int = 0, max_keys: int = 10000):
+        self.processes = processes
+        self.max_keys = max_keys
+        self._accounts: Dict[str, SigningAccount] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.transactions_signed = 0
+        self.transactions_offloaded = 0
+
+    def account(self, private_key: str) -> SigningAccount:
+        account = self._accounts.get(private_key)
+        if account is None:
+            raw = base64.b64decode(private_key)
+            seed = raw[:constants.key_len_bytes]
+            account = SigningAccount(encoding.encode_address(raw[constants.key_len_bytes:]), seed, SigningKey(seed))
+            with self._lock:
+                if len(self._accounts) >= self.max_keys:
+                    self._accounts.clear()
+                self._accounts[private_key] = account
+        return account
+
+    def address(self, private_key: str) -> str:
+        """Address of a private key, without re-deriving it on every call"""
+        return self.account(private_key).address
+
+    def sign(self, txn: Transaction, private_key: str) -> SignedTransaction:
+        return self.sign_group([txn], private_key)[0]
+
+    def sign_group(self, txns: Sequence[Transaction], private_keys: Keys) -> List[SignedTransaction]:
+        """Sign a group in this thread; private_keys is one key or one per transaction"""
+        accounts = self._accounts_for(txns, private_keys)
+        signatures = [
+            account.signing_key.sign(txn.bytes_to_sign()).signature
+            for txn, account in zip(txns, accounts)
+        ]
+        self.transactions_signed += len(txns)
+        return self._signed(txns, accounts, signatures)
+
+    def sign_encoded_group(self, encoded_txns: Sequence[bytes], private_key: str, sender: str) -> List[bytes]:
+        """
+        Sign msgpack-encoded transactions of one sender, as rendered by
+        PurchaseGroupTemplates; returns encoded signed transactions
+        """
+        account = self.account(private_key)
+        signatures = [account.signing_key.sign(constants.txid_prefix + encoded).signature for encoded in encoded_txns]
+        self.transactions_signed += len(encoded_txns)
+        return self._encoded_signed(encoded_txns, account, sender, signatures)
+
+    async def sign_encoded_group_async(self, encoded_txns: Sequence[bytes], private_key: str, sender: str) -> List[bytes]:
+        if not self.processes:
+            return self.sign_encoded_group(encoded_txns, private_key, sender)
+
+        account = self.account(private_key)
+        jobs = [(account.seed, constants.txid_prefix + encoded) for encoded in encoded_txns]
+        signatures = await asyncio.get_running_loop().run_in_executor(self._executor(), sign_payloads, jobs)
+        self.transactions_signed += len(jobs)
+        self.transactions_offloaded += len(jobs)
+        return self._encoded_signed(encoded_txns, account, sender, signatures)
+
+    async def sign_group_async(self, txns: Sequence[Transaction], private_keys: Keys) -> List[SignedTransaction]:
+        return (await self.sign_groups_async([(txns, private_keys)]))[0]
+
+    async def sign_groups_async(
+        self,
+        groups: Sequence[Tuple[Sequence[Transaction], Keys]]
+    ) -> List[List[SignedTransaction]]:
+        """
+        Sign many groups; with a pool they are split into one batch per
+        worker, so each process round trip carries many signatures
+        """
+        if not self.processes:
+            return [self.sign_group(txns, private_keys) for txns, private_keys in groups]
+
+        accounts = [self._accounts_for(txns, private_keys) for txns, private_keys in groups]
+        jobs = [
+            (account.seed, txn.bytes_to_sign())
+            for (txns, _), group_accounts in zip(groups, accounts)
+            for txn, account in zip(txns, group_accounts)
+        ]
+        batch_size = -(-len(jobs) // self.processes)
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(pool, sign_payloads, jobs[start:start + batch_size])
+            for start in range(0, len(jobs), batch_size)
+        ])
+        signatures = [signature for batch in batches for signature in batch]
+        self.transactions_signed += len(jobs)
+        self.transactions_offloaded += len(jobs)
+
+        signed = []
+        position = 0
+        for (txns, _), group_accounts in zip(groups, accounts):
+            signed.append(self._signed(txns, group_accounts, signatures[position:position + len(txns)]))
+            position += len(txns)
+        return signed
+
+    def _accounts_for(self, txns: Sequence[Transaction], private_keys: Keys) -> List[SigningAccount]:
+        if isinstance(private_keys, str):
+            return [self.account(private_keys)] * len(txns)
+        if len(private_keys) != len(txns):
+            raise ValueError("One private key per transaction")
+        return [self.account(private_key) for private_key in private_keys]
+
+    def _signed(
+        self,
+        txns: Sequence[Transaction],
+        accounts: Sequence[SigningAccount],
+        signatures: Sequence[bytes]
+    ) -> List[SignedTransaction]:
+        # A key that is not the sender's signs as a rekeyed account, as Transaction.sign does
+        return [
+            SignedTransaction(
+                txn,
+                base64.b64encode(signature).decode(),
+                None if txn.sender == account.address else account.address
+            )
+            for txn, account, signature in zip(txns, accounts, signatures)
+        ]
+
+    def _encoded_signed(
+        self,
+        encoded_txns: Sequence[bytes],
+        account: SigningAccount,
+        sender: str,
+        signatures: Sequence[bytes]
+    ) -> List[bytes]:
+        authorizing_public_key = None if sender == account.address else encoding.decode_address(account.address)
+        return [
+            encode_signed(encoded, signature, authorizing_public_key)
+            for encoded, signature in zip(encoded_txns, signatures)
+        ]
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the service process runs threads
+                self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+                logger.info(f"Started {self.processes} signing processes")
+            return self._pool
+
+    def stats(self) -> Dict:
+        return {
+            "processes": self.processes,
+            "cached_keys": len(self._accounts),
+            "transactions_signed": self.transactions_signed,
+            "transactions_offloaded": self.transactions_offloaded
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,186 @@
+"""
+ClearSpend Spend Counter Engine
+Sharded daily spend counters with atomic check-and-reserve semantics
+"""
+
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SECONDS_IN_DAY = 86400
+
+
+class ShardedSpendCounter:
+    """
+    Daily spend counters keyed by merchant name (or any other limit key).
+
+    Keys are spread over a fixed number of shards, each guarded by its own
+    lock. Reservations against the same key are serialized, so a
+    check-and-reserve can never overshoot the limit, while reservations
+    against different keys rarely contend.
+    """
+
+    # Counters live in this process only (see RedisSpendCounter)
+    persistent = False
+
+    def __init__(self, num_shards: int = 64):
+        if num_shards < 1:
+            raise ValueError("num_shards must be positive")
+        self.num_shards = num_shards
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        # Each entry is [day, spent, last_update]
+        self._shards: List[Dict[str, List[int]]] = [{} for _ in range(num_shards)]
+        # Called as journal(key, entry) under the shard lock after every
+        # change (entry is None on removal), so a write-ahead log sees
+        # changes to one key in the order they were applied
+        self.journal: Optional[Callable[[str, Optional[List[int]]], None]] = None
+
+    def _shard_index(self, key: str) -> int:
+        """Stable shard index for a key"""
+        return zlib.crc32(key.encode()) % self.num_shards
+
+    def _reserve_unlocked(self, index: int, key: str, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        """Check-and-reserve on a shard whose lock the caller holds"""
+        day = timestamp // SECONDS_IN_DAY
+        shard = self._shards[index]
+        entry = shard.get(key)
+        if entry is None:
+            entry = [day, 0, timestamp]
+            shard[key] = entry
+        elif entry[0] < day:
+            # Reset daily spending if it's a new day
+            entry[0] = day
+            entry[1] = 0
+
+        new_total = entry[1] + amount
+        if new_total > limit:
+            return False, entry[1]
+
+        entry[1] = new_total
+        entry[2] = timestamp
+        if self.journal is not None:
+            self.journal(key, entry)
+        return True, new_total
+
+    def _release_unlocked(self, index: int, key: str, amount: int, timestamp: int) -> int:
+        """Release on a shard whose lock the caller holds"""
+        entry = self._shards[index].get(key)
+        if entry is None or entry[0] < timestamp // SECONDS_IN_DAY:
+            return 0
+        entry[1] = max(0, entry[1] - amount)
+        if self.journal is not None:
+            self.journal(key, entry)
+        return entry[1]
+
+    def try_reserve(self, key: str, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        """
+        Atomically reserve amount against the daily limit for key.
+        Returns (approved, spent_today) where spent_today includes the
+        reservation when approved.
+        """
+        index = self._shard_index(key)
+        with self._locks[index]:
+            return self._reserve_unlocked(index, key, amount, limit, timestamp)
+
+    def release(self, key: str, amount: int, timestamp: int) -> int:
+        """Give back a reservation that was not used (e.g. failed execution)"""
+        index = self._shard_index(key)
+        with self._locks[index]:
+            return self._release_unlocked(index, key, amount, timestamp)
+
+    @contextmanager
+    def hold(self, keys: Iterable[str]) -> Iterator["HeldCounters"]:
+        """
+        Lock every shard touched by keys (in shard order, so holders never
+        deadlock) and yield a view for reserving against those keys.
+        Used to apply a sequence of reservations atomically.
+        """
+        indexes = sorted({self._shard_index(key) for key in keys})
+        for index in indexes:
+            self._locks[index].acquire()
+        try:
+            yield HeldCounters(self)
+        finally:
+            for index in reversed(indexes):
+                self._locks[index].release()
+
+    def set_spent(self, key: str, spent: int, timestamp: int) -> None:
+        """Seed or overwrite the counter for key"""
+        index = self._shard_index(key)
+        with self._locks[index]:
+            entry = self._shards[index][key] = [timestamp // SECONDS_IN_DAY, spent, timestamp]
+            if self.journal is not None:
+                self.journal(key, entry)
+
+    def restore(self, key: str, day: int, spent: int, last_update: int) -> None:
+        """Load a persisted counter as-is (not journaled)"""
+        index = self._shard_index(key)
+        with self._locks[index]:
+            self._shards[index][key] = [day, spent, last_update]
+
+    def restore_many(self, entries: Iterable[Sequence]) -> None:
+        """Load persisted (key, day, spent, last_update) counters as-is, taking each shard lock once"""
+        by_shard: List[Dict[str, List[int]]] = [{} for _ in range(self.num_shards)]
+        num_shards = self.num_shards
+        for key, day, spent, last_update in entries:
+            by_shard[zlib.crc32(key.encode()) % num_shards][key] = [day, spent, last_update]
+        for index, restored in enumerate(by_shard):
+            with self._locks[index]:
+                self._shards[index].update(restored)
+
+    def live_entries(self, timestamp: int) -> List[Tuple[str, int, int, int]]:
+        """
+        Counters with spend on timestamp's day, as (key, day, spent,
+        last_update). Every other counter reads as zero; a snapshot that
+        leaves them out loses only their last spend time.
+        """
+        day = timestamp // SECONDS_IN_DAY
+        return [entry for entry in self.entries() if entry[1] >= day and entry[2] > 0]
+
+    def entries(self) -> List[Tuple[str, int, int, int]]:
+        """Copy of every counter as (key, day, spent, last_update), one shard lock at a time"""
+        entries = []
+        for index, shard in enumerate(self._shards):
+            with self._locks[index]:
+                entries.extend((key, *entry) for key, entry in shard.items())
+        return entries
+
+    def get_spent(self, key: str, timestamp: int) -> Tuple[int, int]:
+        """Return (spent_today, last_update) for key as of timestamp"""
+        index = self._shard_index(key)
+        with self._locks[index]:
+            entry = self._shards[index].get(key)
+            if entry is None:
+                return 0, 0
+            if entry[0] < timestamp // SECONDS_IN_DAY:
+                return 0, entry[2]
+            return entry[1], entry[2]
+
+    def get_spent_many(self, keys: Iterable[str], timestamp: int) -> List[Tuple[int, int]]:
+        return [self.get_spent(key, timestamp) for key in keys]
+
+    def remove(self, key: str) -> None:
+        """Drop the counter for key"""
+        index = self._shard_index(key)
+        with self._locks[index]:
+            if self._shards[index].pop(key, None) is not None and self.journal is not None:
+                self.journal(key, None)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class HeldCounters:
+    """Reservation view over shards locked by ShardedSpendCounter.hold"""
+
+    def __init__(self, counter: ShardedSpendCounter):
+        self._counter = counter
+
+    def try_reserve(self, key: str, amount: int, limit: int, timestamp: int) -> Tuple[bool, int]:
+        counter = self._counter
+        return counter._reserve_unlocked(counter._shard_index(key), key, amount, limit, timestamp)
+
+    def release(self, key: str, amount: int, timestamp: int) -> int:
+        counter = self._counter
+        return counter._release_unlocked(counter._shard_index(key), key, amount, timestamp)
@@ -0,0 +1,409 @@
+"""
+ClearSpend Transaction Store
+Local SQLite copy of watched addresses' transactions, kept current by an
+incremental indexer sync
+"""
+
+import os
+import time
+import base64
+import asyncio
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from .blockchain_service import (
+    BlockchainService,
+    TRANSACTION_PAGE_SIZE,
+    decode_history_cursor,
+    encode_history_cursor
+)
+from .analytics_aggregator import AnalyticsAggregator
+from .block_ingestor import BlockIngestor
+
+logger = logging.getLogger(__name__)
+
+PURCHASE_NOTE_PREFIX = "ClearSpend purchase at "
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watched_addresses (
+    address TEXT PRIMARY KEY,
+    synced_round INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    address TEXT NOT NULL,
+    id TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    intra_round INTEGER NOT NULL,
+    timestamp INTEGER,
+    type TEXT,
+    sender TEXT,
+    receiver TEXT,
+    amount INTEGER NOT NULL DEFAULT 0,
+    note TEXT,
+    merchant TEXT,
+    PRIMARY KEY (address, id)
+);
+CREATE INDEX IF NOT EXISTS transactions_by_round
+    ON transactions (address, round DESC, intra_round DESC);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    round INTEGER NOT NULL
+);
+"""
+
+
+def purchase_merchant(note: Optional[str]) -> Optional[str]:
+    """Merchant name from a base64 'ClearSpend purchase at ...' note, if any"""
+    if not note:
+        return None
+    try:
+        text = base64.b64decode(note).decode()
+    except Exception:
+        return None
+    if not text.startswith(PURCHASE_NOTE_PREFIX):
+        return None
+    return text[len(PURCHASE_NOTE_PREFIX):].strip()
+
+
+class TransactionStore:
+    """
+    Embedded SQLite store of indexer transactions per watched address.
+    Rows are keyed by (address, id) so replayed pages are idempotent, and
+    indexed by (address, round) for newest-first history pages.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("TRANSACTION_STORE_PATH", "clearspend_transactions.db")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def watch(self, address: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO watched_addresses (address) VALUES (?)", (address,)
+            )
+
+    def watched_addresses(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT address FROM watched_addresses")]
+
+    def synced_round(self, address: str) -> Optional[int]:
+        """Round the address is synced through, or None if it is not watched"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_round FROM watched_addresses WHERE address = ?", (address,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_transactions(self, address: str, transactions: List[Dict]) -> List[Dict]:
+        """
+        Insert raw indexer transactions for an address, ignoring ones
+        already stored. Returns the newly inserted rows.
+        """
+        inserted = []
+        with self._lock, self._conn:
+            for tx in transactions:
+                payment = tx.get("payment-transaction", {})
+                row = {
+                    "address": address,
+                    "id": tx["id"],
+                    "round": tx.get("confirmed-round") or 0,
+                    "intra_round": tx.get("intra-round-offset") or 0,
+                    "timestamp": tx.get("round-time"),
+                    "type": tx.get("tx-type"),
+                    "sender": tx.get("sender"),
+                    "receiver": payment.get("receiver"),
+                    "amount": payment.get("amount", 0),
+                    "note": tx.get("note"),
+                    "merchant": purchase_merchant(tx.get("note"))
+                }
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO transactions VALUES "
+                    "(:address, :id, :round, :intra_round, :timestamp, :type, "
+                    ":sender, :receiver, :amount, :note, :merchant)",
+                    row
+                )
+                if cursor.rowcount:
+                    inserted.append(row)
+        return inserted
+
+    def iter_rows(self, address: str) -> Iterator[Dict]:
+        """Every stored row for an address, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM transactions WHERE address = ? ORDER BY round, intra_round",
+                (address,)
+            ).fetchall()
+        for row in rows:
+            yield dict(row)
+
+    def set_synced_round(self, address: str, round_number: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE watched_addresses SET synced_round = MAX(synced_round, ?) WHERE address = ?",
+                (round_number, address)
+            )
+
+    def get_checkpoint(self, name: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT round FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, name: str, round_number: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO checkpoints (name, round) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET round = excluded.round",
+                (name, round_number)
+            )
+
+    def history(self, address: str, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """
+        Newest-first page of stored transactions in the same shape as
+        BlockchainService.get_transaction_page_async.
+        Raises ValueError for a cursor this store did not issue.
+        """
+        params: list = [address]
+        where = "address = ?"
+        if cursor:
+            round_number, intra_round = decode_history_cursor(cursor)
+            where += " AND (round, intra_round) < (?, ?)"
+            params += [round_number, intra_round]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM transactions WHERE {where} "
+                "ORDER BY round DESC, intra_round DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        page = [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "round": row["round"],
+                "timestamp": row["timestamp"],
+                "sender": row["sender"],
+                "receiver": row["receiver"],
+                "amount": row["amount"],
+                "note": row["note"],
+                "confirmed": True
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_history_cursor(last["round"], last["intra_round"])
+        return {"transactions": page, "next_cursor": next_cursor}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TransactionSync:
+    """
+    Keeps a TransactionStore current. Each indexer sync asks only for
+    rounds after the address's synced round. With a BlockIngestor, watched
+    addresses are also subscribed to new blocks; once an address's indexer
+    sync reaches the round the ingestor started at, the ingestor alone
+    keeps it current and the periodic indexer sync skips it.
+    """
+
+    def __init__(
+        self,
+        blockchain_service: BlockchainService,
+        store: TransactionStore,
+        interval: Optional[float] = None,
+        aggregator: Optional[AnalyticsAggregator] = None,
+        ingestor: Optional[BlockIngestor] = None
+    ):
+        self.blockchain_service = blockchain_service
+        self.store = store
+        self.aggregator = aggregator or AnalyticsAggregator()
+        self.ingestor = ingestor
+        self._subscriptions: Dict[str, int] = {}
+        # Orders store inserts + aggregate updates against aggregate loads,
+        # so a row is never counted twice or missed
+        self._ingest_lock = threading.Lock()
+        self.interval = interval if interval is not None else float(
+            os.getenv("TRANSACTION_SYNC_INTERVAL", "5.0")
+        )
+        self._address_locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+        # First syncs and aggregate loads running in the background, by address
+        self._warmups: Dict[str, asyncio.Task] = {}
+
+    async def sync_address(self, address: str) -> int:
+        """Pull transactions newer than the synced round; returns the new synced round"""
+        lock = self._address_locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            self.store.watch(address)
+            synced_round = self.store.synced_round(address) or 0
+            indexer = self.blockchain_service.async_indexer
+
+            start = time.perf_counter()
+            added = 0
+            current_round = synced_round
+            cursor = None
+            while True:
+                response = await indexer.search_transactions(
+                    address=address,
+                    limit=TRANSACTION_PAGE_SIZE,
+                    next_page=cursor,
+                    min_round=synced_round + 1
+                )
+                # The first page's current-round bounds everything this pass can see
+                if cursor is None:
+                    current_round = response.get("current-round", synced_round)
+                page = response.get("transactions", [])
+                added += await asyncio.to_thread(self._ingest, address, page)
+                cursor = response.get("next-token")
+                if not page or not cursor:
+                    break
+
+            self.store.set_synced_round(address, current_round)
+            if added:
+                logger.info(
+                    f"Synced {added} transactions for {address} through round {current_round} "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+            return current_round
+
+    async def ensure_synced(self, address: str) -> Optional[int]:
+        """
+        Watch an address. Returns the synced round, or None while its first
+        sync is still running in the background (started by this call).
+        """
+        if not self.store.synced_round(address):
+            self._warm_up(address)
+            return None
+        self._follow(address)
+        return self.synced_round(address)
+
+    def _warm_up(self, address: str) -> None:
+        """Start the address's first sync and aggregate load unless already running"""
+        task = self._warmups.get(address)
+        if task is None or task.done():
+            self._warmups[address] = asyncio.get_running_loop().create_task(self._initial_sync(address))
+
+    async def _initial_sync(self, address: str) -> None:
+        try:
+            await self.sync_address(address)
+            self._follow(address)
+            await asyncio.to_thread(self._load_aggregate, address)
+        except Exception as e:
+            logger.error(f"Initial transaction sync for {address} failed: {e}")
+
+    def synced_round(self, address: str) -> Optional[int]:
+        """Round the local copy of an address's history is complete through"""
+        store_round = self.store.synced_round(address)
+        if store_round is not None and self._is_covered(address, store_round):
+            return max(store_round, self.ingestor.processed_round)
+        return store_round
+
+    def _is_covered(self, address: str, store_round: int) -> bool:
+        """Whether the ingestor delivers every round after store_round for address"""
+        return (
+            self.ingestor is not None
+            and self.ingestor.is_running
+            and address in self._subscriptions
+            and store_round >= self.ingestor.started_round - 1
+        )
+
+    def _follow(self, address: str) -> None:
+        """Subscribe a watched address to the block ingestor"""
+        if self.ingestor is None or address in self._subscriptions:
+            return
+        self._subscriptions[address] = self.ingestor.subscribe(
+            address,
+            lambda round_number, transactions: asyncio.to_thread(self._ingest, address, transactions)
+        )
+
+    def _ingest(self, address: str, transactions: List[Dict]) -> int:
+        with self._ingest_lock:
+            inserted = self.store.add_transactions(address, transactions)
+            self.aggregator.apply(address, inserted)
+        return len(inserted)
+
+    def _load_aggregate(self, address: str) -> None:
+        if not self.aggregator.is_loaded(address):
+            with self._ingest_lock:
+                if not self.aggregator.is_loaded(address):
+                    self.aggregator.load(address, self.store.iter_rows(address))
+
+    def analytics(self, address: str) -> Dict:
+        """
+        Precomputed analytics for a synced address. The aggregate is built
+        from the store once per process (inline, so call this off the event
+        loop); ingestion keeps it current after that.
+        """
+        self._load_aggregate(address)
+        return self.aggregator.snapshot(address, int(datetime.now().timestamp()))
+
+    def loaded_analytics(self, address: str) -> Optional[Dict]:
+        """
+        Analytics if the aggregate is already built, else None after
+        starting the build in a worker thread. Safe on the event loop.
+        """
+        if self.aggregator.is_loaded(address):
+            return self.aggregator.snapshot(address, int(datetime.now().timestamp()))
+        task = self._warmups.get(address)
+        if task is None or task.done():
+            self._warmups[address] = asyncio.get_running_loop().create_task(self._load_analytics(address))
+        return None
+
+    async def _load_analytics(self, address: str) -> None:
+        try:
+            await asyncio.to_thread(self._load_aggregate, address)
+        except Exception as e:
+            logger.error(f"Loading analytics for {address} failed: {e}")
+
+    async def sync_all(self) -> None:
+        for address in self.store.watched_addresses():
+            if self._is_covered(address, self.store.synced_round(address) or 0):
+                continue
+            try:
+                await self.sync_address(address)
+            except Exception as e:
+                logger.error(f"Transaction sync for {address} failed: {e}")
+
+    def ensure_running(self) -> None:
+        """Start the block ingestor and periodic background sync on the running event loop if needed"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        for task in self._warmups.values():
+            task.cancel()
+        self._warmups = {}
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.ingestor is not None:
+            await self.ingestor.stop()
+
+    async def _run(self) -> None:
+        while True:
+            if self.ingestor is not None and not self.ingestor.is_running:
+                try:
+                    await self.ingestor.start()
+                    for address in self.store.watched_addresses():
+                        self._follow(address)
+                except Exception as e:
+                    logger.error(f"Failed to start block ingestor: {e}")
+            await self.sync_all()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,205 @@
+"""
+ClearSpend Oracle Write Coalescer
+Collects attestation oracle mutations over a short window and submits them
+as atomic groups of app calls, several groups at a time
+"""
+
+import os
+import time
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .blockchain_service import BlockchainService
+
+logger = logging.getLogger(__name__)
+
+# Algorand's limit on transactions in one atomic group
+MAX_GROUP_SIZE = 16
+
+
+class OracleMutation(NamedTuple):
+    """One attestation oracle app call waiting to be sent"""
+    private_key: str
+    method: str
+    args: Tuple[bytes, ...]
+
+
+class OracleWriteCoalescer:
+    """
+    Callers submit mutations and get a Future (or block in call()). A
+    flusher thread waits up to `window` seconds for more mutations to
+    arrive, then sends everything pending as groups of up to `group_size`
+    app calls on a pool of `concurrency` threads, each of which waits for
+    its group to confirm. Identical mutations pending together are sent
+    once and share the outcome.
+
+    A group is atomic, so one rejected call fails all of it; the members
+    of a failed group are then retried as single calls so each caller gets
+    its own outcome. Every Future resolves to a result dict, including
+    when sending raises or the coalescer is closed first.
+    """
+
+    def __init__(
+        self,
+        blockchain_service: BlockchainService,
+        window: Optional[float] = None,
+        group_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.blockchain_service = blockchain_service
+        self.window = float(os.getenv("ORACLE_WRITE_WINDOW", "0.05")) if window is None else window
+        group_size = int(os.getenv("ORACLE_WRITE_GROUP_SIZE", "16")) if group_size is None else group_size
+        self.group_size = max(1, min(MAX_GROUP_SIZE, group_size))
+        self.concurrency = int(os.getenv("ORACLE_WRITE_CONCURRENCY", "8")) if concurrency is None else concurrency
+        # Bounds call() and close(); a group waits up to 4 rounds to confirm, then may be retried singly
+        self.timeout = float(os.getenv("ORACLE_WRITE_TIMEOUT", "60")) if timeout is None else timeout
+
+        self._pending: Dict[OracleMutation, Future] = {}
+        self._inflight: set = set()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+        self.groups_sent = 0
+        self.mutations_sent = 0
+        self.retried = 0
+
+    def submit(self, private_key: str, method: str, args: List[bytes]) -> Future:
+        """Queue a mutation; the Future resolves to the call_attestation_oracle result shape"""
+        mutation = OracleMutation(private_key, method, tuple(args))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Oracle write coalescer is closed")
+            future = self._pending.get(mutation)
+            if future is None:
+                future = self._pending[mutation] = Future()
+                self._ensure_running()
+                self._condition.notify()
+            return future
+
+    def call(self, private_key: str, method: str, args: List[bytes], timeout: Optional[float] = None) -> Dict:
+        """Submit a mutation and wait for its outcome (at most timeout seconds, default self.timeout)"""
+        try:
+            return self.submit(private_key, method, args).result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            return {"error": f"Timed out waiting for {method} to confirm"}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _ensure_running(self) -> None:
+        """Start the flusher thread and sender pool (caller holds the condition)"""
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="oracle-writes")
+            self._thread = threading.Thread(target=self._run, name="oracle-write-coalescer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # Let more mutations join unless a full group is already waiting
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.group_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = list(self._pending.items())
+                self._pending = {}
+                self._inflight.update(future for _, future in batch)
+
+            for start in range(0, len(batch), self.group_size):
+                group = batch[start:start + self.group_size]
+                try:
+                    self._executor.submit(self._send_group, group)
+                except RuntimeError as e:
+                    # The sender pool was shut down by a close() that timed out
+                    for _, future in group:
+                        self._resolve(future, {"error": str(e)})
+
+    def _send_group(self, group: List[Tuple[OracleMutation, Future]]) -> None:
+        try:
+            result = self.blockchain_service.call_attestation_oracle_group(
+                [(mutation.private_key, mutation.method, list(mutation.args)) for mutation, _ in group]
+            )
+            with self._condition:
+                self.groups_sent += 1
+                self.mutations_sent += len(group)
+
+            if result.get("success"):
+                outcomes = [
+                    {"success": True, "transaction_id": txid, "confirmed_round": result.get("confirmed_round")}
+                    for txid in result["transaction_ids"]
+                ]
+                if len(outcomes) != len(group):
+                    raise ValueError(f"Oracle group returned {len(outcomes)} transaction ids for {len(group)} calls")
+                for (_, future), outcome in zip(group, outcomes):
+                    self._resolve(future, outcome)
+            elif len(group) > 1:
+                logger.warning(f"Oracle write group of {len(group)} failed ({result.get('error')}); retrying singly")
+                with self._condition:
+                    self.retried += len(group)
+                for item in group:
+                    self._executor.submit(self._send_group, [item])
+            else:
+                self._resolve(group[0][1], {"error": result.get("error", "Oracle call failed")})
+
+        except Exception as e:
+            logger.error(f"Failed to send oracle write group: {e}")
+            for _, future in group:
+                self._resolve(future, {"error": str(e)})
+
+    def _resolve(self, future: Future, result: Dict) -> None:
+        with self._condition:
+            self._inflight.discard(future)
+            if future.done():
+                return
+            future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Get pending / in-flight mutation and group counters"""
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "in_flight": len(self._inflight),
+                "groups_sent": self.groups_sent,
+                "mutations_sent": self.mutations_sent,
+                "retried": self.retried
+            }
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Send pending mutations and wait up to timeout seconds (default
+        self.timeout) for their outcomes; any still unresolved then get an
+        error result, and the threads are stopped
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread, executor = self._thread, self._executor
+        if thread is None:
+            return
+        thread.join(max(0.0, deadline - time.monotonic()))
+        while True:
+            with self._condition:
+                inflight = list(self._inflight)
+            remaining = deadline - time.monotonic()
+            if not inflight or remaining <= 0:
+                break
+            wait(inflight, timeout=remaining)
+
+        with self._condition:
+            abandoned = list(self._inflight) + list(self._pending.values())
+            self._pending = {}
+        for future in abandoned:
+            self._resolve(future, {"error": "Oracle write coalescer closed before the write confirmed"})
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,320 @@
+"""
+ClearSpend Oracle Write Queue
+Durable write-behind queue for attestation oracle mutations: local changes
+apply at once and the chain writes are retried in the background
+"""
+
+import os
+import time
+import random
+import sqlite3
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Set
+
+import msgpack
+
+from .write_coalescer import OracleWriteCoalescer
+
+logger = logging.getLogger(__name__)
+
+WRITE_PENDING = "pending"
+WRITE_CONFIRMED = "confirmed"
+WRITE_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS oracle_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    merchant TEXT NOT NULL,
+    method TEXT NOT NULL,
+    args BLOB NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    transaction_id TEXT,
+    confirmed_round INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS oracle_writes_pending ON oracle_writes (status, merchant, id);
+"""
+
+
+class OracleWriteQueue:
+    """
+    Mutations are written to a SQLite table and acknowledged with a write
+    id before anything is sent. A worker thread claims due writes, hands
+    them to the coalescer (so they still go out as atomic groups) and
+    records each outcome: confirmed, retried after an exponential backoff
+    with jitter, or failed once max_attempts is used up.
+
+    Writes for one merchant go out in the order they were queued: only the
+    oldest pending write per merchant can be claimed. A claim is a lease
+    taken under SQLite's write lock, so several processes can share one
+    queue file; a lease left by a crashed process expires and the write is
+    sent again. close() drains what it can and leaves the rest on disk for
+    the next start.
+    """
+
+    def __init__(
+        self,
+        coalescer: OracleWriteCoalescer,
+        private_key: Callable[[], str],
+        path: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        poll_interval: float = 1.0
+    ):
+        self.coalescer = coalescer
+        self.private_key = private_key
+        self.path = path or os.getenv("ORACLE_WRITE_QUEUE_PATH", "clearspend_oracle_writes.db")
+        self.max_attempts = int(os.getenv("ORACLE_WRITE_MAX_ATTEMPTS", "8")) if max_attempts is None else max_attempts
+        self.backoff = float(os.getenv("ORACLE_WRITE_BACKOFF", "1")) if backoff is None else backoff
+        self.max_backoff = float(os.getenv("ORACLE_WRITE_MAX_BACKOFF", "300")) if max_backoff is None else max_backoff
+        # Other processes' writes and expired leases are picked up at least this often
+        self.poll_interval = poll_interval
+
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+        self._condition = threading.Condition()
+        self._inflight: Dict[int, Future] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        if self._count(WRITE_PENDING):
+            # Writes left over from the last run
+            with self._condition:
+                self._ensure_running()
+
+    @property
+    def lease(self) -> float:
+        """How long a claimed write is reserved; past the coalescer's bound on an outcome"""
+        return self.coalescer.timeout * 2
+
+    def enqueue(self, merchant: str, method: str, args: List[bytes]) -> int:
+        """Queue a chain write; returns its write id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO oracle_writes "
+                "(merchant, method, args, status, next_attempt, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (merchant, method, msgpack.packb(list(args)), WRITE_PENDING, now, now, now)
+            )
+            write_id = cursor.lastrowid
+        with self._condition:
+            if self._closed:
+                logger.warning(f"Oracle write {write_id} queued after close; it is sent on the next start")
+            else:
+                self._ensure_running()
+                self._condition.notify()
+        return write_id
+
+    def status(self, write_id: int) -> Optional[Dict]:
+        """A write's state, or None if there is no such write"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, merchant, method, status, attempts, next_attempt, last_error, "
+                "transaction_id, confirmed_round, created_at, updated_at "
+                "FROM oracle_writes WHERE id = ?",
+                (write_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = [
+            "write_id", "merchant", "method", "status", "attempts", "next_attempt", "last_error",
+            "transaction_id", "confirmed_round", "created_at", "updated_at"
+        ]
+        return dict(zip(keys, row))
+
+    def pending_merchants(self) -> Set[str]:
+        """Merchants with a write not yet confirmed or failed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT merchant FROM oracle_writes WHERE status = ?", (WRITE_PENDING,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def stats(self) -> Dict:
+        """Write counts by status, plus this process's in-flight writes"""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM oracle_writes GROUP BY status"))
+        with self._condition:
+            inflight = len(self._inflight)
+        return {
+            "pending": counts.get(WRITE_PENDING, 0),
+            "confirmed": counts.get(WRITE_CONFIRMED, 0),
+            "failed": counts.get(WRITE_FAILED, 0),
+            "in_flight": inflight
+        }
+
+    def _count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM oracle_writes WHERE status = ?", (status,)).fetchone()[0]
+
+    def _ensure_running(self) -> None:
+        """Start the worker thread (caller holds the condition)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="oracle-write-queue", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                capacity = self.coalescer.group_size * self.coalescer.concurrency * 2 - len(self._inflight)
+            try:
+                claimed = self._claim(capacity) if capacity > 0 else []
+            except Exception as e:
+                logger.error(f"Failed to claim oracle writes: {e}")
+                with self._condition:
+                    self._condition.wait(self.poll_interval)
+                continue
+            for row in claimed:
+                self._send(row)
+
+            with self._condition:
+                if self._closed:
+                    return
+                if not claimed:
+                    self._condition.wait(self._idle_wait())
+
+    def _idle_wait(self) -> float:
+        """Seconds until the next backed-off write is due, at most poll_interval"""
+        with self._lock:
+            due = self._conn.execute(
+                "SELECT MIN(next_attempt) FROM oracle_writes AS w WHERE status = ? AND lease_until <= ? "
+                "AND id = (SELECT MIN(id) FROM oracle_writes WHERE merchant = w.merchant AND status = ?)",
+                (WRITE_PENDING, time.time(), WRITE_PENDING)
+            ).fetchone()[0]
+        if due is None:
+            return self.poll_interval
+        return max(0.01, min(self.poll_interval, due - time.time()))
+
+    def _claim(self, limit: int) -> List[tuple]:
+        """Lease the oldest pending write of each merchant that is due and not already leased"""
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, merchant, method, args, attempts FROM oracle_writes AS w "
+                    "WHERE status = ? AND next_attempt <= ? AND lease_until <= ? "
+                    "AND id = (SELECT MIN(id) FROM oracle_writes WHERE merchant = w.merchant AND status = ?) "
+                    "ORDER BY id LIMIT ?",
+                    (WRITE_PENDING, now, now, WRITE_PENDING, limit)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE oracle_writes SET lease_until = ? WHERE id = ?",
+                    [(now + self.lease, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _send(self, row: tuple) -> None:
+        write_id, _, method, args, attempts = row
+        try:
+            future = self.coalescer.submit(self.private_key(), method, msgpack.unpackb(args))
+        except Exception as e:
+            self._record(write_id, attempts, {"error": str(e)})
+            return
+        with self._condition:
+            self._inflight[write_id] = future
+        future.add_done_callback(lambda done: self._record(write_id, attempts, done.result()))
+
+    def _record(self, write_id: int, attempts: int, result: Dict) -> None:
+        """Store a send's outcome and release the write's lease"""
+        attempts += 1
+        now = time.time()
+        with self._condition:
+            if self._closed:
+                # close() released the lease; the write is sent again on the next start
+                return
+        try:
+            with self._lock:
+                if result.get("success"):
+                    self._conn.execute(
+                        "UPDATE oracle_writes SET status = ?, attempts = ?, lease_until = 0, last_error = NULL, "
+                        "transaction_id = ?, confirmed_round = ?, updated_at = ? WHERE id = ?",
+                        (WRITE_CONFIRMED, attempts, result.get("transaction_id"),
+                         result.get("confirmed_round"), now, write_id)
+                    )
+                elif attempts >= self.max_attempts:
+                    logger.error(f"Oracle write {write_id} failed after {attempts} attempts: {result.get('error')}")
+                    self._conn.execute(
+                        "UPDATE oracle_writes SET status = ?, attempts = ?, lease_until = 0, last_error = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (WRITE_FAILED, attempts, result.get("error"), now, write_id)
+                    )
+                else:
+                    delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                    delay *= 1 + random.random() * 0.2
+                    logger.warning(f"Oracle write {write_id} attempt {attempts} failed ({result.get('error')}); "
+                                   f"retrying in {delay:.1f}s")
+                    self._conn.execute(
+                        "UPDATE oracle_writes SET attempts = ?, next_attempt = ?, lease_until = 0, last_error = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (attempts, now + delay, result.get("error"), now, write_id)
+                    )
+        except Exception as e:
+            # The lease expires and the write is sent again
+            logger.error(f"Failed to record oracle write {write_id}: {e}")
+        with self._condition:
+            self._inflight.pop(write_id, None)
+            self._condition.notify_all()
+
+    def drain(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for every pending write to be confirmed or failed"""
+        deadline = time.monotonic() + timeout
+        while self._count(WRITE_PENDING):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._condition:
+                self._condition.wait(min(remaining, 0.05))
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Drain for up to timeout seconds (default ORACLE_WRITE_DRAIN_TIMEOUT),
+        then stop the worker. Writes still pending stay in the queue file
+        and are sent on the next start.
+        """
+        if timeout is None:
+            timeout = float(os.getenv("ORACLE_WRITE_DRAIN_TIMEOUT", "10"))
+        with self._condition:
+            thread = self._thread
+        if thread is not None and not self.drain(timeout):
+            pending = self._count(WRITE_PENDING)
+            if self.path == ":memory:":
+                logger.warning(f"Closing the in-memory oracle write queue with {pending} writes unsent")
+            else:
+                logger.warning(f"{pending} oracle writes left in {self.path} for the next start")
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            inflight = list(self._inflight)
+            self._inflight.clear()
+        if thread is not None:
+            thread.join(1.0)
+        with self._lock:
+            # Unconfirmed writes can be claimed again at once instead of after their lease
+            self._conn.executemany(
+                "UPDATE oracle_writes SET lease_until = 0 WHERE id = ?", [(write_id,) for write_id in inflight]
+            )
+            self._conn.close()
@@ -0,0 +1,84 @@
+"""
+Tests for the incremental transaction analytics aggregator
+"""
+
+import asyncio
+import base64
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock
+
+from backend.services.analytics_aggregator import AnalyticsAggregator, UNCATEGORIZED
+from backend.services.blockchain_service import BlockchainService
+from backend.services.transaction_store import TransactionStore, TransactionSync
+
+TEEN = "TEEN"
+NOW = int(datetime.now().timestamp())
+DAY = 86400
+
+
+def _purchase(txid, round_number, amount, merchant, timestamp=NOW):
+    return {
+        "id": txid,
+        "tx-type": "pay",
+        "confirmed-round": round_number,
+        "round-time": timestamp,
+        "sender": TEEN,
+        "payment-transaction": {"amount": amount, "receiver": "MERCHANT"},
+        "note": base64.b64encode(f"ClearSpend purchase at {merchant}".encode()).decode()
+    }
+
+
+class TestAnalyticsAggregator:
+    """Test cases for AnalyticsAggregator"""
+
+    def test_incremental_updates_past_old_horizon(self):
+        """Test totals cover every ingested transaction and update without rescans"""
+        store = TransactionStore(":memory:")
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.async_indexer = Mock()
+        aggregator = AnalyticsAggregator(category_of={"Starbucks": "food"}.get)
+        sync = TransactionSync(blockchain_service, store, interval=0, aggregator=aggregator)
+
+        history = [_purchase(f"T{i}", i + 1, 1000, "Starbucks" if i % 2 else "Amazon") for i in range(250)]
+        blockchain_service.async_indexer.search_transactions = AsyncMock(side_effect=[
+            {"current-round": 300, "transactions": history},
+            {"current-round": 310, "transactions": [_purchase("NEW", 305, 7000, "Starbucks"), history[0]]}
+        ])
+
+        asyncio.run(sync.sync_address(TEEN))
+        first = sync.analytics(TEEN)
+        store.iter_rows = Mock(side_effect=AssertionError("aggregate must not be rebuilt"))
+        asyncio.run(sync.sync_address(TEEN))
+        second = sync.analytics(TEEN)
+        store.close()
+
+        assert first["total_spent"] == 250_000
+        assert first["purchase_count"] == 250
+        assert first["merchant_counts"] == {"Amazon": 125, "Starbucks": 125}
+        assert first["category_spending"] == {UNCATEGORIZED: 125_000, "food": 125_000}
+
+        # The replayed history[0] is not counted twice
+        assert second["total_spent"] == 257_000
+        assert second["merchant_spending"]["Starbucks"] == 132_000
+        assert second["transaction_count"] == 251
+        assert second["last_round"] == 305
+
+    def test_windowed_totals(self):
+        """Test windows only include purchases inside them, regardless of ingest order"""
+        aggregator = AnalyticsAggregator()
+        aggregator.load(TEEN, [])
+        aggregator.apply(TEEN, [
+            {"type": "pay", "sender": TEEN, "amount": 100, "timestamp": NOW - 3600, "round": 3, "merchant": "A"},
+            {"type": "pay", "sender": TEEN, "amount": 30, "timestamp": NOW - 40 * DAY, "round": 1, "merchant": "A"},
+            {"type": "pay", "sender": TEEN, "amount": 20, "timestamp": NOW - 10 * DAY, "round": 2, "merchant": "B"},
+            {"type": "pay", "sender": "PARENT", "receiver": TEEN, "amount": 500, "timestamp": NOW, "round": 4}
+        ])
+
+        snapshot = aggregator.snapshot(TEEN, NOW)
+
+        assert snapshot["windows"]["24h"] == {"spent": 100, "purchase_count": 1}
+        assert snapshot["windows"]["7d"] == {"spent": 100, "purchase_count": 1}
+        assert snapshot["windows"]["30d"] == {"spent": 120, "purchase_count": 2}
+        assert snapshot["total_spent"] == 150
+        assert snapshot["total_received"] == 500
+        assert snapshot["net_balance"] == 350
@@ -0,0 +1,91 @@
+"""
+Tests for the asyncio algod and indexer clients
+"""
+
+import asyncio
+import base64
+
+import httpx
+import pytest
+from algosdk import account, error
+from algosdk.transaction import PaymentTxn
+
+from backend.services.async_algorand import AsyncAlgodClient, AsyncIndexerClient
+
+PARAMS = {
+    "fee": 0,
+    "last-round": 500,
+    "genesis-hash": base64.b64encode(b"\x01" * 32).decode(),
+    "genesis-id": "testnet-v1.0",
+    "consensus-version": "v1",
+    "min-fee": 1000
+}
+
+
+def _client(cls, handler):
+    return cls("token", "http://node", transport=httpx.MockTransport(handler))
+
+
+class TestAsyncAlgorand:
+    """Test cases for AsyncAlgodClient / AsyncIndexerClient"""
+
+    def test_suggested_params_and_send(self):
+        """Test params are parsed like algosdk and signed groups are posted as msgpack"""
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.url.path == "/v2/transactions/params":
+                return httpx.Response(200, json=PARAMS)
+            return httpx.Response(200, json={"txId": "TXID"})
+
+        async def run():
+            client = _client(AsyncAlgodClient, handler)
+            params = await client.suggested_params()
+            private_key, address = account.generate_account()
+            signed = PaymentTxn(address, params, address, 1).sign(private_key)
+            txid = await client.send_transactions([signed, signed])
+            await client.aclose()
+            return params, txid
+
+        params, txid = asyncio.run(run())
+
+        assert (params.first, params.last, params.min_fee) == (500, 1500, 1000)
+        assert txid == "TXID"
+        post = requests[-1]
+        assert post.method == "POST"
+        assert post.headers["Content-Type"] == "application/x-binary"
+        assert post.headers["X-Algo-API-Token"] == "token"
+
+    def test_http_errors_raise_sdk_errors(self):
+        """Test algod error bodies surface as AlgodHTTPError"""
+        def handler(request):
+            return httpx.Response(404, json={"message": "account not found"})
+
+        async def run():
+            client = _client(AsyncAlgodClient, handler)
+            try:
+                await client.account_info("ADDR")
+            finally:
+                await client.aclose()
+
+        with pytest.raises(error.AlgodHTTPError, match="account not found"):
+            asyncio.run(run())
+
+    def test_search_transactions_query(self):
+        """Test indexer search passes the same query parameters as algosdk"""
+        seen = {}
+
+        def handler(request):
+            seen.update(request.url.params)
+            seen["path"] = request.url.path
+            return httpx.Response(200, json={"transactions": []})
+
+        async def run():
+            client = _client(AsyncIndexerClient, handler)
+            result = await client.search_transactions(address="ADDR", limit=25, min_round=7, next_page="abc")
+            await client.aclose()
+            return result
+
+        assert asyncio.run(run()) == {"transactions": []}
+        assert seen == {"path": "/v2/transactions", "address": "ADDR", "limit": "25", "min-round": "7", "next": "abc"}
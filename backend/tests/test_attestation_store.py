@@ -0,0 +1,108 @@
+"""
+Tests for the attestation snapshot + write-ahead log store
+"""
+
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from backend.services.attestation_store import AttestationStore
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService, PurchaseRequest
+from backend.services.policy_compiler import FamilyRules
+
+
+class TestAttestationStore:
+    """Test cases for AttestationStore"""
+
+    @pytest.fixture
+    def mock_blockchain_service(self):
+        mock_service = Mock(spec=BlockchainService)
+        mock_service.attestation_oracle_app_id = None
+        return mock_service
+
+    def test_restart_restores_approvals_limits_and_spend(self, mock_blockchain_service, tmp_path):
+        """Test parent approvals, limit changes and today's spend survive a restart"""
+        store = AttestationStore(str(tmp_path), sync_every=1, sync_interval=0)
+        oracle_service = OracleService(mock_blockchain_service, attestation_store=store)
+        oracle_service.update_merchant_limits("Target", 7000000, True)
+        oracle_service.parent_approve_merchant("Spotify", False)
+        oracle_service.set_family_rules(FamilyRules(family_id="smith", teen_addresses=["TEEN"]))
+        oracle_service.parent_approve_merchant("Amazon", False, family_id="smith")
+        assert oracle_service.verify_purchase(PurchaseRequest(
+            merchant_name="Target", amount=5000000, user_address="OTHER_TEEN"
+        )).approved
+        store.close()
+
+        restarted = OracleService(mock_blockchain_service, attestation_store=AttestationStore(str(tmp_path)))
+
+        target = restarted.get_merchant_attestation("Target")
+        assert target.daily_limit == 7000000
+        assert target.total_spent_today == 5000000
+        assert restarted.get_merchant_attestation("Spotify").parent_approved is False
+        assert restarted.policy_compiler.family_of("TEEN") == "smith"
+        # Only 2 ALGO of the 7 ALGO limit is left after the restart
+        assert not restarted.verify_purchase(PurchaseRequest(
+            merchant_name="Target", amount=3000000, user_address="OTHER_TEEN"
+        )).approved
+        amazon = restarted.verify_purchase(PurchaseRequest(merchant_name="Amazon", amount=1, user_address="TEEN"))
+        assert not amazon.approved
+        assert "not approved by parent" in amazon.reason
+        restarted.attestation_store.close()
+
+    def test_snapshot_compacts_log_and_ignores_torn_tail(self, mock_blockchain_service, tmp_path):
+        """Test a snapshot drops covered segments and a torn final record is skipped on replay"""
+        store = AttestationStore(str(tmp_path), sync_every=0, sync_interval=0, snapshot_every=0)
+        oracle_service = OracleService(mock_blockchain_service, attestation_store=store)
+        for limit in range(1, 6):
+            oracle_service.update_merchant_limits("Bookstore", limit, True)
+        store.snapshot()
+        oracle_service.update_merchant_limits("Bookstore", 6, True)
+        oracle_service.update_merchant_limits("Khan Academy", 9, False)
+        store.close()
+
+        segments = sorted(name for name in os.listdir(tmp_path) if name.startswith("wal-"))
+        assert len(segments) == 1
+        with open(os.path.join(tmp_path, segments[0]), "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x00\x00\x00\x00partial")
+
+        recovered = AttestationStore(str(tmp_path))
+        snapshot, records = recovered.recover()
+        recovered.close()
+        assert snapshot is not None
+        assert [record[1] for record in records] == ["Bookstore", "Khan Academy"]
+
+        restarted = OracleService(mock_blockchain_service, attestation_store=AttestationStore(str(tmp_path)))
+        assert restarted.get_merchant_attestation("Bookstore").daily_limit == 6
+        assert restarted.get_merchant_attestation("Khan Academy").is_approved is False
+        assert len(restarted.get_merchant_attestations()) == 7
+        restarted.attestation_store.close()
+
+    def test_directory_has_one_owner(self, tmp_path):
+        """Test a second store on the same directory fails fast until the first is closed"""
+        store = AttestationStore(str(tmp_path), sync_interval=0)
+        with pytest.raises(RuntimeError, match="in use by another process"):
+            AttestationStore(str(tmp_path), sync_interval=0)
+        store.close()
+
+        AttestationStore(str(tmp_path), sync_interval=0).close()
+
+    def test_journal_appends_never_wait_for_the_log(self, tmp_path):
+        """Test wait=False appends return while a write holds the log, and are group-committed after"""
+        store = AttestationStore(str(tmp_path), sync_every=1, sync_interval=0)
+        with store._lock:
+            # A stalled write or fsync is in progress
+            for spent in range(100):
+                store.append(["s", "Starbucks", 20000, spent, 1700000000], wait=False)
+            assert store.stats()["records_written"] == 0
+        store.append(["s", "Starbucks", 20000, 100, 1700000000])
+        stats = store.stats()
+        store.close()
+
+        assert stats["records_written"] == 101
+        assert stats["syncs"] < 101
+        recovered = AttestationStore(str(tmp_path))
+        _, records = recovered.recover()
+        recovered.close()
+        assert [record[3] for record in records] == list(range(101))
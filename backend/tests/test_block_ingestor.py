@@ -0,0 +1,171 @@
+"""
+Tests for the block-following ingestion worker
+"""
+
+import asyncio
+import base64
+from unittest.mock import AsyncMock, Mock
+
+import msgpack
+import pytest
+from algosdk import account
+from algosdk.transaction import PaymentTxn, SuggestedParams
+
+from backend.services.block_ingestor import BlockIngestor, CHECKPOINT_NAME, SubscriberError
+from backend.services.blockchain_service import BlockchainService
+from backend.services.transaction_store import TransactionStore, TransactionSync
+
+GENESIS_HASH = base64.b64encode(b"\x02" * 32).decode()
+TEEN_KEY, TEEN = account.generate_account()
+_, MERCHANT = account.generate_account()
+_, STRANGER = account.generate_account()
+
+
+def _payment(sender_key, sender, receiver, amount, round_number, note=None):
+    params = SuggestedParams(1000, round_number - 5, round_number + 995, GENESIS_HASH, "testnet-v1.0", flat_fee=True)
+    txn = PaymentTxn(sender, params, receiver, amount, note=note)
+    return txn, txn.sign(sender_key)
+
+
+def _block(round_number, signed_txns):
+    """msgpack block as algod serves it: genesis hash/ID stripped from each txn"""
+    txns = []
+    for signed in signed_txns:
+        stxn = signed.dictify()
+        del stxn["txn"]["gh"]
+        del stxn["txn"]["gen"]
+        stxn["hgi"] = True
+        txns.append(stxn)
+    block = {
+        "rnd": round_number,
+        "ts": 1700000000 + round_number,
+        "gen": "testnet-v1.0",
+        "gh": base64.b64decode(GENESIS_HASH),
+        "txns": txns
+    }
+    return msgpack.packb({"block": block}, use_bin_type=True)
+
+
+def _blockchain_service(blocks, last_round):
+    service = Mock(spec=BlockchainService)
+    service.async_algod = Mock()
+    service.async_algod.block_raw = AsyncMock(side_effect=lambda round_number: blocks[round_number])
+    service.async_algod.status = AsyncMock(return_value={"last-round": last_round})
+    return service
+
+
+class TestBlockIngestor:
+    """Test cases for BlockIngestor"""
+
+    def test_fan_out_and_checkpoint(self):
+        """Test one decoded block reaches every subscriber of the touched addresses"""
+        purchase, signed_purchase = _payment(TEEN_KEY, TEEN, MERCHANT, 5000, 100, b"ClearSpend purchase at Starbucks")
+        other_key, other = account.generate_account()
+        _, signed_other = _payment(other_key, other, STRANGER, 1, 100)
+        store = TransactionStore(":memory:")
+        ingestor = BlockIngestor(
+            _blockchain_service({100: _block(100, [signed_other, signed_purchase])}, 100),
+            checkpoint_store=store
+        )
+
+        teen_events, merchant_events, stranger_events = [], [], []
+        ingestor.subscribe(TEEN, lambda round_number, txs: teen_events.append((round_number, txs)))
+        ingestor.subscribe(MERCHANT, lambda round_number, txs: merchant_events.append(txs))
+        token = ingestor.subscribe(STRANGER, lambda round_number, txs: stranger_events.append(txs))
+        ingestor.unsubscribe(token)
+
+        matched = asyncio.run(ingestor.process_round(100))
+
+        assert matched == 1
+        round_number, txs = teen_events[0]
+        assert round_number == 100
+        assert txs[0]["id"] == purchase.get_txid()
+        assert txs[0]["sender"] == TEEN
+        assert txs[0]["payment-transaction"] == {"amount": 5000, "receiver": MERCHANT}
+        assert txs[0]["intra-round-offset"] == 1
+        assert merchant_events == [txs]
+        assert stranger_events == []
+        assert store.get_checkpoint(CHECKPOINT_NAME) == 100
+        assert ingestor.stats()["lag_rounds"] == 0
+
+    def test_failed_subscriber_holds_the_round(self):
+        """Test a failing subscriber gets the round again before the checkpoint moves, then has it recorded as missed"""
+        _, signed = _payment(TEEN_KEY, TEEN, MERCHANT, 5000, 100)
+        store = TransactionStore(":memory:")
+        ingestor = BlockIngestor(
+            _blockchain_service({100: _block(100, [signed]), 101: _block(101, [signed])}, 101),
+            checkpoint_store=store,
+            max_round_attempts=3
+        )
+        teen_rounds, merchant_calls = [], []
+        failures = {"left": 1}
+
+        def flaky(round_number, txs):
+            merchant_calls.append(round_number)
+            if failures["left"]:
+                failures["left"] -= 1
+                raise RuntimeError("store unavailable")
+
+        ingestor.subscribe(TEEN, lambda round_number, txs: teen_rounds.append(round_number))
+        merchant = ingestor.subscribe(MERCHANT, flaky)
+
+        with pytest.raises(SubscriberError):
+            asyncio.run(ingestor.process_round(100))
+        assert ingestor.processed_round is None and store.get_checkpoint(CHECKPOINT_NAME) is None
+
+        # Only the failed subscriber gets the retry
+        asyncio.run(ingestor.process_round(100))
+        assert (teen_rounds, merchant_calls) == ([100], [100, 100])
+        assert store.get_checkpoint(CHECKPOINT_NAME) == 100
+
+        # A subscriber that keeps failing is skipped after max_round_attempts
+        failures["left"] = 3
+        for _ in range(2):
+            with pytest.raises(SubscriberError):
+                asyncio.run(ingestor.process_round(101))
+        asyncio.run(ingestor.process_round(101))
+        assert ingestor.processed_round == 101
+        assert ingestor.missed_rounds[merchant] == [101]
+        assert ingestor.stats()["missed_rounds"] == 1
+        assert teen_rounds == [100, 101]
+        store.close()
+
+    def test_sync_follows_blocks_after_restart(self):
+        """Test a restarted worker resumes at the checkpoint and feeds the local store"""
+        _, signed = _payment(TEEN_KEY, TEEN, MERCHANT, 700, 51, b"ClearSpend purchase at Amazon")
+        store = TransactionStore(":memory:")
+        store.watch(TEEN)
+        store.set_synced_round(TEEN, 50)
+        store.set_checkpoint(CHECKPOINT_NAME, 50)
+        blockchain_service = _blockchain_service({51: _block(51, [signed]), 52: _block(52, [])}, 999)
+
+        waiting = asyncio.Event()
+
+        async def status_after_block(round_number, **kwargs):
+            if round_number >= 52:
+                waiting.set()
+                await asyncio.Event().wait()
+            return {"last-round": 52}
+
+        blockchain_service.async_algod.status_after_block = status_after_block
+        sync = TransactionSync(
+            blockchain_service, store, interval=3600,
+            ingestor=BlockIngestor(blockchain_service, checkpoint_store=store)
+        )
+
+        async def run():
+            sync.ensure_running()
+            await asyncio.wait_for(waiting.wait(), 5)
+            synced = sync.synced_round(TEEN)
+            await sync.stop()
+            return synced
+
+        synced = asyncio.run(run())
+
+        assert sync.ingestor.started_round == 51
+        blockchain_service.async_algod.status.assert_not_awaited()
+        assert synced == 52
+        assert store.get_checkpoint(CHECKPOINT_NAME) == 52
+        assert [tx["amount"] for tx in store.history(TEEN)["transactions"]] == [700]
+        assert sync.analytics(TEEN)["merchant_spending"] == {"Amazon": 700}
+        store.close()
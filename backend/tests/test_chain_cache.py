@@ -0,0 +1,256 @@
+"""
+Tests for the round-tagged chain state cache
+"""
+
+import asyncio
+import base64
+from unittest.mock import AsyncMock, Mock
+
+import msgpack
+from algosdk import account, transaction
+from algosdk.transaction import SuggestedParams
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routes import allowances
+from backend.services.block_ingestor import BlockIngestor
+from backend.services.blockchain_service import BlockchainService
+from backend.services.chain_cache import ChainStateCache
+from backend.services.family_registry import FamilyRegistry, encode_family_allowance, family_box_name
+
+GENESIS_HASH = base64.b64encode(b"\x02" * 32).decode()
+ORACLE_APP = 1234
+ALLOWANCE_APP = 77
+SENDER_KEY, SENDER = account.generate_account()
+
+
+def _app_call(round_number, app_id, boxes=(), foreign_apps=None):
+    params = SuggestedParams(1000, round_number - 5, round_number + 995, GENESIS_HASH, "testnet-v1.0", flat_fee=True)
+    return transaction.ApplicationNoOpTxn(
+        SENDER, params, app_id, [b"update_merchant_limits"], foreign_apps=foreign_apps, boxes=list(boxes)
+    )
+
+
+def _block(round_number, stxns):
+    txns = []
+    for stxn in stxns:
+        del stxn["txn"]["gh"]
+        txns.append(stxn)
+    return msgpack.packb({"block": {"rnd": round_number, "ts": 0, "txns": txns}}, use_bin_type=True)
+
+
+class FakeChain:
+    """Box and global state reads behind the async BlockchainService methods the cache uses"""
+
+    def __init__(self):
+        self.round = 100
+        self.blocks = {}
+        self.boxes = {}
+        self.reads = 0
+        self.service = Mock(spec=BlockchainService)
+        self.service.async_algod = Mock()
+        self.service.async_algod.status = AsyncMock(side_effect=lambda: {"last-round": self.round})
+        self.service.async_algod.status_after_block = AsyncMock(side_effect=self._wait_for_block)
+        self.service.async_algod.block_raw = AsyncMock(side_effect=lambda round_number: self.blocks[round_number])
+        self.service.read_box_async = AsyncMock(side_effect=self._read_box)
+        self.service.get_application_global_state_async = AsyncMock(
+            side_effect=lambda app_id: {"state": {"weekly_amount": self.round}}
+        )
+
+    async def _wait_for_block(self, round_number, **kwargs):
+        self.round = max(self.round, round_number + 1)
+        return {"last-round": self.round}
+
+    async def _read_box(self, app_id, name):
+        self.reads += 1
+        await asyncio.sleep(0)
+        return {"value": self.boxes.get(name)}
+
+
+async def _following(chain):
+    """An ingestor that reports itself running without following blocks on its own"""
+    ingestor = BlockIngestor(chain.service)
+    ingestor._task = asyncio.get_running_loop().create_future()
+    ingestor.network_round = chain.round
+    return ingestor
+
+
+class TestChainStateCache:
+    """Test cases for ChainStateCache"""
+
+    def test_entries_served_until_an_app_call_touches_them(self):
+        """Test a box is read once, and again only after the ingestor sees a call referencing it"""
+        chain = FakeChain()
+        chain.boxes = {b"merchant_a": b"A1", b"merchant_b": b"B1"}
+
+        async def scenario():
+            cache = ChainStateCache(chain.service, await _following(chain))
+            assert (await cache.get_box(ORACLE_APP, b"merchant_a"))["value"] == b"A1"
+            assert (await cache.get_box(ORACLE_APP, b"merchant_b"))["value"] == b"B1"
+            assert (await cache.get_box(ORACLE_APP, b"merchant_a")) == {"value": b"A1", "round": 100}
+            assert chain.reads == 2
+
+            # Round 101: an unrelated app call, then a grouped call to the oracle
+            # whose box reference sits on the other group member
+            chain.boxes[b"merchant_a"] = b"A2"
+            other = _app_call(101, 999, boxes=[(0, b"merchant_b")])
+            oracle_call = _app_call(101, ORACLE_APP)
+            ref_carrier = _app_call(101, ALLOWANCE_APP, boxes=[(ORACLE_APP, b"merchant_a")], foreign_apps=[ORACLE_APP])
+            transaction.assign_group_id([oracle_call, ref_carrier])
+            chain.blocks[101] = _block(101, [txn.sign(SENDER_KEY).dictify() for txn in [other, oracle_call, ref_carrier]])
+            chain.round = 101
+            await cache.ingestor.process_round(101)
+
+            assert (await cache.get_box(ORACLE_APP, b"merchant_a")) == {"value": b"A2", "round": 101}
+            assert (await cache.get_box(ORACLE_APP, b"merchant_b"))["value"] == b"B1"
+            assert chain.reads == 3
+            assert cache.stats()["hits"] == 2
+            cache.close()
+            assert cache.ingestor.stats()["subscribed_applications"] == 0
+
+        asyncio.run(scenario())
+
+    def test_inner_calls_invalidate_global_state(self):
+        """Test an inner call to the allowance manager marks its global state changed"""
+        chain = FakeChain()
+
+        async def scenario():
+            cache = ChainStateCache(chain.service, await _following(chain))
+            assert (await cache.get_global_state(ALLOWANCE_APP))["value"] == {"weekly_amount": 100}
+            assert (await cache.get_global_state(ALLOWANCE_APP))["round"] == 100
+
+            outer = _app_call(102, 5555).sign(SENDER_KEY).dictify()
+            inner = _app_call(102, ALLOWANCE_APP).dictify()
+            outer["dt"] = {"itx": [{"txn": inner}]}
+            chain.blocks[102] = _block(102, [outer])
+            chain.round = 102
+            await cache.ingestor.process_round(102)
+
+            assert (await cache.get_global_state(ALLOWANCE_APP))["value"] == {"weekly_amount": 102}
+            assert chain.service.get_application_global_state_async.await_count == 2
+
+        asyncio.run(scenario())
+
+    def test_min_round_reads_your_writes(self):
+        """Test an entry older than min_round is reloaded once algod reaches that round"""
+        chain = FakeChain()
+        chain.boxes = {b"merchant_a": b"A1"}
+
+        async def scenario():
+            cache = ChainStateCache(chain.service, await _following(chain))
+            await cache.get_box(ORACLE_APP, b"merchant_a")
+            assert (await cache.get_box(ORACLE_APP, b"merchant_a", min_round=100))["round"] == 100
+
+            chain.boxes[b"merchant_a"] = b"A2"
+            result = await cache.get_box(ORACLE_APP, b"merchant_a", min_round=105)
+            assert result == {"value": b"A2", "round": 105}
+            chain.service.async_algod.status_after_block.assert_awaited_with(104)
+            assert chain.reads == 2
+
+        asyncio.run(scenario())
+
+    def test_concurrent_misses_share_one_read(self):
+        """Test readers that miss together wait on a single algod read"""
+        chain = FakeChain()
+        chain.boxes = {b"merchant_a": b"A1"}
+
+        async def scenario():
+            cache = ChainStateCache(chain.service, await _following(chain))
+            results = await asyncio.gather(*(cache.get_box(ORACLE_APP, b"merchant_a") for _ in range(20)))
+            assert all(result["value"] == b"A1" for result in results)
+            assert chain.reads == 1
+
+        asyncio.run(scenario())
+
+    def test_cancelled_read_does_not_strand_waiters(self):
+        """Test readers waiting on a read whose caller is cancelled read for themselves"""
+        chain = FakeChain()
+        chain.boxes = {b"merchant_a": b"A1"}
+        started, release = asyncio.Event(), asyncio.Event()
+        read_box = chain._read_box
+
+        async def slow_first_read(app_id, name):
+            if not started.is_set():
+                started.set()
+                await release.wait()
+            return await read_box(app_id, name)
+
+        chain.service.read_box_async = AsyncMock(side_effect=slow_first_read)
+
+        async def scenario():
+            cache = ChainStateCache(chain.service, await _following(chain))
+            first = asyncio.ensure_future(cache.get_box(ORACLE_APP, b"merchant_a"))
+            await started.wait()
+            waiters = [asyncio.ensure_future(cache.get_box(ORACLE_APP, b"merchant_a")) for _ in range(3)]
+            await asyncio.sleep(0)
+            first.cancel()
+            results = await asyncio.wait_for(asyncio.gather(*waiters), 5)
+            assert all(result["value"] == b"A1" for result in results)
+            assert cache.stats()["entries"] == 1
+
+        asyncio.run(scenario())
+
+    def test_reads_bypass_the_cache_without_ingestion(self):
+        """Test nothing is cached when no running ingestor could invalidate it"""
+        chain = FakeChain()
+        chain.boxes = {b"merchant_a": b"A1"}
+
+        async def scenario():
+            cache = ChainStateCache(chain.service)
+            await cache.get_box(ORACLE_APP, b"merchant_a")
+            assert (await cache.get_box(ORACLE_APP, b"merchant_a"))["value"] == b"A1"
+            assert chain.reads == 2
+            assert cache.stats()["entries"] == 0
+
+            chain.service.read_box_async = AsyncMock(return_value={"error": "algod unreachable"})
+            assert await cache.get_box(ORACLE_APP, b"merchant_a") == {"error": "algod unreachable"}
+
+        asyncio.run(scenario())
+
+    def test_eviction_keeps_the_most_recent_entries(self):
+        """Test the least recently used entry is dropped past max_entries"""
+        chain = FakeChain()
+        chain.boxes = {b"a": b"1", b"b": b"2", b"c": b"3"}
+
+        async def scenario():
+            cache = ChainStateCache(chain.service, await _following(chain), max_entries=2)
+            for name in [b"a", b"b", b"a", b"c", b"a"]:
+                await cache.get_box(ORACLE_APP, name)
+            assert chain.reads == 3
+            await cache.get_box(ORACLE_APP, b"b")
+            assert chain.reads == 4
+
+        asyncio.run(scenario())
+
+    def test_allowance_status_reads_family_box(self):
+        """Test the status route decodes the teen's allowance box at the requested round"""
+        chain = FakeChain()
+        chain.service.allowance_manager_app_id = ALLOWANCE_APP
+        chain.service.families = FamilyRegistry()
+        _, parent = account.generate_account()
+        chain.boxes[family_box_name(SENDER)] = encode_family_allowance({
+            "parent_address": parent,
+            "weekly_amount": 50000000,
+            "last_allowance_time": 1700000000,
+            "total_issued": 150000000,
+            "savings_locked": 0,
+            "savings_unlock_time": 0,
+            "created": 1690000000,
+            "is_paused": True
+        })
+        cache = ChainStateCache(chain.service)
+
+        app = FastAPI()
+        app.include_router(allowances.router)
+        app.dependency_overrides[allowances.get_blockchain_service] = lambda: chain.service
+        app.dependency_overrides[allowances.get_chain_cache] = lambda: cache
+        client = TestClient(app)
+
+        body = client.get(f"/api/v1/allowances/{SENDER}/status", params={"min_round": 103}).json()
+        assert (body["weekly_amount"], body["total_issued"], body["is_paused"]) == (50000000, 150000000, True)
+        assert (body["can_issue"], body["round"]) == (False, 103)
+
+        assert chain.service.families.get(SENDER).parent_address == parent
+
+        _, other = account.generate_account()
+        assert client.get(f"/api/v1/allowances/{other}/status").status_code == 404
@@ -0,0 +1,151 @@
+"""
+Tests for checking out a multi-item cart as one atomic group
+"""
+
+import asyncio
+import base64
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from algosdk import account, encoding
+from algosdk.transaction import SuggestedParams
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routes import purchases
+from backend.services.attestation_layout import (
+    encode_arc4_string_array,
+    encode_arc4_uint64_array,
+    merchant_box_name,
+    touched_box_names
+)
+from backend.services.blockchain_service import CHECKOUT_MAX_ITEMS, BlockchainService
+from backend.services.family_registry import family_box_name
+from backend.services.oracle_service import OracleService, PurchaseRequest
+
+ORACLE_APP = 1234
+ALLOWANCE_APP = 77
+TEEN_KEY, TEEN = account.generate_account()
+PARAMS = SuggestedParams(1000, 100, 1100, base64.b64encode(b"\x02" * 32).decode(), "testnet-v1.0", flat_fee=True)
+
+
+@pytest.fixture
+def service():
+    service = BlockchainService()
+    service.attestation_oracle_app_id = ORACLE_APP
+    service.allowance_manager_app_id = ALLOWANCE_APP
+    service.attestation_oracle_version = 1
+    service.params_cache = Mock(peek=Mock(return_value=PARAMS))
+    service.async_algod = Mock(send_transactions=AsyncMock(return_value="TXID"))
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def oracle_service():
+    blockchain_service = Mock(spec=BlockchainService)
+    blockchain_service.attestation_oracle_app_id = ORACLE_APP
+    blockchain_service.attestation_oracle_version = 1
+    blockchain_service.submit_checkout_group_async = AsyncMock(
+        return_value={"success": True, "transaction_id": "TXID", "last_valid_round": 1100, "explorer_link": "link"}
+    )
+    oracle_service = OracleService(blockchain_service)
+    oracle_service.confirmation_tracker = Mock()
+    return oracle_service
+
+
+def _cart(*items):
+    return [PurchaseRequest(merchant_name=name, amount=amount, user_address=TEEN) for name, amount in items]
+
+
+class TestCheckout:
+    """Test the checkout group layout and the all-or-nothing cart reservation"""
+
+    def test_checkout_group_layout(self, service):
+        """Test one oracle call, one allowance call and a payment per item share one group id"""
+        merchants = [(f"Merchant {i}", account.generate_account()[1], 1000 * (i + 1)) for i in range(10)]
+        items = merchants + [merchants[0]]
+
+        result = asyncio.run(service.submit_checkout_group_async(TEEN_KEY, TEEN, items))
+        assert result["transaction_id"] == "TXID" and result["last_valid_round"] == 1100
+
+        group = [stxn.transaction for stxn in service.async_algod.send_transactions.call_args.args[0]]
+        assert len(group) == len(items) + 2
+        assert len({txn.group for txn in group}) == 1 and group[0].group is not None
+
+        oracle_call, allowance_call, payments = group[0], group[1], group[2:]
+        names = [name for name, _, _ in items]
+        amounts = [amount for _, _, amount in items]
+        assert oracle_call.app_args == [
+            b"verify_purchases", encode_arc4_string_array(names), encode_arc4_uint64_array(amounts),
+            encoding.decode_address(TEEN)
+        ]
+        # Oracle sync finds every merchant a cart touched
+        assert touched_box_names([oracle_call.app_args]) >= {merchant_box_name(name) for name in names}
+        assert allowance_call.app_args == [b"process_purchases_atomic", encode_arc4_uint64_array(amounts)]
+        assert [(payment.receiver, payment.amt) for payment in payments] == [(address, amount) for _, address, amount in items]
+
+        # Ten distinct merchant boxes: eight on the oracle call, the rest carried by the allowance call
+        assert [ref.name for ref in oracle_call.boxes] == [merchant_box_name(name) for name, _, _ in merchants[:8]]
+        assert allowance_call.foreign_apps == [ORACLE_APP]
+        assert [(ref.app_index, ref.name) for ref in allowance_call.boxes] == [
+            (0, family_box_name(TEEN)),
+            (1, merchant_box_name("Merchant 8")),
+            (1, merchant_box_name("Merchant 9"))
+        ]
+
+    def test_checkout_group_size_limit(self, service):
+        """Test a cart must fit one 16-transaction group"""
+        items = [("Target", TEEN, 1)] * (CHECKOUT_MAX_ITEMS + 1)
+        assert asyncio.run(service.submit_checkout_group_async(TEEN_KEY, TEEN, items[:1]))["success"]
+        assert "1 to 14" in asyncio.run(service.submit_checkout_group_async(TEEN_KEY, TEEN, items))["error"]
+        assert service.async_algod.send_transactions.call_count == 1
+
+    def test_checkout_reserves_every_item(self, oracle_service):
+        """Test an approved cart is submitted once and tracked as one group"""
+        cart = _cart(("Starbucks", 30000000), ("Target", 5000000), ("Starbucks", 10000000))
+        result = asyncio.run(oracle_service.submit_checkout_async(TEEN_KEY, TEEN, cart))
+
+        assert (result.approved, result.transaction_id, result.status) == (True, "TXID", "pending")
+        assert result.reasons == [None, None, None]
+        items = oracle_service.blockchain_service.submit_checkout_group_async.call_args.kwargs["items"]
+        assert [(name, amount) for name, _, amount in items] == [("Starbucks", 30000000), ("Target", 5000000), ("Starbucks", 10000000)]
+        assert oracle_service.get_spent_today("Starbucks") == 40000000
+
+        # A group that fails on chain gives back every item
+        track = oracle_service.confirmation_tracker.track.call_args
+        assert track.args[0] == "TXID"
+        track.kwargs["on_failed"](Mock(transaction_id="TXID", error="rejected"))
+        assert oracle_service.get_spent_today("Starbucks") == 0
+        assert oracle_service.get_spent_today("Target") == 0
+
+    def test_checkout_denies_the_whole_cart(self, oracle_service):
+        """Test one denied item leaves nothing reserved and nothing submitted"""
+        cart = _cart(("Starbucks", 30000000), ("Gaming Store", 1000000), ("Target", 5000000))
+        result = asyncio.run(oracle_service.submit_checkout_async(TEEN_KEY, TEEN, cart))
+
+        assert result.approved is False
+        assert result.reason.startswith("Item 2 (Gaming Store)")
+        assert [reason is None for reason in result.reasons] == [True, False, True]
+        assert oracle_service.get_spent_today("Starbucks") == 0
+        assert oracle_service.get_spent_today("Target") == 0
+        oracle_service.blockchain_service.submit_checkout_group_async.assert_not_called()
+
+        oracle_service.blockchain_service.submit_checkout_group_async.return_value = {"error": "overspend"}
+        result = asyncio.run(oracle_service.submit_checkout_async(TEEN_KEY, TEEN, _cart(("Starbucks", 30000000))))
+        assert result.reason == "Transaction failed: overspend"
+        assert oracle_service.get_spent_today("Starbucks") == 0
+
+    def test_checkout_route(self, oracle_service):
+        """Test POST /checkout totals the cart and caps it at 14 items"""
+        app = FastAPI()
+        app.include_router(purchases.router)
+        app.dependency_overrides[purchases.get_oracle_service] = lambda: oracle_service
+        client = TestClient(app)
+
+        items = [{"merchant_name": "Target", "amount": 1000000}, {"merchant_name": "Bookstore", "amount": 2000000}]
+        body = client.post("/api/v1/purchases/checkout", json={"user_address": TEEN, "items": items}).json()
+        assert (body["approved"], body["item_count"], body["total_amount"]) == (True, 2, 3000000)
+
+        response = client.post("/api/v1/purchases/checkout", json={"user_address": TEEN, "items": items * 8})
+        assert response.status_code == 422
@@ -0,0 +1,107 @@
+"""
+Tests for the background confirmation tracker
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.confirmation_tracker import (
+    ConfirmationTracker,
+    STATUS_CONFIRMED,
+    STATUS_FAILED,
+    STATUS_PENDING
+)
+
+
+class TestConfirmationTracker:
+    """Test cases for ConfirmationTracker"""
+    
+    def _blockchain_service(self, infos, last_round=100):
+        service = Mock(spec=BlockchainService)
+        service.get_network_status_async = AsyncMock(return_value={"last_round": last_round})
+        service.get_pending_transaction_info_async = AsyncMock(side_effect=lambda txid: infos[txid])
+        return service
+    
+    def test_confirmed_and_failed_transactions(self):
+        """Test poll results move transactions out of pending"""
+        infos = {
+            "TX_OK": {"confirmed-round": 42},
+            "TX_BAD": {"pool-error": "overspend"},
+            "TX_WAIT": {"confirmed-round": 0, "pool-error": ""}
+        }
+        failed = []
+        tracker = ConfirmationTracker(self._blockchain_service(infos), poll_interval=0)
+        tracker.track("TX_OK")
+        tracker.track("TX_BAD", on_failed=failed.append)
+        tracker.track("TX_WAIT", last_valid_round=200)
+        
+        asyncio.run(tracker.poll_once())
+        
+        assert tracker.get("TX_OK").status == STATUS_CONFIRMED
+        assert tracker.get("TX_OK").confirmed_round == 42
+        assert tracker.get("TX_BAD").status == STATUS_FAILED
+        assert tracker.get("TX_WAIT").status == STATUS_PENDING
+        assert [status.transaction_id for status in failed] == ["TX_BAD"]
+        assert tracker.pending_count == 1
+    
+    def test_expired_transaction_fails(self):
+        """Test a transaction past its last valid round that the indexer never saw is marked failed"""
+        infos = {"TX_LOST": {"error": "not found"}}
+        service = self._blockchain_service(infos, last_round=301)
+        service.find_confirmed_transaction_async = AsyncMock(
+            return_value={"confirmed_round": None, "indexer_round": 301}
+        )
+        tracker = ConfirmationTracker(service, poll_interval=0)
+        tracker.track("TX_LOST", last_valid_round=300)
+        
+        asyncio.run(tracker.poll_once())
+        
+        assert tracker.get("TX_LOST").status == STATUS_FAILED
+        assert "expired" in tracker.get("TX_LOST").error
+    
+    def test_confirmed_transaction_gone_from_pool_is_not_failed(self):
+        """Test a transaction algod has forgotten is settled from the indexer, not released"""
+        infos = {"TX_DONE": {"error": "not found"}, "TX_LAG": {"error": "not found"}}
+        found = {
+            "TX_DONE": {"confirmed_round": 295, "indexer_round": 301},
+            "TX_LAG": {"confirmed_round": None, "indexer_round": 298}
+        }
+        service = self._blockchain_service(infos, last_round=301)
+        service.find_confirmed_transaction_async = AsyncMock(side_effect=lambda txid: found[txid])
+        failed = []
+        tracker = ConfirmationTracker(service, poll_interval=0)
+        tracker.track("TX_DONE", last_valid_round=300, on_failed=failed.append)
+        tracker.track("TX_LAG", last_valid_round=300, on_failed=failed.append)
+        
+        asyncio.run(tracker.poll_once())
+        
+        assert tracker.get("TX_DONE").status == STATUS_CONFIRMED
+        assert tracker.get("TX_DONE").confirmed_round == 295
+        # The indexer has not caught up to the last valid round yet: still unknown
+        assert tracker.get("TX_LAG").status == STATUS_PENDING
+        assert failed == []
+    
+    def test_poll_bounds_concurrent_lookups(self):
+        """Test a poll looks up at most `concurrency` pending transactions at once"""
+        in_flight = []
+        peak = []
+        
+        async def pending_info(txid):
+            in_flight.append(txid)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0)
+            in_flight.remove(txid)
+            return {"confirmed-round": 7}
+        
+        service = self._blockchain_service({})
+        service.get_pending_transaction_info_async = AsyncMock(side_effect=pending_info)
+        tracker = ConfirmationTracker(service, poll_interval=0, concurrency=3)
+        for i in range(20):
+            tracker.track(f"TX_{i}")
+        
+        asyncio.run(tracker.poll_once())
+        
+        assert service.get_pending_transaction_info_async.call_count == 20
+        assert max(peak) == 3
+        assert tracker.pending_count == 0
@@ -0,0 +1,129 @@
+"""
+Tests for the event hub behind the SSE / WebSocket streams
+"""
+
+import asyncio
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routes import events
+from backend.services.event_hub import (
+    DISCONNECT,
+    DROP_OLDEST,
+    EventHub,
+    PURCHASE_VERIFIED,
+    STREAM_RESET
+)
+
+
+class TestEventHub:
+    """Test cases for EventHub"""
+
+    def test_resume_from_last_event_id(self):
+        """Test a reconnecting client gets only the events after its cursor, or a reset if they expired"""
+        hub = EventHub(history_size=3, buffer_size=16, drop_policy=DROP_OLDEST)
+        for amount in range(5):
+            hub.publish(["TEEN", "family-a"], PURCHASE_VERIFIED, {"amount": amount})
+
+        async def run():
+            resumed = hub.subscribe("TEEN", last_event_id=7)
+            expired = hub.subscribe("TEEN", last_event_id=1)
+            return await resumed.next_batch(0), await expired.next_batch(0)
+
+        resumed, expired = asyncio.run(run())
+
+        # Ids are shared across topics: TEEN got 1, 3, 5, 7, 9
+        assert [event.id for event in resumed] == [9]
+        assert expired[0].type == STREAM_RESET
+        assert expired[0].id is None
+        assert [event.data["amount"] for event in expired[1:]] == [2, 3, 4]
+
+    def test_slow_consumer_policies(self):
+        """Test drop_oldest keeps the newest events with a reset marker and disconnect closes the stream"""
+        async def run(policy):
+            hub = EventHub(history_size=16, buffer_size=2, drop_policy=policy)
+            subscription = hub.subscribe("TEEN")
+            for amount in range(4):
+                hub.publish(["TEEN"], PURCHASE_VERIFIED, {"amount": amount})
+            try:
+                return await subscription.next_batch(0)
+            except ConnectionAbortedError:
+                return "closed"
+            finally:
+                hub.unsubscribe(subscription)
+                assert hub.stats()["connections"] == 0
+
+        batch = asyncio.run(run(DROP_OLDEST))
+        assert batch[0].type == STREAM_RESET
+        assert batch[0].data["dropped"] == 2
+        assert [event.data["amount"] for event in batch[1:]] == [2, 3]
+        assert asyncio.run(run(DISCONNECT)) == "closed"
+
+    def test_large_resume_gap_does_not_trip_disconnect(self):
+        """Test a gap larger than the buffer gets a reset instead of disconnecting the resuming client"""
+        hub = EventHub(history_size=256, buffer_size=4, drop_policy=DISCONNECT)
+        for amount in range(10):
+            hub.publish(["TEEN"], PURCHASE_VERIFIED, {"amount": amount})
+
+        async def run():
+            subscription = hub.subscribe("TEEN", last_event_id=2)
+            hub.publish(["TEEN"], PURCHASE_VERIFIED, {"amount": 10})
+            return await subscription.next_batch(0)
+
+        batch = asyncio.run(run())
+        assert batch[0].type == STREAM_RESET
+        assert batch[0].data == {"reason": "gap_too_large", "missed": 8}
+        assert [event.data["amount"] for event in batch[1:]] == [10]
+
+    def test_event_published_during_subscribe_is_delivered_once(self):
+        """Test an event racing a subscriber's registration reaches it exactly once"""
+        hub = EventHub(buffer_size=8)
+
+        async def run():
+            hub.subscribe("TEEN")
+            # Published off the loop before the second subscription registers, delivered after
+            worker = threading.Thread(target=hub.publish, args=(["TEEN"], PURCHASE_VERIFIED, {"amount": 1}))
+            worker.start()
+            worker.join()
+            subscription = hub.subscribe("TEEN", last_event_id=0)
+            hub.publish(["TEEN"], PURCHASE_VERIFIED, {"amount": 2})
+            await asyncio.sleep(0)
+            return await subscription.next_batch(0)
+
+        batch = asyncio.run(run())
+        assert [event.data["amount"] for event in batch] == [1, 2]
+
+    def test_publish_from_worker_thread(self):
+        """Test events published off the loop (e.g. from a threadpool route) reach subscribers"""
+        hub = EventHub(buffer_size=8)
+
+        async def run():
+            subscription = hub.subscribe("family-a")
+            worker = threading.Thread(target=hub.publish, args=(["family-a"], PURCHASE_VERIFIED, {"amount": 1}))
+            worker.start()
+            batch = await subscription.next_batch(5)
+            worker.join()
+            return batch
+
+        batch = asyncio.run(run())
+        assert [event.data for event in batch] == [{"amount": 1}]
+
+    def test_websocket_replays_history(self):
+        """Test the WebSocket route resumes from last_event_id"""
+        hub = EventHub(history_size=8, buffer_size=8)
+        hub.publish(["TEEN"], PURCHASE_VERIFIED, {"amount": 1})
+        hub.publish(["TEEN"], PURCHASE_VERIFIED, {"amount": 2})
+        app = FastAPI()
+        app.include_router(events.router)
+        original = events.get_event_hub
+        events.get_event_hub = lambda: hub
+        try:
+            with TestClient(app).websocket_connect("/api/v1/events/TEEN/ws?last_event_id=1") as websocket:
+                message = websocket.receive_json()
+        finally:
+            events.get_event_hub = original
+
+        assert message["id"] == 2
+        assert message["data"] == {"amount": 2}
@@ -0,0 +1,117 @@
+"""
+Tests for routing allowance calls to the shared family allowance manager
+"""
+
+import base64
+import pytest
+from unittest.mock import Mock, patch
+
+from algosdk import account, encoding, logic
+from algosdk.transaction import SuggestedParams
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routes import allowances
+from backend.services.blockchain_service import BlockchainService
+from backend.services.family_registry import (
+    FAMILY_BOX_MBR,
+    FamilyAccount,
+    decode_family_allowance,
+    encode_family_allowance,
+    family_box_name
+)
+
+ALLOWANCE_APP = 77
+PARENT_KEY, PARENT = account.generate_account()
+TEEN_KEY, TEEN = account.generate_account()
+
+
+@pytest.fixture
+def service():
+    service = BlockchainService()
+    service.allowance_manager_app_id = ALLOWANCE_APP
+    service.params_cache = Mock(get=Mock(return_value=SuggestedParams(
+        1000, 100, 1100, base64.b64encode(b"\x02" * 32).decode(), "testnet-v1.0", flat_fee=True
+    )))
+    service.algod_client = Mock(send_transaction=Mock(return_value="TXID"), send_transactions=Mock(return_value="TXID"))
+    with patch("backend.services.blockchain_service.wait_for_confirmation", return_value={"confirmed-round": 105}):
+        yield service
+    service.close()
+
+
+class TestFamilyRegistry:
+    """Test the family box layout and per-teen call routing"""
+
+    def test_family_record_round_trip(self):
+        """Test a FamilyAllowance box decodes to what was encoded, under a key of the teen"""
+        record = {
+            "parent_address": PARENT,
+            "weekly_amount": 50000000,
+            "last_allowance_time": 1700000000,
+            "total_issued": 150000000,
+            "savings_locked": 2000000,
+            "savings_unlock_time": 1800000000,
+            "created": 1690000000,
+            "is_paused": False
+        }
+        value = encode_family_allowance(record)
+        assert len(value) == 81
+        assert decode_family_allowance(value) == record
+        assert family_box_name(TEEN) == b"t" + encoding.decode_address(TEEN)
+        with pytest.raises(ValueError):
+            decode_family_allowance(value[:-1])
+
+    def test_register_family_pays_box_mbr(self, service):
+        """Test registration sends the box MBR payment with the app call and remembers the parent"""
+        result = service.register_family(PARENT_KEY, TEEN, 50000000, "family-1")
+        assert result["parent_address"] == PARENT and result["confirmed_round"] == 105
+
+        payment, call = [stxn.transaction for stxn in service.algod_client.send_transactions.call_args.args[0]]
+        assert payment.receiver == logic.get_application_address(ALLOWANCE_APP)
+        assert payment.amt == FAMILY_BOX_MBR
+        assert payment.group == call.group is not None
+        assert call.app_args == [b"register_family", encoding.decode_address(TEEN), (50000000).to_bytes(8, "big")]
+        assert [(ref.app_index, ref.name) for ref in call.boxes] == [(0, family_box_name(TEEN))]
+        assert service.families.get(TEEN) == FamilyAccount(TEEN, PARENT, "family-1")
+        assert service.families.teens_of(PARENT) == [TEEN]
+
+    def test_parent_calls_name_the_teen(self, service):
+        """Test parent methods get the teen as their first argument and a box reference to the teen's record"""
+        service.families.add(FamilyAccount(TEEN, PARENT))
+        assert service.call_allowance_manager(PARENT_KEY, TEEN, "pause_allowance", [])["success"]
+
+        call = service.algod_client.send_transaction.call_args.args[0].transaction
+        assert call.app_args == [b"pause_allowance", encoding.decode_address(TEEN)]
+        assert [(ref.app_index, ref.name) for ref in call.boxes] == [(0, family_box_name(TEEN))]
+
+        # Someone else's key is refused before anything is sent
+        other_key, _ = account.generate_account()
+        assert "parent" in service.call_allowance_manager(other_key, TEEN, "pause_allowance", [])["error"]
+        assert service.algod_client.send_transaction.call_count == 1
+
+    def test_teen_calls_use_the_sender(self, service):
+        """Test teen methods are keyed by the sender and must be signed by the teen"""
+        args = [(1000).to_bytes(8, "big"), (1800000000).to_bytes(8, "big")]
+        assert service.call_allowance_manager(TEEN_KEY, TEEN, "timelock_savings", args)["success"]
+        call = service.algod_client.send_transaction.call_args.args[0].transaction
+        assert call.sender == TEEN and call.app_args == [b"timelock_savings"] + args
+
+        assert "error" in service.call_allowance_manager(PARENT_KEY, TEEN, "timelock_savings", args)
+
+    def test_register_route(self, service):
+        """Test POST /families registers the teen with the shared app"""
+        app = FastAPI()
+        app.include_router(allowances.router)
+        app.dependency_overrides[allowances.get_blockchain_service] = lambda: service
+        client = TestClient(app)
+
+        body = client.post("/api/v1/allowances/families", json={
+            "teen_address": TEEN, "weekly_amount": 50000000, "parent_private_key": PARENT_KEY
+        }).json()
+        assert (body["parent_address"], body["app_id"], body["confirmed_round"]) == (PARENT, ALLOWANCE_APP, 105)
+
+        service.algod_client.send_transactions.side_effect = Exception("logic eval error: Teen already registered")
+        response = client.post("/api/v1/allowances/families", json={
+            "teen_address": TEEN, "weekly_amount": 50000000, "parent_private_key": PARENT_KEY
+        })
+        assert response.status_code == 400 and "already registered" in response.json()["detail"]
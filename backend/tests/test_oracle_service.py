@@ -2,8 +2,9 @@
 Tests for Oracle Service
 """
 
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from backend.services.oracle_service import OracleService, MerchantAttestation, PurchaseRequest
 from backend.services.blockchain_service import BlockchainService
 
@@ -15,6 +16,7 @@ class TestOracleService:
         """Mock blockchain service"""
         mock_service = Mock(spec=BlockchainService)
         mock_service.attestation_oracle_app_id = 12345
+        mock_service.attestation_oracle_version = 1
         return mock_service
     
     @pytest.fixture
@@ -162,9 +164,83 @@ class TestOracleService:
         assert analytics["is_approved"] is True
         assert analytics["parent_approved"] is True
     
-    def test_sync_with_blockchain(self, oracle_service):
+    def test_sync_with_blockchain(self, oracle_service, mock_blockchain_service):
         """Test syncing with blockchain"""
-        result = oracle_service.sync_with_blockchain()
+        mock_blockchain_service.get_network_status_async = AsyncMock(return_value={"last_round": 1000})
+        mock_blockchain_service.get_application_boxes_async = AsyncMock(return_value=[])
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
         
         assert result["success"] is True
-        assert "synced_merchants" in result
+        assert result["synced_merchants"] == 0
+        assert result["synced_round"] == 1000
+        
+        mock_blockchain_service.attestation_oracle_app_id = None
+        assert asyncio.run(oracle_service.sync_with_blockchain_async()) == {"error": "Attestation oracle not deployed"}
+    
+    def test_verify_purchase_batch_matches_sequential(self, oracle_service, mock_blockchain_service):
+        """Test batch verification gives the same outcome as sequential verification"""
+        names = ["Starbucks", "Gaming Store", "Unknown", "Bookstore", "Starbucks", "Starbucks", "Bookstore"]
+        amounts = [30000000, 1000000, 1000000, 30000000, 15000000, 10000000, 1]
+        
+        users = ["DEMO_USER_ADDRESS"] * len(names)
+        
+        approved, reasons = oracle_service.verify_purchase_batch(names, amounts, users)
+        
+        sequential_service = OracleService(mock_blockchain_service)
+        for name, amount, ok, reason in zip(names, amounts, approved, reasons):
+            expected = sequential_service.verify_purchase(
+                PurchaseRequest(merchant_name=name, amount=amount, user_address="DEMO_USER_ADDRESS")
+            )
+            assert ok == expected.approved
+            assert reason == expected.reason
+        
+        assert approved == [True, False, False, True, True, False, False]
+        assert oracle_service.get_spent_today("Starbucks") == 45000000
+    
+    def test_verify_purchase_batch_sees_parent_approval_change(self, oracle_service):
+        """Test batch verification picks up merchant rule changes"""
+        oracle_service.verify_purchase_batch(["Target"], [1000000], ["DEMO_USER_ADDRESS"])
+        oracle_service.parent_approve_merchant("Target", False)
+        
+        approved, reasons = oracle_service.verify_purchase_batch(["Target"], [1000000], ["DEMO_USER_ADDRESS"])
+        
+        assert approved == [False]
+        assert "not approved by parent" in reasons[0]
+    
+    def test_verify_purchase_rolling_window_limit(self, oracle_service):
+        """Test a teen's rolling window limit spans merchants"""
+        from backend.services.rolling_limits import SpendWindowConfig
+        
+        oracle_service.configure_spend_windows("DEMO_USER_ADDRESS", [
+            SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24, limit=40000000)
+        ])
+        
+        first = oracle_service.verify_purchase(
+            PurchaseRequest(merchant_name="Starbucks", amount=30000000, user_address="DEMO_USER_ADDRESS")
+        )
+        second = oracle_service.verify_purchase(
+            PurchaseRequest(merchant_name="Target", amount=20000000, user_address="DEMO_USER_ADDRESS")
+        )
+        
+        assert first.approved is True
+        assert second.approved is False
+        assert "24h" in second.reason
+        assert oracle_service.get_spent_today("Target") == 0
+    
+    def test_failed_purchase_releases_its_window_bucket(self, oracle_service):
+        """Test a purchase failing on chain an hour later gives its spend-window reservation back"""
+        from datetime import datetime
+        from backend.services.rolling_limits import SpendWindowConfig
+        
+        oracle_service.configure_spend_windows("DEMO_USER_ADDRESS", [
+            SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24, limit=40000000)
+        ])
+        oracle_service.confirmation_tracker = Mock()
+        reserved_at = int(datetime.now().timestamp()) - 3600
+        request = PurchaseRequest(merchant_name="Starbucks", amount=30000000, user_address="DEMO_USER_ADDRESS")
+        
+        assert oracle_service.verify_purchase(request, reserved_at).approved
+        oracle_service._track_purchases([request], {"transaction_id": "TXID"}, reserved_at)
+        oracle_service.confirmation_tracker.track.call_args.kwargs["on_failed"](Mock(transaction_id="TXID", error="rejected"))
+        
+        assert oracle_service.get_spend_windows("DEMO_USER_ADDRESS")[0]["spent"] == 0
@@ -0,0 +1,246 @@
+"""
+Tests for reconciling merchant attestations with the oracle's boxes
+"""
+
+import asyncio
+import base64
+import threading
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService
+from backend.services.attestation_layout import (
+    MERCHANT_V2_COUNTER_OFFSET,
+    decode_merchant_attestation,
+    decode_merchant_record_v2,
+    encode_merchant_attestation,
+    encode_merchant_record_v2,
+    merchant_box_name,
+    merchant_key_v2,
+    restricted_category_mask
+)
+from backend.services.oracle_sync import OracleBoxSync
+
+
+def _attestation(name, category="Retail", daily_limit=1000000, is_approved=True, parent_approved=True):
+    return {
+        "merchant_name": name,
+        "category": category,
+        "is_approved": is_approved,
+        "daily_limit": daily_limit,
+        "total_spent_today": 0,
+        "last_update": 1700000000,
+        "parent_approved": parent_approved
+    }
+
+
+class FakeOracleChain:
+    """Merchant boxes and app call args behind the async BlockchainService methods sync uses"""
+
+    def __init__(self):
+        self.boxes = {}
+        self.calls = []
+        self.round = 1000
+        self.box_reads = 0
+        self.service = Mock(spec=BlockchainService)
+        self.service.attestation_oracle_app_id = 1234
+        self.service.attestation_oracle_version = 1
+        self.service.get_network_status_async = AsyncMock(side_effect=lambda: {"last_round": self.round})
+        self.service.get_application_boxes_async = AsyncMock(side_effect=lambda app_id: list(self.boxes))
+        self.service.get_box_async = AsyncMock(side_effect=self._get_box)
+        self.service.get_application_call_args_async = AsyncMock(
+            side_effect=lambda app_id, min_round: {"args": list(self.calls), "current_round": self.round}
+        )
+
+    async def _get_box(self, app_id, name):
+        self.box_reads += 1
+        return self.boxes.get(name)
+
+    def put(self, attestation):
+        self.boxes[merchant_box_name(attestation["merchant_name"])] = encode_merchant_attestation(attestation)
+
+    def put_v2(self, attestation):
+        self.boxes[merchant_key_v2(attestation["merchant_name"])] = encode_merchant_record_v2(attestation)
+
+
+class TestOracleSync:
+    """Test cases for OracleBoxSync and OracleService.sync_with_blockchain_async"""
+
+    @pytest.fixture
+    def chain(self):
+        return FakeOracleChain()
+
+    def test_attestation_box_round_trip(self):
+        """Test the ARC-4 MerchantAttestation layout decodes back to what was encoded"""
+        attestation = _attestation("Café Ünïcode", "Food & Beverage", 2**64 - 1, is_approved=False)
+        value = encode_merchant_attestation(attestation)
+        # 30-byte head, then the two length-prefixed strings
+        assert value[:4] == bytes([0, 30, 0, 30 + 2 + len("Café Ünïcode".encode())])
+        assert decode_merchant_attestation(value) == attestation
+        with pytest.raises(ValueError):
+            decode_merchant_attestation(value[:20])
+        with pytest.raises(ValueError):
+            decode_merchant_attestation(value[:-3])
+
+    def test_sync_applies_only_changed_boxes(self, chain):
+        """Test the first sync reads every box, later ones only new boxes and those an app call named"""
+        oracle_service = OracleService(chain.service)
+        chain.put(_attestation("Starbucks", "Food & Beverage", 50000000))
+        chain.put(_attestation("Target", daily_limit=7))
+        chain.put(_attestation("Chain Cafe", "Food & Beverage"))
+
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert result["success"] is True
+        assert (result["synced_merchants"], result["fetched"], result["updated"]) == (3, 3, 2)
+        assert oracle_service.get_merchant_attestation("Target").daily_limit == 7
+        assert oracle_service.get_merchant_attestation("Chain Cafe").category == "Food & Beverage"
+
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert (result["fetched"], result["updated"]) == (0, 0)
+        assert chain.box_reads == 3
+
+        # The service's own calls pass the bare merchant name after the method name
+        chain.round = 1010
+        chain.put(_attestation("Target", daily_limit=9, parent_approved=False))
+        chain.calls = [[b"update_merchant_limits", b"Target", (9).to_bytes(8, "big"), b"True"]]
+        chain.put(_attestation("Bookstore 2", "Education"))
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert (result["synced_merchants"], result["fetched"], result["updated"]) == (4, 2, 2)
+        target = oracle_service.get_merchant_attestation("Target")
+        assert (target.daily_limit, target.parent_approved) == (9, False)
+        assert chain.service.get_application_call_args_async.call_args.args == (1234, 1000)
+        assert oracle_service.box_sync.synced_round == 1010
+
+    def test_queued_writes_keep_local_state(self, chain):
+        """Test a merchant with a chain write still queued is not overwritten, and is read again later"""
+        release = threading.Event()
+
+        def confirm_when_released(calls):
+            release.wait(5)
+            chain.put(_attestation("Target", daily_limit=123))
+            return {"success": True, "transaction_ids": ["TX"] * len(calls), "confirmed_round": 1001}
+
+        chain.service.call_attestation_oracle_group.side_effect = confirm_when_released
+        oracle_service = OracleService(chain.service)
+        oracle_service.oracle_private_key = "ORACLE_KEY"
+        chain.put(_attestation("Target", daily_limit=7))
+        oracle_service.update_merchant_limits("Target", 123, True)
+
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert (result["updated"], result["skipped"]) == (0, 1)
+        assert oracle_service.get_merchant_attestation("Target").daily_limit == 123
+
+        release.set()
+        assert oracle_service.write_queue.drain(5)
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert (result["fetched"], result["updated"], result["skipped"]) == (1, 0, 0)
+        assert oracle_service.get_merchant_attestation("Target").daily_limit == 123
+        oracle_service.write_queue.close()
+        oracle_service.oracle_writes.close()
+
+    def test_box_reads_are_bounded(self, chain):
+        """Test thousands of boxes are read concurrently but never more than `concurrency` at a time"""
+        for i in range(2000):
+            chain.put(_attestation(f"Merchant {i}"))
+        active = peak = 0
+
+        async def slow_box(app_id, name):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            active -= 1
+            return chain.boxes[name]
+
+        chain.service.get_box_async = AsyncMock(side_effect=slow_box)
+        box_sync = OracleBoxSync(chain.service, concurrency=16)
+        read = asyncio.run(box_sync.read())
+        assert len(read["changed"]) == 2000
+        assert peak == 16
+
+    def test_application_call_args_walk_pages_and_inner_calls(self):
+        """Test app call args are collected across indexer pages, including inner calls to the app"""
+        def app_call(app_id, *args, inner=()):
+            return {
+                "application-transaction": {
+                    "application-id": app_id,
+                    "application-args": [base64.b64encode(arg).decode() for arg in args]
+                },
+                "inner-txns": list(inner)
+            }
+
+        pages = [
+            {"current-round": 900, "next-token": "p2", "transactions": [app_call(1234, b"add", b"Target")]},
+            {"current-round": 901, "transactions": [app_call(77, b"route", inner=[app_call(1234, b"approve", b"Amazon")])]}
+        ]
+        service = BlockchainService()
+        service.async_indexer = Mock(search_transactions=AsyncMock(side_effect=pages))
+
+        result = asyncio.run(service.get_application_call_args_async(1234, 850))
+        assert result == {"args": [[b"add", b"Target"], [b"approve", b"Amazon"]], "current_round": 900}
+        assert service.async_indexer.search_transactions.call_args_list[1].kwargs["next_page"] == "p2"
+        assert service.async_indexer.search_transactions.call_args.kwargs["min_round"] == 850
+        service.close()
+
+    def test_v2_record_layout(self):
+        """Test v2 records are fixed width under fixed-length keys and migrate v1 boxes with their spend"""
+        v1_box = encode_merchant_attestation({**_attestation("Barnes & Noble College Bookstore", "Education"),
+                                              "total_spent_today": 4200, "last_update": 1700000123})
+        record = encode_merchant_record_v2(decode_merchant_attestation(v1_box))
+        assert len(record) == len(encode_merchant_record_v2(_attestation("T"))) == 34
+        assert len(merchant_key_v2("T")) == len(merchant_key_v2("Barnes & Noble College Bookstore")) == 16
+
+        decoded = decode_merchant_record_v2(record, "Barnes & Noble College Bookstore")
+        assert decoded == {**_attestation("Barnes & Noble College Bookstore", "Education"),
+                           "total_spent_today": 4200, "last_update": 1700000123}
+        # The counter belongs to its day; a later day reads it as spent nothing
+        assert decode_merchant_record_v2(record, "B", now=1700000123 + 86400)["total_spent_today"] == 0
+        assert record[MERCHANT_V2_COUNTER_OFFSET:MERCHANT_V2_COUNTER_OFFSET + 8] == (4200).to_bytes(8, "big")
+
+        assert restricted_category_mask(["Gaming", "Gambling", "Adult Content", "Tobacco", "Alcohol"]) == 0b11111000000
+        with pytest.raises(ValueError):
+            encode_merchant_record_v2(_attestation("Arcade", "Arcades"))
+        with pytest.raises(ValueError):
+            decode_merchant_record_v2(record[:-1], "B")
+
+    def test_v2_sync_maps_hashed_keys_to_names(self, chain):
+        """Test v2 boxes are read once matched to a local merchant or a name passed to an oracle call"""
+        chain.service.attestation_oracle_version = 2
+        oracle_service = OracleService(chain.service)
+        chain.put_v2(_attestation("Target", daily_limit=7))
+        chain.put_v2(_attestation("Elsewhere Cafe", "Food & Beverage"))
+
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert (result["synced_merchants"], result["fetched"], result["updated"]) == (2, 1, 1)
+        assert oracle_service.get_merchant_attestation("Target").daily_limit == 7
+        assert oracle_service.get_merchant_attestation("Elsewhere Cafe") is None
+
+        chain.calls = [[b"add_merchant_attestation", b"Elsewhere Cafe", bytes([1]), b"True"]]
+        result = asyncio.run(oracle_service.sync_with_blockchain_async())
+        assert (result["fetched"], result["updated"]) == (1, 1)
+        assert oracle_service.get_merchant_attestation("Elsewhere Cafe").category == "Food & Beverage"
+
+    def test_v2_writes_send_category_ids(self, chain):
+        """Test the v2 oracle is sent a category id, and a category without one is rejected up front"""
+        chain.service.attestation_oracle_version = 2
+        oracle_service = OracleService(chain.service)
+        oracle_service.oracle_private_key = "ORACLE_KEY"
+        oracle_service.write_queue.close()
+        oracle_service.write_queue = Mock()
+
+        attestation = oracle_service.get_merchant_attestation("Target").model_copy(update={"merchant_name": "Kiosk"})
+        assert oracle_service.add_merchant_attestation(attestation)["success"] is True
+        merchant, method, args = oracle_service.write_queue.enqueue.call_args.args
+        assert (merchant, method, args[1]) == ("Kiosk", "add_merchant_attestation", bytes([0]))
+
+        unknown = attestation.model_copy(update={"merchant_name": "Arcade", "category": "Arcades"})
+        assert "error" in oracle_service.add_merchant_attestation(unknown)
+        assert oracle_service.get_merchant_attestation("Arcade") is None
+        oracle_service.oracle_writes.close()
+
+        service = BlockchainService()
+        assert service.attestation_box_name("Target") == merchant_box_name("Target")
+        service.attestation_oracle_version = 2
+        assert service.attestation_box_name("Target") == merchant_key_v2("Target")
+        service.close()
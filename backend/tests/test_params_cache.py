@@ -0,0 +1,66 @@
+"""
+Tests for the suggested params cache
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from algosdk.transaction import SuggestedParams
+
+from backend.services.params_cache import SuggestedParamsCache
+
+
+def make_params(first: int) -> SuggestedParams:
+    return SuggestedParams(fee=1000, first=first, last=first + 1000, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", flat_fee=True)
+
+
+class TestSuggestedParamsCache:
+    """Test cases for SuggestedParamsCache"""
+    
+    def test_concurrent_gets_share_one_fetch(self):
+        """Test many callers in the same round hit algod once"""
+        algod_client = Mock()
+        algod_client.suggested_params.return_value = make_params(100)
+        cache = SuggestedParamsCache(algod_client, round_time=60, background=False)
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: cache.get(), range(200)))
+        
+        assert algod_client.suggested_params.call_count == 1
+        assert cache.hits == 199 and cache.misses == 1
+        assert all(params.first == 100 for params in results)
+        # Callers get copies they can safely mutate
+        results[0].fee = 5
+        assert cache.get().fee == 1000
+    
+    def test_refresh_near_end_of_validity_window(self):
+        """Test params are refetched when the validity window is nearly used up"""
+        algod_client = Mock()
+        algod_client.suggested_params.side_effect = [make_params(100), make_params(1095)]
+        cache = SuggestedParamsCache(algod_client, refresh_margin=10, round_time=60, background=False)
+        
+        cache.get()
+        cache._last_round = 1091  # chain advanced close to params.last (1100)
+        
+        assert cache.get().first == 1095
+        assert cache.misses == 2
+    
+    def test_background_follower_refreshes_each_round(self):
+        """Test the follower refreshes once per new round"""
+        rounds = iter([101, 102])
+        algod_client = Mock()
+        algod_client.suggested_params.side_effect = lambda: make_params(cache._last_round)
+        cache = SuggestedParamsCache(algod_client, round_time=60, background=False)
+        
+        def status_after_block(round_num):
+            try:
+                return {"last-round": next(rounds)}
+            except StopIteration:
+                cache._stop.set()
+                return {"last-round": round_num}
+        algod_client.status_after_block.side_effect = status_after_block
+        
+        cache._follow_rounds()
+        
+        assert cache.background_refreshes == 2
+        assert cache.stats()["last_round"] == 102
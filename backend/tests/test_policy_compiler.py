@@ -0,0 +1,162 @@
+"""
+Tests for the purchase policy compiler
+"""
+
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import Mock
+
+from backend.services.policy_compiler import (
+    FLAG_PARENT_APPROVED,
+    FLAG_RESTRICTED,
+    FLAGS_ELIGIBLE,
+    FamilyRules,
+    PolicyCompiler
+)
+from backend.services.oracle_service import MerchantAttestation, OracleService, PurchaseRequest
+from backend.services.blockchain_service import BlockchainService
+from backend.api.routes import families
+
+
+class TestPolicyCompiler:
+    """Test cases for PolicyCompiler"""
+    
+    @pytest.fixture
+    def oracle_service(self):
+        """Oracle service with a family that has its own rules"""
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.attestation_oracle_app_id = None
+        service = OracleService(blockchain_service)
+        service.set_family_rules(FamilyRules(
+            family_id="family-1",
+            teen_addresses=["TEEN_1"],
+            restricted_categories=["Entertainment"],
+            merchant_approvals={"Gaming Store": True},
+            category_caps={"Education": 40000000}
+        ))
+        return service
+    
+    def test_default_policy_records(self, oracle_service):
+        """Test decision records for teens without family rules"""
+        compiler = oracle_service.policy_compiler
+        
+        assert compiler.decide("OTHER_TEEN", "Starbucks").flags == FLAGS_ELIGIBLE
+        assert compiler.decide("OTHER_TEEN", "Gaming Store").flags & FLAG_PARENT_APPROVED == 0
+        assert compiler.decide("OTHER_TEEN", "Unknown") is None
+    
+    def test_family_restricted_category_bitmask(self, oracle_service):
+        """Test family-specific restricted categories"""
+        record = oracle_service.policy_compiler.decide("TEEN_1", "Spotify")
+        
+        assert record.flags & FLAG_RESTRICTED
+        response = oracle_service.verify_purchase(
+            PurchaseRequest(merchant_name="Spotify", amount=1000000, user_address="TEEN_1")
+        )
+        assert response.approved is False
+        assert "Entertainment" in response.reason
+    
+    def test_category_cap_spans_merchants(self, oracle_service):
+        """Test a family category cap shared across merchants in that category"""
+        first = oracle_service.verify_purchase(
+            PurchaseRequest(merchant_name="Bookstore", amount=25000000, user_address="TEEN_1")
+        )
+        second = oracle_service.verify_purchase(
+            PurchaseRequest(merchant_name="Khan Academy", amount=25000000, user_address="TEEN_1")
+        )
+        
+        assert first.approved is True
+        assert second.approved is False
+        assert "cap" in second.reason
+        # The rejected purchase must not keep its merchant reservation
+        assert oracle_service.get_spent_today("Khan Academy") == 0
+    
+    def test_incremental_recompile_on_rule_change(self, oracle_service):
+        """Test parent approval and limit changes patch compiled records"""
+        compiler = oracle_service.policy_compiler
+        compiler.decide("TEEN_1", "Target")
+        
+        oracle_service.parent_approve_merchant("Target", False, family_id="family-1")
+        oracle_service.update_merchant_limits("Target", 1000, True)
+        
+        family_record = compiler.decide("TEEN_1", "Target")
+        default_record = compiler.decide("OTHER_TEEN", "Target")
+        assert family_record.flags & FLAG_PARENT_APPROVED == 0
+        assert family_record.daily_limit == 1000
+        assert default_record.flags == FLAGS_ELIGIBLE
+        assert default_record.daily_limit == 1000
+    
+    def test_family_rules_route_and_unknown_family(self, oracle_service):
+        """Test families are managed through the API and approvals for unknown families are rejected"""
+        assert oracle_service.parent_approve_merchant("Target", False, family_id="nobody") == {
+            "error": "Family not found"
+        }
+        assert oracle_service.get_family_rules("nobody") is None
+        
+        app = FastAPI()
+        app.include_router(families.router)
+        app.dependency_overrides[families.get_oracle_service] = lambda: oracle_service
+        client = TestClient(app)
+        assert client.get("/api/v1/families/nobody/rules").status_code == 404
+        
+        response = client.put("/api/v1/families/jones/rules", json={
+            "teen_addresses": ["TEEN_2"], "category_caps": {"Retail": 1000000}
+        })
+        assert response.status_code == 200
+        assert client.get("/api/v1/families/jones/rules").json()["category_caps"] == {"Retail": 1000000}
+        assert oracle_service.parent_approve_merchant("Target", False, family_id="jones")["success"]
+        denied = oracle_service.verify_purchase(
+            PurchaseRequest(merchant_name="Target", amount=1000, user_address="TEEN_2")
+        )
+        assert "not approved by parent" in denied.reason
+    
+    def test_new_merchants_are_safe_to_read_while_added(self, oracle_service):
+        """Test lookups racing merchant inserts never see a half-added row"""
+        compiler = oracle_service.policy_compiler
+        compiler.decide("TEEN_1", "Target")
+        errors = []
+        
+        def add_merchants():
+            for i in range(2000):
+                compiler.update_merchant(MerchantAttestation(
+                    merchant_name=f"M{i}", category="Retail", is_approved=True, daily_limit=1,
+                    total_spent_today=0, last_update=0, parent_approved=True
+                ))
+        
+        adder = threading.Thread(target=add_merchants)
+        adder.start()
+        while adder.is_alive():
+            try:
+                for i in range(0, 2000, 7):
+                    compiler.decide("TEEN_1", f"M{i}")
+                    compiler.decide("OTHER_TEEN", f"M{i}")
+            except Exception as e:
+                errors.append(e)
+                break
+        adder.join()
+        
+        assert errors == []
+        assert compiler.decide("TEEN_1", "M1999").daily_limit == 1
+    
+    def test_concurrent_merchant_updates_keep_each_field(self, oracle_service):
+        """Test a limit update and a parent approval racing on one merchant both land"""
+        oracle_service._queue_oracle_write = Mock(return_value=None)
+        
+        def update_limits():
+            for limit in range(1, 301):
+                oracle_service.update_merchant_limits("Target", limit, True)
+        
+        def toggle_approval():
+            for i in range(301):
+                oracle_service.parent_approve_merchant("Target", i % 2 == 1)
+        
+        threads = [threading.Thread(target=update_limits), threading.Thread(target=toggle_approval)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        merchant = oracle_service.get_merchant_attestation("Target")
+        assert (merchant.daily_limit, merchant.is_approved, merchant.parent_approved) == (300, True, False)
@@ -0,0 +1,109 @@
+"""
+Tests for pre-encoded purchase group templates
+"""
+
+import asyncio
+import base64
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from algosdk import account, encoding
+from algosdk.transaction import SuggestedParams
+
+from backend.services.blockchain_service import BlockchainService
+
+ORACLE_APP = 1234
+ALLOWANCE_APP = 77
+GENESIS_HASH = base64.b64encode(b"\x02" * 32).decode()
+TEEN_KEY, TEEN = account.generate_account()
+PARENT_KEY, _ = account.generate_account()
+_, MERCHANT = account.generate_account()
+
+
+def _params(first, fee=1000, flat_fee=True):
+    return SuggestedParams(fee, first, first + 1000, GENESIS_HASH, "testnet-v1.0", flat_fee=flat_fee)
+
+
+def _built(service, params, amount, private_key=TEEN_KEY, merchant_name="Starbucks"):
+    """The group as the algosdk builder encodes it"""
+    return [
+        base64.b64decode(encoding.msgpack_encode(stxn))
+        for stxn in service._build_purchase_group(params, private_key, merchant_name, amount, TEEN, MERCHANT)
+    ]
+
+
+def _rendered(service, params, amount, private_key=TEEN_KEY, merchant_name="Starbucks"):
+    encoded = service._render_purchase_group(params, merchant_name, amount, TEEN, MERCHANT)
+    return None if encoded is None else service.signer.sign_encoded_group(encoded, private_key, TEEN)
+
+
+@pytest.fixture
+def service():
+    service = BlockchainService()
+    service.attestation_oracle_app_id = ORACLE_APP
+    service.allowance_manager_app_id = ALLOWANCE_APP
+    service.attestation_oracle_version = 1
+    yield service
+    service.close()
+
+
+class TestPurchaseTemplates:
+    """Test rendered groups are byte-for-byte what the builder produces"""
+
+    @pytest.mark.parametrize("amount", [1, 300, 70000, 5000000, 2 ** 40])
+    def test_rendered_group_matches_builder(self, service, amount):
+        """Test amounts of every msgpack width, across validity windows, render like the builder"""
+        for first in [100, 70000, 30000000]:
+            params = _params(first)
+            assert _rendered(service, params, amount) == _built(service, params, amount)
+
+        group = service._purchase_group(_params(100), "Starbucks", amount, TEEN, MERCHANT)
+        rendered = service._render_purchase_group(_params(100), "Starbucks", amount, TEEN, MERCHANT)
+        assert encoding.msgpack_decode(base64.b64encode(rendered[0]).decode()).group == group[0].group
+        assert service.get_purchase_template_stats() == {"templates": 1, "hits": 3, "misses": 1, "fallbacks": 0}
+
+    def test_templates_are_per_teen_merchant_and_deployment(self, service):
+        """Test a new merchant, address or app deployment gets its own template"""
+        params = _params(100)
+        _rendered(service, params, 1000)
+        _rendered(service, params, 1000, merchant_name="Target")
+        assert service.get_purchase_template_stats()["templates"] == 2
+
+        service.allowance_manager_app_id = 78
+        assert _rendered(service, params, 1000) == _built(service, params, 1000)
+        assert service.get_purchase_template_stats()["misses"] == 3
+
+        service.purchase_templates.max_templates = 2
+        _rendered(service, params, 1000, merchant_name="Bookstore")
+        assert service.get_purchase_template_stats()["templates"] == 2
+
+    def test_min_fee_and_per_byte_fee(self, service):
+        """Test suggested (non-flat) params render at the minimum fee, and per-byte fees fall back"""
+        params = _params(100, fee=0, flat_fee=False)
+        assert _rendered(service, params, 1000) == _built(service, params, 1000)
+
+        params = _params(100, fee=5, flat_fee=False)
+        assert service._render_purchase_group(params, "Starbucks", 1000, TEEN, MERCHANT) is None
+        assert service.get_purchase_template_stats()["fallbacks"] == 1
+
+    def test_rekeyed_teen(self, service):
+        """Test a key that is not the teen's signs as the authorizing address"""
+        params = _params(100)
+        assert _rendered(service, params, 1000, private_key=PARENT_KEY) == _built(service, params, 1000, private_key=PARENT_KEY)
+
+    def test_submit_sends_rendered_group(self, service):
+        """Test the async purchase path submits the rendered bytes, and builds when it cannot render"""
+        params = _params(100)
+        service.params_cache = Mock(peek=Mock(return_value=params))
+        service.async_algod = Mock(
+            send_raw_transactions=AsyncMock(return_value="TXID"),
+            send_transactions=AsyncMock(return_value="TXID")
+        )
+
+        result = asyncio.run(service.submit_atomic_purchase_group_async(TEEN_KEY, "Starbucks", 1000, TEEN, MERCHANT))
+        assert result["transaction_id"] == "TXID" and result["last_valid_round"] == 1100
+        assert service.async_algod.send_raw_transactions.call_args.args[0] == b"".join(_built(service, params, 1000))
+
+        service.purchase_templates.max_templates = 0
+        asyncio.run(service.submit_atomic_purchase_group_async(TEEN_KEY, "Starbucks", 1000, TEEN, MERCHANT))
+        assert service.async_algod.send_transactions.call_count == 1
@@ -0,0 +1,125 @@
+"""
+Tests for the Redis spend counter backend
+"""
+
+import asyncio
+import threading
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService, PurchaseRequest
+from backend.services.policy_compiler import FamilyRules
+from backend.services.redis_spend import RedisRollingLimits
+from backend.services.rolling_limits import SpendWindowConfig
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+class TestRedisSpendCounters:
+    """Test cases for RedisSpendCounter and RedisRollingLimits"""
+
+    @pytest.fixture
+    def server(self):
+        return fakeredis.FakeServer()
+
+    def _worker(self, server) -> OracleService:
+        """An OracleService as one API worker would build it"""
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.attestation_oracle_app_id = None
+        return OracleService(blockchain_service, redis_client=fakeredis.FakeRedis(server=server))
+
+    def test_limits_are_shared_across_workers(self, server):
+        """Test two workers draw down one merchant limit, category cap and teen window"""
+        first, second = self._worker(server), self._worker(server)
+        for worker in (first, second):
+            worker.set_family_rules(FamilyRules(
+                family_id="smith", teen_addresses=["TEEN"], category_caps={"Shopping": 150000000}
+            ))
+
+        def buy(worker, merchant, amount, user="TEEN"):
+            return worker.verify_purchase(PurchaseRequest(merchant_name=merchant, amount=amount, user_address=user))
+
+        # Starbucks daily limit is 50 ALGO across both workers
+        assert buy(first, "Starbucks", 30000000, "OTHER").approved
+        denied = buy(second, "Starbucks", 30000000, "OTHER")
+        assert not denied.approved
+        assert denied.reason == "Purchase would exceed daily limit of 50000000 microAlgos"
+        assert second.get_spent_today("Starbucks") == 30000000
+
+        # Amazon (Shopping) is capped at 150 ALGO for the family
+        assert buy(first, "Amazon", 100000000).approved
+        denied = buy(second, "Amazon", 60000000)
+        assert denied.reason == "Purchase would exceed daily Shopping cap of 150000000 microAlgos"
+        # A rejected cap leaves the merchant counter untouched
+        assert first.get_spent_today("Amazon") == 100000000
+
+        # Teen's 24h window, configured on one worker, applies on the other
+        first.configure_spend_windows("TEEN", [
+            SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24, limit=120000000)
+        ])
+        denied = buy(second, "Target", 30000000)
+        assert denied.reason == "Purchase would exceed 24h spend limit of 120000000 microAlgos"
+        assert second.get_spend_windows("TEEN")[0]["spent"] == 100000000
+
+        first._release_purchase(PurchaseRequest(merchant_name="Amazon", amount=100000000, user_address="TEEN"))
+        assert buy(second, "Target", 30000000).approved
+        assert second.get_merchant_attestations()["Amazon"].total_spent_today == 0
+
+    def test_batch_matches_sequential_verification(self, server):
+        """Test a pipelined batch gives the same outcomes as one-by-one verification"""
+        batch_worker, sequential_worker = self._worker(server), self._worker(fakeredis.FakeServer())
+        merchants = ["Starbucks", "Gaming Store", "Starbucks", "Unknown", "Bookstore", "Starbucks"]
+        amounts = [20000000, 1000, 20000000, 1000, 40000000, 20000000]
+        users = ["TEEN"] * len(merchants)
+
+        approved, reasons = batch_worker.verify_purchase_batch(merchants, amounts, users)
+        sequential = [
+            sequential_worker.verify_purchase(PurchaseRequest(merchant_name=m, amount=a, user_address=u))
+            for m, a, u in zip(merchants, amounts, users)
+        ]
+
+        assert approved == [True, False, True, False, False, False]
+        assert approved == [response.approved for response in sequential]
+        assert reasons == [response.reason for response in sequential]
+        assert batch_worker.spend_counter.get_spent("Starbucks", int(datetime.now().timestamp()))[0] == 40000000
+
+    def test_async_purchase_keeps_redis_off_the_event_loop(self, server):
+        """Test submit_purchase_atomic_async reserves and releases spend from a worker thread"""
+        worker = self._worker(server)
+        worker.blockchain_service.submit_atomic_purchase_group_async = AsyncMock(return_value={"error": "rejected"})
+        client_threads = []
+        client = worker.spend_counter.client
+        original = client.evalsha
+
+        def evalsha(*args, **kwargs):
+            client_threads.append(threading.current_thread())
+            return original(*args, **kwargs)
+
+        client.evalsha = evalsha
+        request = PurchaseRequest(merchant_name="Starbucks", amount=1000, user_address="TEEN")
+        result = asyncio.run(worker.submit_purchase_atomic_async("KEY", "TEEN", request))
+
+        assert result.reason == "Transaction failed: rejected"
+        assert client_threads and threading.main_thread() not in client_threads
+        assert worker.get_spent_today("Starbucks") == 0
+
+    def test_release_after_bucket_boundary(self, server):
+        """Test a release in a later bucket gives back the bucket the reservation was charged to"""
+        limits = RedisRollingLimits(fakeredis.FakeRedis(server=server), default_windows=[
+            SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24, limit=100)
+        ])
+        reserved_at = 1000 * 86400 + 3500
+
+        assert limits.try_reserve("TEEN", 100, reserved_at) is None
+        limits.release("TEEN", 100, reserved_at + 200, reserved_at)
+        assert limits.status("TEEN", reserved_at + 200)[0]["spent"] == 0
+        assert limits.try_reserve("TEEN", 50, reserved_at + 200) is None
+
+        # A reservation whose bucket already left the window gives back nothing
+        limits.release("TEEN", 50, reserved_at + 2 * 86400, reserved_at + 200)
+        assert limits.try_reserve("TEEN", 100, reserved_at + 2 * 86400) is None
+        assert limits.status("TEEN", reserved_at + 2 * 86400)[0]["spent"] == 100
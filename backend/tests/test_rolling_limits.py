@@ -0,0 +1,83 @@
+"""
+Tests for rolling per-teen spend limits
+"""
+
+from backend.services.rolling_limits import RollingSpendLimits, SpendWindow, SpendWindowConfig
+
+HOUR = 3600
+DAY = 86400
+
+
+class TestRollingSpendLimits:
+    """Test cases for RollingSpendLimits"""
+    
+    def test_window_expires_old_buckets(self):
+        """Test spend rolls out of the window bucket by bucket"""
+        window = SpendWindow(SpendWindowConfig(name="24h", window_seconds=DAY, num_buckets=24, limit=100))
+        start = 1000 * DAY
+        window.add(60, start)
+        window.add(30, start + 12 * HOUR)
+        
+        assert window.spent(start + 23 * HOUR) == 90
+        assert window.spent(start + 25 * HOUR) == 30
+        assert window.spent(start + 40 * HOUR) == 0
+    
+    def test_limit_enforced_across_merchants(self):
+        """Test a teen's 24h limit is shared across purchases"""
+        limits = RollingSpendLimits([
+            SpendWindowConfig(name="24h", window_seconds=DAY, num_buckets=24, limit=50)
+        ])
+        now = 1000 * DAY
+        
+        assert limits.try_reserve("TEEN", 40, now) is None
+        assert "24h" in limits.try_reserve("TEEN", 20, now + HOUR)
+        assert limits.try_reserve("OTHER_TEEN", 20, now + HOUR) is None
+        assert limits.try_reserve("TEEN", 20, now + 25 * HOUR) is None
+    
+    def test_configure_keeps_history_for_same_shape(self):
+        """Test changing only the limit keeps recorded spend"""
+        limits = RollingSpendLimits()
+        now = 1000 * DAY
+        limits.try_reserve("TEEN", 70, now)
+        
+        limits.configure("TEEN", [
+            SpendWindowConfig(name="7d", window_seconds=7 * DAY, num_buckets=28, limit=100)
+        ])
+        
+        status = limits.status("TEEN", now)
+        assert status == [{
+            "name": "7d",
+            "window_seconds": 7 * DAY,
+            "num_buckets": 28,
+            "limit": 100,
+            "spent": 70,
+            "remaining": 30
+        }]
+    
+    def test_release_after_bucket_boundary(self):
+        """Test a release in a later bucket gives back the bucket the reservation was charged to"""
+        limits = RollingSpendLimits([
+            SpendWindowConfig(name="24h", window_seconds=DAY, num_buckets=24, limit=100)
+        ])
+        reserved_at = 1000 * DAY + HOUR - 100
+        
+        assert limits.try_reserve("TEEN", 100, reserved_at) is None
+        limits.release("TEEN", 100, reserved_at + 200, reserved_at)
+        assert limits.status("TEEN", reserved_at + 200)[0]["spent"] == 0
+        assert limits.try_reserve("TEEN", 50, reserved_at + 200) is None
+        
+        # A reservation whose bucket already left the window gives back nothing
+        limits.release("TEEN", 50, reserved_at + 2 * DAY, reserved_at + 200)
+        assert limits.try_reserve("TEEN", 100, reserved_at + 2 * DAY) is None
+        assert limits.status("TEEN", reserved_at + 2 * DAY)[0]["spent"] == 100
+    
+    def test_late_reservation_expires_with_its_bucket(self):
+        """Test a spend stamped in an earlier bucket is charged to, and expires with, that bucket"""
+        window = SpendWindow(SpendWindowConfig(name="24h", window_seconds=DAY, num_buckets=24))
+        start = 1000 * DAY
+        window.add(10, start + 2 * HOUR)
+        window.add(20, start)
+        
+        assert window.spent(start + 24 * HOUR) == 10
+        window.remove(10, start + 24 * HOUR, start + 2 * HOUR)
+        assert window.spent(start + 24 * HOUR) == 0
@@ -0,0 +1,150 @@
+"""
+Tests for the memory-mapped shared state table
+"""
+
+import multiprocessing
+from unittest.mock import Mock
+
+import pytest
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import MerchantAttestation, OracleService, PurchaseRequest
+from backend.services.policy_compiler import FamilyRules
+from backend.services.rolling_limits import SpendWindowConfig
+from backend.services.shared_state import (
+    CHANGE_RING_SIZE,
+    SharedRollingLimits,
+    SharedStateTable,
+    close_table,
+    open_table
+)
+
+
+def _worker(table: SharedStateTable) -> OracleService:
+    """An OracleService as one API worker would build it"""
+    blockchain_service = Mock(spec=BlockchainService)
+    blockchain_service.attestation_oracle_app_id = None
+    return OracleService(blockchain_service, shared_state=table)
+
+
+def _buy_in_process(path: str, count: int, results) -> None:
+    """Worker process: open the table and buy count 1 ALGO coffees"""
+    table = SharedStateTable(path, 1024)
+    oracle_service = _worker(table)
+    approved = 0
+    for _ in range(count):
+        approved += oracle_service.verify_purchase(PurchaseRequest(
+            merchant_name="Starbucks", amount=1000000, user_address="TEEN"
+        )).approved
+    table.close()
+    results.put(approved)
+
+
+class TestSharedStateTable:
+    """Test cases for SharedStateTable and SharedSpendCounter"""
+
+    @pytest.fixture
+    def table(self, tmp_path):
+        table = open_table(str(tmp_path / "state.mmap"), 1024)
+        yield table
+        close_table(table)
+
+    def test_processes_share_one_daily_limit(self, table):
+        """Test worker processes never approve more than the merchant's daily limit between them"""
+        # Seed the demo merchants (Starbucks: 50 ALGO a day)
+        _worker(table)
+
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [context.Process(target=_buy_in_process, args=(table.path, 40, results)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        approved = sum(results.get(timeout=60) for _ in processes)
+        for process in processes:
+            process.join()
+
+        assert approved == 50
+        assert _worker(table).get_spent_today("Starbucks") == 50000000
+
+    def test_attestation_changes_reach_other_workers(self, table):
+        """Test limit and approval changes on one worker apply to another's verification"""
+        first, second = _worker(table), _worker(table)
+
+        first.update_merchant_limits("Starbucks", 1000, True)
+        denied = second.verify_purchase(PurchaseRequest(merchant_name="Starbucks", amount=2000, user_address="TEEN"))
+        assert denied.reason == "Purchase would exceed daily limit of 1000 microAlgos"
+
+        first.parent_approve_merchant("Target", False)
+        assert not second.get_merchant_attestation("Target").parent_approved
+
+        # More changes than the change ring holds fall back to a full rescan
+        for i in range(CHANGE_RING_SIZE + 10):
+            first.update_merchant_limits("Amazon", i, True)
+        assert second.get_merchant_attestation("Amazon").daily_limit == CHANGE_RING_SIZE + 9
+
+        # New merchants are visible, and restarted workers load every change
+        first.add_merchant_attestation(MerchantAttestation(
+            merchant_name="Library Cafe", category="Food & Beverage", is_approved=True,
+            daily_limit=5000000, total_spent_today=0, last_update=0, parent_approved=True
+        ))
+        assert second.get_merchant_category("Library Cafe") == "Food & Beverage"
+        restarted = _worker(table)
+        assert restarted.get_merchant_attestation("Amazon").daily_limit == CHANGE_RING_SIZE + 9
+        assert len(restarted.get_merchant_attestations()) == 8
+
+    def test_family_rules_and_windows_are_shared_and_persisted(self, tmp_path):
+        """Test family rules, family approvals and teen windows set on one worker hold on another and after restart"""
+        path = str(tmp_path / "state.mmap")
+        table = open_table(path, 1024)
+        first, second = _worker(table), _worker(table)
+        first.set_family_rules(FamilyRules(family_id="smith", teen_addresses=["TEEN"]))
+        second.parent_approve_merchant("Amazon", False, family_id="smith")
+        first.parent_approve_merchant("Target", False, family_id="smith")
+        first.configure_spend_windows("TEEN", [
+            SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24, limit=30000000)
+        ])
+
+        def buy(worker, merchant, amount):
+            return worker.verify_purchase(PurchaseRequest(merchant_name=merchant, amount=amount, user_address="TEEN"))
+
+        assert second.get_family_rules("smith").merchant_approvals == {"Amazon": False, "Target": False}
+        assert "not approved by parent" in buy(second, "Amazon", 1000).reason
+        assert buy(first, "Starbucks", 20000000).approved
+        denied = buy(second, "Starbucks", 20000000)
+        assert denied.reason == "Purchase would exceed 24h spend limit of 30000000 microAlgos"
+
+        close_table(table)
+        table = open_table(path)
+        restarted = _worker(table)
+        try:
+            assert "not approved by parent" in buy(restarted, "Target", 1000).reason
+            assert restarted.get_spend_windows("TEEN")[0]["spent"] == 20000000
+        finally:
+            close_table(table)
+
+    def test_oversized_keys_are_rejected_before_any_change(self, table):
+        """Test a merchant name or family id that cannot fit a table row leaves every worker unchanged"""
+        worker = _worker(table)
+        result = worker.add_merchant_attestation(MerchantAttestation(
+            merchant_name="M" * 65, category="Retail", is_approved=True,
+            daily_limit=1000, total_spent_today=0, last_update=0, parent_approved=True
+        ))
+        assert "longer than 64 bytes" in result["error"]
+        assert worker.get_merchant_attestation("M" * 65) is None
+
+        result = worker.set_family_rules(FamilyRules(family_id="f" * 60, teen_addresses=["TEEN"]))
+        assert "longer than 64 bytes" in result["error"]
+        assert worker.get_family_rules("f" * 60) is None
+
+    def test_window_release_after_bucket_boundary(self, table):
+        """Test a release from another worker, a bucket later, gives back the reservation's bucket"""
+        first, second = [
+            SharedRollingLimits(table.documents, [SpendWindowConfig(name="24h", window_seconds=86400, num_buckets=24, limit=100)])
+            for _ in range(2)
+        ]
+        reserved_at = 1000 * 86400 + 3500
+
+        assert first.try_reserve("TEEN", 100, reserved_at) is None
+        second.release("TEEN", 100, reserved_at + 200, reserved_at)
+        assert first.status("TEEN", reserved_at + 200)[0]["spent"] == 0
+        assert first.try_reserve("TEEN", 50, reserved_at + 200) is None
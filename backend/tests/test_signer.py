@@ -0,0 +1,88 @@
+"""
+Tests for the cached transaction signer
+"""
+
+import asyncio
+import base64
+import pytest
+
+from algosdk import account, encoding
+from algosdk.transaction import PaymentTxn, SuggestedParams, assign_group_id
+
+from backend.services.signer import Signer
+
+PARAMS = SuggestedParams(1000, 100, 1100, base64.b64encode(b"\x02" * 32).decode(), "testnet-v1.0", flat_fee=True)
+KEY, ADDRESS = account.generate_account()
+OTHER_KEY, OTHER = account.generate_account()
+
+
+def _group(sender, count=3):
+    return assign_group_id([PaymentTxn(sender, PARAMS, OTHER, 1000 + i) for i in range(count)])
+
+
+class TestSigner:
+    """Test signatures match algosdk's and keys are derived once"""
+
+    def test_signatures_match_algosdk(self):
+        """Test group signing gives the same signed transactions as Transaction.sign"""
+        signer = Signer()
+        group = _group(ADDRESS)
+
+        signed = signer.sign_group(group, KEY)
+        assert [encoding.msgpack_encode(stxn) for stxn in signed] == [
+            encoding.msgpack_encode(txn.sign(KEY)) for txn in group
+        ]
+        assert signer.address(KEY) == ADDRESS
+        assert signer.stats()["cached_keys"] == 1 and signer.stats()["transactions_signed"] == 3
+
+    def test_per_transaction_keys_and_rekeyed_senders(self):
+        """Test each transaction can have its own key, and a key that is not the sender's signs as auth address"""
+        signer = Signer()
+        group = assign_group_id([PaymentTxn(ADDRESS, PARAMS, OTHER, 1), PaymentTxn(OTHER, PARAMS, ADDRESS, 2)])
+
+        signed = signer.sign_group(group, [KEY, KEY])
+        assert signed[0].authorizing_address is None
+        assert signed[1].authorizing_address == ADDRESS
+        assert encoding.msgpack_encode(signed[1]) == encoding.msgpack_encode(group[1].sign(KEY))
+
+        with pytest.raises(ValueError):
+            signer.sign_group(group, [KEY])
+
+    def test_key_cache_is_bounded(self):
+        """Test the key cache starts over instead of growing past max_keys"""
+        signer = Signer(max_keys=2)
+        keys = [account.generate_account()[0] for _ in range(3)]
+        for private_key in keys:
+            signer.address(private_key)
+        assert signer.stats()["cached_keys"] == 1
+        assert signer.address(keys[0]) == account.address_from_private_key(keys[0])
+
+    def test_process_pool_signing(self):
+        """Test groups signed in worker processes match groups signed inline"""
+        signer = Signer(processes=2)
+        groups = [(_group(ADDRESS), KEY), (_group(OTHER, 2), OTHER_KEY), (_group(ADDRESS, 1), KEY)]
+        try:
+            signed = asyncio.run(signer.sign_groups_async(groups))
+        finally:
+            signer.close()
+
+        inline = Signer()
+        assert [[encoding.msgpack_encode(stxn) for stxn in group] for group in signed] == [
+            [encoding.msgpack_encode(stxn) for stxn in inline.sign_group(txns, private_key)]
+            for txns, private_key in groups
+        ]
+        assert signer.stats()["transactions_offloaded"] == 6
+
+    def test_encoded_group_signing(self):
+        """Test signing pre-encoded transactions, inline and in a worker, matches signing the transactions"""
+        group = _group(ADDRESS)
+        encoded = [base64.b64decode(encoding.msgpack_encode(txn)) for txn in group]
+        expected = [base64.b64decode(encoding.msgpack_encode(txn.sign(OTHER_KEY))) for txn in group]
+
+        assert Signer().sign_encoded_group(encoded, OTHER_KEY, ADDRESS) == expected
+        signer = Signer(processes=1)
+        try:
+            assert asyncio.run(signer.sign_encoded_group_async(encoded, OTHER_KEY, ADDRESS)) == expected
+        finally:
+            signer.close()
+        assert signer.stats()["transactions_offloaded"] == 3
@@ -0,0 +1,70 @@
+"""
+Tests for the sharded spend counter engine
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from backend.services.spend_counter import ShardedSpendCounter, SECONDS_IN_DAY
+from backend.services.oracle_service import OracleService, PurchaseRequest
+from backend.services.blockchain_service import BlockchainService
+
+
+class TestShardedSpendCounter:
+    """Test cases for ShardedSpendCounter"""
+
+    def test_reserve_within_and_over_limit(self):
+        """Test that reservations stop at the limit"""
+        counter = ShardedSpendCounter(num_shards=4)
+
+        assert counter.try_reserve("Starbucks", 30, 50, 1000) == (True, 30)
+        assert counter.try_reserve("Starbucks", 20, 50, 1000) == (True, 50)
+        assert counter.try_reserve("Starbucks", 1, 50, 1000) == (False, 50)
+
+    def test_new_day_resets_counter(self):
+        """Test that spending resets on a new day"""
+        counter = ShardedSpendCounter()
+        counter.try_reserve("Target", 100, 100, 1000)
+
+        approved, spent = counter.try_reserve("Target", 40, 100, 1000 + SECONDS_IN_DAY)
+
+        assert approved is True
+        assert spent == 40
+
+    def test_release_returns_reservation(self):
+        """Test releasing a reservation frees limit"""
+        counter = ShardedSpendCounter()
+        counter.try_reserve("Amazon", 80, 100, 1000)
+        counter.release("Amazon", 80, 1000)
+
+        assert counter.get_spent("Amazon", 1000)[0] == 0
+
+    def test_bulk_restore_and_live_entries(self):
+        """Test a bulk restore matches restoring one by one, and only today's spend is live"""
+        entries = [("Target", 1, 40, 100), ("Amazon", 1, 0, 100), ("Bookstore", 0, 70, 50)]
+        counter = ShardedSpendCounter(num_shards=2)
+        counter.restore_many(entries)
+
+        one_by_one = ShardedSpendCounter(num_shards=2)
+        for entry in entries:
+            one_by_one.restore(*entry)
+        assert sorted(counter.entries()) == sorted(one_by_one.entries())
+        assert counter.live_entries(SECONDS_IN_DAY + 200) == [("Target", 1, 40, 100)]
+
+    def test_concurrent_verifications_never_overshoot(self):
+        """Test thousands of concurrent verifications against one merchant"""
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.attestation_oracle_app_id = None
+        oracle_service = OracleService(blockchain_service)
+        request = PurchaseRequest(
+            merchant_name="Starbucks",
+            amount=1000000,  # 1 ALGO
+            user_address="DEMO_USER_ADDRESS"
+        )
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda _: oracle_service.verify_purchase(request), range(2000)))
+
+        approved = sum(1 for r in results if r.approved)
+        assert approved == 50  # 50 ALGO daily limit
+        assert oracle_service.get_spent_today("Starbucks") == 50000000
@@ -0,0 +1,110 @@
+"""
+Tests for cursor-paginated and streaming transaction history
+"""
+
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routes import transactions
+from backend.services.blockchain_service import BlockchainService
+from backend.services.transaction_store import TransactionStore, TransactionSync
+
+
+def _indexer(transactions):
+    """search_transactions stand-in: newest-first pages honoring max_round, next-token is an offset"""
+    async def search_transactions(address=None, limit=None, next_page=None, max_round=None, **kwargs):
+        matching = [tx for tx in transactions if max_round is None or tx["confirmed-round"] <= max_round]
+        start = int(next_page or 0)
+        response = {"transactions": matching[start:start + limit]}
+        if start + limit < len(matching):
+            response["next-token"] = str(start + limit)
+        return response
+    return AsyncMock(side_effect=search_transactions)
+
+
+def _tx(txid, round_number, intra_round=0):
+    return {
+        "id": txid,
+        "tx-type": "pay",
+        "confirmed-round": round_number,
+        "intra-round-offset": intra_round,
+        "round-time": 1700000000 + round_number,
+        "sender": "TEEN",
+        "payment-transaction": {"amount": round_number, "receiver": "MERCHANT"}
+    }
+
+
+# Newest first, as the indexer returns an address's transactions
+HISTORY = [_tx("E", 12), _tx("D", 11, 1), _tx("C", 11, 0), _tx("B", 10), _tx("A", 9)]
+
+
+@pytest.fixture
+def blockchain_service():
+    service = BlockchainService()
+    service.async_indexer.search_transactions = _indexer(HISTORY)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def transaction_sync():
+    # Address not synced locally yet, so history comes straight from the indexer
+    transaction_sync = Mock(spec=TransactionSync)
+    transaction_sync.ensure_synced = AsyncMock(return_value=None)
+    return transaction_sync
+
+
+@pytest.fixture
+def client(blockchain_service, transaction_sync):
+    app = FastAPI()
+    app.include_router(transactions.router)
+    app.dependency_overrides[transactions.get_blockchain_service] = lambda: blockchain_service
+    app.dependency_overrides[transactions.get_transaction_sync] = lambda: transaction_sync
+    return TestClient(app)
+
+
+class TestTransactionHistory:
+    """Test cases for transaction history pagination"""
+
+    def test_cursor_pagination(self, client):
+        """Test indexer pages are newest first and next_cursor is followed until history is exhausted"""
+        first = client.get("/api/v1/transactions/TEEN", params={"limit": 2}).json()
+        assert [tx["id"] for tx in first["transactions"]] == ["E", "D"]
+        assert first["transactions"][0]["receiver"] == "MERCHANT"
+
+        second = client.get("/api/v1/transactions/TEEN", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+        assert [tx["id"] for tx in second["transactions"]] == ["C", "B"]
+
+        last = client.get("/api/v1/transactions/TEEN", params={"limit": 2, "cursor": second["next_cursor"]}).json()
+        assert [tx["id"] for tx in last["transactions"]] == ["A"]
+        assert last["next_cursor"] is None
+
+        invalid = client.get("/api/v1/transactions/TEEN", params={"cursor": "cursor-1"})
+        assert invalid.status_code == 400
+
+    def test_cursor_carries_over_to_local_store(self, client, transaction_sync):
+        """Test a cursor from the indexer fallback continues the same history once the store is synced"""
+        first = client.get("/api/v1/transactions/TEEN", params={"limit": 2}).json()
+
+        store = TransactionStore(":memory:")
+        store.watch("TEEN")
+        store.add_transactions("TEEN", HISTORY)
+        transaction_sync.ensure_synced = AsyncMock(return_value=12)
+        transaction_sync.store = store
+        second = client.get("/api/v1/transactions/TEEN", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+        store.close()
+
+        assert second["synced_round"] == 12
+        assert [tx["id"] for tx in second["transactions"]] == ["C", "B"]
+
+    def test_ndjson_stream_follows_every_page(self, client):
+        """Test the stream yields one line per transaction across pages"""
+        response = client.get("/api/v1/transactions/TEEN/stream", params={"page_size": 2})
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["id"] for line in lines] == ["E", "D", "C", "B", "A"]
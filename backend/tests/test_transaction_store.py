@@ -0,0 +1,99 @@
+"""
+Tests for the local transaction store and its incremental indexer sync
+"""
+
+import asyncio
+import base64
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.transaction_store import TransactionStore, TransactionSync
+
+TEEN = "TEEN"
+
+
+def _tx(txid, round_number, amount, sender=TEEN, receiver="MERCHANT", note=None):
+    tx = {
+        "id": txid,
+        "tx-type": "pay",
+        "confirmed-round": round_number,
+        "intra-round-offset": 0,
+        "round-time": 1700000000 + round_number,
+        "sender": sender,
+        "payment-transaction": {"amount": amount, "receiver": receiver}
+    }
+    if note:
+        tx["note"] = base64.b64encode(note.encode()).decode()
+    return tx
+
+
+@pytest.fixture
+def sync():
+    store = TransactionStore(":memory:")
+    blockchain_service = Mock(spec=BlockchainService)
+    blockchain_service.async_indexer = Mock()
+    yield TransactionSync(blockchain_service, store, interval=0)
+    store.close()
+
+
+class TestTransactionStore:
+    """Test cases for TransactionStore / TransactionSync"""
+
+    def test_sync_resumes_from_synced_round(self, sync):
+        """Test the second sync only asks the indexer for newer rounds"""
+        search = AsyncMock(side_effect=[
+            {"current-round": 100, "transactions": [_tx("A", 10, 5), _tx("B", 20, 7)]},
+            {"current-round": 150, "transactions": [_tx("C", 120, 3)]}
+        ])
+        sync.blockchain_service.async_indexer.search_transactions = search
+
+        assert asyncio.run(sync.sync_address(TEEN)) == 100
+        assert asyncio.run(sync.sync_address(TEEN)) == 150
+
+        assert search.await_args_list[0].kwargs["min_round"] == 1
+        assert search.await_args_list[1].kwargs["min_round"] == 101
+        assert sync.store.synced_round(TEEN) == 150
+        assert [tx["id"] for tx in sync.store.history(TEEN)["transactions"]] == ["C", "B", "A"]
+
+    def test_first_sync_runs_in_background(self, sync):
+        """Test ensure_synced returns at once and reports the synced round after the first sync finishes"""
+        release = asyncio.Event()
+
+        async def search_transactions(**kwargs):
+            await release.wait()
+            return {"current-round": 100, "transactions": [_tx("A", 10, 5)]}
+
+        sync.blockchain_service.async_indexer.search_transactions = AsyncMock(side_effect=search_transactions)
+
+        async def scenario():
+            assert await sync.ensure_synced(TEEN) is None
+            assert await sync.ensure_synced(TEEN) is None
+            assert sync.loaded_analytics(TEEN) is None
+            release.set()
+            await asyncio.gather(*sync._warmups.values())
+            return await sync.ensure_synced(TEEN), sync.loaded_analytics(TEEN)
+
+        synced_round, analytics = asyncio.run(scenario())
+        assert synced_round == 100
+        assert analytics["total_spent"] == 5
+        assert sync.blockchain_service.async_indexer.search_transactions.await_count == 1
+
+    def test_history_cursor_pages(self, sync):
+        """Test local pages are newest first and cursors continue where they left off"""
+        sync.store.watch(TEEN)
+        sync.store.add_transactions(TEEN, [_tx(f"T{i}", i, 1) for i in range(1, 6)])
+        # Replayed pages are ignored
+        assert sync.store.add_transactions(TEEN, [_tx("T5", 5, 1)]) == []
+
+        first = sync.store.history(TEEN, limit=2)
+        second = sync.store.history(TEEN, limit=2, cursor=first["next_cursor"])
+        third = sync.store.history(TEEN, limit=2, cursor=second["next_cursor"])
+
+        assert [tx["id"] for tx in first["transactions"]] == ["T5", "T4"]
+        assert [tx["id"] for tx in second["transactions"]] == ["T3", "T2"]
+        assert [tx["id"] for tx in third["transactions"]] == ["T1"]
+        assert third["next_cursor"] is None
+        with pytest.raises(ValueError):
+            sync.store.history(TEEN, cursor="not-a-cursor")
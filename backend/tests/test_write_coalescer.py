@@ -0,0 +1,121 @@
+"""
+Tests for the attestation oracle write coalescer
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService
+from backend.services.write_coalescer import OracleWriteCoalescer
+
+
+def _group_call(groups):
+    """call_attestation_oracle_group stand-in: a group fails if any call's method is 'reject'"""
+    def call(calls):
+        groups.append([args[0] for _, _, args in calls])
+        if any(method == "reject" for _, method, _ in calls):
+            return {"error": "logic eval error"}
+        return {
+            "success": True,
+            "transaction_ids": [f"TX_{args[0].decode()}" for _, _, args in calls],
+            "confirmed_round": 100 + len(groups)
+        }
+    return call
+
+
+class TestOracleWriteCoalescer:
+    """Test cases for OracleWriteCoalescer"""
+
+    def test_concurrent_mutations_share_groups(self):
+        """Test concurrent callers are packed into groups of at most 16 with per-call outcomes"""
+        groups = []
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.call_attestation_oracle_group.side_effect = _group_call(groups)
+        coalescer = OracleWriteCoalescer(blockchain_service, window=0.2, group_size=16, concurrency=4)
+
+        with ThreadPoolExecutor(40) as callers:
+            results = list(callers.map(
+                lambda i: coalescer.call("KEY", "update_merchant_limits", [f"M{i}".encode()]),
+                range(40)
+            ))
+        coalescer.close()
+
+        assert [result["transaction_id"] for result in results] == [f"TX_M{i}" for i in range(40)]
+        assert all(len(group) <= 16 for group in groups)
+        assert sum(len(group) for group in groups) == 40
+        assert len(groups) < 10
+
+    def test_rejected_call_does_not_fail_its_group(self):
+        """Test a failed group is retried call by call, and duplicates are sent once"""
+        groups = []
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.call_attestation_oracle_group.side_effect = _group_call(groups)
+        coalescer = OracleWriteCoalescer(blockchain_service, window=0.2)
+
+        good = coalescer.submit("KEY", "update_merchant_limits", [b"A"])
+        duplicate = coalescer.submit("KEY", "update_merchant_limits", [b"A"])
+        bad = coalescer.submit("KEY", "reject", [b"B"])
+        other = coalescer.submit("KEY", "parent_approve_merchant", [b"C"])
+        coalescer.close()
+
+        assert duplicate is good
+        assert good.result()["transaction_id"] == "TX_A"
+        assert other.result()["transaction_id"] == "TX_C"
+        assert bad.result() == {"error": "logic eval error"}
+        assert groups[0] == [b"A", b"B", b"C"]
+        assert coalescer.stats()["retried"] == 3
+
+    def test_failures_and_close_always_resolve_callers(self):
+        """Test a raising or malformed group call and a bounded close never leave a caller waiting"""
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.call_attestation_oracle_group.side_effect = RuntimeError("algod unreachable")
+        coalescer = OracleWriteCoalescer(blockchain_service, window=0)
+        assert coalescer.call("KEY", "update_merchant_limits", [b"A"]) == {"error": "algod unreachable"}
+        coalescer.close()
+
+        # A bare mock result (no transaction ids) is an error, not a hang
+        blockchain_service.call_attestation_oracle_group.side_effect = None
+        coalescer = OracleWriteCoalescer(blockchain_service, window=0)
+        assert "error" in coalescer.call("KEY", "update_merchant_limits", [b"A"], timeout=5)
+        coalescer.close()
+
+        release = threading.Event()
+        blockchain_service.call_attestation_oracle_group.side_effect = lambda calls: release.wait(5) and {}
+        coalescer = OracleWriteCoalescer(blockchain_service, window=0, timeout=0.2)
+        assert coalescer.call("KEY", "update_merchant_limits", [b"A"]) == {
+            "error": "Timed out waiting for update_merchant_limits to confirm"
+        }
+        pending = coalescer.submit("KEY", "update_merchant_limits", [b"B"])
+        start = time.monotonic()
+        coalescer.close()
+        assert time.monotonic() - start < 2
+        assert pending.result(0) == {"error": "Oracle write coalescer closed before the write confirmed"}
+        release.set()
+
+    def test_oracle_service_writes_go_through_coalescer(self):
+        """Test concurrent limit updates reach the chain as one group once the write queue drains"""
+        groups = []
+        blockchain_service = Mock(spec=BlockchainService)
+        blockchain_service.attestation_oracle_app_id = 1234
+        blockchain_service.attestation_oracle_version = 1
+        blockchain_service.call_attestation_oracle_group.side_effect = _group_call(groups)
+        oracle_service = OracleService(blockchain_service)
+        oracle_service.oracle_private_key = "ORACLE_KEY"
+        oracle_service.oracle_writes.window = 0.5
+        merchants = ["Starbucks", "Target", "Bookstore", "Amazon"]
+
+        with ThreadPoolExecutor(len(merchants)) as callers:
+            results = list(callers.map(
+                lambda name: oracle_service.update_merchant_limits(name, 1000000, True), merchants
+            ))
+        assert oracle_service.write_queue.drain(5)
+
+        assert all(result["success"] for result in results)
+        assert all(oracle_service.get_oracle_write(result["write_id"])["status"] == "confirmed" for result in results)
+        oracle_service.write_queue.close()
+        oracle_service.oracle_writes.close()
+        assert sorted(groups[0]) == sorted(name.encode() for name in merchants)
+        blockchain_service.call_attestation_oracle.assert_not_called()
@@ -0,0 +1,162 @@
+"""
+Tests for the durable attestation oracle write queue
+"""
+
+import sqlite3
+import threading
+from unittest.mock import Mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routes import merchants
+from backend.services.blockchain_service import BlockchainService
+from backend.services.oracle_service import OracleService
+from backend.services.write_coalescer import OracleWriteCoalescer
+from backend.services.write_queue import OracleWriteQueue, WRITE_CONFIRMED, WRITE_FAILED, WRITE_PENDING
+
+
+def _chain(outcomes, sent):
+    """call_attestation_oracle_group stand-in: pops an outcome ('ok' or an error) per group sent"""
+    def call(calls):
+        sent.append([args[0] for _, _, args in calls])
+        outcome = outcomes.pop(0) if outcomes else "ok"
+        if outcome != "ok":
+            return {"error": outcome}
+        return {
+            "success": True,
+            "transaction_ids": [f"TX_{args[0].decode()}_{len(sent)}" for _, _, args in calls],
+            "confirmed_round": 100 + len(sent)
+        }
+    blockchain_service = Mock(spec=BlockchainService)
+    blockchain_service.attestation_oracle_app_id = 1234
+    blockchain_service.attestation_oracle_version = 1
+    blockchain_service.call_attestation_oracle_group.side_effect = call
+    return blockchain_service
+
+
+def _queue(blockchain_service, path=":memory:", **options):
+    coalescer = OracleWriteCoalescer(blockchain_service, window=0, timeout=5)
+    options.setdefault("backoff", 0.01)
+    return OracleWriteQueue(coalescer, lambda: "ORACLE_KEY", path, **options), coalescer
+
+
+class TestOracleWriteQueue:
+    """Test cases for OracleWriteQueue"""
+
+    def test_failed_writes_are_retried_with_backoff(self):
+        """Test a write is retried until it confirms, and gives up after max_attempts"""
+        sent = []
+        queue, coalescer = _queue(_chain(["algod unreachable", "algod unreachable"], sent), max_attempts=3)
+
+        write_id = queue.enqueue("Target", "update_merchant_limits", [b"Target"])
+        assert queue.drain(5)
+        write = queue.status(write_id)
+        assert write["status"] == WRITE_CONFIRMED
+        assert write["attempts"] == 3
+        assert write["transaction_id"] == "TX_Target_3"
+        assert write["last_error"] is None
+
+        sent.clear()
+        queue.coalescer.blockchain_service.call_attestation_oracle_group.side_effect = (
+            lambda calls: {"error": "logic eval error"}
+        )
+        write_id = queue.enqueue("Bookstore", "update_merchant_limits", [b"Bookstore"])
+        assert queue.drain(5)
+        write = queue.status(write_id)
+        assert write["status"] == WRITE_FAILED
+        assert write["attempts"] == 3
+        assert write["last_error"] == "logic eval error"
+        assert queue.stats() == {"pending": 0, "confirmed": 1, "failed": 1, "in_flight": 0}
+        assert queue.status(999) is None
+        queue.close()
+        coalescer.close()
+
+    def test_writes_for_one_merchant_keep_their_order(self):
+        """Test a merchant's later write waits for its earlier one, other merchants do not"""
+        sent = []
+        release = threading.Event()
+        blockchain_service = _chain([], sent)
+        send = blockchain_service.call_attestation_oracle_group.side_effect
+
+        def slow_first(calls):
+            if not sent:
+                release.wait(5)
+            return send(calls)
+
+        blockchain_service.call_attestation_oracle_group.side_effect = slow_first
+        queue, coalescer = _queue(blockchain_service)
+        first = queue.enqueue("Target", "update_merchant_limits", [b"T1"])
+        second = queue.enqueue("Target", "update_merchant_limits", [b"T2"])
+        other = queue.enqueue("Amazon", "update_merchant_limits", [b"A1"])
+
+        queue.drain(0.3)
+        assert queue.status(second)["attempts"] == 0
+        release.set()
+        assert queue.drain(5)
+
+        order = [arg for group in sent for arg in group]
+        assert order.index(b"T1") < order.index(b"T2")
+        assert all(queue.status(write_id)["status"] == WRITE_CONFIRMED for write_id in [first, second, other])
+        queue.close()
+        coalescer.close()
+
+    def test_unsent_writes_survive_a_restart(self, tmp_path):
+        """Test writes left pending at close are sent by the next queue on the same file"""
+        path = str(tmp_path / "writes.db")
+        blockchain_service = _chain(["algod unreachable"], [])
+        queue, coalescer = _queue(blockchain_service, path, backoff=60)
+        write_id = queue.enqueue("Target", "update_merchant_limits", [b"Target"])
+        queue.close(timeout=0.3)
+        coalescer.close()
+
+        restarted, coalescer = _queue(blockchain_service, path)
+        assert restarted.status(write_id)["status"] == WRITE_PENDING
+        # Backed off for a minute, so only a drain past that would send it
+        restarted.close(timeout=0.1)
+        coalescer.close()
+
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("UPDATE oracle_writes SET next_attempt = 0")
+        conn.close()
+        restarted, coalescer = _queue(blockchain_service, path)
+        restarted.close(timeout=5)
+        coalescer.close()
+        restarted, coalescer = _queue(blockchain_service, path)
+        write = restarted.status(write_id)
+        assert write["status"] == WRITE_CONFIRMED
+        assert write["attempts"] == 2
+        restarted.close()
+        coalescer.close()
+
+    def test_merchant_changes_return_before_the_chain_write(self):
+        """Test a failing chain write leaves the local change in place and is reported per write"""
+        blockchain_service = _chain(["algod unreachable"] * 10, [])
+        oracle_service = OracleService(blockchain_service)
+        oracle_service.oracle_private_key = "ORACLE_KEY"
+        oracle_service.write_queue.backoff = 0.01
+        oracle_service.write_queue.max_attempts = 2
+
+        app = FastAPI()
+        app.include_router(merchants.router)
+        app.dependency_overrides[merchants.get_oracle_service] = lambda: oracle_service
+        client = TestClient(app)
+
+        response = client.put("/api/v1/merchants/Target/limits", json={
+            "merchant_name": "Target", "new_daily_limit": 123, "is_approved": True
+        })
+        assert response.status_code == 200
+        write_id = response.json()["write_id"]
+        assert oracle_service.get_merchant_attestation("Target").daily_limit == 123
+
+        assert oracle_service.write_queue.drain(5)
+        body = client.get(f"/api/v1/merchants/writes/{write_id}").json()
+        assert body["status"] == WRITE_FAILED
+        assert body["merchant_name"] == "Target"
+        assert body["last_error"] == "algod unreachable"
+        assert client.get("/api/v1/merchants/writes/999").status_code == 404
+
+        oracle_service.write_queue.close()
+        oracle_service.oracle_writes.close()
+